@@ -0,0 +1,28 @@
+"""Index idempotency_key.created_at for batched purge
+
+Revision ID: a8d3f5c7e214
+Revises: f4c8a2e6b913
+Create Date: 2025-09-19 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3f5c7e214'
+down_revision = 'f4c8a2e6b913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_idempotency_key_created_at '
+            'ON idempotency_key (created_at)'
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_idempotency_key_created_at')
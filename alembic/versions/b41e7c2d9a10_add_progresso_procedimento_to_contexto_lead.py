@@ -0,0 +1,24 @@
+"""Add progresso_procedimento column to contexto_lead
+
+Revision ID: b41e7c2d9a10
+Revises: 7254c34a3657
+Create Date: 2025-09-10 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41e7c2d9a10'
+down_revision = '7254c34a3657'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('contexto_lead', sa.Column('progresso_procedimento', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('contexto_lead', 'progresso_procedimento')
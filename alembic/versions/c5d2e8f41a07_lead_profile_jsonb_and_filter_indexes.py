@@ -0,0 +1,64 @@
+"""LeadProfile JSON -> JSONB with indexes for Studio lead filters
+
+Revision ID: c5d2e8f41a07
+Revises: b41e7c2d9a10
+Create Date: 2025-09-15 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2e8f41a07'
+down_revision = 'b41e7c2d9a10'
+branch_labels = None
+depends_on = None
+
+JSON_COLUMNS = ('accounts', 'deposit', 'agreements', 'flags')
+
+EXPRESSION_INDEXES = {
+    'ix_lead_profile_deposit_status': "(deposit ->> 'status')",
+    'ix_lead_profile_accounts_quotex': "(accounts ->> 'quotex')",
+    'ix_lead_profile_accounts_nyrion': "(accounts ->> 'nyrion')",
+}
+
+
+def upgrade() -> None:
+    for column in JSON_COLUMNS:
+        op.alter_column(
+            'lead_profile', column,
+            type_=postgresql.JSONB(),
+            existing_type=sa.JSON(),
+            postgresql_using=f'{column}::jsonb'
+        )
+
+    # CONCURRENTLY para não bloquear escrita em tabelas grandes
+    with op.get_context().autocommit_block():
+        for column in JSON_COLUMNS:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_lead_profile_{column}_gin '
+                f'ON lead_profile USING gin ({column} jsonb_path_ops)'
+            )
+        for name, expression in EXPRESSION_INDEXES.items():
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                f'ON lead_profile ({expression})'
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in EXPRESSION_INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+        for column in JSON_COLUMNS:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS ix_lead_profile_{column}_gin')
+
+    for column in JSON_COLUMNS:
+        op.alter_column(
+            'lead_profile', column,
+            type_=sa.JSON(),
+            existing_type=postgresql.JSONB(),
+            postgresql_using=f'{column}::json'
+        )
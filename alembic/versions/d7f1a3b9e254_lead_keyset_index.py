@@ -0,0 +1,28 @@
+"""Index lead(created_at, id) for keyset pagination
+
+Revision ID: d7f1a3b9e254
+Revises: c5d2e8f41a07
+Create Date: 2025-09-16 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7f1a3b9e254'
+down_revision = 'c5d2e8f41a07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_lead_created_at_id '
+            'ON lead (created_at, id)'
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_lead_created_at_id')
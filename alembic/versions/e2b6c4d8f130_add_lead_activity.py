@@ -0,0 +1,59 @@
+"""Add lead_activity summary table
+
+Revision ID: e2b6c4d8f130
+Revises: d7f1a3b9e254
+Create Date: 2025-09-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b6c4d8f130'
+down_revision = 'd7f1a3b9e254'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'lead_activity',
+        sa.Column('lead_id', sa.Integer(), primary_key=True),
+        sa.Column('last_activity_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_event_type', sa.String(), nullable=True),
+        sa.Column('events_day', sa.Date(), nullable=False),
+        sa.Column('events_today', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('messages_in', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('messages_out', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('procedure_active', sa.String(), nullable=True),
+        sa.Column('procedure_step', sa.String(), nullable=True),
+    )
+    op.create_index('ix_lead_activity_last_activity_at', 'lead_activity', ['last_activity_at'])
+    op.create_index('ix_lead_activity_procedure_active', 'lead_activity', ['procedure_active'])
+
+    # Backfill a partir do ledger de eventos e do contexto atual
+    op.execute("""
+        INSERT INTO lead_activity (
+            lead_id, last_activity_at, events_day, events_today,
+            messages_in, messages_out, procedure_active, procedure_step
+        )
+        SELECT
+            e.lead_id,
+            max(e.created_at),
+            (now() AT TIME ZONE 'UTC')::date,
+            count(*) FILTER (WHERE (e.created_at AT TIME ZONE 'UTC')::date = (now() AT TIME ZONE 'UTC')::date),
+            count(*) FILTER (WHERE e.type = 'message_received'),
+            count(*) FILTER (WHERE e.type = 'pipeline_executed' AND e.payload->>'response_sent' = 'true'),
+            c.procedimento_ativo,
+            c.etapa_ativa
+        FROM journey_event e
+        LEFT JOIN contexto_lead c ON c.lead_id = e.lead_id
+        GROUP BY e.lead_id, c.procedimento_ativo, c.etapa_ativa
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_lead_activity_procedure_active', table_name='lead_activity')
+    op.drop_index('ix_lead_activity_last_activity_at', table_name='lead_activity')
+    op.drop_table('lead_activity')
@@ -0,0 +1,88 @@
+"""Partition journey_event by month on created_at
+
+Revision ID: f4c8a2e6b913
+Revises: e2b6c4d8f130
+Create Date: 2025-09-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4c8a2e6b913'
+down_revision = 'e2b6c4d8f130'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 2
+
+
+def upgrade() -> None:
+    op.execute('ALTER TABLE journey_event RENAME TO journey_event_legacy')
+    op.execute('ALTER INDEX ix_journey_event_lead_id RENAME TO ix_journey_event_legacy_lead_id')
+    op.execute('ALTER TABLE journey_event_legacy RENAME CONSTRAINT journey_event_pkey TO journey_event_legacy_pkey')
+
+    # A chave de partição precisa fazer parte da PK
+    op.execute("""
+        CREATE TABLE journey_event (
+            id integer NOT NULL DEFAULT nextval('journey_event_id_seq'),
+            lead_id integer NOT NULL,
+            type varchar NOT NULL,
+            payload json NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute('CREATE INDEX ix_journey_event_lead_id_created_at ON journey_event (lead_id, created_at DESC)')
+    op.execute('CREATE TABLE journey_event_default PARTITION OF journey_event DEFAULT')
+
+    # Uma partição por mês com dados, até MONTHS_AHEAD meses à frente
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month_start date;
+            last_month date := date_trunc('month', now() AT TIME ZONE 'UTC')::date + interval '{MONTHS_AHEAD} months';
+        BEGIN
+            SELECT coalesce(date_trunc('month', min(created_at) AT TIME ZONE 'UTC')::date,
+                            date_trunc('month', now() AT TIME ZONE 'UTC')::date)
+              INTO month_start FROM journey_event_legacy;
+            WHILE month_start <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF journey_event '
+                    'FOR VALUES FROM (%L) TO (%L)',
+                    'journey_event_p' || to_char(month_start, 'YYYYMM'),
+                    month_start::timestamp AT TIME ZONE 'UTC',
+                    (month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+                );
+                month_start := month_start + interval '1 month';
+            END LOOP;
+        END $$
+    """)
+
+    op.execute("""
+        INSERT INTO journey_event (id, lead_id, type, payload, created_at)
+        SELECT id, lead_id, type, payload, created_at FROM journey_event_legacy
+    """)
+    op.execute('ALTER SEQUENCE journey_event_id_seq OWNED BY journey_event.id')
+    op.execute('DROP TABLE journey_event_legacy')
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE journey_event RENAME TO journey_event_partitioned')
+    op.execute("""
+        CREATE TABLE journey_event (
+            id integer NOT NULL DEFAULT nextval('journey_event_id_seq'),
+            lead_id integer NOT NULL,
+            type varchar NOT NULL,
+            payload json NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            CONSTRAINT journey_event_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("""
+        INSERT INTO journey_event (id, lead_id, type, payload, created_at)
+        SELECT id, lead_id, type, payload, created_at FROM journey_event_partitioned
+    """)
+    op.execute('ALTER SEQUENCE journey_event_id_seq OWNED BY journey_event.id')
+    op.execute('DROP TABLE journey_event_partitioned CASCADE')
+    op.create_index('ix_journey_event_lead_id', 'journey_event', ['lead_id'], unique=False)
@@ -3,7 +3,6 @@ Catalog Reset API - Safe catalog/procedures reset mechanism
 Provides endpoints to reset automation catalogs and procedures safely.
 """
 import os
-import yaml
 import shutil
 import logging
 from datetime import datetime
@@ -11,6 +10,8 @@ from typing import Dict, Any, Optional
 from fastapi import APIRouter, HTTPException, Depends
 from app.infra.logging import log_structured
 from app.core.contexto_lead import get_contexto_lead_service
+from app.core.catalog_store import get_catalog_store
+from app.core.policy_watcher import notify_policy_change, get_policy_watcher, COMPONENT_CATALOG
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/catalog", tags=["catalog"])
@@ -115,8 +116,9 @@ class CatalogResetService:
                 reset_results["procedures_reset"] = True
                 reset_results["files_reset"].append("procedures.yml")
             
-            # Clear caches
-            await self._clear_caches()
+            # Swap in-memory store to the empty state
+            get_catalog_store().replace(automations=[], procedures=[])
+            await notify_policy_change(COMPONENT_CATALOG, reload=False)
             
             log_structured("info", "catalog_reset_complete", reset_results)
             
@@ -129,19 +131,9 @@ class CatalogResetService:
             raise
     
     async def _clear_caches(self):
-        """Clear all catalog caches."""
+        """Reload the catalog store from disk on every worker."""
         try:
-            # Clear automation hook cache
-            from app.core.automation_hook import _catalog_cache
-            globals()["_catalog_cache"] = None
-            
-            # Clear selector cache
-            from app.core.selector import _CATALOG_CACHE
-            globals()["_CATALOG_CACHE"] = None
-            
-            # Clear procedures cache
-            from app.core.procedures import _PROCEDURES_CACHE
-            globals()["_PROCEDURES_CACHE"] = None
+            await notify_policy_change(COMPONENT_CATALOG)
             
             log_structured("info", "catalog_caches_cleared", {})
             
@@ -159,31 +151,14 @@ class CatalogResetService:
                 "procedures_empty": True
             }
             
-            # Count automations
-            catalog_path = os.path.join(POLICIES_DIR, "catalog.yml")
-            if os.path.exists(catalog_path):
-                with open(catalog_path, "r", encoding="utf-8") as f:
-                    catalog_data = yaml.safe_load(f) or []
-                    if isinstance(catalog_data, list):
-                        stats["automations_count"] = len(catalog_data)
-                        stats["catalog_empty"] = len(catalog_data) == 0
-            
-            # Count procedures
-            procedures_path = os.path.join(POLICIES_DIR, "procedures.yml")
-            if os.path.exists(procedures_path):
-                with open(procedures_path, "r", encoding="utf-8") as f:
-                    procedures_data = yaml.safe_load(f) or []
-                    if isinstance(procedures_data, list):
-                        stats["procedures_count"] = len(procedures_data)
-                        stats["procedures_empty"] = len(procedures_data) == 0
-            
-            # Count confirm targets
-            confirm_targets_path = os.path.join(POLICIES_DIR, "confirm_targets.yml")
-            if os.path.exists(confirm_targets_path):
-                with open(confirm_targets_path, "r", encoding="utf-8") as f:
-                    targets_data = yaml.safe_load(f) or {}
-                    if isinstance(targets_data, dict):
-                        stats["confirm_targets_count"] = len(targets_data)
+            store = get_catalog_store()
+            stats["automations_count"] = len(store.automations)
+            stats["catalog_empty"] = len(store.automations) == 0
+            stats["procedures_count"] = len(store.procedures)
+            stats["procedures_empty"] = len(store.procedures) == 0
+            stats["confirm_targets_count"] = len(store.confirm_targets)
+            stats["catalog_version"] = store.version
+            stats["policy_versions"] = dict(get_policy_watcher().versions)
             
             return stats
             
@@ -289,8 +264,9 @@ async def save_catalog(
         with open(catalog_path, "w", encoding="utf-8") as f:
             f.write(content)
         
-        # Clear caches
-        await service._clear_caches()
+        # Swap in-memory store with the already-parsed content
+        get_catalog_store().replace(automations=parsed_content or [])
+        await notify_policy_change(COMPONENT_CATALOG, reload=False)
         
         log_structured("info", "catalog_saved", {
             "file": "catalog.yml",
@@ -335,8 +311,9 @@ async def save_procedures(
         with open(procedures_path, "w", encoding="utf-8") as f:
             f.write(content)
         
-        # Clear caches
-        await service._clear_caches()
+        # Swap in-memory store with the already-parsed content
+        get_catalog_store().replace(procedures=parsed_content or [])
+        await notify_policy_change(COMPONENT_CATALOG, reload=False)
         
         log_structured("info", "procedures_saved", {
             "file": "procedures.yml", 
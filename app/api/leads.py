@@ -3,14 +3,19 @@ API endpoints para gerenciamento de leads
 """
 from fastapi import APIRouter, Depends, Query, HTTPException
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc, or_, and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, desc, asc, or_, and_, func, literal_column, String
 from datetime import datetime, timedelta
 import math
 
-from app.data.models import Lead, LeadProfile, JourneyEvent, ContextoLead
-from app.data.repo import LeadRepository, EventRepository
-from app.infra.db import get_db
+from app.data.models import Lead, LeadProfile, LeadActivity, JourneyEvent, ContextoLead
+from app.data.repo import LeadRepository
+from app.infra.db import get_async_db
+from app.core.procedures import summarize_progress
+from app.data.pagination import (
+    InvalidCursor, encode_cursor, decode_cursor, keyset_filter,
+    estimate_count, cached_exact_count
+)
 
 router = APIRouter()
 
@@ -18,7 +23,7 @@ router = APIRouter()
 @router.delete("/leads/{lead_id}/session")
 async def clear_lead_session(
     lead_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Limpa a sessão/contexto de um lead específico.
@@ -26,13 +31,14 @@ async def clear_lead_session(
     try:
         from app.core.contexto_lead import get_contexto_lead_service
         
-        contexto_service = get_contexto_lead_service()
+        contexto_service = get_contexto_lead_service(db)
         
         # Limpar contexto completo
         await contexto_service.atualizar_contexto(
             lead_id=lead_id,
             procedimento_ativo=None,
             etapa_ativa=None,
+            progresso_procedimento={},
             aguardando=None,
             ultima_automacao_enviada=None,
             ultimo_topico_kb=None
@@ -47,7 +53,7 @@ async def clear_lead_session(
 @router.delete("/leads/{lead_id}")
 async def delete_lead(
     lead_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Remove um lead completamente do sistema.
@@ -56,31 +62,81 @@ async def delete_lead(
         lead_repo = LeadRepository(db)
         
         # Verificar se lead existe
-        lead = lead_repo.get_by_id(lead_id)
+        lead = await lead_repo.get_by_id(lead_id)
         if not lead:
             raise HTTPException(status_code=404, detail="Lead não encontrado")
         
         # Deletar eventos relacionados
-        event_repo = EventRepository(db)
-        db.query(JourneyEvent).filter(JourneyEvent.lead_id == lead_id).delete()
+        await db.execute(delete(JourneyEvent).where(JourneyEvent.lead_id == lead_id))
         
         # Deletar perfil e contexto
-        db.query(LeadProfile).filter(LeadProfile.lead_id == lead_id).delete()
-        db.query(ContextoLead).filter(ContextoLead.lead_id == lead_id).delete()
+        await db.execute(delete(LeadProfile).where(LeadProfile.lead_id == lead_id))
+        await db.execute(delete(ContextoLead).where(ContextoLead.lead_id == lead_id))
+        await db.execute(delete(LeadActivity).where(LeadActivity.lead_id == lead_id))
         
         # Deletar lead
-        db.delete(lead)
-        db.commit()
+        await db.delete(lead)
+        await db.commit()
+        
+        # Descartar contexto em cache (evita que o write-behind recrie a linha)
+        from app.core.context_cache import get_context_cache
+        get_context_cache().invalidate(lead_id)
         
         return {"success": True, "message": f"Lead {lead_id} removido com sucesso"}
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao remover lead: {str(e)}")
 
 
+NO_ACCOUNT_VALUES = ("null", "desconhecido", "")
+
+# Campos não nulos em que a paginação por cursor é exata (com desempate por id)
+KEYSET_SORT_FIELDS = ("created_at", "id", "platform_user_id")
+
+
+def _inactive_cutoff(hours: int, now: Optional[datetime] = None) -> datetime:
+    """
+    Corte de inatividade truncado ao minuto.
+    
+    O corte é parâmetro da query e entra na chave do cache de contagem;
+    sem truncar, cada requisição geraria uma chave nova.
+    
+    Args:
+        hours: Horas sem atividade
+        now: Instante de referência (UTC, padrão agora)
+        
+    Returns:
+        Instante de corte
+    """
+    now = now or datetime.utcnow()
+    return (now - timedelta(hours=hours)).replace(second=0, microsecond=0)
+
+
+def _account_filter(platform: str, value: str):
+    """
+    Filtro de conta por plataforma.
+    
+    Args:
+        platform: Chave em accounts (quotex, nyrion)
+        value: "com_conta", "sem_conta" ou valor exato
+        
+    Returns:
+        Expressão para query.filter
+    """
+    if value not in ("com_conta", "sem_conta"):
+        return LeadProfile.accounts.contains({platform: value})
+    
+    # Chave literal (não parâmetro) para casar com o índice de expressão
+    # ix_lead_profile_accounts_<platform> também em planos genéricos
+    account = LeadProfile.accounts[literal_column(f"'{platform}'", String)].astext
+    if value == "com_conta":
+        return and_(account.isnot(None), account.notin_(NO_ACCOUNT_VALUES))
+    return or_(account.is_(None), account.in_(NO_ACCOUNT_VALUES))
+
+
 @router.get("/leads")
 async def list_leads(
     # Busca textual
@@ -122,15 +178,21 @@ async def list_leads(
     min_events_24h: Optional[int] = Query(None, description="Mínimo de eventos em 24h"),
     
     # Paginação e ordenação
-    page: int = Query(1, ge=1, description="Página atual"),
+    page: int = Query(1, ge=1, description="Página atual (ignorada com cursor)"),
     page_size: int = Query(50, ge=1, le=100, description="Itens por página"),
     sort_by: str = Query("created_at", description="Campo para ordenação"),
     sort_dir: str = Query("desc", regex="^(asc|desc)$", description="Direção da ordenação"),
+    cursor: Optional[str] = Query(None, description="Token next_cursor da página anterior"),
+    count: str = Query("exact", regex="^(exact|estimate|none)$", description="Total exato (cache), estimado pelo planner ou nenhum"),
     
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Lista leads com filtros avançados e paginação server-side.
+    
+    Com cursor, a página é buscada por keyset em (sort_by, id) e o custo não
+    depende da profundidade. O total exato fica em cache; em páginas por
+    cursor um cache miss é recalculado em background e o total vem None.
     """
     
     # Se modo mock, retornar dados de exemplo
@@ -138,7 +200,11 @@ async def list_leads(
         return _get_mock_leads_data(page, page_size)
     
     # Construir query base
-    query = db.query(Lead).join(LeadProfile, Lead.id == LeadProfile.lead_id, isouter=True)
+    query = (
+        select(Lead)
+        .join(LeadProfile, Lead.id == LeadProfile.lead_id, isouter=True)
+        .join(LeadActivity, Lead.id == LeadActivity.lead_id, isouter=True)
+    )
     
     # Aplicar filtros
     if q:
@@ -164,112 +230,107 @@ async def list_leads(
     if lang:
         query = query.filter(Lead.lang == lang)
     
-    # Filtros de perfil (JSON)
+    # Filtros de perfil (JSONB): igualdades viram containment (@>) para usar
+    # os índices GIN; com_conta/sem_conta usam os índices de expressão (->>)
     if deposit_status:
-        query = query.filter(LeadProfile.deposit['status'].astext == deposit_status)
+        query = query.filter(LeadProfile.deposit.contains({"status": deposit_status}))
     if accounts_quotex:
-        if accounts_quotex == "com_conta":
-            # Filtrar por qualquer valor que não seja None, null, "desconhecido" ou vazio
-            query = query.filter(
-                and_(
-                    LeadProfile.accounts['quotex'].astext.isnot(None),
-                    LeadProfile.accounts['quotex'].astext != 'null',
-                    LeadProfile.accounts['quotex'].astext != 'desconhecido',
-                    LeadProfile.accounts['quotex'].astext != ''
-                )
-            )
-        elif accounts_quotex == "sem_conta":
-            # Filtrar por valores que indicam ausência de conta
-            query = query.filter(
-                or_(
-                    LeadProfile.accounts['quotex'].astext.is_(None),
-                    LeadProfile.accounts['quotex'].astext == 'null',
-                    LeadProfile.accounts['quotex'].astext == 'desconhecido',
-                    LeadProfile.accounts['quotex'].astext == ''
-                )
-            )
-        else:
-            # Filtro exato para outros valores
-            query = query.filter(LeadProfile.accounts['quotex'].astext == accounts_quotex)
-    
+        query = query.filter(_account_filter("quotex", accounts_quotex))
     if accounts_nyrion:
-        if accounts_nyrion == "com_conta":
-            query = query.filter(
-                and_(
-                    LeadProfile.accounts['nyrion'].astext.isnot(None),
-                    LeadProfile.accounts['nyrion'].astext != 'null',
-                    LeadProfile.accounts['nyrion'].astext != 'desconhecido',
-                    LeadProfile.accounts['nyrion'].astext != ''
-                )
-            )
-        elif accounts_nyrion == "sem_conta":
-            query = query.filter(
-                or_(
-                    LeadProfile.accounts['nyrion'].astext.is_(None),
-                    LeadProfile.accounts['nyrion'].astext == 'null',
-                    LeadProfile.accounts['nyrion'].astext == 'desconhecido',
-                    LeadProfile.accounts['nyrion'].astext == ''
-                )
-            )
-        else:
-            query = query.filter(LeadProfile.accounts['nyrion'].astext == accounts_nyrion)
+        query = query.filter(_account_filter("nyrion", accounts_nyrion))
     if agreements_can_deposit is not None:
-        query = query.filter(LeadProfile.agreements['can_deposit'].astext == str(agreements_can_deposit).lower())
+        query = query.filter(LeadProfile.agreements.contains({"can_deposit": agreements_can_deposit}))
     if agreements_wants_test is not None:
-        query = query.filter(LeadProfile.agreements['wants_test'].astext == str(agreements_wants_test).lower())
+        query = query.filter(LeadProfile.agreements.contains({"wants_test": agreements_wants_test}))
+    if tags:
+        query = query.filter(LeadProfile.flags.contains({"tags": tags}))
+    if not_tags:
+        query = query.filter(
+            or_(
+                LeadProfile.flags.is_(None),
+                ~or_(*[LeadProfile.flags.contains({"tags": [tag]}) for tag in not_tags])
+            )
+        )
     
-    # Filtros de inatividade
+    # Filtros de atividade (resumo lead_activity, sem agregar journey_event)
+    if last_active_from:
+        query = query.filter(LeadActivity.last_activity_at >= last_active_from)
+    if last_active_to:
+        query = query.filter(LeadActivity.last_activity_at <= last_active_to)
     if inactive_gt_hours:
-        cutoff_time = datetime.utcnow() - timedelta(hours=inactive_gt_hours)
-        # Subquery para última atividade
-        last_event_subq = db.query(
-            JourneyEvent.lead_id,
-            func.max(JourneyEvent.created_at).label('last_activity')
-        ).group_by(JourneyEvent.lead_id).subquery()
-        
-        query = query.outerjoin(last_event_subq, Lead.id == last_event_subq.c.lead_id)
+        cutoff_time = _inactive_cutoff(inactive_gt_hours)
         query = query.filter(
             or_(
-                last_event_subq.c.last_activity < cutoff_time,
-                last_event_subq.c.last_activity == None
+                LeadActivity.last_activity_at < cutoff_time,
+                LeadActivity.last_activity_at.is_(None)
             )
         )
+    if min_events_24h:
+        query = query.filter(
+            LeadActivity.events_day == datetime.utcnow().date(),
+            LeadActivity.events_today >= min_events_24h
+        )
+    if procedure_active:
+        query = query.filter(LeadActivity.procedure_active == procedure_active)
+    if procedure_step:
+        query = query.filter(LeadActivity.procedure_step == procedure_step)
+    
+    # Total (antes da ordenação/paginação)
+    if count == "estimate":
+        total = await estimate_count(db, query)
+    elif count == "exact":
+        total = await cached_exact_count(db, "leads", query, wait=cursor is None)
+    else:
+        total = None
     
-    # Contagem total antes da paginação
-    total = query.count()
-    
-    # Aplicar ordenação
+    # Aplicar ordenação (id desempata e torna o cursor estável)
+    keyset = sort_by in KEYSET_SORT_FIELDS
     order_field = getattr(Lead, sort_by, Lead.created_at)
-    if sort_dir == "desc":
-        query = query.order_by(desc(order_field))
+    order = desc if sort_dir == "desc" else asc
+    query = query.order_by(order(order_field), order(Lead.id))
+    
+    # Aplicar paginação: keyset a partir do cursor ou offset da página
+    if cursor:
+        if not keyset:
+            raise HTTPException(status_code=400, detail=f"Cursor não suportado para sort_by={sort_by}")
+        try:
+            value, last_id = decode_cursor(cursor, sort_by, sort_dir)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.filter(keyset_filter(order_field, Lead.id, sort_dir, value, last_id))
     else:
-        query = query.order_by(asc(order_field))
+        query = query.offset((page - 1) * page_size)
     
-    # Aplicar paginação
-    offset = (page - 1) * page_size
-    leads = query.offset(offset).limit(page_size).all()
+    leads = (await db.execute(query.limit(page_size + 1))).scalars().all()
+    has_more = len(leads) > page_size
+    leads = leads[:page_size]
     
-    # Buscar eventos recentes para cada lead
+    next_cursor = None
+    if has_more and keyset:
+        last = leads[-1]
+        next_cursor = encode_cursor(sort_by, sort_dir, getattr(last, sort_by), last.id)
+    
+    # Buscar resumo de atividade e perfis da página em lote
     lead_ids = [lead.id for lead in leads]
-    events_count = {}
+    activities = {}
+    profiles = {}
     if lead_ids:
-        cutoff_24h = datetime.utcnow() - timedelta(hours=24)
-        events_count_query = db.query(
-            JourneyEvent.lead_id,
-            func.count(JourneyEvent.id).label('count')
-        ).filter(
-            JourneyEvent.lead_id.in_(lead_ids),
-            JourneyEvent.created_at >= cutoff_24h
-        ).group_by(JourneyEvent.lead_id)
+        activity_query = select(LeadActivity).where(LeadActivity.lead_id.in_(lead_ids))
+        for activity in (await db.execute(activity_query)).scalars():
+            activities[activity.lead_id] = activity
         
-        for lead_id, count in events_count_query.all():
-            events_count[lead_id] = count
+        profiles_query = select(LeadProfile).where(LeadProfile.lead_id.in_(lead_ids))
+        for profile in (await db.execute(profiles_query)).scalars():
+            profiles[profile.lead_id] = profile
+    
+    today = datetime.utcnow().date()
     
     # Serializar resultados
     items = []
     for lead in leads:
-        # Buscar perfil e contexto
-        profile = lead.lead_profile[0] if hasattr(lead, 'lead_profile') and lead.lead_profile else None
+        profile = profiles.get(lead.id)
+        activity = activities.get(lead.id)
+        events_today = activity.events_today if activity and activity.events_day == today else 0
         
         # Inferir canal do platform_user_id
         channel_inferred = "telegram" if lead.platform_user_id.isdigit() else "whatsapp"
@@ -281,16 +342,19 @@ async def list_leads(
             "platform_user_id": lead.platform_user_id,
             "lang": lead.lang,
             "created_at": lead.created_at.isoformat() if lead.created_at else None,
-            "last_activity_at": None,  # TODO: calcular da JourneyEvent
-            "events_24h": events_count.get(lead.id, 0),
+            "last_activity_at": activity.last_activity_at.isoformat() if activity and activity.last_activity_at else None,
+            # Contador do dia (UTC) mantido no resumo; mantém a chave usada pelo Studio
+            "events_24h": events_today,
+            "messages_in": activity.messages_in if activity else 0,
+            "messages_out": activity.messages_out if activity else 0,
             "accounts": profile.accounts if profile else {},
             "deposit": profile.deposit if profile else {},
             "agreements": profile.agreements if profile else {},
             "flags": profile.flags if profile else {},
             "tags": profile.flags.get("tags", []) if profile and profile.flags else [],
             "procedure": {
-                "active": None,  # TODO: buscar do ContextoLead
-                "step": None
+                "active": activity.procedure_active if activity else None,
+                "step": activity.procedure_step if activity else None
             }
         }
         items.append(item)
@@ -298,38 +362,44 @@ async def list_leads(
     return {
         "items": items,
         "total": total,
+        "total_estimated": count == "estimate",
         "page": page,
         "page_size": page_size,
-        "total_pages": math.ceil(total / page_size) if total > 0 else 0
+        "total_pages": (math.ceil(total / page_size) if total > 0 else 0) if total is not None else None,
+        "has_more": has_more,
+        "next_cursor": next_cursor
     }
 
 
 @router.get("/leads/{lead_id}")
 async def get_lead_detail(
     lead_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtém detalhes completos de um lead específico.
     """
     
     # Buscar lead
-    lead = db.query(Lead).filter(Lead.id == lead_id).first()
+    lead_repo = LeadRepository(db)
+    lead = await lead_repo.get_by_id(lead_id)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead não encontrado")
     
     # Buscar perfil
-    lead_repo = LeadRepository(db)
-    profile = lead_repo.get_profile(lead_id)
+    profile = await lead_repo.get_profile(lead_id)
     
-    # Buscar contexto
-    contexto = db.query(ContextoLead).filter(ContextoLead.lead_id == lead_id).first()
+    # Buscar contexto (via serviço: reflete o cache antes do write-behind)
+    from app.core.contexto_lead import get_contexto_lead_service
+    contexto = await get_contexto_lead_service(db).obter_contexto(lead_id)
     
     # Buscar eventos recentes (últimos 20)
-    event_repo = EventRepository(db)
-    recent_events = db.query(JourneyEvent).filter(
-        JourneyEvent.lead_id == lead_id
-    ).order_by(desc(JourneyEvent.created_at)).limit(20).all()
+    recent_events = (await db.execute(
+        select(JourneyEvent)
+        .where(JourneyEvent.lead_id == lead_id)
+        .order_by(desc(JourneyEvent.created_at))
+        .limit(20)
+    )).scalars().all()
     
     # Inferir canal
     channel_inferred = "telegram" if lead.platform_user_id.isdigit() else "whatsapp"
@@ -362,6 +432,7 @@ async def get_lead_detail(
         "procedure": {
             "active": contexto.procedimento_ativo if contexto else None,
             "step": contexto.etapa_ativa if contexto else None,
+            "progress": summarize_progress(contexto.progresso_procedimento) if contexto else None,
             "waiting": contexto.aguardando if contexto else None
         },
         "events_recent": events
@@ -432,7 +503,10 @@ def _get_mock_leads_data(page: int, page_size: int) -> Dict[str, Any]:
     return {
         "items": items,
         "total": total,
+        "total_estimated": False,
         "page": page,
         "page_size": page_size,
-        "total_pages": math.ceil(total / page_size) if total > 0 else 0
+        "total_pages": math.ceil(total / page_size) if total > 0 else 0,
+        "has_more": end < total,
+        "next_cursor": None
     }
@@ -17,6 +17,7 @@ from app.core.fallback_kb import load_knowledge_base
 from app.core.comparador_semantico import TEMPLATE_GERACAO_RESPOSTA
 from app.core.orchestrator import decide_and_plan
 from app.core.rag_prompt_manager import get_current_rag_prompt, save_custom_rag_prompt, is_using_custom_prompt
+from app.core.policy_watcher import notify_policy_change, COMPONENT_KB, COMPONENT_PROMPT
 from app.data.schemas import Env, Lead, Snapshot, Message, KbContext
 from app.settings import settings
 import logging
@@ -212,9 +213,8 @@ async def update_knowledge_base(kb: RAGKnowledgeBase):
         with open(kb_path, 'w', encoding='utf-8') as f:
             f.write(kb.content)
         
-        # Limpar cache RAG
-        rag_service = get_rag_service()
-        rag_service._carregar_kb()  # Forçar reload
+        # Recarregar KB e limpar cache RAG em todos os workers
+        await notify_policy_change(COMPONENT_KB)
         
         logger.info(f"Base de conhecimento atualizada: {len(kb.content)} caracteres")
         return {"success": True, "message": "Base de conhecimento atualizada com sucesso"}
@@ -265,6 +265,8 @@ async def update_rag_prompt(prompt: RAGPrompt):
         if not success:
             raise HTTPException(status_code=500, detail="Falha ao salvar prompt personalizado")
         
+        await notify_policy_change(COMPONENT_PROMPT)
+        
         return {
             "success": True, 
             "message": "Prompt atualizado com sucesso",
@@ -2,7 +2,7 @@
 Adapter para transformar payload unificado (texto/mídia/botões) para cada canal.
 Transforma as ações do plano em formatos específicos de cada plataforma.
 """
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 
 def to_telegram(payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -120,6 +120,23 @@ def normalize_inbound_event(platform: str, raw_data: Dict[str, Any]) -> Dict[str
         }
 
 
+def telegram_chat_id(update: Dict[str, Any]) -> Optional[str]:
+    """
+    Chat do update do Telegram (mensagem ou callback de botão).
+    
+    Args:
+        update: Update bruto do Telegram
+        
+    Returns:
+        chat_id como string ou None
+    """
+    if "message" in update:
+        return str(update["message"]["chat"]["id"])
+    if "callback_query" in update:
+        return str(update["callback_query"]["message"]["chat"]["id"])
+    return None
+
+
 def _normalize_telegram_update(update: Dict[str, Any]) -> Dict[str, Any]:
     """Normaliza update do Telegram."""
     message = update.get("message", {})
@@ -3,21 +3,29 @@ Canal de comunicação Telegram
 Implementa webhook para receber atualizações do Telegram Bot API
 """
 from fastapi import APIRouter, Header, Request, HTTPException
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 import httpx
 import time
 
 from app.settings import settings
-from app.channels.adapter import normalize_inbound_event
+from app.channels.adapter import normalize_inbound_event, telegram_chat_id
 from app.core.snapshot_builder import build_snapshot
 from app.core.intake_agent import run_intake  
 from app.core.confirmation_gate import get_confirmation_gate
 from app.core.orchestrator import decide_and_plan
 from app.data.schemas import Plan, Action
 from app.tools.apply_plan import apply_plan
-from app.infra.db import SessionLocal
+from app.data.unit_of_work import UnitOfWork, turn_unit_of_work
 from app.data.repo import LeadRepository, EventRepository
+from app.core.lead_serializer import (
+    LeadSerializationTimeout, LeadTurnLost, ensure_lead_turn_current, get_lead_serializer,
+    telegram_lead_key
+)
+from app.core.degradation import get_degradation_controller
+from app.core.catalog_store import get_catalog_store
+from app.core.callback_routes import callback_route_actions
+from app.infra.logging import log_structured
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -59,6 +67,52 @@ async def send_telegram_message(chat_id: str, text: str) -> bool:
         return False
 
 
+async def _send_turn_message(chat_id: str, text: str) -> bool:
+    """
+    Envia a resposta do turno, só se o turno ainda é o dono do lead.
+    
+    Args:
+        chat_id: ID do chat do Telegram
+        text: Texto da mensagem a ser enviada
+        
+    Returns:
+        True se mensagem foi enviada com sucesso
+        
+    Raises:
+        LeadTurnLost: Outro worker assumiu o lead; a resposta fica com ele
+    """
+    ensure_lead_turn_current()
+    return await send_telegram_message(chat_id, text)
+
+
+async def answer_callback_query(callback_query_id: Optional[str]) -> bool:
+    """
+    Confirma o clique em botão (answerCallbackQuery) para o Telegram.
+    
+    Args:
+        callback_query_id: ID do callback_query recebido
+        
+    Returns:
+        True se o Telegram aceitou a confirmação
+    """
+    if not callback_query_id:
+        return False
+    try:
+        url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/answerCallbackQuery"
+        
+        async with httpx.AsyncClient() as client:
+            response = await client.post(url, json={"callback_query_id": callback_query_id})
+        
+        if response.status_code == 200:
+            return True
+        logger.error(f"Erro ao responder callback: {response.status_code} - {response.text}")
+        return False
+    
+    except Exception as e:
+        logger.error(f"Exceção ao responder callback: {str(e)}")
+        return False
+
+
 @router.post("/webhook")
 async def webhook(request: Request, secret: str):
     """
@@ -90,239 +144,405 @@ async def webhook(request: Request, secret: str):
         message_text = inbound.get("message_text", "")
         
         # Obter chat_id do update original
-        chat_id = None
-        if "message" in update:
-            chat_id = str(update["message"]["chat"]["id"])
-        elif "callback_query" in update:
-            chat_id = str(update["callback_query"]["message"]["chat"]["id"])
-            
+        chat_id = telegram_chat_id(update)
+        
         if not chat_id:
             logger.error("Não foi possível obter chat_id do update")
             raise HTTPException(status_code=400, detail="Chat ID não encontrado")
         
-        # 💾 PERSISTÊNCIA - Gerenciar lead no banco de dados
-        db = SessionLocal()
-        lead_id = None
-        try:
-            lead_repo = LeadRepository(db)
-            event_repo = EventRepository(db)
-            
-            # Buscar ou criar lead
-            lead = lead_repo.get_by_platform_user_id(chat_id)
-            if not lead:
-                # Extrair nome se disponível
-                user_name = None
-                if "message" in update and "from" in update["message"]:
-                    user_data = update["message"]["from"]
-                    user_name = user_data.get("first_name", "")
-                    if user_data.get("last_name"):
-                        user_name += f" {user_data['last_name']}"
-                
-                lead = lead_repo.create_lead(platform_user_id=chat_id, name=user_name)
-                logger.info(f"Novo lead criado: ID={lead.id}, chat_id={chat_id}")
-            else:
-                logger.info(f"Lead existente: ID={lead.id}, chat_id={chat_id}")
-            
-            # Guardar ID para usar após fechar a sessão
-            lead_id = lead.id
-            
-            # Registrar evento de mensagem recebida
-            event_repo.log_event(
-                lead_id=lead_id,
-                event_type="message_received", 
-                payload={
-                    "channel": "telegram",
-                    "text": message_text,
-                    "update_id": update.get("update_id"),
-                    "chat_id": chat_id
-                }
+        # 🔘 Clique em botão: responde o callback na hora (tira o "carregando"
+        # do botão) e, se o id está na tabela do catálogo, usa o caminho rápido
+        route = None
+        callback_query = update.get("callback_query")
+        if callback_query:
+            await answer_callback_query(callback_query.get("id"))
+            route = get_catalog_store().get_callback_route(message_text)
+        
+        # 🔒 Turnos do mesmo lead em ordem, entre todos os workers
+        # 💾 Unit of work do turno: uma sessão para lead, contexto e plano; a
+        # conexão só fica presa no carregamento do lead e no apply_plan
+        async with get_lead_serializer().serialize(telegram_lead_key(chat_id)):
+            async with get_degradation_controller().track_turn():
+                result = None
+                try:
+                    async with turn_unit_of_work() as uow:
+                        if route is not None:
+                            result = await _process_callback_turn(uow, update, inbound, chat_id, route)
+                        else:
+                            result = await _process_turn(uow, update, inbound, chat_id, message_text)
+                except LeadTurnLost:
+                    # Lease perdido depois da resposta enviada: as gravações já
+                    # foram descartadas, e reentregar o update duplicaria a mensagem
+                    if not (result and result["result"].get("response_sent")):
+                        raise
+                    log_structured("warning", "lead_turn_fenced", {
+                        "chat_id": chat_id,
+                        "decision_id": result.get("decision_id"),
+                        "response_sent": True
+                    })
+                    result["result"]["persisted"] = False
+                return result
+        
+    except (LeadSerializationTimeout, LeadTurnLost) as e:
+        # Outro worker está com a vez do lead: o Telegram reentrega o update
+        log_structured("warning", "telegram_turn_rejected", {
+            "chat_id": chat_id,
+            "reason": type(e).__name__
+        })
+        raise HTTPException(status_code=503, detail="Lead ocupado, tente novamente")
+        
+    except Exception as e:
+        logger.error(f"Erro no processamento do webhook Telegram: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+
+async def _process_turn(
+    uow: UnitOfWork,
+    update: Dict[str, Any],
+    inbound: Dict[str, Any],
+    chat_id: str,
+    message_text: str
+) -> Dict[str, Any]:
+    """
+    Executa um turno completo (persistência, pipeline e envio) no unit of work.
+    
+    Args:
+        uow: Unit of work do turno
+        update: Update original do Telegram
+        inbound: Evento normalizado
+        chat_id: Chat do lead
+        message_text: Texto recebido
+        
+    Returns:
+        Resposta do webhook
+    """
+    # 💾 PERSISTÊNCIA - Gerenciar lead no banco de dados
+    lead_id = await _load_lead(uow, update, chat_id, message_text)
+    
+    # 🚀 PIPELINE COMPLETO DE AUTOMAÇÕES E PROCEDIMENTOS
+    logger.info("🎯 Iniciando pipeline completo de processamento")
+    
+    try:
+        # 2) Construir snapshot base
+        logger.info("📊 Construindo snapshot do lead...")
+        snapshot_env = await build_snapshot(inbound)
+        
+        # 3) Intake inteligente (pode executar até 2 tools)
+        logger.info("🔍 Executando intake inteligente...")
+        enriched_env = await run_intake(snapshot_env)
+        
+        # 3.5) Gate de confirmação LLM-first
+        logger.info("🎯 Verificando confirmações LLM-first...")
+        confirmation_gate = get_confirmation_gate()
+        confirmation_result = await confirmation_gate.process_message(enriched_env)
+        
+        if confirmation_result.handled:
+            logger.info(f"✅ Confirmação processada: {confirmation_result.target} = {confirmation_result.polarity}")
+            # Se confirmação foi processada, usar as ações criadas pelo gate
+            plan = Plan(
+                decision_id=f"confirm_{int(time.time())}",
+                actions=confirmation_result.actions
             )
-            
-        except Exception as db_error:
-            logger.error(f"Erro na persistência: {str(db_error)}")
-        finally:
-            db.close()
+            plan.metadata = {"lead_id": lead_id}
+        else:
+            # 4) Decisão e planejamento normal
+            logger.info("🧠 Executando orquestrador de decisões...")
+            plan = await decide_and_plan(enriched_env)
         
-        # 🚀 PIPELINE COMPLETO DE AUTOMAÇÕES E PROCEDIMENTOS
-        logger.info("🎯 Iniciando pipeline completo de processamento")
+        # 5) Aplicar plano de ações
+        logger.info(f"⚡ Aplicando plano com {len(plan.actions)} ações...")
+        pipeline_result = await apply_plan({
+            "decision_id": plan.decision_id,
+            "actions": [action.__dict__ if hasattr(action, '__dict__') else action for action in plan.actions],
+            "metadata": plan.metadata or {"lead_id": lead_id}
+        })
         
-        try:
-            # 2) Construir snapshot base
-            logger.info("📊 Construindo snapshot do lead...")
-            snapshot_env = await build_snapshot(inbound)
-            
-            # 3) Intake inteligente (pode executar até 2 tools)
-            logger.info("🔍 Executando intake inteligente...")
-            enriched_env = await run_intake(snapshot_env)
-            
-            # 3.5) Gate de confirmação LLM-first
-            logger.info("🎯 Verificando confirmações LLM-first...")
-            confirmation_gate = get_confirmation_gate()
-            confirmation_result = await confirmation_gate.process_message(enriched_env)
-            
-            if confirmation_result.handled:
-                logger.info(f"✅ Confirmação processada: {confirmation_result.target} = {confirmation_result.polarity}")
-                # Se confirmação foi processada, usar as ações criadas pelo gate
-                plan = Plan(
-                    decision_id=f"confirm_{int(time.time())}",
-                    actions=confirmation_result.actions
-                )
-                plan.metadata = {"lead_id": lead_id}
+        # Verificar se houve resposta do pipeline
+        final_response = await _deliver_pipeline_message(pipeline_result, chat_id)
+        pipeline_sent_message = final_response is not None
+        
+        # Se pipeline não enviou mensagem, extrair resposta das ações
+        if not pipeline_sent_message and plan.actions:
+            for action in plan.actions:
+                action_dict = action.__dict__ if hasattr(action, '__dict__') else action
+                # Aceitar tanto "send_message" quanto "message" como tipos de ação
+                if action_dict.get("type") in ["send_message", "message"]:
+                    response_text = action_dict.get("text", "")
+                    if response_text:
+                        # Enviar resposta via nosso método direto
+                        sent = await _send_turn_message(chat_id, response_text)
+                        pipeline_sent_message = sent
+                        final_response = response_text
+                        break
+        
+        # Fallback para garantir resposta
+        if not pipeline_sent_message:
+            logger.warning("⚠️ Pipeline não gerou resposta - usando fallback")
+            if message_text:
+                fallback_text = f"🤖 Olá! Recebi sua mensagem: \"{message_text}\"\n\n✅ O sistema está processando sua solicitação..."
             else:
-                # 4) Decisão e planejamento normal
-                logger.info("🧠 Executando orquestrador de decisões...")
-                plan = await decide_and_plan(enriched_env)
-            
-            # 5) Aplicar plano de ações
-            logger.info(f"⚡ Aplicando plano com {len(plan.actions)} ações...")
-            pipeline_result = await apply_plan({
-                "decision_id": plan.decision_id,
-                "actions": [action.__dict__ if hasattr(action, '__dict__') else action for action in plan.actions],
-                "metadata": plan.metadata or {"lead_id": lead_id}
-            })
+                fallback_text = "🤖 Olá! Como posso ajudar você hoje?"
             
-            # Verificar se houve resposta do pipeline
-            pipeline_sent_message = False
-            final_response = None
-            
-            if pipeline_result.get("applied") and pipeline_result.get("execution_results"):
-                for result in pipeline_result["execution_results"]:
-                    # Aceitar tanto "send_message" quanto "message" como tipos de ação de mensagem
-                    if (result.get("action_type") in ["send_message", "message"] and 
-                        result.get("status") == "success"):
-                        # Pipeline preparou mensagem - agora vamos enviar efetivamente
-                        message_data = result.get("result", {})
-                        if message_data.get("message_sent"):
-                            # Extrair texto da mensagem preparada
-                            adapted_payload = message_data.get("adapted_payload", {})
-                            response_text = ""
-                            
-                            # Verificar se tem src (estrutura do catálogo)
-                            if "src" in adapted_payload:
-                                response_text = adapted_payload["src"].get("text", "")
-                            else:
-                                response_text = adapted_payload.get("text", "")
-                            
-                            if response_text:
-                                # Enviar mensagem efetivamente via API do Telegram
-                                sent = await send_telegram_message(chat_id, response_text)
-                                if sent:
-                                    pipeline_sent_message = True
-                                    final_response = response_text
-                                    logger.info(f"✅ Mensagem do pipeline enviada com sucesso: {response_text[:50]}...")
-                                else:
-                                    logger.error("❌ Erro ao enviar mensagem do pipeline")
-                            break
+            sent = await _send_turn_message(chat_id, fallback_text)
+            pipeline_sent_message = sent
+            final_response = fallback_text
+        
+        # 💾 Persistir resultado do pipeline
+        try:
+            event_repo2 = EventRepository(uow.db)
+            lead_repo2 = LeadRepository(uow.db)
             
-            # Se pipeline não enviou mensagem, extrair resposta das ações
-            if not pipeline_sent_message and plan.actions:
-                for action in plan.actions:
-                    action_dict = action.__dict__ if hasattr(action, '__dict__') else action
-                    # Aceitar tanto "send_message" quanto "message" como tipos de ação
-                    if action_dict.get("type") in ["send_message", "message"]:
-                        response_text = action_dict.get("text", "")
-                        if response_text:
-                            # Enviar resposta via nosso método direto
-                            sent = await send_telegram_message(chat_id, response_text)
-                            pipeline_sent_message = sent
-                            final_response = response_text
-                            break
+            # Registrar evento de pipeline executado
+            if lead_id:
+                await event_repo2.log_event(
+                    lead_id=lead_id,
+                    event_type="pipeline_executed",
+                    payload={
+                        "decision_id": plan.decision_id,
+                        "actions_count": len(plan.actions),
+                        "response_sent": pipeline_sent_message,
+                        "final_response": final_response[:200] if final_response else None
+                    }
+                )
             
-            # Fallback para garantir resposta
-            if not pipeline_sent_message:
-                logger.warning("⚠️ Pipeline não gerou resposta - usando fallback")
-                if message_text:
-                    fallback_text = f"🤖 Olá! Recebi sua mensagem: \"{message_text}\"\n\n✅ O sistema está processando sua solicitação..."
-                else:
-                    fallback_text = "🤖 Olá! Como posso ajudar você hoje?"
+            # Atualizar perfil do lead com novos dados descobertos
+            if hasattr(enriched_env, 'snapshot') and enriched_env.snapshot:
+                snapshot = enriched_env.snapshot
+                profile_updates = {}
                 
-                sent = await send_telegram_message(chat_id, fallback_text)
-                pipeline_sent_message = sent
-                final_response = fallback_text
-            
-            # 💾 Persistir resultado do pipeline
-            try:
-                db2 = SessionLocal()
-                try:
-                    event_repo2 = EventRepository(db2)
-                    lead_repo2 = LeadRepository(db2)
-                    
-                    # Registrar evento de pipeline executado
-                    if lead_id:
-                        event_repo2.log_event(
-                            lead_id=lead_id,
-                            event_type="pipeline_executed",
-                            payload={
-                                "decision_id": plan.decision_id,
-                                "actions_count": len(plan.actions),
-                                "response_sent": pipeline_sent_message,
-                                "final_response": final_response[:200] if final_response else None
-                            }
-                        )
-                    
-                    # Atualizar perfil do lead com novos dados descobertos
-                    if hasattr(enriched_env, 'snapshot') and enriched_env.snapshot:
-                        snapshot = enriched_env.snapshot
-                        profile_updates = {}
-                        
-                        # Atualizar contas se descobertas
-                        if hasattr(snapshot, 'accounts') and snapshot.accounts:
-                            profile_updates['accounts'] = snapshot.accounts
-                        
-                        # Atualizar status de depósito se descoberto
-                        if hasattr(snapshot, 'deposit') and snapshot.deposit:
-                            profile_updates['deposit'] = snapshot.deposit
-                        
-                        # Aplicar atualizações
-                        if profile_updates and lead_id:
-                            lead_repo2.update_profile(lead_id, **profile_updates)
-                            logger.info(f"Perfil do lead {lead_id} atualizado: {profile_updates}")
-                    
-                finally:
-                    db2.close()
-                    
-            except Exception as persist_error:
-                logger.error(f"Erro ao persistir resultado do pipeline: {str(persist_error)}")
+                # Atualizar contas se descobertas
+                if hasattr(snapshot, 'accounts') and snapshot.accounts:
+                    profile_updates['accounts'] = snapshot.accounts
+                
+                # Atualizar status de depósito se descoberto
+                if hasattr(snapshot, 'deposit') and snapshot.deposit:
+                    profile_updates['deposit'] = snapshot.deposit
+                
+                # Aplicar atualizações
+                if profile_updates and lead_id:
+                    await lead_repo2.update_profile(lead_id, **profile_updates)
+                    logger.info(f"Perfil do lead {lead_id} atualizado: {profile_updates}")
             
-            logger.info(f"🎉 Pipeline completo executado - Decisão: {plan.decision_id}")
-            return {
-                "ok": True,
-                "decision_id": plan.decision_id,
-                "lead_id": lead_id,
-                "result": {
-                    "status": "processed",
-                    "inbound": inbound,
-                    "pipeline_executed": True,
-                    "actions_count": len(plan.actions),
-                    "response_sent": pipeline_sent_message,
-                    "final_response": final_response[:100] + "..." if final_response and len(final_response) > 100 else final_response,
-                    "pipeline_result": pipeline_result
-                }
+        except Exception as persist_error:
+            logger.error(f"Erro ao persistir resultado do pipeline: {str(persist_error)}")
+        
+        logger.info(f"🎉 Pipeline completo executado - Decisão: {plan.decision_id}")
+        return {
+            "ok": True,
+            "decision_id": plan.decision_id,
+            "lead_id": lead_id,
+            "result": {
+                "status": "processed",
+                "inbound": inbound,
+                "pipeline_executed": True,
+                "actions_count": len(plan.actions),
+                "response_sent": pipeline_sent_message,
+                "final_response": final_response[:100] + "..." if final_response and len(final_response) > 100 else final_response,
+                "pipeline_result": pipeline_result
             }
-            
-        except Exception as pipeline_error:
-            logger.error(f"❌ Erro no pipeline: {str(pipeline_error)}")
-            
-            # Fallback em caso de erro
-            fallback_text = "🤖 Olá! Tive um pequeno problema técnico, mas estou funcionando. Como posso ajudar?"
-            sent = await send_telegram_message(chat_id, fallback_text)
-            
-            return {
-                "ok": True,
-                "decision_id": "pipeline_error",
-                "result": {
-                    "status": "processed_with_error",
-                    "inbound": inbound,
-                    "pipeline_executed": False,
-                    "error": str(pipeline_error),
-                    "response_sent": sent,
-                    "fallback_used": True
-                }
+        }
+        
+    except LeadTurnLost:
+        raise
+        
+    except Exception as pipeline_error:
+        logger.error(f"❌ Erro no pipeline: {str(pipeline_error)}")
+        
+        # Descartar o que o turno deixou pendente e soltar a conexão antes do envio
+        await uow.rollback()
+        
+        # Fallback em caso de erro
+        fallback_text = "🤖 Olá! Tive um pequeno problema técnico, mas estou funcionando. Como posso ajudar?"
+        sent = await _send_turn_message(chat_id, fallback_text)
+        
+        return {
+            "ok": True,
+            "decision_id": "pipeline_error",
+            "result": {
+                "status": "processed_with_error",
+                "inbound": inbound,
+                "pipeline_executed": False,
+                "error": str(pipeline_error),
+                "response_sent": sent,
+                "fallback_used": True
             }
+        }
+
+
+async def _load_lead(
+    uow: UnitOfWork,
+    update: Dict[str, Any],
+    chat_id: str,
+    message_text: str
+) -> Optional[int]:
+    """
+    Busca ou cria o lead do chat, pré-carrega o turno e registra a mensagem.
+    
+    Faz commit ao final: a conexão volta ao pool (e o lock de lead_activity
+    é liberado) antes do intake e das chamadas LLM; o identity map do turno
+    continua carregado.
+    
+    Args:
+        uow: Unit of work do turno
+        update: Update original do Telegram
+        chat_id: Chat do lead
+        message_text: Texto recebido (ou id do botão clicado)
         
-    except Exception as e:
-        logger.error(f"Erro no processamento do webhook Telegram: {str(e)}")
-        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+    Returns:
+        ID do lead ou None se a persistência falhou
+    """
+    lead_id = None
+    try:
+        lead_repo = LeadRepository(uow.db)
+        event_repo = EventRepository(uow.db)
+        
+        # Buscar ou criar lead
+        lead = await lead_repo.get_by_platform_user_id(chat_id)
+        if not lead:
+            # Extrair nome se disponível (mensagem ou clique em botão)
+            user_name = None
+            source = update.get("message") or update.get("callback_query") or {}
+            if "from" in source:
+                user_data = source["from"]
+                user_name = user_data.get("first_name", "")
+                if user_data.get("last_name"):
+                    user_name += f" {user_data['last_name']}"
+        
+            lead = await lead_repo.create_lead(platform_user_id=chat_id, name=user_name)
+            logger.info(f"Novo lead criado: ID={lead.id}, chat_id={chat_id}")
+        else:
+            logger.info(f"Lead existente: ID={lead.id}, chat_id={chat_id}")
+        
+        lead_id = lead.id
+        
+        # Carregar perfil e contexto uma vez para todo o turno
+        await uow.preload_lead(lead_id)
+        
+        # Registrar evento de mensagem recebida
+        await event_repo.log_event(
+            lead_id=lead_id,
+            event_type="message_received", 
+            payload={
+                "channel": "telegram",
+                "text": message_text,
+                "update_id": update.get("update_id"),
+                "chat_id": chat_id
+            }
+        )
+        await uow.commit()
+        
+    except LeadTurnLost:
+        raise
+        
+    except Exception as db_error:
+        logger.error(f"Erro na persistência: {str(db_error)}")
+        await uow.rollback()
+        lead_id = None
+    
+    return lead_id
+
+
+async def _deliver_pipeline_message(pipeline_result: Dict[str, Any], chat_id: str) -> Optional[str]:
+    """
+    Envia pelo Telegram a primeira mensagem preparada pelo apply_plan.
+    
+    Args:
+        pipeline_result: Resultado do apply_plan
+        chat_id: Chat do lead
+        
+    Returns:
+        Texto enviado ou None se nada foi enviado
+    """
+    if not (pipeline_result.get("applied") and pipeline_result.get("execution_results")):
+        return None
+    
+    for result in pipeline_result["execution_results"]:
+        # Aceitar tanto "send_message" quanto "message" como tipos de ação de mensagem
+        if (result.get("action_type") in ["send_message", "message"] and 
+            result.get("status") == "success"):
+            # Pipeline preparou mensagem - agora vamos enviar efetivamente
+            message_data = result.get("result", {})
+            if message_data.get("message_sent"):
+                # Extrair texto da mensagem preparada
+                adapted_payload = message_data.get("adapted_payload", {})
+                
+                # Verificar se tem src (estrutura do catálogo)
+                if "src" in adapted_payload:
+                    response_text = adapted_payload["src"].get("text", "")
+                else:
+                    response_text = adapted_payload.get("text", "")
+                
+                if response_text:
+                    # Enviar mensagem efetivamente via API do Telegram
+                    if await _send_turn_message(chat_id, response_text):
+                        logger.info(f"✅ Mensagem do pipeline enviada com sucesso: {response_text[:50]}...")
+                        return response_text
+                    logger.error("❌ Erro ao enviar mensagem do pipeline")
+                return None
+    return None
+
+
+async def _process_callback_turn(
+    uow: UnitOfWork,
+    update: Dict[str, Any],
+    inbound: Dict[str, Any],
+    chat_id: str,
+    route: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Caminho rápido do clique em botão: aplica a rota do catálogo direto.
+    
+    Sem snapshot, intake, gate, orquestrador, LLM ou RAG: set_facts, track e
+    a próxima automação do botão vão para o apply_plan no mesmo unit of work.
+    
+    Args:
+        uow: Unit of work do turno
+        update: Update original do Telegram
+        inbound: Evento normalizado
+        chat_id: Chat do lead
+        route: Rota do botão (ver callback_routes)
+        
+    Returns:
+        Resposta do webhook
+    """
+    button_id = route["button_id"]
+    lead_id = await _load_lead(uow, update, chat_id, button_id)
+    
+    store = get_catalog_store()
+    next_automation = store.get_automation(route["next_automation"]) if route.get("next_automation") else None
+    actions = callback_route_actions(route, next_automation)
+    
+    decision_id = f"callback_{button_id}_{int(time.time())}"
+    pipeline_result = await apply_plan({
+        "decision_id": decision_id,
+        "actions": actions,
+        "metadata": {"lead_id": lead_id, "fast_path": "callback", "button_id": button_id}
+    })
+    final_response = await _deliver_pipeline_message(pipeline_result, chat_id)
+    
+    log_structured("info", "callback_fast_path", {
+        "decision_id": decision_id,
+        "lead_id": lead_id,
+        "button_id": button_id,
+        "actions_count": len(actions),
+        "response_sent": final_response is not None
+    })
+    
+    return {
+        "ok": True,
+        "decision_id": decision_id,
+        "lead_id": lead_id,
+        "result": {
+            "status": "processed",
+            "inbound": inbound,
+            "pipeline_executed": False,
+            "fast_path": "callback",
+            "actions_count": len(actions),
+            "response_sent": final_response is not None,
+            "final_response": final_response,
+            "pipeline_result": pipeline_result
+        }
+    }
 
 
 @router.get("/info")
@@ -6,17 +6,14 @@ automaticamente quando uma automação tem expects_reply definido.
 """
 import time
 import logging
-import yaml
-import os
 from typing import Dict, Any, Optional
 
 from app.core.contexto_lead import get_contexto_lead_service
+from app.core.catalog_store import get_catalog_store
+from app.core.confirmation_plans import get_confirmation_plan_cache
 
 logger = logging.getLogger(__name__)
 
-# Cache do catálogo de automações
-_catalog_cache = None
-
 
 class AutomationHook:
     """
@@ -92,6 +89,9 @@ class AutomationHook:
                 ultima_automacao_enviada=automation_id
             )
             
+            # Desfechos sim/não prontos para o gate só classificar e aplicar
+            self._precompute_confirmation_plans(lead_id, target, automation_id, aguardando["ttl"])
+            
             logger.info(f"🪝 [AutomationHook] Set waiting confirmation for lead {lead_id}: {target} (ttl: {ttl_minutes}min)")
             logger.info(f"🪝 [AutomationHook] Automation {automation_id} configured with expects_reply.target={target}")
             
@@ -109,7 +109,7 @@ class AutomationHook:
     
     async def _get_automation_config(self, automation_id: str) -> Optional[Dict[str, Any]]:
         """
-        Obtém configuração de uma automação do catálogo YAML.
+        Obtém configuração de uma automação da store do catálogo.
         
         Args:
             automation_id: ID da automação
@@ -117,32 +117,7 @@ class AutomationHook:
         Returns:
             Configuração da automação ou None
         """
-        global _catalog_cache
-        
-        if _catalog_cache is None:
-            try:
-                # Carregar catalog.yml
-                catalog_path = os.path.join(
-                    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 
-                    "policies", "catalog.yml"
-                )
-                
-                if os.path.exists(catalog_path):
-                    with open(catalog_path, 'r', encoding='utf-8') as f:
-                        catalog_list = yaml.safe_load(f) or []
-                        
-                    # Converter lista em dict indexado por ID
-                    _catalog_cache = {item.get("id"): item for item in catalog_list if item.get("id")}
-                    logger.info(f"Loaded {len(_catalog_cache)} automations from catalog")
-                else:
-                    logger.warning(f"Catalog YAML not found: {catalog_path}")
-                    _catalog_cache = {}
-                    
-            except Exception as e:
-                logger.error(f"Error loading catalog YAML: {str(e)}")
-                _catalog_cache = {}
-        
-        return _catalog_cache.get(automation_id)
+        return get_catalog_store().get_automation(automation_id)
     
     async def _get_target_ttl(self, target: str) -> int:
         """
@@ -154,26 +129,35 @@ class AutomationHook:
         Returns:
             TTL em minutos (default: 30)
         """
-        try:
-            # Carregar confirm_targets.yml
-            targets_path = os.path.join(
-                os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 
-                "policies", "confirm_targets.yml"
-            )
-            
-            if os.path.exists(targets_path):
-                with open(targets_path, 'r', encoding='utf-8') as f:
-                    targets = yaml.safe_load(f) or {}
-                    
-                target_config = targets.get(target, {})
-                return target_config.get("max_age_minutes", 30)
-            else:
-                logger.warning(f"Confirm targets YAML not found: {targets_path}")
-                return 30
-                
-        except Exception as e:
-            logger.error(f"Error loading target TTL: {str(e)}")
-            return 30
+        target_config = get_catalog_store().get_confirm_target(target) or {}
+        return target_config.get("max_age_minutes", 30)
+
+    
+    def _precompute_confirmation_plans(
+        self,
+        lead_id: int,
+        target: str,
+        automation_id: str,
+        expires_at: int
+    ) -> None:
+        """
+        Monta e guarda os Plans de sim e não da pendência recém-criada.
+        
+        Args:
+            lead_id: ID do lead
+            target: Target de confirmação
+            automation_id: Automação que fez a pergunta
+            expires_at: Fim do TTL da pendência (epoch)
+        """
+        snapshot = get_catalog_store().snapshot
+        get_confirmation_plan_cache().precompute(
+            lead_id=lead_id,
+            target=target,
+            automation_id=automation_id,
+            target_config=snapshot.confirm_targets.get(target),
+            expires_at=expires_at,
+            catalog_version=snapshot.version
+        )
 
 
 # Instância global do hook
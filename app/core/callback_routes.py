@@ -0,0 +1,107 @@
+"""
+Callback Routes - Tabela de roteamento dos botões do catálogo
+
+O callback_data de um botão do Telegram é o id exato do botão. Tudo o que o
+clique faz (set_facts, track e a próxima automação) já está no catálogo,
+então a tabela é montada junto com o snapshot e o webhook aplica o clique
+direto pelo apply_plan, sem intake, gate, orquestrador, LLM ou RAG.
+
+Botões sem id explícito, sem efeito declarado ou com o mesmo id e efeitos
+diferentes em automações distintas ficam fora da tabela e seguem pelo
+pipeline completo.
+"""
+import logging
+from typing import Dict, Any, List, Optional
+
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+# Campos do botão que o clique aplica
+ROUTE_FIELDS = ("set_facts", "track", "next_automation")
+
+
+def build_callback_routes(automations: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Monta a tabela id do botão -> efeitos do clique.
+
+    Args:
+        automations: Automações do catálogo
+
+    Returns:
+        Dict button_id -> {button_id, automation_id, set_facts, track, next_automation}
+    """
+    automation_ids = {a.get("id") for a in automations if a.get("id")}
+    routes: Dict[str, Dict[str, Any]] = {}
+    conflicting = set()
+
+    for automation in automations:
+        buttons = (automation.get("output") or {}).get("buttons") or []
+        for button in buttons:
+            if not isinstance(button, dict) or button.get("kind", "callback") != "callback":
+                continue
+            button_id = button.get("id")
+            if not button_id:
+                continue
+
+            next_automation = button.get("next_automation")
+            if next_automation and next_automation not in automation_ids:
+                logger.warning(
+                    f"Botão {button_id} aponta para automação inexistente: {next_automation}"
+                )
+                next_automation = None
+
+            route = {
+                "button_id": button_id,
+                "automation_id": automation.get("id"),
+                "set_facts": dict(button.get("set_facts") or {}),
+                "track": dict(button.get("track") or {}),
+                "next_automation": next_automation,
+            }
+            if not any(route[field] for field in ROUTE_FIELDS):
+                continue
+
+            existing = routes.get(button_id)
+            if existing is not None and not _same_effects(existing, route):
+                conflicting.add(button_id)
+                continue
+            routes.setdefault(button_id, route)
+
+    for button_id in conflicting:
+        routes.pop(button_id, None)
+    if conflicting:
+        log_structured("warning", "callback_routes_conflict", {
+            "button_ids": sorted(conflicting)
+        })
+
+    return routes
+
+
+def _same_effects(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    return all(a[field] == b[field] for field in ROUTE_FIELDS)
+
+
+def callback_route_actions(
+    route: Dict[str, Any],
+    next_automation: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Converte uma rota em ações para o apply_plan.
+
+    Args:
+        route: Rota da tabela
+        next_automation: Automação seguinte já buscada na store (opcional)
+
+    Returns:
+        Lista de ações (set_facts, track_event e envio da próxima automação)
+    """
+    from app.core.selector import convert_automation_to_action
+
+    actions: List[Dict[str, Any]] = []
+    if route.get("set_facts"):
+        actions.append({"type": "set_facts", "set_facts": route["set_facts"]})
+    if route.get("track"):
+        actions.append({"type": "track_event", "track": route["track"]})
+    if next_automation:
+        actions.append(convert_automation_to_action(next_automation))
+    return actions
@@ -0,0 +1,248 @@
+"""
+Catalog Store - Armazenamento único em memória das políticas YAML
+
+Carrega catalog.yml, confirm_targets.yml e procedures.yml uma única vez em um
+snapshot versionado e indexado por ID. Todos os módulos consultam o mesmo
+snapshot; escritas (/save, /save-procedures, reset) trocam o snapshot inteiro
+de forma atômica, sem reler o disco a cada chamada.
+
+Cada snapshot validado é gravado como bundle compilado (ver policy_bundle);
+recargas usam o bundle e só parseiam YAML quando ele está desatualizado.
+"""
+import time
+import pathlib
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+
+import yaml
+
+from app.infra.logging import log_structured
+from app.core.eligibility import compile_automations
+from app.core.callback_routes import build_callback_routes
+from app.core import policy_bundle
+
+logger = logging.getLogger(__name__)
+
+# Diretório das políticas (mesmo caminho relativo usado pelas rotas de escrita)
+POLICIES_DIR = pathlib.Path("policies")
+
+CATALOG_FILE = "catalog.yml"
+CONFIRM_TARGETS_FILE = "confirm_targets.yml"
+PROCEDURES_FILE = "procedures.yml"
+SOURCE_FILES = (CATALOG_FILE, CONFIRM_TARGETS_FILE, PROCEDURES_FILE)
+
+# Loader em C quando a libyaml estiver disponível
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class CatalogSnapshot:
+    """
+    Snapshot imutável das políticas carregadas.
+
+    Nunca é alterado depois de criado: atualizações criam um novo snapshot
+    que substitui o anterior na store.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        automations: List[Dict[str, Any]],
+        confirm_targets: Dict[str, Dict[str, Any]],
+        procedures: List[Dict[str, Any]],
+        compiled_rules: Optional[Dict[str, tuple]] = None,
+        keywords: Optional[Dict[str, tuple]] = None
+    ):
+        self.version = version
+        self.loaded_at = time.time()
+        self.automations = automations
+        self.automations_by_id = {a["id"]: a for a in automations if a.get("id")}
+        self.confirm_targets = confirm_targets
+        self.procedures = procedures
+        self.procedures_by_id = {p["id"]: p for p in procedures if p.get("id")}
+        if compiled_rules is None or keywords is None:
+            compiled_rules, keywords = compile_automations(automations)
+        self.compiled_rules = compiled_rules
+        self.keywords = keywords
+        self.callback_routes = build_callback_routes(automations)
+
+
+class CatalogStore:
+    """Store versionada das políticas, compartilhada por todo o processo."""
+
+    def __init__(self, policies_dir: pathlib.Path = POLICIES_DIR):
+        self.policies_dir = policies_dir
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version = 0
+        # Reentrante: replace lê o snapshot atual (que pode recarregar) sob o lock
+        self._lock = threading.RLock()
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """Snapshot atual (carrega do disco no primeiro acesso)."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.reload()
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+
+    @property
+    def automations(self) -> List[Dict[str, Any]]:
+        return self.snapshot.automations
+
+    @property
+    def confirm_targets(self) -> Dict[str, Dict[str, Any]]:
+        return self.snapshot.confirm_targets
+
+    @property
+    def procedures(self) -> List[Dict[str, Any]]:
+        return self.snapshot.procedures
+
+    def get_automation(self, automation_id: str) -> Optional[Dict[str, Any]]:
+        """Busca automação por ID em O(1)."""
+        return self.snapshot.automations_by_id.get(automation_id)
+
+    def get_callback_route(self, button_id: str) -> Optional[Dict[str, Any]]:
+        """Busca a rota de um botão de callback (id do botão) em O(1)."""
+        return self.snapshot.callback_routes.get(button_id)
+
+    def get_confirm_target(self, target: str) -> Optional[Dict[str, Any]]:
+        """Busca configuração de um target de confirmação."""
+        return self.snapshot.confirm_targets.get(target)
+
+    def get_procedure(self, proc_id: str) -> Optional[Dict[str, Any]]:
+        """Busca procedimento por ID em O(1)."""
+        return self.snapshot.procedures_by_id.get(proc_id)
+
+    def reload(self) -> CatalogSnapshot:
+        """
+        Recarrega as políticas e troca o snapshot atomicamente.
+
+        Usa o bundle compilado quando está em dia com os YAMLs; caso
+        contrário parseia os YAMLs e regrava o bundle.
+
+        Returns:
+            Novo snapshot em uso
+        """
+        with self._lock:
+            bundle = policy_bundle.load_bundle(self.policies_dir, SOURCE_FILES)
+            if bundle is not None:
+                return self._swap(
+                    bundle["automations"],
+                    bundle["confirm_targets"],
+                    bundle["procedures"],
+                    reason="bundle",
+                    compiled_rules=bundle["compiled_rules"],
+                    keywords=bundle["keywords"]
+                )
+
+            automations = self._read_list(CATALOG_FILE)
+            confirm_targets = self._read_dict(CONFIRM_TARGETS_FILE)
+            procedures = self._read_list(PROCEDURES_FILE)
+            snapshot = self._swap(automations, confirm_targets, procedures, reason="reload")
+            policy_bundle.write_bundle(self.policies_dir, SOURCE_FILES, snapshot)
+            return snapshot
+
+    def replace(
+        self,
+        automations: Optional[Any] = None,
+        confirm_targets: Optional[Any] = None,
+        procedures: Optional[Any] = None
+    ) -> CatalogSnapshot:
+        """
+        Substitui partes do snapshot com conteúdo já parseado (sem reler o disco).
+
+        O conteúdo deve ser o mesmo já gravado nos YAMLs: o bundle compilado
+        é regravado com os carimbos atuais dos arquivos.
+
+        Args:
+            automations: Nova lista de automações (None = manter atual)
+            confirm_targets: Novo dict de targets (None = manter atual)
+            procedures: Nova lista de procedimentos (None = manter atual)
+
+        Returns:
+            Novo snapshot em uso
+        """
+        with self._lock:
+            current = self.snapshot
+            snapshot = self._swap(
+                current.automations if automations is None else _as_list(automations),
+                current.confirm_targets if confirm_targets is None else _as_dict(confirm_targets),
+                current.procedures if procedures is None else _as_list(procedures),
+                reason="replace"
+            )
+            policy_bundle.write_bundle(self.policies_dir, SOURCE_FILES, snapshot)
+            return snapshot
+
+    def _swap(
+        self,
+        automations: List[Dict[str, Any]],
+        confirm_targets: Dict[str, Dict[str, Any]],
+        procedures: List[Dict[str, Any]],
+        reason: str,
+        compiled_rules: Optional[Dict[str, tuple]] = None,
+        keywords: Optional[Dict[str, tuple]] = None
+    ) -> CatalogSnapshot:
+        """Monta o novo snapshot completo e só então o publica."""
+        self._version += 1
+        snapshot = CatalogSnapshot(
+            self._version, automations, confirm_targets, procedures,
+            compiled_rules=compiled_rules, keywords=keywords
+        )
+        self._snapshot = snapshot
+
+        log_structured("info", "catalog_store_swapped", {
+            "version": snapshot.version,
+            "reason": reason,
+            "automations": len(snapshot.automations),
+            "confirm_targets": len(snapshot.confirm_targets),
+            "procedures": len(snapshot.procedures),
+            "callback_routes": len(snapshot.callback_routes)
+        })
+        return snapshot
+
+    def _read_yaml(self, filename: str) -> Any:
+        path = self.policies_dir / filename
+        if not path.exists():
+            logger.warning(f"Arquivo de política não encontrado: {path}")
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return yaml.load(f, Loader=_YamlLoader)
+        except Exception as e:
+            logger.error(f"Erro ao carregar {path}: {e}")
+            return None
+
+    def _read_list(self, filename: str) -> List[Dict[str, Any]]:
+        return _as_list(self._read_yaml(filename))
+
+    def _read_dict(self, filename: str) -> Dict[str, Dict[str, Any]]:
+        return _as_dict(self._read_yaml(filename))
+
+
+def _as_list(data: Any) -> List[Dict[str, Any]]:
+    """Normaliza conteúdo YAML de lista (catálogo/procedimentos)."""
+    if not isinstance(data, list):
+        return []
+    return [item for item in data if isinstance(item, dict)]
+
+
+def _as_dict(data: Any) -> Dict[str, Dict[str, Any]]:
+    """Normaliza conteúdo YAML de mapa (confirm targets)."""
+    if not isinstance(data, dict):
+        return {}
+    return {k: v for k, v in data.items() if isinstance(v, dict)}
+
+
+# Instância global da store
+_catalog_store: Optional[CatalogStore] = None
+
+def get_catalog_store() -> CatalogStore:
+    """Obtém instância singleton da store de políticas."""
+    global _catalog_store
+    if _catalog_store is None:
+        _catalog_store = CatalogStore()
+    return _catalog_store
@@ -0,0 +1,199 @@
+"""
+Circuit Breaker - Proteção das dependências LLM
+
+Um breaker por modelo + endpoint, compartilhado por todos os pontos do
+pipeline que chamam aquele modelo. Em uma janela deslizante conta erros
+(exceções e timeouts) e chamadas lentas; abre quando a taxa de qualquer um
+passa do limite. Aberto, recusa na hora (CircuitOpenError) e quem chamou
+segue pelo caminho determinístico. Depois de LLM_BREAKER_OPEN_SECONDS,
+deixa passar poucas chamadas de prova (meio-aberto): sucesso fecha,
+falha reabre.
+
+Estado por processo: cada worker aprende sozinho em poucas chamadas.
+"""
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.settings import settings
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Breaker aberto: a chamada não foi feita."""
+
+    def __init__(self, name: str):
+        super().__init__(f"circuit open: {name}")
+        self.name = name
+
+
+class CircuitBreaker:
+    """Breaker de uma dependência (ex: "gpt-4o-mini:chat.completions")."""
+
+    def __init__(self, name: str, clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.window = settings.LLM_BREAKER_WINDOW_SECONDS
+        self.min_calls = settings.LLM_BREAKER_MIN_CALLS
+        self.error_rate = settings.LLM_BREAKER_ERROR_RATE
+        self.slow_call_ms = settings.LLM_BREAKER_SLOW_CALL_MS
+        self.slow_rate = settings.LLM_BREAKER_SLOW_RATE
+        self.open_seconds = settings.LLM_BREAKER_OPEN_SECONDS
+        self.half_open_probes = settings.LLM_BREAKER_HALF_OPEN_PROBES
+        self.state = CLOSED
+        self.rejected = 0
+        self._opened_at: Optional[float] = None
+        self._probes = 0
+        # (instante, sucesso, lenta)
+        self._outcomes: Deque[Tuple[float, bool, bool]] = deque()
+
+    def allow(self) -> bool:
+        """
+        Reserva uma chamada se o breaker permitir.
+
+        Returns:
+            True se a chamada pode seguir (em meio-aberto, ocupa uma prova)
+        """
+        if self.state == OPEN:
+            if self.clock() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self.rejected += 1
+                return False
+            self._probes += 1
+        return True
+
+    def record(self, success: bool, latency_ms: float, probe: bool = False) -> None:
+        """
+        Registra o resultado de uma chamada permitida.
+
+        Args:
+            success: Chamada terminou sem erro
+            latency_ms: Duração da chamada
+            probe: Chamada era uma prova do meio-aberto
+        """
+        slow = latency_ms >= self.slow_call_ms
+        if probe:
+            self._probes = max(0, self._probes - 1)
+            if self.state == HALF_OPEN:
+                if success and not slow:
+                    self._outcomes.clear()
+                    self._transition(CLOSED)
+                else:
+                    self._open()
+                return
+
+        now = self.clock()
+        self._outcomes.append((now, success, slow))
+        self._trim(now)
+        if self.state == CLOSED and self._should_trip():
+            self._open()
+
+    def cancel_probe(self, probe: bool) -> None:
+        """Libera a prova de uma chamada cancelada (sem contar resultado)."""
+        if probe:
+            self._probes = max(0, self._probes - 1)
+
+    @asynccontextmanager
+    async def guard(self):
+        """
+        Executa o bloco como uma chamada protegida.
+
+        Raises:
+            CircuitOpenError: Breaker aberto (o bloco não roda)
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        probe = self.state == HALF_OPEN
+        started = self.clock()
+        try:
+            yield
+        except asyncio.CancelledError:
+            # Cancelamento (ex: hedge perdedor) não diz nada sobre o provedor
+            self.cancel_probe(probe)
+            raise
+        except Exception:
+            self.record(False, (self.clock() - started) * 1000, probe)
+            raise
+        self.record(True, (self.clock() - started) * 1000, probe)
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def _rates(self) -> Tuple[int, float, float]:
+        total = len(self._outcomes)
+        if not total:
+            return 0, 0.0, 0.0
+        errors = sum(1 for _, success, _ in self._outcomes if not success)
+        slow = sum(1 for _, _, is_slow in self._outcomes if is_slow)
+        return total, errors / total, slow / total
+
+    def _should_trip(self) -> bool:
+        total, error_rate, slow_rate = self._rates()
+        if total < self.min_calls:
+            return False
+        return error_rate >= self.error_rate or slow_rate >= self.slow_rate
+
+    def _open(self) -> None:
+        self._opened_at = self.clock()
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        previous = self.state
+        self.state = state
+        if state != HALF_OPEN:
+            self._probes = 0
+        total, error_rate, slow_rate = self._rates()
+        log_structured("warning" if state == OPEN else "info", "llm_circuit_state_changed", {
+            "breaker": self.name,
+            "from": previous,
+            "to": state,
+            "calls": total,
+            "error_rate": round(error_rate, 3),
+            "slow_rate": round(slow_rate, 3)
+        })
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado atual para /metrics/runtime."""
+        self._trim(self.clock())
+        total, error_rate, slow_rate = self._rates()
+        return {
+            "state": self.state,
+            "calls": total,
+            "error_rate": round(error_rate, 3),
+            "slow_rate": round(slow_rate, 3),
+            "rejected": self.rejected,
+        }
+
+
+# Instâncias globais (uma por modelo + endpoint)
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_circuit_breaker(model: str, endpoint: str = "chat.completions") -> CircuitBreaker:
+    """Obtém o breaker compartilhado de um modelo + endpoint."""
+    name = f"{model}:{endpoint}"
+    breaker = _circuit_breakers.get(name)
+    if breaker is None:
+        breaker = _circuit_breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def circuit_breakers_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Estado de todos os breakers criados neste processo."""
+    return {name: breaker.snapshot() for name, breaker in sorted(_circuit_breakers.items())}
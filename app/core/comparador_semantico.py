@@ -13,6 +13,8 @@ from openai import AsyncOpenAI
 
 from app.data.schemas import Snapshot, KbContext
 from app.settings import settings
+from app.core.decision_mode import llm_slot
+from app.core.llm_call import call_llm
 
 # Importar prompt manager para usar prompt personalizado quando disponível
 try:
@@ -77,7 +79,8 @@ class ComparadorSemantico:
             - Se score < limiar: resposta_gerada preenchido
         """
         # Gerar resposta baseada no contexto
-        resposta_gerada = await self._gerar_resposta(pergunta, snapshot)
+        async with llm_slot():
+            resposta_gerada = await self._gerar_resposta(pergunta, snapshot)
         
         if not resposta_gerada:
             logger.warning("Falha ao gerar resposta, sem comparação possível")
@@ -162,7 +165,7 @@ class ComparadorSemantico:
             
             # Chamar LLM com timeout
             response = await asyncio.wait_for(
-                self.client.chat.completions.create(
+                call_llm("comparador", self.client.chat.completions.create,
                     model="gpt-4o",
                     messages=[{"role": "user", "content": prompt}],
                     max_tokens=300,
@@ -38,6 +38,7 @@ DECISION_TYPES = {
 
 # Headers de idempotência
 IDEMPOTENCY_HEADER = "X-Idempotency-Key"
+IDEMPOTENCY_DURABLE_HEADER = "X-Idempotency-Durable"  # "true": replay também via Postgres
 
 # Configurações de log estruturado
 LOG_CORRELATION_FIELDS = [
@@ -0,0 +1,255 @@
+"""
+Confirmation Classifier - Classificador determinístico de sim/não (PT-BR)
+
+Único classificador de respostas de confirmação, usado pelo gate e pelo
+serviço de resposta curta antes de qualquer LLM:
+
+- léxico com gírias ("bora", "blz", "tbm", "ss"), frases e emojis
+- negação ("não consigo", "nem pensar", "não" antes de um verbo de sim)
+- confiança calibrada: peso do termo × cobertura da mensagem, com
+  penalidade para conflito de polaridade, contraste ("mas") e pergunta
+
+As expressões são compiladas uma vez na importação do módulo. Quem chama
+só consulta o LLM quando a confiança fica abaixo do limiar
+(CONFIRM_CLASSIFIER_THRESHOLD).
+"""
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+YES = "yes"
+NO = "no"
+OTHER = "other"
+
+# Emojis viram tokens antes da normalização
+EMOJI_TOKENS = {
+    "👍": "emoji_yes", "✅": "emoji_yes", "👌": "emoji_yes", "🙌": "emoji_yes",
+    "💪": "emoji_yes", "🤝": "emoji_yes", "✔": "emoji_yes", "☑": "emoji_yes",
+    "🫡": "emoji_yes", "😁": "emoji_yes", "🔥": "emoji_yes",
+    "👎": "emoji_no", "❌": "emoji_no", "🚫": "emoji_no", "🙅": "emoji_no", "✖": "emoji_no",
+    "🤔": "emoji_unsure", "🤷": "emoji_unsure",
+}
+
+STRONG = 0.97
+NORMAL = 0.9
+WEAK = 0.8
+
+# (frase normalizada, polaridade, peso)
+LEXICON: List[Tuple[str, str, float]] = [
+    # Afirmação
+    *[(term, YES, STRONG) for term in (
+        "sim", "s", "ss", "claro", "claro que sim", "com certeza", "certeza", "consigo",
+        "posso", "aceito", "concordo", "pode", "pode sim", "quero", "quero sim", "ok", "okay",
+        "blz", "beleza", "bora", "bora sim", "vamos", "vambora", "fechado", "perfeito", "isso",
+        "isso mesmo", "exato", "yes", "y", "uhum", "aham", "positivo", "sim senhor",
+        "combinado", "emoji_yes", "consigo sim", "posso sim", "tenho sim",
+    )],
+    *[(term, YES, NORMAL) for term in (
+        "pode ser", "show", "top", "massa", "demoro", "partiu", "certo", "ta bom", "ta certo",
+        "tranquilo", "suave", "manda", "ja fiz", "ja tenho", "ja criei", "ja depositei",
+        "tbm", "tb", "tambem", "eu tambem",
+    )],
+    *[(term, YES, WEAK) for term in (
+        "vou", "tenho", "fiz", "criei", "depositei", "ta",
+    )],
+    # Negação
+    *[(term, NO, STRONG) for term in (
+        "nao", "n", "nn", "no", "nope", "negativo", "nunca", "jamais", "agora nao", "ainda nao",
+        "de jeito nenhum", "nem pensar", "impossivel", "nao da", "nao consigo", "nao posso",
+        "nao quero", "nao tenho", "nao vou", "claro que nao", "emoji_no", "nao nao",
+    )],
+    *[(term, NO, NORMAL) for term in (
+        "nem", "to fora", "deixa pra la", "dispenso", "sem chance", "ainda nao fiz",
+    )],
+    # Adiamento / incerteza
+    *[(term, OTHER, NORMAL) for term in (
+        "depois", "talvez", "mais tarde", "vou ver", "deixa eu pensar", "sei la", "nao sei",
+        "quem sabe", "outro dia", "vou pensar", "depende", "emoji_unsure", "n sei",
+    )],
+]
+
+# Termos ambíguos dentro de frases ("no" = em+o, "ta caro"): só valem como a mensagem inteira
+WHOLE_MESSAGE_ONLY = {"no", "ta"}
+
+NEGATORS = {"nao", "n", "nem", "nunca", "jamais"}
+
+# Palavras que não contam contra a cobertura (vocativos, artigos, tema da pergunta)
+NEUTRAL_TOKENS = {
+    "eu", "e", "a", "o", "os", "as", "um", "uma", "pra", "para", "de", "do", "da", "que",
+    "cara", "mano", "amigo", "opa", "oi", "ola", "entao", "bom", "ai", "ne", "viu", "ja",
+    "agora", "k", "kk", "rs", "haha", "kkk", "fazer", "depositar", "deposito", "conta",
+    "criar", "cadastro", "testar", "teste", "com",
+}
+CONTRAST_TOKENS = {"mas", "porem", "entretanto", "contudo", "so que"}
+QUESTION_STARTS = {"como", "quando", "qual", "quanto", "onde", "porque", "pq", "sera", "por que"}
+
+_POLARITY_OF = {phrase: (polarity, weight) for phrase, polarity, weight in LEXICON}
+_LEXICON_RE = re.compile(
+    r"\b(" + "|".join(re.escape(p) for p in sorted(_POLARITY_OF, key=len, reverse=True)) + r")\b"
+)
+_CONTRAST_RE = re.compile(r"\b(" + "|".join(sorted(CONTRAST_TOKENS, key=len, reverse=True)) + r")\b")
+_REPEAT_RE = re.compile(r"(\w)\1{2,}")
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+# Fronteiras de oração: o negador nunca se junta a um termo depois delas
+_CLAUSE_RE = re.compile(r"[,.!?;]+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+class ConfirmationClassification:
+    """Resultado do classificador."""
+
+    def __init__(self, polarity: Optional[str], confidence: float, reason: str,
+                 matched: Optional[List[str]] = None):
+        self.polarity = polarity  # 'yes' | 'no' | 'other' | None
+        self.confidence = confidence
+        self.reason = reason
+        self.matched = matched or []
+
+    def __repr__(self) -> str:
+        return f"ConfirmationClassification({self.polarity!r}, {self.confidence}, {self.reason!r})"
+
+
+def normalize(message: str) -> str:
+    """
+    Normaliza a mensagem para o léxico.
+
+    Minúsculas, emojis como tokens, sem acentos/pontuação e letras
+    repetidas colapsadas ("siiiim" → "sim").
+    """
+    text = message.lower().replace("\ufe0f", "")
+    for emoji, token in EMOJI_TOKENS.items():
+        text = text.replace(emoji, f" {token} ")
+    text = "".join(
+        ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch)
+    )
+    text = _REPEAT_RE.sub(r"\1", text)
+    text = _NON_WORD_RE.sub(" ", text)
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def classify_confirmation(message: str) -> ConfirmationClassification:
+    """
+    Classifica uma resposta de confirmação.
+
+    Args:
+        message: Texto do usuário
+
+    Returns:
+        ConfirmationClassification (polarity None se nada reconhecido)
+    """
+    # Léxico por oração ("não, pode sim" = "não" + "pode sim"), offsets no texto unido
+    clauses = [clause for clause in (normalize(part) for part in _CLAUSE_RE.split(message or "")) if clause]
+    text = " ".join(clauses)
+    if not text:
+        return ConfirmationClassification(None, 0.0, "empty")
+
+    matches: List[Tuple[int, int, str, float, str]] = []
+    boundaries: List[int] = []
+    offset = 0
+    for clause in clauses:
+        for match in _LEXICON_RE.finditer(clause):
+            if match.group(1) in WHOLE_MESSAGE_ONLY and match.group(1) != text:
+                continue
+            polarity, weight = _POLARITY_OF[match.group(1)]
+            matches.append((offset + match.start(), offset + match.end(), polarity, weight, match.group(1)))
+        offset += len(clause) + 1
+        boundaries.append(offset - 1)
+    if not matches:
+        return ConfirmationClassification(None, 0.0, "no_lexicon_match")
+
+    matches = _apply_negation(text, matches, boundaries)
+
+    totals: Dict[str, float] = {}
+    for _, _, polarity, weight, _ in matches:
+        totals[polarity] = totals.get(polarity, 0.0) + weight
+    polarity = max(totals, key=totals.get)
+    top_weight = max(weight for _, _, p, weight, _ in matches if p == polarity)
+
+    # Cobertura: fração das palavras relevantes explicadas pelo léxico
+    tokens = text.split()
+    spans = [(start, end) for start, end, _, _, _ in matches]
+    relevant = covered = 0
+    for token in re.finditer(r"\S+", text):
+        is_covered = any(start <= token.start() < end for start, end in spans)
+        if is_covered or token.group() not in NEUTRAL_TOKENS:
+            relevant += 1
+            covered += is_covered
+    coverage = covered / relevant if relevant else 1.0
+
+    confidence = top_weight * (0.55 + 0.45 * coverage)
+    reasons = [f"lexicon:{polarity}"]
+    if len(totals) > 1:
+        confidence *= 0.5
+        reasons.append("conflict")
+    if _CONTRAST_RE.search(text):
+        confidence *= 0.7
+        reasons.append("contrast")
+    if "?" in message or tokens[0] in QUESTION_STARTS or " ".join(tokens[:2]) in QUESTION_STARTS:
+        confidence *= 0.5
+        reasons.append("question")
+
+    return ConfirmationClassification(
+        polarity, round(confidence, 3), ",".join(reasons), [m[4] for m in matches]
+    )
+
+
+def _apply_negation(
+    text: str,
+    matches: List[Tuple[int, int, str, float, str]],
+    boundaries: List[int]
+) -> List[Tuple[int, int, str, float, str]]:
+    """Negador logo antes de um termo de sim ("não ... consigo"), na mesma oração, vira um não."""
+    result: List[Tuple[int, int, str, float, str]] = []
+    for match in matches:
+        start, end, polarity, weight, phrase = match
+        previous = result[-1] if result else None
+        if (
+            polarity == YES
+            and previous is not None
+            and previous[4] in NEGATORS
+            and len(text[previous[1]:start].split()) <= 1
+            and not any(previous[1] <= boundary < start for boundary in boundaries)
+        ):
+            result[-1] = (previous[0], end, NO, weight, f"{previous[4]} {phrase}")
+            continue
+        result.append(match)
+    return result
+
+
+class ConfirmationMetrics:
+    """Como as confirmações foram resolvidas (com ou sem modelo)."""
+
+    PATHS = ("classifier", "fallback", "intake", "llm", "unresolved")
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {path: 0 for path in self.PATHS}
+        self.llm_calls = 0
+
+    def record(self, path: str) -> None:
+        self.counts[path] = self.counts.get(path, 0) + 1
+
+    def record_llm_call(self) -> None:
+        self.llm_calls += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Contagens e fração resolvida sem chamada de modelo (ou sem chamada extra)."""
+        resolved = sum(count for path, count in self.counts.items() if path != "unresolved")
+        without_model = self.counts["classifier"] + self.counts["fallback"]
+        without_extra_call = without_model + self.counts["intake"]
+        return {
+            **self.counts,
+            "llm_calls": self.llm_calls,
+            "without_model_ratio": round(without_model / resolved, 3) if resolved else None,
+            "without_extra_call_ratio": round(without_extra_call / resolved, 3) if resolved else None,
+        }
+
+
+# Instância global
+_confirmation_metrics: Optional[ConfirmationMetrics] = None
+
+def get_confirmation_metrics() -> ConfirmationMetrics:
+    """Obtém instância singleton das métricas de confirmação."""
+    global _confirmation_metrics
+    if _confirmation_metrics is None:
+        _confirmation_metrics = ConfirmationMetrics()
+    return _confirmation_metrics
@@ -6,20 +6,23 @@ Integra no pipeline antes do orchestrator para interceptar confirmações.
 """
 import time
 import logging
-import yaml
-import os
 from typing import Dict, Any, Optional, List
 from openai import AsyncOpenAI
 
 from app.data.schemas import Env, Action, Plan
 from app.core.contexto_lead import get_contexto_lead_service
+from app.core.catalog_store import get_catalog_store
 from app.settings import settings
+from app.core.decision_mode import llm_slot
+from app.core.degradation import confirm_agent_mode
+from app.core.llm_call import call_llm
+from app.core.confirmation_classifier import classify_confirmation, get_confirmation_metrics
+from app.core.confirmation_plans import build_confirmation_actions, get_confirmation_plan_cache
 
 logger = logging.getLogger(__name__)
 
-# Carregamento do store de targets será implementado
-_confirm_targets_cache = None
-_confirm_targets_whitelist = set()
+# Whitelist usada quando confirm_targets.yml está vazio ou ausente
+DEFAULT_TARGETS_WHITELIST = {"confirm_can_deposit", "confirm_created_account"}
 
 
 class ConfirmationResult:
@@ -44,6 +47,8 @@ class ConfirmationGate:
     
     def __init__(self):
         self.contexto_service = get_contexto_lead_service()
+        self._lead_turns: Dict[int, Any] = {}
+        self.metrics = get_confirmation_metrics()
         self.openai_client = None
         if settings.OPENAI_API_KEY:
             self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
@@ -60,10 +65,10 @@ class ConfirmationGate:
         """
         start_time = time.time()
         
-        # FASE 3 - Lock por lead_id para evitar processamento concorrente
+        # FASE 3 - Vez do lead (serialização distribuída por lead)
         lock_acquired = await self._acquire_lead_lock(env.lead.id)
         if not lock_acquired:
-            logger.info(f"Lead {env.lead.id} lock busy - skipping confirmation processing")
+            logger.info(f"Lead {env.lead.id} lock timeout - skipping confirmation processing")
             return ConfirmationResult(handled=False, reason="lead_locked")
         
         try:
@@ -78,11 +83,7 @@ class ConfirmationGate:
                 return ConfirmationResult(handled=False, reason="idempotent_skip")
             
             # Verificar se tem contexto de aguardando
-            contexto_lead = None
-            if env.lead.id:
-                contexto_lead = await self.contexto_service.obter_contexto(env.lead.id)
-            
-            pending_confirmations = await self._get_pending_confirmations(contexto_lead, env)
+            pending_confirmations = await self.get_pending_confirmations(env)
             
             if not pending_confirmations:
                 return ConfirmationResult(handled=False, reason="no_pending_confirmations")
@@ -93,37 +94,64 @@ class ConfirmationGate:
             # Determinar se é retroativo
             is_retroactive = any(conf.get("source") == "retroactive" for conf in pending_confirmations)
             
-            # Verificar curto-circuito determinístico para respostas curtas
-            if settings.GATE_YESNO_DETERMINISTICO and self._is_short_response(current_message):
-                short_result = self._deterministic_short_response(current_message, pending_confirmations)
-                if short_result:
-                    # Log estruturado para observabilidade
-                    from app.infra.logging import log_structured
-                    log_structured("info", "gate_short_circuit", {
-                        "used": True, 
-                        "polarity": short_result.polarity
-                    })
-                    
-                    # Criar ações baseadas no resultado
-                    actions = await self._create_confirmation_actions(short_result, env.lead.id)
-                    short_result.actions = actions
-                    
-                    # Salvar para idempotência
-                    await self._store_idempotency(idempotency_key, short_result)
-                    
-                    return short_result
+            # Curto-circuito: classificador determinístico com confiança alta (sem LLM)
+            short_result = self._deterministic_short_response(current_message, pending_confirmations)
+            if short_result:
+                # Log estruturado para observabilidade
+                from app.infra.logging import log_structured
+                log_structured("info", "gate_short_circuit", {
+                    "used": True, 
+                    "polarity": short_result.polarity,
+                    "confidence": short_result.confidence
+                })
+                
+                # Criar ações baseadas no resultado
+                actions = await self._create_confirmation_actions(short_result, env.lead.id, pending_confirmations)
+                short_result.actions = actions
+                
+                # Salvar para idempotência
+                await self._store_idempotency(idempotency_key, short_result)
+                
+                self.metrics.record("classifier")
+                return short_result
+            
+            # Sinais do intake (já receberam as pendências no prompt): sem nova chamada
+            intake_result = self._intake_signal_result(env, pending_confirmations)
+            if intake_result:
+                intake_result.actions = await self._create_confirmation_actions(intake_result, env.lead.id, pending_confirmations)
+                
+                from app.infra.logging import log_structured
+                log_structured("info", "gate_eval", {
+                    "has_waiting": True, 
+                    "retro_active": is_retroactive, 
+                    "decision": intake_result.polarity, 
+                    "reason_summary": "intake_signals"
+                })
+                
+                await self._store_idempotency(idempotency_key, intake_result)
+                
+                latency_ms = int((time.time() - start_time) * 1000)
+                await self._log_confirmation_telemetry(
+                    env.lead.id, intake_result, latency_ms, "applied"
+                )
+                
+                self.metrics.record("intake")
+                return intake_result
             
-            # Tentar LLM primeiro se habilitado
-            if settings.CONFIRM_AGENT_MODE in ["llm_first", "hybrid"] and self.openai_client:
+            # LLM só para respostas ambíguas (sob carga o gate vira det_only)
+            agent_mode = confirm_agent_mode(settings.CONFIRM_AGENT_MODE)
+            if agent_mode in ["llm_first", "hybrid"] and self.openai_client:
                 try:
-                    llm_result = await self._try_llm_confirmation(
-                        current_message, env.messages_window, pending_confirmations, env.snapshot
-                    )
+                    self.metrics.record_llm_call()
+                    async with llm_slot():
+                        llm_result = await self._try_llm_confirmation(
+                            current_message, env.messages_window, pending_confirmations, env.snapshot
+                        )
                     
                     if llm_result.handled:
                         # Aplicar outcome se confiança suficiente
                         if llm_result.confidence >= settings.CONFIRM_AGENT_THRESHOLD:
-                            actions = await self._create_confirmation_actions(llm_result, env.lead.id)
+                            actions = await self._create_confirmation_actions(llm_result, env.lead.id, pending_confirmations)
                             llm_result.actions = actions
                             
                             # Log estruturado para observabilidade
@@ -144,10 +172,12 @@ class ConfirmationGate:
                                 env.lead.id, llm_result, latency_ms, "applied"
                             )
                             
+                            self.metrics.record("llm")
                             return llm_result
                         else:
                             # Confiança baixa - não aplicar
                             logger.info(f"LLM confidence too low: {llm_result.confidence} < {settings.CONFIRM_AGENT_THRESHOLD}")
+                            self.metrics.record("unresolved")
                             return ConfirmationResult(handled=False, reason="low_confidence")
                             
                 except Exception as e:
@@ -155,13 +185,13 @@ class ConfirmationGate:
                     # Continuar para fallback determinístico
             
             # Fallback determinístico
-            if settings.CONFIRM_AGENT_MODE in ["llm_first", "hybrid", "det_only"]:
+            if agent_mode in ["llm_first", "hybrid", "det_only"]:
                 fallback_result = await self._try_deterministic_confirmation(
                     current_message, pending_confirmations
                 )
                 
                 if fallback_result.handled:
-                    actions = await self._create_confirmation_actions(fallback_result, env.lead.id)
+                    actions = await self._create_confirmation_actions(fallback_result, env.lead.id, pending_confirmations)
                     fallback_result.actions = actions
                     
                     # Log estruturado para observabilidade
@@ -182,6 +212,7 @@ class ConfirmationGate:
                         env.lead.id, fallback_result, latency_ms, "applied"
                     )
                     
+                    self.metrics.record("fallback")
                     return fallback_result
             
             # Se chegou aqui, nenhum método funcionou
@@ -192,6 +223,7 @@ class ConfirmationGate:
                 "decision": "unknown", 
                 "reason_summary": "no_method_succeeded"
             })
+            self.metrics.record("unresolved")
             return ConfirmationResult(handled=False, reason="no_match")
             
         finally:
@@ -200,7 +232,7 @@ class ConfirmationGate:
     
     async def _get_automation_config(self, automation_id: str) -> Optional[Dict[str, Any]]:
         """
-        Obtém configuração de uma automação do catálogo YAML.
+        Obtém configuração de uma automação da store do catálogo.
         
         Args:
             automation_id: ID da automação
@@ -208,31 +240,23 @@ class ConfirmationGate:
         Returns:
             Configuração da automação ou None
         """
-        try:
-            import yaml
-            import os
-            
-            # Carregar catalog.yml
-            catalog_path = os.path.join(
-                os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 
-                "policies", "catalog.yml"
-            )
-            
-            if os.path.exists(catalog_path):
-                with open(catalog_path, 'r', encoding='utf-8') as f:
-                    catalog_list = yaml.safe_load(f) or []
-                    
-                # Buscar automação por ID
-                for automation in catalog_list:
-                    if automation.get("id") == automation_id:
-                        return automation
-                        
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error loading automation config: {str(e)}")
-            return None
+        return get_catalog_store().get_automation(automation_id)
 
+    async def get_pending_confirmations(self, env: Env) -> List[Dict[str, Any]]:
+        """
+        Confirmações pendentes do lead (usado também pelo intake).
+        
+        Args:
+            env: Ambiente atual
+            
+        Returns:
+            Lista de confirmações pendentes
+        """
+        contexto_lead = None
+        if env.lead.id:
+            contexto_lead = await self.contexto_service.obter_contexto(env.lead.id)
+        return await self._get_pending_confirmations(contexto_lead, env)
+    
     async def _get_pending_confirmations(self, contexto_lead, env: Env) -> List[Dict[str, Any]]:
         """
         Obtém lista de confirmações pendentes baseada no contexto.
@@ -286,6 +310,41 @@ class ConfirmationGate:
         
         return pending
     
+    def _intake_signal_result(self, env: Env, pending_confirmations: List[Dict[str, Any]]) -> Optional[ConfirmationResult]:
+        """
+        Reaproveita a classificação do intake para as confirmações pendentes.
+        
+        Args:
+            env: Ambiente com snapshot.llm_signals
+            pending_confirmations: Confirmações pendentes
+            
+        Returns:
+            ConfirmationResult ou None se o intake não cobre a pendência
+            ou respondeu com confiança baixa
+        """
+        snapshot = getattr(env, "snapshot", None)
+        signals = getattr(snapshot, "llm_signals", None) or {}
+        if not signals or signals.get("error"):
+            return None
+        
+        confidence = signals.get("confidence")
+        if not isinstance(confidence, (int, float)) or confidence < settings.CONFIRM_AGENT_THRESHOLD:
+            return None
+        
+        targets = signals.get("targets") or {}
+        for pending in pending_confirmations:
+            polarity = targets.get(pending["target"])
+            if polarity in ("yes", "no"):
+                return ConfirmationResult(
+                    handled=True,
+                    target=pending["target"],
+                    polarity=polarity,
+                    confidence=confidence,
+                    source="intake",
+                    reason="intake_signals"
+                )
+        return None
+    
     async def _try_llm_confirmation(
         self, 
         message: str, 
@@ -313,7 +372,7 @@ class ConfirmationGate:
         
         try:
             # Usar function calling para estruturar resposta
-            response = await self.openai_client.chat.completions.create(
+            response = await call_llm("gate", self.openai_client.chat.completions.create,
                 model="gpt-4o-mini",
                 temperature=0,
                 messages=[
@@ -417,135 +476,54 @@ Regras:
         if not pending_confirmations:
             return ConfirmationResult(handled=False, reason="no_pending")
         
-        # Normalizar mensagem
-        msg_lower = message.lower().strip()
-        
-        # Padrões de confirmação
-        yes_patterns = [
-            "sim", "consigo", "posso", "quero", "aceito", "pode", "vamos", 
-            "claro", "certeza", "ok", "beleza", "perfeito", "vou"
-        ]
-        
-        no_patterns = [
-            "não", "nao", "não consigo", "não posso", "não quero", 
-            "impossível", "não dá", "não da", "negativo"
-        ]
-        
-        # Verificar padrões
-        polarity = None
-        confidence = 0.0
-        
-        for pattern in yes_patterns:
-            if pattern in msg_lower:
-                polarity = "yes"
-                confidence = 0.85 if pattern in ["sim", "consigo", "posso"] else 0.75
-                break
-        
-        if not polarity:
-            for pattern in no_patterns:
-                if pattern in msg_lower:
-                    polarity = "no"
-                    confidence = 0.85 if pattern in ["não", "nao"] else 0.75
-                    break
-        
-        if polarity and confidence >= 0.70:  # Limiar mais baixo para determinístico
+        # Mesmo classificador do curto-circuito, com limiar mais baixo
+        classification = classify_confirmation(message)
+        if (
+            classification.polarity in ("yes", "no")
+            and classification.confidence >= settings.CONFIRM_CLASSIFIER_FALLBACK_MIN
+        ):
             return ConfirmationResult(
                 handled=True,
                 target=pending_confirmations[0]["target"],
-                polarity=polarity,
-                confidence=confidence,
+                polarity=classification.polarity,
+                confidence=classification.confidence,
                 source="fallback",
-                reason=f"deterministic_match: {polarity}"
+                reason=f"deterministic_match: {classification.polarity}"
             )
         
         return ConfirmationResult(handled=False, reason="deterministic_no_match", source="fallback")
     
-    def _is_short_response(self, message: str) -> bool:
-        """
-        Verifica se a mensagem é uma resposta curta.
-        
-        Args:
-            message: Mensagem a ser verificada
-            
-        Returns:
-            True se é resposta curta
-        """
-        if not message:
-            return False
-        
-        # Respostas curtas conhecidas
-        short_responses = {
-            "yes": ["sim", "s", "yes", "y", "ok", "👍", "✅", "claro", "pode ser", "beleza"],
-            "no": ["não", "nao", "n", "no", "nope", "agora não", "depois", "mais tarde", "não consigo"]
-        }
-        
-        message_lower = message.lower().strip()
-        
-        # Verificar se é uma resposta curta conhecida
-        for polarity, responses in short_responses.items():
-            if message_lower in responses:
-                return True
-        
-        # Verificar se tem ≤ 3 palavras
-        words = message_lower.split()
-        if len(words) <= 3:
-            return True
-        
-        return False
-    
     def _deterministic_short_response(self, message: str, pending_confirmations: List[Dict[str, Any]]) -> Optional[ConfirmationResult]:
         """
-        Classifica resposta curta de forma determinística.
+        Classifica a resposta sem LLM quando o classificador está confiante.
+        
+        Adiamentos ("depois", "talvez") só são resolvidos aqui com
+        GATE_YESNO_DETERMINISTICO; sem a flag seguem para o LLM.
         
         Args:
             message: Mensagem a ser classificada
             pending_confirmations: Confirmações pendentes
             
         Returns:
-            ConfirmationResult ou None se não conseguir classificar
+            ConfirmationResult ou None se a confiança ficou abaixo do limiar
         """
         if not pending_confirmations:
             return None
         
-        message_lower = message.lower().strip()
-        
-        # Respostas afirmativas
-        yes_responses = ["sim", "s", "yes", "y", "ok", "👍", "✅", "claro", "pode ser", "beleza"]
-        if message_lower in yes_responses:
-            return ConfirmationResult(
-                handled=True,
-                target=pending_confirmations[0]["target"],
-                polarity="yes",
-                confidence=0.95,
-                source="deterministic_short",
-                reason="short_yes_response"
-            )
-        
-        # Respostas negativas
-        no_responses = ["não", "nao", "n", "no", "nope", "agora não", "impossível", "não dá", "não da", "negativo"]
-        if message_lower in no_responses:
-            return ConfirmationResult(
-                handled=True,
-                target=pending_confirmations[0]["target"],
-                polarity="no",
-                confidence=0.95,
-                source="deterministic_short",
-                reason="short_no_response"
-            )
-        
-        # Respostas neutras/adiamento
-        other_responses = ["depois", "talvez", "mais tarde", "agora não", "vou ver", "deixa eu pensar"]
-        if message_lower in other_responses:
-            return ConfirmationResult(
-                handled=True,
-                target=pending_confirmations[0]["target"],
-                polarity="other",
-                confidence=0.90,
-                source="deterministic_short",
-                reason="short_other_response"
-            )
+        classification = classify_confirmation(message)
+        if classification.polarity is None or classification.confidence < settings.CONFIRM_CLASSIFIER_THRESHOLD:
+            return None
+        if classification.polarity == "other" and not settings.GATE_YESNO_DETERMINISTICO:
+            return None
         
-        return None
+        return ConfirmationResult(
+            handled=True,
+            target=pending_confirmations[0]["target"],
+            polarity=classification.polarity,
+            confidence=classification.confidence,
+            source="deterministic_short",
+            reason=f"short_{classification.polarity}_response"
+        )
     
     def _build_llm_context(
         self, 
@@ -581,76 +559,53 @@ Regras:
         
         return "\n\n".join(context_parts)
     
-    async def _create_confirmation_actions(self, result: ConfirmationResult, lead_id: Optional[int]) -> List[Action]:
+    async def _create_confirmation_actions(
+        self,
+        result: ConfirmationResult,
+        lead_id: Optional[int],
+        pending_confirmations: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Action]:
         """
         Cria ações baseadas no resultado da confirmação.
         
+        Usa o plano pré-calculado no envio da pergunta (AutomationHook) quando
+        ele ainda vale para a pendência; senão monta as ações na hora.
+        
         Args:
             result: Resultado da confirmação
             lead_id: ID do lead
+            pending_confirmations: Pendências do turno (para validar o plano pronto)
             
         Returns:
             Lista de ações a serem executadas
         """
-        actions = []
-        
         if not result.handled or not result.target or not lead_id:
-            return actions
+            return []
+        
+        pending = next(
+            (p for p in pending_confirmations or [] if p.get("target") == result.target), None
+        )
+        if pending is not None:
+            plan_cache = get_confirmation_plan_cache()
+            plan = plan_cache.get_plan(
+                lead_id, result.target, result.polarity,
+                pending.get("automation_id"), get_catalog_store().version
+            )
+            plan_cache.discard(lead_id)
+            if plan is not None:
+                return list(plan.actions)
         
         # Carregar configuração do target
         target_config = await self._get_target_config(result.target)
         if not target_config:
             logger.warning(f"Target config not found: {result.target}")
-            return actions
-        
-        # Criar ações baseado na polaridade
-        if result.polarity == "yes" and "on_yes" in target_config:
-            facts = target_config["on_yes"].get("facts", {})
-            if facts:
-                actions.append(Action(
-                    type="set_facts",
-                    set_facts=facts
-                ))
-            
-            # Adicionar mensagem de confirmação para o usuário
-            actions.append(Action(
-                type="send_message",
-                text="✅ Perfeito! Entendi que você consegue fazer o depósito. Vou liberar seu acesso ao teste!"
-            ))
-        
-        elif result.polarity == "no" and "on_no" in target_config:
-            facts = target_config["on_no"].get("facts", {})
-            automation = target_config["on_no"].get("automation")
-            
-            if facts:
-                actions.append(Action(
-                    type="set_facts",
-                    set_facts=facts
-                ))
-            
-            if automation:
-                actions.append(Action(
-                    type="send_message",
-                    text=f"Automação de ajuda disparada: {automation}"
-                ))
-            else:
-                # Mensagem padrão para 'não'
-                actions.append(Action(
-                    type="send_message",
-                    text="Entendi que você não consegue fazer o depósito agora. Posso te ajudar com outras opções!"
-                ))
-        
-        # Sempre limpar estado aguardando
-        actions.append(Action(
-            type="clear_waiting",
-            text="Estado de aguardando limpo"
-        ))
-        
-        return actions
+            return []
+        
+        return build_confirmation_actions(target_config, result.polarity)
     
     async def _get_target_config(self, target: str) -> Optional[Dict[str, Any]]:
         """
-        Obtém configuração de um target do YAML.
+        Obtém configuração de um target da store do catálogo.
         
         Args:
             target: Nome do target
@@ -658,27 +613,7 @@ Regras:
         Returns:
             Configuração do target ou None
         """
-        global _confirm_targets_cache
-        
-        if _confirm_targets_cache is None:
-            try:
-                # Carregar confirm_targets.yml
-                targets_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 
-                                           "policies", "confirm_targets.yml")
-                
-                if os.path.exists(targets_path):
-                    with open(targets_path, 'r', encoding='utf-8') as f:
-                        _confirm_targets_cache = yaml.safe_load(f) or {}
-                        logger.info(f"Loaded {len(_confirm_targets_cache)} confirmation targets from YAML")
-                else:
-                    logger.warning(f"Confirm targets YAML not found: {targets_path}")
-                    _confirm_targets_cache = {}
-                    
-            except Exception as e:
-                logger.error(f"Error loading confirm targets YAML: {str(e)}")
-                _confirm_targets_cache = {}
-        
-        return _confirm_targets_cache.get(target)
+        return get_catalog_store().get_confirm_target(target)
     
     def _is_target_valid(self, target: str) -> bool:
         """
@@ -690,21 +625,10 @@ Regras:
         Returns:
             True se válido
         """
-        global _confirm_targets_whitelist, _confirm_targets_cache
-        
-        if not _confirm_targets_whitelist:
-            # Carregar whitelist das chaves do YAML
-            if _confirm_targets_cache is None:
-                # Carregar cache primeiro
-                import asyncio
-                asyncio.create_task(self._get_target_config("dummy"))
-            
-            if _confirm_targets_cache:
-                _confirm_targets_whitelist = set(_confirm_targets_cache.keys())
-            else:
-                _confirm_targets_whitelist = {"confirm_can_deposit", "confirm_created_account"}
-        
-        return target in _confirm_targets_whitelist
+        confirm_targets = get_catalog_store().confirm_targets
+        if confirm_targets:
+            return target in confirm_targets
+        return target in DEFAULT_TARGETS_WHITELIST
     
     async def _log_confirmation_telemetry(
         self, 
@@ -739,47 +663,49 @@ Regras:
     
     async def _acquire_lead_lock(self, lead_id: int) -> bool:
         """
-        Adquire lock simples por lead_id para evitar processamento concorrente.
+        Aguarda a vez do lead no serializador distribuído.
+        
+        Dentro de um turno já serializado (webhook) segue direto; fora dele
+        espera o lease do lead em vez de pular o processamento.
         
         Args:
             lead_id: ID do lead
             
         Returns:
-            True se lock foi adquirido
+            False só se a vez não vier dentro do prazo
         """
-        # Implementação simples usando timestamp
-        # Em produção, seria melhor usar Redis com TTL
-        lock_key = f"confirmation_lock_{lead_id}"
-        current_time = int(time.time())
+        from app.core.lead_serializer import get_lead_serializer, current_lead_turn, lead_key_for_id
         
-        try:
-            # Verificar se já existe lock
-            if hasattr(self, '_locks'):
-                existing_lock = self._locks.get(lock_key, 0)
-                if current_time - existing_lock < 30:  # Lock válido por 30 segundos
-                    return False
-            else:
-                self._locks = {}
-            
-            # Adquirir lock
-            self._locks[lock_key] = current_time
+        if current_lead_turn() is not None or not lead_id:
             return True
-            
+        try:
+            # Mesma chave do webhook: os dois caminhos disputam o mesmo lease
+            key = await lead_key_for_id(lead_id)
+            if key is None:
+                return True
+            turn = await get_lead_serializer().acquire(key)
         except Exception as e:
             logger.warning(f"Error acquiring lock for lead {lead_id}: {e}")
             return True  # Permitir processamento se não conseguir obter lock
+        if turn is None:
+            return False
+        self._lead_turns[lead_id] = turn
+        return True
     
     async def _release_lead_lock(self, lead_id: int) -> None:
         """
-        Libera lock do lead.
+        Libera a vez do lead (se foi adquirida por este gate).
         
         Args:
             lead_id: ID do lead
         """
+        from app.core.lead_serializer import get_lead_serializer
+        
+        turn = self._lead_turns.pop(lead_id, None)
+        if turn is None:
+            return
         try:
-            lock_key = f"confirmation_lock_{lead_id}"
-            if hasattr(self, '_locks') and lock_key in self._locks:
-                del self._locks[lock_key]
+            await get_lead_serializer().release(turn)
         except Exception as e:
             logger.warning(f"Error releasing lock for lead {lead_id}: {e}")
     
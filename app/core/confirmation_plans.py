@@ -0,0 +1,213 @@
+"""
+Confirmation Plans - Planos de resposta pré-calculados para confirmações
+
+Quando uma automação com expects_reply é enviada, o target e seus
+desfechos (on_yes/on_no: fatos e automação seguinte) já estão no
+confirm_targets.yml. O AutomationHook monta nesse momento os dois Plans
+(sim e não) e guarda aqui por lead; quando o lead responde, o gate só
+classifica a polaridade e aplica o plano pronto.
+
+O cache é do processo: se a resposta cair em outro worker, se o catálogo
+mudou desde o envio ou se a pendência expirou, o gate monta as ações na
+hora, como antes.
+"""
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+from app.data.schemas import Action, Plan
+
+logger = logging.getLogger(__name__)
+
+POLARITIES = ("yes", "no")
+
+# Limite de leads com plano em memória (LRU)
+MAX_CACHED_LEADS = 10000
+
+
+def build_confirmation_actions(target_config: Optional[Dict[str, Any]], polarity: Optional[str]) -> List[Action]:
+    """
+    Monta as ações de um desfecho de confirmação.
+
+    Args:
+        target_config: Configuração do target (confirm_targets.yml)
+        polarity: 'yes' | 'no' | outra
+
+    Returns:
+        Lista de ações (vazia se o target não tem configuração)
+    """
+    actions: List[Action] = []
+    if not target_config:
+        return actions
+
+    # Criar ações baseado na polaridade
+    if polarity == "yes" and "on_yes" in target_config:
+        facts = target_config["on_yes"].get("facts", {})
+        if facts:
+            actions.append(Action(
+                type="set_facts",
+                set_facts=facts
+            ))
+
+        # Adicionar mensagem de confirmação para o usuário
+        actions.append(Action(
+            type="send_message",
+            text="✅ Perfeito! Entendi que você consegue fazer o depósito. Vou liberar seu acesso ao teste!"
+        ))
+
+    elif polarity == "no" and "on_no" in target_config:
+        facts = target_config["on_no"].get("facts", {})
+        automation = target_config["on_no"].get("automation")
+
+        if facts:
+            actions.append(Action(
+                type="set_facts",
+                set_facts=facts
+            ))
+
+        if automation:
+            actions.append(Action(
+                type="send_message",
+                text=f"Automação de ajuda disparada: {automation}"
+            ))
+        else:
+            # Mensagem padrão para 'não'
+            actions.append(Action(
+                type="send_message",
+                text="Entendi que você não consegue fazer o depósito agora. Posso te ajudar com outras opções!"
+            ))
+
+    # Sempre limpar estado aguardando
+    actions.append(Action(
+        type="clear_waiting",
+        text="Estado de aguardando limpo"
+    ))
+
+    return actions
+
+
+class PendingConfirmationPlans:
+    """Planos prontos (sim e não) de uma pendência de um lead."""
+
+    def __init__(self, target: str, automation_id: Optional[str], catalog_version: int,
+                 expires_at: float, plans: Dict[str, Plan]):
+        self.target = target
+        self.automation_id = automation_id
+        self.catalog_version = catalog_version
+        self.expires_at = expires_at
+        self.plans = plans
+
+
+class ConfirmationPlanCache:
+    """Cache por lead dos planos de confirmação pré-calculados."""
+
+    def __init__(self, max_leads: int = MAX_CACHED_LEADS):
+        self.max_leads = max_leads
+        self._entries: "OrderedDict[int, PendingConfirmationPlans]" = OrderedDict()
+        self.stored = 0
+        self.hits = 0
+        self.misses = 0
+
+    def precompute(
+        self,
+        lead_id: int,
+        target: str,
+        automation_id: Optional[str],
+        target_config: Optional[Dict[str, Any]],
+        expires_at: float,
+        catalog_version: int
+    ) -> Optional[PendingConfirmationPlans]:
+        """
+        Monta e guarda os planos de sim e não da pendência do lead.
+
+        Args:
+            lead_id: ID do lead
+            target: Target de confirmação
+            automation_id: Automação que fez a pergunta
+            target_config: Configuração do target
+            expires_at: Fim do TTL da pendência (epoch)
+            catalog_version: Versão do snapshot usada para montar os planos
+
+        Returns:
+            Entrada guardada ou None se o target não tem configuração
+        """
+        if not target_config:
+            self.discard(lead_id)
+            return None
+
+        plans = {
+            polarity: Plan(
+                decision_id=f"confirm_{target}_{polarity}",
+                actions=build_confirmation_actions(target_config, polarity)
+            )
+            for polarity in POLARITIES
+        }
+        entry = PendingConfirmationPlans(target, automation_id, catalog_version, expires_at, plans)
+
+        self._entries[lead_id] = entry
+        self._entries.move_to_end(lead_id)
+        while len(self._entries) > self.max_leads:
+            self._entries.popitem(last=False)
+        self.stored += 1
+        return entry
+
+    def get_plan(
+        self,
+        lead_id: int,
+        target: str,
+        polarity: Optional[str],
+        automation_id: Optional[str],
+        catalog_version: int
+    ) -> Optional[Plan]:
+        """
+        Plano pronto para a polaridade, se ainda vale para a pendência atual.
+
+        Args:
+            lead_id: ID do lead
+            target: Target da pendência respondida
+            polarity: Polaridade classificada
+            automation_id: Automação da pendência (None = não conferir)
+            catalog_version: Versão atual do snapshot
+
+        Returns:
+            Plan ou None (sem entrada, outra pendência, expirado ou catálogo trocado)
+        """
+        entry = self._entries.get(lead_id)
+        plan = entry.plans.get(polarity) if entry is not None else None
+        if (
+            plan is None
+            or entry.target != target
+            or (automation_id and entry.automation_id != automation_id)
+            or entry.catalog_version != catalog_version
+            or time.time() > entry.expires_at
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return plan
+
+    def discard(self, lead_id: int) -> None:
+        self._entries.pop(lead_id, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Contadores para /metrics/runtime."""
+        lookups = self.hits + self.misses
+        return {
+            "leads": len(self._entries),
+            "stored": self.stored,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+# Instância global
+_confirmation_plan_cache: Optional[ConfirmationPlanCache] = None
+
+def get_confirmation_plan_cache() -> ConfirmationPlanCache:
+    """Obtém instância singleton do cache de planos de confirmação."""
+    global _confirmation_plan_cache
+    if _confirmation_plan_cache is None:
+        _confirmation_plan_cache = ConfirmationPlanCache()
+    return _confirmation_plan_cache
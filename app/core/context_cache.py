@@ -0,0 +1,486 @@
+"""
+Context Cache - Cache read-through do ContextoLead com write-behind
+
+O estado quente da conversa fica no Redis (ou no adapter in-memory):
+
+- mb:ctx:{lead}             hash com os campos do contexto
+- mb:ctx:{lead}:aguardando  estado 'aguardando' com TTL nativo (expira sozinho)
+- mb:ctx:{lead}:timeline    sorted set de expects_reply (score = created_at)
+- mb:ctx:dirty              set de leads com alterações ainda não persistidas
+- mb:ctx:timeline:dirty     set de leads com timeline a fotografar
+
+Leituras que não encontram o hash carregam do Postgres uma vez e populam o
+cache. Escritas só tocam o Redis e marcam o lead como sujo; o
+ContextFlusher grava os leads sujos em contexto_lead em lotes, em
+background. O timeline é só fotografado no Postgres, em intervalo maior.
+
+Erros do adapter levantam ContextCacheUnavailable em vez de parecerem
+ausência no cache (leitura) ou sucesso (escrita): o serviço de contexto segue
+pelo banco, e o flusher devolve ao set os leads que não conseguiu ler.
+"""
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.redis_adapter import get_redis, RedisAdapter
+from app.settings import settings
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_KEY = "mb:ctx:{lead_id}"
+AGUARDANDO_KEY = "mb:ctx:{lead_id}:aguardando"
+TIMELINE_KEY = "mb:ctx:{lead_id}:timeline"
+DIRTY_KEY = "mb:ctx:dirty"
+TIMELINE_DIRTY_KEY = "mb:ctx:timeline:dirty"
+
+# Entradas mantidas no timeline de expects_reply por lead
+TIMELINE_MAX_ENTRIES = 10
+
+# Marcador de hash carregado ("1" = existe contexto, "0" = lead sem contexto)
+LOADED_FIELD = "_loaded"
+
+CONTEXT_FIELDS = (
+    "procedimento_ativo",
+    "etapa_ativa",
+    "progresso_procedimento",
+    "ultima_automacao_enviada",
+    "ultimo_topico_kb",
+)
+JSON_FIELDS = {"progresso_procedimento"}
+
+
+class ContextCacheUnavailable(Exception):
+    """O Redis não respondeu à leitura do contexto."""
+
+
+def _encode(field: str, value: Any) -> str:
+    if field in JSON_FIELDS:
+        return json.dumps(value)
+    return "" if value is None else str(value)
+
+
+def _decode(field: str, raw: Optional[str]) -> Any:
+    if raw is None or raw == "":
+        return None
+    if field in JSON_FIELDS:
+        return json.loads(raw)
+    return raw
+
+
+class ContextCache:
+    """Hash de contexto por lead com estado 'aguardando' em chave com TTL."""
+
+    def __init__(self, redis: Optional[RedisAdapter] = None, ttl_seconds: Optional[int] = None):
+        self.redis = redis or get_redis()
+        self.ttl_seconds = ttl_seconds or settings.CONTEXT_CACHE_TTL_SECONDS
+
+    def _raise_on_error(self) -> None:
+        if self.redis.last_error is not None:
+            raise ContextCacheUnavailable(str(self.redis.last_error))
+
+    def get(self, lead_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Lê o contexto do cache.
+
+        Returns:
+            None se o lead não está no cache; {} se está marcado como sem
+            contexto; senão dict com os campos e 'aguardando'
+
+        Raises:
+            ContextCacheUnavailable: Erro do Redis na leitura
+        """
+        raw = self.redis.hgetall(CONTEXT_KEY.format(lead_id=lead_id))
+        self._raise_on_error()
+        if not raw:
+            return None
+        aguardando = self.get_aguardando(lead_id)
+        if raw.get(LOADED_FIELD) == "0" and aguardando is None:
+            return {}
+        data = {field: _decode(field, raw.get(field)) for field in CONTEXT_FIELDS}
+        data["aguardando"] = aguardando
+        return data
+
+    def get_aguardando(self, lead_id: int) -> Optional[Dict[str, Any]]:
+        """Estado 'aguardando' ainda válido (a chave expira pelo TTL)."""
+        raw = self.redis.get(AGUARDANDO_KEY.format(lead_id=lead_id))
+        self._raise_on_error()
+        return json.loads(raw) if raw else None
+
+    def load(self, lead_id: int, values: Optional[Dict[str, Any]]) -> None:
+        """
+        Popula o cache a partir do banco (sem marcar como sujo).
+
+        Args:
+            lead_id: ID do lead
+            values: Campos do contexto_lead ou None se não houver linha
+        """
+        mapping = {LOADED_FIELD: "1" if values is not None else "0"}
+        for field in CONTEXT_FIELDS:
+            if values is not None and values.get(field) is not None:
+                mapping[field] = _encode(field, values[field])
+        self.redis.hset(CONTEXT_KEY.format(lead_id=lead_id), mapping, ex=self.ttl_seconds)
+
+        aguardando = (values or {}).get("aguardando")
+        ttl = _remaining_ttl(aguardando)
+        if ttl:
+            self.redis.set(AGUARDANDO_KEY.format(lead_id=lead_id), aguardando, ex=ttl)
+
+        timeline = (values or {}).get("timeline_expects_reply") or []
+        if timeline:
+            self.redis.zadd(
+                TIMELINE_KEY.format(lead_id=lead_id),
+                {_timeline_member(entry): _timeline_score(entry) for entry in timeline},
+                max_len=TIMELINE_MAX_ENTRIES,
+                ex=self.ttl_seconds
+            )
+
+    def is_loaded(self, lead_id: int) -> bool:
+        """True se o hash do lead está no cache."""
+        loaded = self.redis.exists(CONTEXT_KEY.format(lead_id=lead_id))
+        self._raise_on_error()
+        return loaded
+
+    def update(self, lead_id: int, fields: Dict[str, Any]) -> None:
+        """
+        Atualiza campos do contexto atomicamente (HSET) e marca o lead como sujo.
+
+        Args:
+            lead_id: ID do lead
+            fields: Campos de CONTEXT_FIELDS a gravar
+
+        Raises:
+            ContextCacheUnavailable: Erro do Redis na escrita
+        """
+        mapping = {LOADED_FIELD: "1"}
+        mapping.update({field: _encode(field, value) for field, value in fields.items()})
+        self.redis.hset(CONTEXT_KEY.format(lead_id=lead_id), mapping, ex=self.ttl_seconds)
+        self._raise_on_error()
+        self.mark_dirty(lead_id)
+
+    def set_aguardando(self, lead_id: int, aguardando: Dict[str, Any]) -> None:
+        """Grava 'aguardando' com TTL até aguardando['ttl'] (timestamp)."""
+        ttl = _remaining_ttl(aguardando)
+        key = AGUARDANDO_KEY.format(lead_id=lead_id)
+        if ttl:
+            self.redis.set(key, aguardando, ex=ttl)
+        else:
+            self.redis.delete(key)
+        self._raise_on_error()
+        self.redis.hset(CONTEXT_KEY.format(lead_id=lead_id), {LOADED_FIELD: "1"}, ex=self.ttl_seconds)
+        self._raise_on_error()
+        self.mark_dirty(lead_id)
+
+    def clear_aguardando(self, lead_id: int) -> None:
+        """Remove o estado 'aguardando' do lead."""
+        self.redis.delete(AGUARDANDO_KEY.format(lead_id=lead_id))
+        self._raise_on_error()
+        self.mark_dirty(lead_id)
+
+    def add_timeline(self, lead_id: int, entry: Dict[str, Any]) -> None:
+        """
+        Registra entrada de expects_reply (ZADD + corte nas mais recentes).
+
+        Args:
+            lead_id: ID do lead
+            entry: Entrada com created_at (timestamp)
+        """
+        self.redis.zadd(
+            TIMELINE_KEY.format(lead_id=lead_id),
+            {_timeline_member(entry): _timeline_score(entry)},
+            max_len=TIMELINE_MAX_ENTRIES,
+            ex=self.ttl_seconds
+        )
+        self._raise_on_error()
+        self.mark_timeline_dirty(lead_id)
+
+    def get_timeline(self, lead_id: int, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Entradas do timeline em ordem cronológica (ZRANGEBYSCORE).
+
+        Args:
+            lead_id: ID do lead
+            since: Timestamp mínimo (None = todas)
+        """
+        members = self.redis.zrangebyscore(
+            TIMELINE_KEY.format(lead_id=lead_id),
+            since if since is not None else "-inf",
+            "+inf"
+        )
+        self._raise_on_error()
+        return [json.loads(member) for member in members]
+
+    def mark_timeline_dirty(self, *lead_ids: int) -> None:
+        self.redis.sadd(TIMELINE_DIRTY_KEY, *[str(lead_id) for lead_id in lead_ids])
+        self._raise_on_error()
+
+    def pop_dirty_timelines(self, count: int) -> List[int]:
+        """Retira até `count` leads do set de timelines a fotografar."""
+        return [int(lead_id) for lead_id in self.redis.spop(TIMELINE_DIRTY_KEY, count)]
+
+    def invalidate(self, lead_id: int) -> None:
+        """Descarta o contexto do lead do cache (ex: lead removido)."""
+        self.redis.delete(CONTEXT_KEY.format(lead_id=lead_id))
+        self.redis.delete(AGUARDANDO_KEY.format(lead_id=lead_id))
+        self.redis.delete(TIMELINE_KEY.format(lead_id=lead_id))
+
+    def mark_dirty(self, *lead_ids: int) -> None:
+        self.redis.sadd(DIRTY_KEY, *[str(lead_id) for lead_id in lead_ids])
+        self._raise_on_error()
+
+    def pop_dirty(self, count: int) -> List[int]:
+        """Retira até `count` leads do set de pendentes."""
+        return [int(lead_id) for lead_id in self.redis.spop(DIRTY_KEY, count)]
+
+    def snapshot_row(self, lead_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Linha de contexto_lead a persistir para o lead.
+
+        Returns:
+            Dict de colunas ou None se o lead saiu do cache
+
+        Raises:
+            ContextCacheUnavailable: Erro do Redis na leitura
+        """
+        raw = self.redis.hgetall(CONTEXT_KEY.format(lead_id=lead_id))
+        self._raise_on_error()
+        if not raw:
+            return None
+        row = {field: _decode(field, raw.get(field)) for field in CONTEXT_FIELDS}
+        row["lead_id"] = lead_id
+        row["aguardando"] = self.get_aguardando(lead_id)
+        return row
+
+
+def _timeline_member(entry: Dict[str, Any]) -> str:
+    return json.dumps(entry, sort_keys=True)
+
+
+def _timeline_score(entry: Dict[str, Any]) -> float:
+    return float(entry.get("created_at") or time.time())
+
+
+def _remaining_ttl(aguardando: Optional[Dict[str, Any]]) -> Optional[int]:
+    """Segundos até a expiração de 'aguardando' (None se já expirou)."""
+    if not aguardando:
+        return None
+    expires_at = aguardando.get("ttl")
+    if expires_at is None:
+        return None
+    remaining = int(expires_at) - int(time.time())
+    return remaining if remaining > 0 else None
+
+
+class ContextFlusher:
+    """Persiste em lotes, em background, os contextos alterados no cache."""
+
+    def __init__(self, cache: Optional[ContextCache] = None):
+        self.cache = cache or get_context_cache()
+        self.interval = settings.CONTEXT_FLUSH_INTERVAL_MS / 1000
+        self.batch_size = settings.CONTEXT_FLUSH_BATCH_SIZE
+        self.timeline_interval = settings.TIMELINE_SNAPSHOT_INTERVAL_MS / 1000
+        self._last_timeline_snapshot = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    async def flush_once(self) -> int:
+        """
+        Grava um lote de contextos sujos em contexto_lead (um único upsert).
+
+        Returns:
+            Número de leads persistidos
+        """
+        lead_ids = self.cache.pop_dirty(self.batch_size)
+        if not lead_ids:
+            return 0
+
+        rows = []
+        unread = []
+        for lead_id in lead_ids:
+            try:
+                row = self.cache.snapshot_row(lead_id)
+            except ContextCacheUnavailable:
+                unread.append(lead_id)
+                continue
+            if row is not None:
+                rows.append(row)
+        if unread:
+            # Hash não lido: devolver ao set para a próxima rodada
+            self.cache.mark_dirty(*unread)
+            log_structured("warning", "context_flush_unread", {"leads": len(unread)})
+        if not rows:
+            return 0
+
+        failed, error = await self._upsert_rows(rows, (*CONTEXT_FIELDS, "aguardando"))
+        if failed:
+            # Só os ids voltam ao set; o hash não é recriado
+            self.cache.mark_dirty(*[row["lead_id"] for row in failed])
+            log_structured("error", "context_flush_error", {
+                "leads": len(failed),
+                "error": str(error)
+            })
+
+        flushed = len(rows) - len(failed)
+        if flushed:
+            log_structured("info", "context_flushed", {"leads": flushed})
+        return flushed
+
+    async def snapshot_timelines_once(self) -> int:
+        """
+        Fotografa em contexto_lead um lote de timelines alterados.
+
+        Returns:
+            Número de leads fotografados
+        """
+        lead_ids = self.cache.pop_dirty_timelines(self.batch_size)
+        if not lead_ids:
+            return 0
+
+        rows = []
+        unread = []
+        for lead_id in lead_ids:
+            try:
+                # Leads que saíram do cache (ex: removidos) não são recriados
+                if not self.cache.is_loaded(lead_id):
+                    continue
+                timeline = self.cache.get_timeline(lead_id)
+            except ContextCacheUnavailable:
+                # Um timeline não lido não pode sobrescrever a cópia do Postgres
+                unread.append(lead_id)
+                continue
+            rows.append({"lead_id": lead_id, "timeline_expects_reply": timeline})
+        if unread:
+            self.cache.mark_timeline_dirty(*unread)
+            log_structured("warning", "timeline_snapshot_unread", {"leads": len(unread)})
+        if not rows:
+            return 0
+
+        failed, error = await self._upsert_rows(rows, ("timeline_expects_reply",))
+        if failed:
+            self.cache.mark_timeline_dirty(*[row["lead_id"] for row in failed])
+            log_structured("error", "timeline_snapshot_error", {
+                "leads": len(failed),
+                "error": str(error)
+            })
+
+        snapshotted = len(rows) - len(failed)
+        if snapshotted:
+            log_structured("info", "timeline_snapshot", {"leads": snapshotted})
+        return snapshotted
+
+    async def flush_all(self) -> int:
+        """Esvazia os sets de pendentes (usado no shutdown)."""
+        total = 0
+        while True:
+            flushed = await self.flush_once() + await self.snapshot_timelines_once()
+            if not flushed:
+                return total
+            total += flushed
+
+    async def _upsert_rows(
+        self,
+        rows: List[Dict[str, Any]],
+        columns: tuple
+    ) -> Tuple[List[Dict[str, Any]], Optional[Exception]]:
+        """
+        Upsert em lote; se o lote falhar, linha a linha, para que uma linha
+        ruim não segure as demais.
+
+        Returns:
+            (linhas não gravadas, último erro)
+        """
+        try:
+            await self._upsert(rows, columns)
+            return [], None
+        except Exception as e:
+            if len(rows) == 1:
+                return rows, e
+            error: Optional[Exception] = e
+
+        failed = []
+        for row in rows:
+            try:
+                await self._upsert([row], columns)
+            except Exception as e:
+                failed.append(row)
+                error = e
+        return failed, error
+
+    async def _upsert(self, rows: List[Dict[str, Any]], columns: tuple) -> None:
+        from sqlalchemy.dialects.postgresql import insert
+        from app.data.models import ContextoLead
+        from app.infra.db import get_async_sessionmaker
+
+        now = datetime.utcnow()
+        for row in rows:
+            row["atualizado_em"] = now
+
+        stmt = insert(ContextoLead).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ContextoLead.lead_id],
+            set_={
+                column: stmt.excluded[column]
+                for column in (*columns, "atualizado_em")
+            }
+        )
+        async with get_async_sessionmaker()() as db:
+            await db.execute(stmt)
+            await db.commit()
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                while await self.flush_once() == self.batch_size:
+                    pass
+                if time.monotonic() - self._last_timeline_snapshot >= self.timeline_interval:
+                    self._last_timeline_snapshot = time.monotonic()
+                    while await self.snapshot_timelines_once() == self.batch_size:
+                        pass
+            except Exception as e:
+                logger.error(f"Erro no flush de contexto: {e}")
+
+    async def start(self) -> None:
+        """Inicia o flush periódico (chamado no startup da aplicação)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            log_structured("info", "context_flusher_started", {
+                "interval_ms": int(self.interval * 1000),
+                "batch_size": self.batch_size
+            })
+
+    async def stop(self) -> None:
+        """Cancela o loop e persiste o que estiver pendente."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        try:
+            await self.flush_all()
+        except Exception as e:
+            logger.error(f"Erro no flush final de contexto: {e}")
+
+
+# Instâncias globais
+_context_cache: Optional[ContextCache] = None
+_context_flusher: Optional[ContextFlusher] = None
+
+def get_context_cache() -> ContextCache:
+    """Obtém instância singleton do cache de contexto."""
+    global _context_cache
+    if _context_cache is None:
+        _context_cache = ContextCache()
+    return _context_cache
+
+
+def get_context_flusher() -> ContextFlusher:
+    """Obtém instância singleton do flusher de contexto."""
+    global _context_flusher
+    if _context_flusher is None:
+        _context_flusher = ContextFlusher()
+    return _context_flusher
@@ -1,17 +1,23 @@
 """
 Serviço para gerenciar contexto persistente do lead entre turnos.
 
-Mantém estado mínimo da sessão com TTL para estados voláteis.
+Mantém estado mínimo da sessão com TTL para estados voláteis. Com
+CONTEXT_CACHE_ENABLED, leituras e escritas do turno usam o cache Redis
+(app.core.context_cache) e a persistência em contexto_lead é write-behind.
 """
 import time
 import logging
 from typing import Optional, Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 
 from app.data.models import ContextoLead
 from app.data.schemas import ContextoLead as ContextoLeadSchema, AguardandoConfirmacao
-from app.infra.db import get_db
+from app.data.unit_of_work import unit_of_work
+from app.core.context_cache import (
+    ContextCache, ContextCacheUnavailable, CONTEXT_FIELDS, get_context_cache
+)
+from app.settings import settings
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +26,58 @@ TTL_AGUARDANDO = 30 * 60
 
 
 class ContextoLeadService:
-    """Serviço para gerenciar contexto persistente do lead."""
+    """
+    Serviço para gerenciar contexto persistente do lead.
     
-    def __init__(self, db: Session):
+    Dentro de um turno usa o unit of work do turno (contexto carregado uma
+    vez, commit no fim do apply_plan); fora dele cada operação usa uma
+    sessão curta.
+    """
+    
+    def __init__(self, db: Optional[AsyncSession] = None, cache: Optional[ContextCache] = None):
         self.db = db
+        if cache is None and settings.CONTEXT_CACHE_ENABLED:
+            cache = get_context_cache()
+        self.cache = cache
+    
+    async def _carregar_cache(self, lead_id: int) -> Dict[str, Any]:
+        """
+        Lê o contexto do cache, carregando do banco na primeira vez (read-through).
+        
+        Returns:
+            Campos do contexto ({} se o lead não tem contexto)
+        """
+        data = self.cache.get(lead_id)
+        if data is not None:
+            return data
+        
+        async with unit_of_work(self.db) as uow:
+            contexto_db = await uow.get(ContextoLead, lead_id)
+            values = None
+            if contexto_db:
+                values = {field: getattr(contexto_db, field) for field in CONTEXT_FIELDS}
+                values["aguardando"] = contexto_db.aguardando
+                values["timeline_expects_reply"] = contexto_db.timeline_expects_reply
+        
+        self.cache.load(lead_id, values)
+        return self.cache.get(lead_id) or {}
+    
+    async def _garantir_cache(self, lead_id: int) -> None:
+        """Garante o hash completo no cache antes de uma escrita parcial."""
+        if not self.cache.is_loaded(lead_id):
+            await self._carregar_cache(lead_id)
+    
+    def _cache_indisponivel(self, lead_id: int, error: ContextCacheUnavailable, escrita: bool) -> None:
+        """
+        Registra a falha do cache; numa escrita, o contexto do lead sai do cache.
+        
+        A escrita segue pelo banco, então o hash (se o Redis voltar) ficaria
+        mais velho que o contexto_lead; descartá-lo faz a próxima leitura
+        recarregar do banco.
+        """
+        logger.warning(f"Cache de contexto indisponível para lead {lead_id}: {str(error)}")
+        if escrita:
+            self.cache.invalidate(lead_id)
     
     async def obter_contexto(self, lead_id: int) -> Optional[ContextoLeadSchema]:
         """
@@ -35,25 +89,45 @@ class ContextoLeadService:
         Returns:
             Contexto do lead ou None se não existir
         """
-        contexto_db = self.db.query(ContextoLead).filter(
-            ContextoLead.lead_id == lead_id
-        ).first()
-        
-        if not contexto_db:
-            return None
+        if self.cache is not None:
+            # 'aguardando' expirado some sozinho pelo TTL da chave
+            try:
+                data = await self._carregar_cache(lead_id)
+            except ContextCacheUnavailable as e:
+                # Sem resposta do cache: ler do banco sem popular o cache
+                self._cache_indisponivel(lead_id, e, escrita=False)
+            else:
+                if not data:
+                    return None
+                return ContextoLeadSchema(
+                    lead_id=lead_id,
+                    procedimento_ativo=data.get("procedimento_ativo"),
+                    etapa_ativa=data.get("etapa_ativa"),
+                    progresso_procedimento=data.get("progresso_procedimento"),
+                    aguardando=data.get("aguardando"),
+                    ultima_automacao_enviada=data.get("ultima_automacao_enviada"),
+                    ultimo_topico_kb=data.get("ultimo_topico_kb")
+                )
         
-        # Verificar se estado 'aguardando' expirou
-        aguardando = contexto_db.aguardando
-        if aguardando and self._aguardando_expirou(aguardando):
-            logger.info(f"Estado 'aguardando' expirado para lead {lead_id}")
-            contexto_db.aguardando = None
-            self.db.commit()
-            aguardando = None
+        async with unit_of_work(self.db) as uow:
+            contexto_db = await uow.get(ContextoLead, lead_id)
+            
+            if not contexto_db:
+                return None
+            
+            # Verificar se estado 'aguardando' expirou
+            aguardando = contexto_db.aguardando
+            if aguardando and self._aguardando_expirou(aguardando):
+                logger.info(f"Estado 'aguardando' expirado para lead {lead_id}")
+                contexto_db.aguardando = None
+                await uow.save()
+                aguardando = None
         
         return ContextoLeadSchema(
             lead_id=contexto_db.lead_id,
             procedimento_ativo=contexto_db.procedimento_ativo,
             etapa_ativa=contexto_db.etapa_ativa,
+            progresso_procedimento=contexto_db.progresso_procedimento,
             aguardando=aguardando,
             ultima_automacao_enviada=contexto_db.ultima_automacao_enviada,
             ultimo_topico_kb=contexto_db.ultimo_topico_kb
@@ -64,6 +138,7 @@ class ContextoLeadService:
         lead_id: int,
         procedimento_ativo: Optional[str] = None,
         etapa_ativa: Optional[str] = None,
+        progresso_procedimento: Optional[Dict[str, Any]] = None,
         aguardando: Optional[Dict[str, Any]] = None,
         ultima_automacao_enviada: Optional[str] = None,
         ultimo_topico_kb: Optional[str] = None
@@ -75,28 +150,50 @@ class ContextoLeadService:
             lead_id: ID do lead
             **kwargs: Campos para atualizar (None = manter atual)
         """
-        contexto_db = self.db.query(ContextoLead).filter(
-            ContextoLead.lead_id == lead_id
-        ).first()
-        
-        if not contexto_db:
-            contexto_db = ContextoLead(lead_id=lead_id)
-            self.db.add(contexto_db)
-        
-        # Atualizar apenas campos não-None
-        if procedimento_ativo is not None:
-            contexto_db.procedimento_ativo = procedimento_ativo
-        if etapa_ativa is not None:
-            contexto_db.etapa_ativa = etapa_ativa
-        if aguardando is not None:
-            contexto_db.aguardando = aguardando
-        if ultima_automacao_enviada is not None:
-            contexto_db.ultima_automacao_enviada = ultima_automacao_enviada
-        if ultimo_topico_kb is not None:
-            contexto_db.ultimo_topico_kb = ultimo_topico_kb
-        
-        contexto_db.atualizado_em = datetime.utcnow()
-        self.db.commit()
+        if self.cache is not None:
+            campos = {
+                "procedimento_ativo": procedimento_ativo,
+                "etapa_ativa": etapa_ativa,
+                "progresso_procedimento": progresso_procedimento,
+                "ultima_automacao_enviada": ultima_automacao_enviada,
+                "ultimo_topico_kb": ultimo_topico_kb,
+            }
+            campos = {field: value for field, value in campos.items() if value is not None}
+            try:
+                await self._garantir_cache(lead_id)
+                if campos:
+                    self.cache.update(lead_id, campos)
+                if aguardando is not None:
+                    self.cache.set_aguardando(lead_id, aguardando)
+                logger.info(f"Contexto atualizado para lead {lead_id}")
+                return
+            except ContextCacheUnavailable as e:
+                # Escrita perdida no Redis: gravar direto no contexto_lead
+                self._cache_indisponivel(lead_id, e, escrita=True)
+        
+        async with unit_of_work(self.db) as uow:
+            contexto_db = await uow.get(ContextoLead, lead_id)
+            
+            if not contexto_db:
+                contexto_db = ContextoLead(lead_id=lead_id)
+                uow.add(contexto_db, lead_id)
+            
+            # Atualizar apenas campos não-None
+            if procedimento_ativo is not None:
+                contexto_db.procedimento_ativo = procedimento_ativo
+            if etapa_ativa is not None:
+                contexto_db.etapa_ativa = etapa_ativa
+            if progresso_procedimento is not None:
+                contexto_db.progresso_procedimento = progresso_procedimento
+            if aguardando is not None:
+                contexto_db.aguardando = aguardando
+            if ultima_automacao_enviada is not None:
+                contexto_db.ultima_automacao_enviada = ultima_automacao_enviada
+            if ultimo_topico_kb is not None:
+                contexto_db.ultimo_topico_kb = ultimo_topico_kb
+            
+            contexto_db.atualizado_em = datetime.utcnow()
+            await uow.save()
         
         logger.info(f"Contexto atualizado para lead {lead_id}")
     
@@ -107,7 +204,20 @@ class ContextoLeadService:
         Args:
             lead_id: ID do lead
         """
-        await self.atualizar_contexto(lead_id, aguardando=None)
+        if self.cache is not None:
+            try:
+                await self._garantir_cache(lead_id)
+                self.cache.clear_aguardando(lead_id)
+                return
+            except ContextCacheUnavailable as e:
+                self._cache_indisponivel(lead_id, e, escrita=True)
+        
+        async with unit_of_work(self.db) as uow:
+            contexto_db = await uow.get(ContextoLead, lead_id)
+            if contexto_db and contexto_db.aguardando is not None:
+                contexto_db.aguardando = None
+                contexto_db.atualizado_em = datetime.utcnow()
+                await uow.save()
     
     async def definir_aguardando_confirmacao(
         self, 
@@ -158,27 +268,36 @@ class ContextoLeadService:
             lead_id: ID do lead
             entry: Entrada do timeline
         """
-        contexto_db = self.db.query(ContextoLead).filter(
-            ContextoLead.lead_id == lead_id
-        ).first()
-        
-        if not contexto_db:
-            contexto_db = ContextoLead(lead_id=lead_id)
-            self.db.add(contexto_db)
+        if self.cache is not None:
+            # ZADD + corte no sorted set; o Postgres só recebe fotografias periódicas
+            try:
+                await self._garantir_cache(lead_id)
+                self.cache.add_timeline(lead_id, entry)
+                logger.info(f"Timeline expects_reply atualizado para lead {lead_id}")
+                return
+            except ContextCacheUnavailable as e:
+                self._cache_indisponivel(lead_id, e, escrita=True)
         
-        # Obter timeline atual ou criar novo
-        timeline_atual = contexto_db.timeline_expects_reply or []
-        
-        # Adicionar nova entrada
-        timeline_atual.append(entry)
-        
-        # Manter apenas últimas 10 entradas para não crescer indefinidamente
-        if len(timeline_atual) > 10:
-            timeline_atual = timeline_atual[-10:]
-        
-        contexto_db.timeline_expects_reply = timeline_atual
-        contexto_db.atualizado_em = datetime.utcnow()
-        self.db.commit()
+        async with unit_of_work(self.db) as uow:
+            contexto_db = await uow.get(ContextoLead, lead_id)
+            
+            if not contexto_db:
+                contexto_db = ContextoLead(lead_id=lead_id)
+                uow.add(contexto_db, lead_id)
+            
+            # Obter timeline atual ou criar novo
+            timeline_atual = list(contexto_db.timeline_expects_reply or [])
+            
+            # Adicionar nova entrada
+            timeline_atual.append(entry)
+            
+            # Manter apenas últimas 10 entradas para não crescer indefinidamente
+            if len(timeline_atual) > 10:
+                timeline_atual = timeline_atual[-10:]
+            
+            contexto_db.timeline_expects_reply = timeline_atual
+            contexto_db.atualizado_em = datetime.utcnow()
+            await uow.save()
         
         logger.info(f"Timeline expects_reply atualizado para lead {lead_id}: {len(timeline_atual)} entradas")
     
@@ -192,16 +311,52 @@ class ContextoLeadService:
         Returns:
             Lista de entradas do timeline ou None
         """
-        contexto_db = self.db.query(ContextoLead).filter(
-            ContextoLead.lead_id == lead_id
-        ).first()
+        if self.cache is not None:
+            try:
+                await self._garantir_cache(lead_id)
+                return self.cache.get_timeline(lead_id)
+            except ContextCacheUnavailable as e:
+                self._cache_indisponivel(lead_id, e, escrita=False)
         
-        if not contexto_db:
-            return None
+        return await self._obter_timeline_db(lead_id)
+
+    async def _obter_timeline_db(self, lead_id: int) -> Optional[list]:
+        """Lê o timeline de expects_reply direto do Postgres."""
+        async with unit_of_work(self.db) as uow:
+            contexto_db = await uow.get(ContextoLead, lead_id)
+            
+            if not contexto_db:
+                return None
+            
+            return contexto_db.timeline_expects_reply or []
+
+    
+    async def obter_expects_reply_recente(self, lead_id: int, desde: int) -> Optional[Dict[str, Any]]:
+        """
+        FASE 3: Entrada mais recente do timeline de expects_reply a partir de `desde`.
         
-        return contexto_db.timeline_expects_reply or []
+        Args:
+            lead_id: ID do lead
+            desde: Timestamp inicial da janela
+            
+        Returns:
+            Entrada mais recente na janela ou None
+        """
+        if self.cache is not None:
+            try:
+                await self._garantir_cache(lead_id)
+                entries = self.cache.get_timeline(lead_id, since=desde)
+                return entries[-1] if entries else None
+            except ContextCacheUnavailable as e:
+                self._cache_indisponivel(lead_id, e, escrita=False)
+        
+        timeline = await self._obter_timeline_db(lead_id) or []
+        recentes = [entry for entry in timeline if entry.get("created_at", 0) >= desde]
+        if not recentes:
+            return None
+        return max(recentes, key=lambda entry: entry.get("created_at", 0))
 
 
-def get_contexto_lead_service(db: Session = next(get_db())) -> ContextoLeadService:
+def get_contexto_lead_service(db: Optional[AsyncSession] = None) -> ContextoLeadService:
     """Factory para criar instância do serviço de contexto."""
     return ContextoLeadService(db)
@@ -0,0 +1,181 @@
+"""
+Cooldown - Cooldown e limite de frequência por (lead, automação)
+
+Usa chaves com TTL no Redis (ou no adapter in-memory quando Redis não está
+disponível), sem consultar o banco:
+
+- mb:cd:{lead}:{automação}        existe enquanto o cooldown estiver ativo
+- mb:cap:{lead}:{automação}:{dia} contador de envios no dia (UTC)
+
+Configuração por automação no catalog.yml:
+
+    cooldown: "24h"      # 90s, 30m, 24h, 2d ou segundos
+    max_per_day: 3
+"""
+import re
+import time
+import logging
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Tuple
+
+from app.redis_adapter import get_redis, RedisAdapter
+from app.core.catalog_store import get_catalog_store
+
+logger = logging.getLogger(__name__)
+
+# Cooldown aplicado quando a automação não define um (comportamento anterior)
+DEFAULT_COOLDOWN_SECONDS = 300
+
+COOLDOWN_KEY = "mb:cd:{lead_id}:{automation_id}"
+CAP_KEY = "mb:cap:{lead_id}:{automation_id}:{day}"
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_DURATION_RE = re.compile(r"^\s*(\d+)\s*([smhd]?)\s*$")
+
+
+def parse_duration(value: Any) -> Optional[int]:
+    """
+    Converte duração do catálogo ("30m", "24h", "2d", 90) em segundos.
+
+    Args:
+        value: Duração em texto ou número
+
+    Returns:
+        Segundos ou None se inválida
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not isinstance(value, str):
+        return None
+    return _parse_duration_text(value.lower())
+
+
+@lru_cache(maxsize=256)
+def _parse_duration_text(value: str) -> Optional[int]:
+    match = _DURATION_RE.match(value)
+    if not match:
+        logger.warning(f"Cooldown inválido no catálogo: {value!r}")
+        return None
+    amount, unit = match.groups()
+    return int(amount) * _DURATION_UNITS[unit or "s"]
+
+
+def get_limits(automation_id: str) -> Tuple[int, Optional[int]]:
+    """
+    Limites configurados para a automação.
+
+    Args:
+        automation_id: ID da automação
+
+    Returns:
+        (cooldown em segundos, máximo por dia ou None)
+    """
+    automation = get_catalog_store().get_automation(automation_id) or {}
+
+    cooldown = parse_duration(automation.get("cooldown"))
+    if cooldown is None:
+        cooldown = DEFAULT_COOLDOWN_SECONDS
+
+    max_per_day = automation.get("max_per_day")
+    if not isinstance(max_per_day, int) or isinstance(max_per_day, bool) or max_per_day <= 0:
+        max_per_day = None
+
+    return cooldown, max_per_day
+
+
+def _day(now: float) -> str:
+    return datetime.fromtimestamp(now, tz=timezone.utc).strftime("%Y%m%d")
+
+
+def _seconds_until_day_end(now: float) -> int:
+    return 86400 - int(now) % 86400
+
+
+class CooldownService:
+    """Verifica e registra cooldown/limite diário de automações por lead."""
+
+    def __init__(self, redis: Optional[RedisAdapter] = None):
+        self.redis = redis or get_redis()
+
+    def check_many(self, lead_id: int, automation_ids: List[str]) -> Dict[str, bool]:
+        """
+        Verifica várias automações candidatas em um único round trip (MGET).
+
+        Args:
+            lead_id: ID do lead
+            automation_ids: Automações candidatas
+
+        Returns:
+            Dict automação -> True se pode enviar
+        """
+        if not automation_ids:
+            return {}
+
+        day = _day(time.time())
+        keys = []
+        for automation_id in automation_ids:
+            keys.append(COOLDOWN_KEY.format(lead_id=lead_id, automation_id=automation_id))
+            keys.append(CAP_KEY.format(lead_id=lead_id, automation_id=automation_id, day=day))
+
+        values = self.redis.mget(keys)
+
+        allowed = {}
+        for i, automation_id in enumerate(automation_ids):
+            in_cooldown = values[2 * i] is not None
+            sent_today = int(values[2 * i + 1] or 0)
+            _, max_per_day = get_limits(automation_id)
+
+            allowed[automation_id] = not in_cooldown and (
+                max_per_day is None or sent_today < max_per_day
+            )
+            if not allowed[automation_id]:
+                logger.info(
+                    f"Automation {automation_id} bloqueada para lead {lead_id} "
+                    f"(cooldown={in_cooldown}, hoje={sent_today}, max={max_per_day})"
+                )
+        return allowed
+
+    def check(self, lead_id: int, automation_id: str) -> bool:
+        """
+        Verifica se a automação pode ser enviada ao lead.
+
+        Returns:
+            True se não está em cooldown nem atingiu o limite diário
+        """
+        return self.check_many(lead_id, [automation_id])[automation_id]
+
+    def record_sent(self, lead_id: int, automation_id: str) -> None:
+        """
+        Registra envio: abre a janela de cooldown e incrementa o contador do dia.
+
+        Args:
+            lead_id: ID do lead
+            automation_id: ID da automação enviada
+        """
+        now = time.time()
+        cooldown, _ = get_limits(automation_id)
+
+        if cooldown > 0:
+            self.redis.set(
+                COOLDOWN_KEY.format(lead_id=lead_id, automation_id=automation_id),
+                str(int(now)),
+                ex=cooldown
+            )
+        self.redis.incr(
+            CAP_KEY.format(lead_id=lead_id, automation_id=automation_id, day=_day(now)),
+            ex=_seconds_until_day_end(now) + 3600
+        )
+
+
+# Instância global do serviço
+_cooldown_service: Optional[CooldownService] = None
+
+def get_cooldown_service() -> CooldownService:
+    """Obtém instância singleton do serviço de cooldown."""
+    global _cooldown_service
+    if _cooldown_service is None:
+        _cooldown_service = CooldownService()
+    return _cooldown_service
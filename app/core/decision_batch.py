@@ -0,0 +1,126 @@
+"""
+Decision Batch - Avaliação de muitos Envs em uma chamada
+
+Usado por simulações do Studio, replays de regressão e checagens "e se"
+de catálogo. As decisões rodam no mesmo processo, com estado de
+catálogo/regras compartilhado, concorrência limitada (geral e para LLM) e
+os Plans são devolvidos na ordem em que ficam prontos. Nenhuma decisão do
+lote grava estado do lead (decision_mode com no_persist).
+"""
+import json
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from app.data.schemas import Env
+from app.core.decision_mode import decision_mode
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_LLM_CONCURRENCY = 4
+MAX_CONCURRENCY = 256
+
+
+async def iter_json_list(items) -> AsyncIterator[Tuple[int, Any]]:
+    """Itera uma lista já carregada como (índice, item)."""
+    for index, item in enumerate(items):
+        yield index, item
+
+
+async def iter_jsonl(body: bytes) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Itera um corpo JSONL como (índice, linha).
+
+    As linhas não são parseadas aqui: um JSON inválido vira erro só daquele
+    item, e cada Env só é construído quando há vaga para avaliá-lo.
+    """
+    index = 0
+    for line in body.splitlines():
+        if line.strip():
+            yield index, line
+            index += 1
+
+
+def _parse_env(raw: Any) -> Env:
+    if isinstance(raw, Env):
+        return raw
+    if isinstance(raw, (bytes, str)):
+        raw = json.loads(raw)
+    return Env(**raw)
+
+
+async def run_decision_batch(
+    items: AsyncIterator[Tuple[int, Any]],
+    deterministic_only: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    llm_concurrency: int = DEFAULT_LLM_CONCURRENCY
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Avalia Envs concorrentemente e produz resultados conforme completam.
+
+    Args:
+        items: Iterador assíncrono de (índice, Env | dict | linha JSON)
+        deterministic_only: Não chamar LLMs em nenhuma decisão
+        concurrency: Máximo de decisões em andamento
+        llm_concurrency: Máximo de chamadas LLM simultâneas no lote
+
+    Yields:
+        {"index", "plan"} ou {"index", "error"}
+    """
+    from app.core.orchestrator import decide_and_plan
+
+    concurrency = max(1, min(concurrency, MAX_CONCURRENCY))
+    slots = asyncio.Semaphore(concurrency)
+    llm_semaphore = asyncio.Semaphore(max(1, llm_concurrency))
+    contexto_cache: Dict[int, Any] = {}
+    results: asyncio.Queue = asyncio.Queue()
+    stats = {"total": 0, "errors": 0}
+
+    async def _decide(index: int, raw: Any) -> None:
+        try:
+            env = _parse_env(raw)
+            with decision_mode(
+                deterministic_only=deterministic_only,
+                llm_semaphore=llm_semaphore,
+                contexto_cache=contexto_cache,
+                no_persist=True
+            ):
+                plan = await decide_and_plan(env)
+            await results.put({"index": index, "plan": plan.dict()})
+        except Exception as e:
+            stats["errors"] += 1
+            await results.put({"index": index, "error": str(e)})
+        finally:
+            slots.release()
+
+    async def _produce() -> None:
+        tasks = []
+        try:
+            async for index, raw in items:
+                await slots.acquire()
+                stats["total"] += 1
+                tasks.append(asyncio.create_task(_decide(index, raw)))
+            await asyncio.gather(*tasks)
+        except Exception as e:
+            await results.put({"index": None, "error": f"Erro lendo lote: {e}"})
+        finally:
+            await results.put(None)
+
+    producer = asyncio.create_task(_produce())
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            yield result
+    finally:
+        if not producer.done():
+            producer.cancel()
+        log_structured("info", "decision_batch_completed", {
+            "total": stats["total"],
+            "errors": stats["errors"],
+            "deterministic_only": deterministic_only,
+            "concurrency": concurrency
+        })
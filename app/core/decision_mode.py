@@ -0,0 +1,107 @@
+"""
+Decision Mode - Opções de execução de uma decisão
+
+Variáveis de contexto (por task asyncio) consultadas pelos pontos do
+pipeline que chamam LLM ou repetem consultas caras:
+
+- deterministic_only: pula LLMs e usa só os caminhos determinísticos
+- llm_semaphore: limita chamadas LLM concorrentes (ex: lote de decisões)
+- contexto_cache: cache de ContextoLead compartilhado dentro de um lote
+- no_persist: a decisão só calcula o plano (lote/what-if); quem grava
+  estado do lead durante a decisão pula a gravação
+
+O modo de degradação do worker (app.core.degradation) também entra aqui:
+em catalog_kb_only toda decisão é determinística, e llm_slot alimenta o
+p95 de LLM que o controlador observa. llm_slot também encerra a transação
+de leitura do turno, para a conexão não ficar presa durante a chamada.
+"""
+import time
+import asyncio
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any
+
+_deterministic_only: ContextVar[bool] = ContextVar("deterministic_only", default=False)
+_llm_semaphore: ContextVar[Optional[asyncio.Semaphore]] = ContextVar("llm_semaphore", default=None)
+_contexto_cache: ContextVar[Optional[Dict[int, Any]]] = ContextVar("contexto_cache", default=None)
+_no_persist: ContextVar[bool] = ContextVar("no_persist", default=False)
+
+
+def is_deterministic_only() -> bool:
+    """True se a decisão atual não deve chamar LLMs."""
+    if _deterministic_only.get():
+        return True
+    from app.core.degradation import catalog_kb_only
+    return catalog_kb_only()
+
+
+def get_contexto_cache() -> Optional[Dict[int, Any]]:
+    """Cache de contexto por lead da decisão atual (None fora de lotes)."""
+    return _contexto_cache.get()
+
+
+def is_no_persist() -> bool:
+    """True se a decisão atual não deve gravar estado do lead."""
+    return _no_persist.get()
+
+
+@contextmanager
+def decision_mode(
+    deterministic_only: bool = False,
+    llm_semaphore: Optional[asyncio.Semaphore] = None,
+    contexto_cache: Optional[Dict[int, Any]] = None,
+    no_persist: bool = False
+):
+    """
+    Define as opções de decisão para o bloco (e tasks criadas dentro dele).
+
+    Args:
+        deterministic_only: Não chamar LLMs
+        llm_semaphore: Semáforo que limita chamadas LLM concorrentes
+        contexto_cache: Cache compartilhado de ContextoLead por lead_id
+        no_persist: Não gravar estado do lead (contexto, atividade)
+    """
+    tokens = (
+        _deterministic_only.set(deterministic_only),
+        _llm_semaphore.set(llm_semaphore),
+        _contexto_cache.set(contexto_cache),
+        _no_persist.set(no_persist),
+    )
+    try:
+        yield
+    finally:
+        _no_persist.reset(tokens[3])
+        _contexto_cache.reset(tokens[2])
+        _llm_semaphore.reset(tokens[1])
+        _deterministic_only.reset(tokens[0])
+
+
+@asynccontextmanager
+async def llm_slot():
+    """
+    Aguarda vaga no semáforo de LLM, se houver um, e mede a chamada.
+
+    Antes de esperar, devolve ao pool a conexão de leitura do turno atual.
+    """
+    from app.data.unit_of_work import current_unit_of_work
+    uow = current_unit_of_work()
+    if uow is not None:
+        await uow.release()
+    semaphore = _llm_semaphore.get()
+    if semaphore is None:
+        async with _timed_llm_call():
+            yield
+        return
+    async with semaphore:
+        async with _timed_llm_call():
+            yield
+
+
+@asynccontextmanager
+async def _timed_llm_call():
+    from app.core.degradation import get_degradation_controller
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        get_degradation_controller().record_llm_latency((time.monotonic() - started) * 1000)
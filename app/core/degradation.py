@@ -0,0 +1,246 @@
+"""
+Degradation Controller - Modos de degradação do pipeline sob carga
+
+Observa a pressão do worker (turnos em andamento, fila de turnos
+aguardando a vez do lead e p95 recente das chamadas LLM) e escolhe um
+modo. Cada modo inclui os cortes dos anteriores:
+
+1. single_intake_sample: intake com uma amostra (sem self-consistency)
+2. det_only_gate: gate de confirmação só determinístico
+3. skip_kb_llm: dúvidas respondidas com o trecho da KB, sem gerar resposta
+   por LLM (o corte por turno mais caro que não afeta intake e gate)
+4. catalog_kb_only: só catálogo + trecho da KB (nenhum LLM no turno)
+
+Sobe direto para o modo exigido pela pressão e volta um degrau por vez,
+depois que a pressão fica abaixo do modo atual por DEGRADATION_RECOVERY_SECONDS.
+"""
+import time
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.settings import settings
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+DEGRADATION_MODES = (
+    "normal",
+    "single_intake_sample",
+    "det_only_gate",
+    "skip_kb_llm",
+    "catalog_kb_only",
+)
+NORMAL = 0
+SINGLE_INTAKE_SAMPLE = 1
+DET_ONLY_GATE = 2
+SKIP_KB_LLM = 3
+CATALOG_KB_ONLY = 4
+
+LATENCY_SAMPLES = 512
+MIN_LATENCY_SAMPLES = 5
+
+
+def parse_thresholds(raw: str) -> List[float]:
+    """
+    Limiares por modo a partir de "a,b,c,d" (um por modo degradado).
+
+    Args:
+        raw: Lista separada por vírgula (vazio = sinal ignorado)
+
+    Returns:
+        Limiares em ordem crescente de modo
+    """
+    return [float(part) for part in raw.split(",") if part.strip()]
+
+
+def level_for(value: float, thresholds: List[float]) -> int:
+    """Maior modo cujo limiar o valor atinge (0 = normal)."""
+    level = NORMAL
+    for index, threshold in enumerate(thresholds[:CATALOG_KB_ONLY]):
+        if value >= threshold:
+            level = index + 1
+    return level
+
+
+class DegradationController:
+    """Escolhe o modo de degradação a partir da pressão atual."""
+
+    def __init__(self, serializer=None, clock=time.monotonic):
+        self.serializer = serializer
+        self.clock = clock
+        self.enabled = settings.DEGRADATION_ENABLED
+        self.in_flight_thresholds = parse_thresholds(settings.DEGRADATION_IN_FLIGHT_THRESHOLDS)
+        self.queue_thresholds = parse_thresholds(settings.DEGRADATION_QUEUE_THRESHOLDS)
+        self.llm_p95_thresholds = parse_thresholds(settings.DEGRADATION_LLM_P95_MS_THRESHOLDS)
+        self.latency_window = settings.DEGRADATION_LLM_WINDOW_SECONDS
+        self.recovery_seconds = settings.DEGRADATION_RECOVERY_SECONDS
+        self.eval_interval = settings.DEGRADATION_EVAL_INTERVAL_MS / 1000
+        self.forced_mode = settings.DEGRADATION_FORCED_MODE
+        self.level = NORMAL
+        self.in_flight = 0
+        self.transitions = 0
+        self._latencies: Deque[Tuple[float, float]] = deque(maxlen=LATENCY_SAMPLES)
+        self._evaluated_at: Optional[float] = None
+        self._calm_since: Optional[float] = None
+        self._last_pressure: Dict[str, Any] = {}
+
+    # ---- sinais ----
+
+    def record_llm_latency(self, latency_ms: float) -> None:
+        """Registra a duração de uma chamada LLM (inclui timeouts)."""
+        self._latencies.append((self.clock(), latency_ms))
+
+    @asynccontextmanager
+    async def track_turn(self):
+        """Conta o bloco como turno em andamento."""
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def queue_depth(self) -> int:
+        """Turnos aguardando a vez do lead neste worker."""
+        serializer = self.serializer
+        if serializer is None:
+            from app.core.lead_serializer import get_lead_serializer
+            serializer = get_lead_serializer()
+        return serializer.metrics.waiting
+
+    def llm_p95_ms(self) -> Optional[float]:
+        """p95 das chamadas LLM na janela recente (None com poucas amostras)."""
+        cutoff = self.clock() - self.latency_window
+        while self._latencies and self._latencies[0][0] < cutoff:
+            self._latencies.popleft()
+        if len(self._latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        values = sorted(latency for _, latency in self._latencies)
+        return values[min(len(values) - 1, int(0.95 * len(values)))]
+
+    def pressure(self) -> Dict[str, Any]:
+        """Sinais atuais e o modo que cada um exige."""
+        queue_depth = self.queue_depth()
+        llm_p95 = self.llm_p95_ms()
+        levels = {
+            "in_flight": level_for(self.in_flight, self.in_flight_thresholds),
+            "queue_depth": level_for(queue_depth, self.queue_thresholds),
+            "llm_p95_ms": level_for(llm_p95, self.llm_p95_thresholds) if llm_p95 is not None else NORMAL,
+        }
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": queue_depth,
+            "llm_p95_ms": round(llm_p95, 1) if llm_p95 is not None else None,
+            "levels": levels,
+            "target": max(levels.values()),
+        }
+
+    # ---- decisão ----
+
+    def evaluate(self, force: bool = False) -> int:
+        """
+        Reavalia o modo (no máximo uma vez por DEGRADATION_EVAL_INTERVAL_MS).
+
+        Args:
+            force: Ignorar o intervalo mínimo entre avaliações
+
+        Returns:
+            Nível do modo atual (índice em DEGRADATION_MODES)
+        """
+        if self.forced_mode in DEGRADATION_MODES:
+            return DEGRADATION_MODES.index(self.forced_mode)
+        if not self.enabled:
+            return NORMAL
+
+        now = self.clock()
+        if not force and self._evaluated_at is not None and now - self._evaluated_at < self.eval_interval:
+            return self.level
+        self._evaluated_at = now
+
+        pressure = self.pressure()
+        self._last_pressure = pressure
+        target = pressure["target"]
+        if target > self.level:
+            self._set_level(target, pressure)
+            self._calm_since = None
+        elif target < self.level:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.recovery_seconds:
+                # Recupera um degrau por vez; o próximo exige nova janela calma
+                self._set_level(self.level - 1, pressure)
+                self._calm_since = now if target < self.level else None
+        else:
+            self._calm_since = None
+        return self.level
+
+    def _set_level(self, level: int, pressure: Dict[str, Any]) -> None:
+        previous = self.level
+        self.level = level
+        self.transitions += 1
+        log_structured("warning" if level > previous else "info", "degradation_mode_changed", {
+            "from": DEGRADATION_MODES[previous],
+            "to": DEGRADATION_MODES[level],
+            "in_flight": pressure["in_flight"],
+            "queue_depth": pressure["queue_depth"],
+            "llm_p95_ms": pressure["llm_p95_ms"]
+        })
+
+    @property
+    def mode(self) -> str:
+        """Nome do modo atual (reavaliando se necessário)."""
+        return DEGRADATION_MODES[self.evaluate()]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado atual para /metrics/runtime."""
+        level = self.evaluate()
+        return {
+            "mode": DEGRADATION_MODES[level],
+            "level": level,
+            "forced": self.forced_mode in DEGRADATION_MODES,
+            "enabled": self.enabled,
+            "transitions": self.transitions,
+            "pressure": self._last_pressure or self.pressure(),
+        }
+
+
+# Instância global
+_degradation_controller: Optional[DegradationController] = None
+
+def get_degradation_controller() -> DegradationController:
+    """Obtém instância singleton do controlador de degradação."""
+    global _degradation_controller
+    if _degradation_controller is None:
+        _degradation_controller = DegradationController()
+    return _degradation_controller
+
+
+def degradation_level() -> int:
+    """Nível do modo atual do worker."""
+    return get_degradation_controller().evaluate()
+
+
+def intake_samples(configured: int) -> int:
+    """Amostras do intake no modo atual."""
+    return 1 if degradation_level() >= SINGLE_INTAKE_SAMPLE else configured
+
+
+def gate_llm_enabled() -> bool:
+    """False se confirmações (gate e resposta curta) devem ser só determinísticas."""
+    return degradation_level() < DET_ONLY_GATE
+
+
+def confirm_agent_mode(configured: str) -> str:
+    """CONFIRM_AGENT_MODE efetivo no modo atual."""
+    return configured if gate_llm_enabled() else "det_only"
+
+
+def kb_llm_enabled() -> bool:
+    """False se a resposta da KB deve ser o trecho encontrado, sem LLM."""
+    return degradation_level() < SKIP_KB_LLM
+
+
+def catalog_kb_only() -> bool:
+    """True se o turno deve usar só catálogo + trecho da KB."""
+    return degradation_level() >= CATALOG_KB_ONLY
@@ -0,0 +1,182 @@
+"""
+Eligibility - Compilador de regras de elegibilidade PT-BR
+
+Transforma a regra textual do catálogo em uma tupla de nomes de predicados
+(serializável no bundle de políticas) e extrai as palavras-chave usadas no
+casamento de tópico, para que nada disso seja refeito a cada mensagem.
+"""
+from functools import lru_cache
+from typing import Dict, Any, Tuple, Callable
+
+
+def _can_deposit(snapshot) -> bool:
+    return bool(snapshot.agreements.get("can_deposit", False))
+
+
+def _deposit_status(snapshot) -> str:
+    return snapshot.deposit.get("status", "nenhum")
+
+
+def _has_account(snapshot) -> bool:
+    return any(status not in ["desconhecido", "unknown"] for status in snapshot.accounts.values())
+
+
+def _explained(snapshot) -> bool:
+    return bool(snapshot.flags.get("explained", False))
+
+
+# Predicados nomeados (o bundle guarda só os nomes)
+PREDICATES: Dict[str, Callable[[Any], bool]] = {
+    "not_agreed_deposit": lambda s: not _can_deposit(s),
+    "agreed_deposit": _can_deposit,
+    "not_deposited": lambda s: _deposit_status(s) not in ["confirmado", "pendente"],
+    "deposited": lambda s: _deposit_status(s) in ["confirmado", "pendente"],
+    "deposit_confirmed": lambda s: _deposit_status(s) == "confirmado",
+    "has_account": _has_account,
+    "no_account": lambda s: not _has_account(s),
+    "not_explained": lambda s: not _explained(s),
+    "explained": _explained,
+}
+
+
+# Fatos do snapshot lidos por cada predicado ("seção.chave" ou seção inteira)
+PREDICATE_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "not_agreed_deposit": ("agreements.can_deposit",),
+    "agreed_deposit": ("agreements.can_deposit",),
+    "not_deposited": ("deposit.status",),
+    "deposited": ("deposit.status",),
+    "deposit_confirmed": ("deposit.status",),
+    "has_account": ("accounts",),
+    "no_account": ("accounts",),
+    "not_explained": ("flags.explained",),
+    "explained": ("flags.explained",),
+}
+
+
+@lru_cache(maxsize=1024)
+def compile_eligibility_rule(rule: str) -> Tuple[str, ...]:
+    """
+    Compila regra em PT-BR para a lista de predicados que precisam ser verdadeiros.
+
+    Args:
+        rule: Regra em português
+
+    Returns:
+        Tupla de nomes de predicados (vazia = sempre elegível)
+    """
+    if not rule:
+        return ()
+
+    rule_lower = rule.lower()
+    compiled = []
+
+    # Regras de depósito
+    if "não concordou em depositar" in rule_lower:
+        compiled.append("not_agreed_deposit")
+    if "concordou em depositar" in rule_lower and "não concordou" not in rule_lower:
+        compiled.append("agreed_deposit")
+    if "não depositou" in rule_lower:
+        compiled.append("not_deposited")
+    if "já depositou" in rule_lower:
+        compiled.append("deposited")
+    if "depósito confirmado" in rule_lower:
+        compiled.append("deposit_confirmed")
+
+    # Regras de conta
+    if "tem conta" in rule_lower and "não tem conta" not in rule_lower:
+        compiled.append("has_account")
+    if "não tem conta" in rule_lower:
+        compiled.append("no_account")
+
+    # Regras de flags
+    if "explicado" in rule_lower:
+        if "não foi explicado" in rule_lower:
+            compiled.append("not_explained")
+        if "foi explicado" in rule_lower:
+            compiled.append("explained")
+
+    return tuple(compiled)
+
+
+def evaluate_compiled_rule(compiled: Tuple[str, ...], snapshot) -> bool:
+    """
+    Avalia regra já compilada contra o snapshot.
+
+    Args:
+        compiled: Tupla de nomes de predicados
+        snapshot: Snapshot do lead
+
+    Returns:
+        True se todos os predicados são satisfeitos
+    """
+    return all(PREDICATES[name](snapshot) for name in compiled if name in PREDICATES)
+
+
+def rule_dependencies(compiled: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    Lista os fatos do snapshot dos quais uma regra compilada depende.
+
+    Args:
+        compiled: Tupla de nomes de predicados
+
+    Returns:
+        Tupla ordenada de caminhos de fatos
+    """
+    deps = set()
+    for name in compiled:
+        deps.update(PREDICATE_DEPENDENCIES.get(name, ()))
+    return tuple(sorted(deps))
+
+
+def read_fact(snapshot, path: str) -> Any:
+    """
+    Lê um fato do snapshot a partir do caminho "seção.chave".
+
+    Args:
+        snapshot: Snapshot do lead
+        path: Caminho do fato (ex: "deposit.status" ou "accounts")
+
+    Returns:
+        Valor atual do fato (None se ausente)
+    """
+    section, _, key = path.partition(".")
+    data = getattr(snapshot, section, None) or {}
+    if not key:
+        return data
+    return data.get(key)
+
+
+def extract_keywords(automation: Dict[str, Any]) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Extrai tópico e palavras de use_when já normalizados.
+
+    Args:
+        automation: Definição da automação
+
+    Returns:
+        (tópico em minúsculas, palavras de use_when)
+    """
+    topic = str(automation.get("topic", "") or "").lower()
+    use_when = str(automation.get("use_when", "") or "").lower()
+    return topic, tuple(use_when.split())
+
+
+def compile_automations(automations) -> Tuple[Dict[str, Tuple[str, ...]], Dict[str, Tuple[str, Tuple[str, ...]]]]:
+    """
+    Compila regras e palavras-chave de todas as automações do catálogo.
+
+    Args:
+        automations: Lista de automações
+
+    Returns:
+        (regras compiladas por ID, palavras-chave por ID)
+    """
+    compiled_rules = {}
+    keywords = {}
+    for automation in automations:
+        automation_id = automation.get("id")
+        if not automation_id:
+            continue
+        compiled_rules[automation_id] = compile_eligibility_rule(automation.get("eligibility", "") or "")
+        keywords[automation_id] = extract_keywords(automation)
+    return compiled_rules, keywords
@@ -0,0 +1,301 @@
+"""
+Event Retention - Partições mensais de journey_event e arquivamento frio
+
+journey_event é particionada por mês em created_at. Este job:
+
+- garante partições para os próximos meses (inserts nunca caem na DEFAULT)
+- destaca partições mais antigas que a retenção
+- exporta cada partição destacada para JSONL gzip em disco
+  (EVENT_ARCHIVE_DIR/journey_event/YYYY-MM.jsonl.gz) e só então a remove
+
+Consultas quentes (eventos recentes por lead, contagens do dia) tocam só
+as partições recentes, independente do volume de histórico.
+"""
+import os
+import gzip
+import json
+import asyncio
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import JSON, text
+
+from app.settings import settings
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "journey_event"
+PARTITION_PREFIX = "journey_event_p"
+RETENTION_LOCK_ID = 0x4A45_5254  # pg_advisory lock: um worker por vez
+ARCHIVE_BATCH_SIZE = 5000
+
+
+def month_start(value: date) -> date:
+    """Primeiro dia do mês de uma data."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    """Soma meses a um primeiro-dia-de-mês."""
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Nome da partição de um mês (journey_event_pYYYYMM)."""
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Mês de uma partição pelo nome (None para a DEFAULT ou nomes estranhos)."""
+    suffix = name[len(PARTITION_PREFIX):] if name.startswith(PARTITION_PREFIX) else ""
+    if len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return date(int(suffix[:4]), int(suffix[4:]), 1)
+
+
+def expired_partitions(names: Iterable[str], today: date, retention_months: int) -> List[Tuple[str, date]]:
+    """
+    Partições cujo mês inteiro está fora da retenção.
+
+    Args:
+        names: Nomes das partições anexadas
+        today: Data de referência (UTC)
+        retention_months: Meses mantidos além do atual
+
+    Returns:
+        [(nome, mês)] em ordem cronológica
+    """
+    cutoff = add_months(month_start(today), -retention_months)
+    expired = []
+    for name in names:
+        month = partition_month(name)
+        if month is not None and month < cutoff:
+            expired.append((name, month))
+    return sorted(expired, key=lambda item: item[1])
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class ArchiveWriter:
+    """Escreve linhas em JSONL gzip com troca atômica do arquivo no fim."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.rows = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = gzip.open(self.tmp_path, "wt", encoding="utf-8")
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self._file.write(json.dumps(row, ensure_ascii=False, default=_json_default))
+            self._file.write("\n")
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class EventRetentionJob:
+    """Mantém as partições de journey_event e arquiva as expiradas."""
+
+    def __init__(
+        self,
+        archive_dir: Optional[str] = None,
+        retention_months: Optional[int] = None,
+        months_ahead: Optional[int] = None
+    ):
+        self.archive_dir = archive_dir or settings.EVENT_ARCHIVE_DIR
+        self.retention_months = retention_months if retention_months is not None else settings.EVENT_RETENTION_MONTHS
+        self.months_ahead = months_ahead if months_ahead is not None else settings.EVENT_PARTITION_MONTHS_AHEAD
+        self.interval = settings.EVENT_RETENTION_INTERVAL_SECONDS
+        self._task: Optional[asyncio.Task] = None
+
+    def archive_path(self, month: date) -> str:
+        """Arquivo de destino de um mês."""
+        return os.path.join(self.archive_dir, PARENT_TABLE, f"{month:%Y-%m}.jsonl.gz")
+
+    async def ensure_partitions(self, db, today: Optional[date] = None) -> List[str]:
+        """
+        Cria as partições do mês atual e dos próximos meses, se faltarem.
+
+        Args:
+            db: AsyncSession
+            today: Data de referência (UTC)
+
+        Returns:
+            Nomes das partições garantidas
+        """
+        current = month_start(today or datetime.now(timezone.utc).date())
+        names = []
+        for offset in range(self.months_ahead + 1):
+            month = add_months(current, offset)
+            name = partition_name(month)
+            await db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00+00') "
+                f"TO ('{add_months(month, 1).isoformat()} 00:00+00')"
+            ))
+            names.append(name)
+        return names
+
+    async def list_partitions(self, db) -> List[str]:
+        """Partições anexadas a journey_event."""
+        result = await db.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :parent"
+        ), {"parent": PARENT_TABLE})
+        return [row[0] for row in result.all()]
+
+    async def archive_partition(self, db, name: str, month: date) -> int:
+        """
+        Exporta uma partição destacada para JSONL gzip e a remove.
+
+        A tabela só é removida depois que o arquivo foi escrito por completo;
+        uma falha no meio deixa a tabela destacada para a próxima execução.
+
+        Args:
+            db: AsyncSession
+            name: Nome da partição
+            month: Mês da partição
+
+        Returns:
+            Linhas arquivadas
+        """
+        writer = await asyncio.to_thread(ArchiveWriter, self.archive_path(month))
+        try:
+            last_id = 0
+            while True:
+                result = await db.execute(text(
+                    f"SELECT id, lead_id, type, payload, created_at FROM {name} "
+                    f"WHERE id > :last_id ORDER BY id LIMIT :limit"
+                ).columns(payload=JSON), {"last_id": last_id, "limit": ARCHIVE_BATCH_SIZE})
+                rows = [dict(row._mapping) for row in result.all()]
+                if not rows:
+                    break
+                await asyncio.to_thread(writer.write, rows)
+                last_id = rows[-1]["id"]
+            await asyncio.to_thread(writer.close)
+        except BaseException:
+            await asyncio.to_thread(writer.abort)
+            raise
+
+        await db.execute(text(f"DROP TABLE {name}"))
+        await db.commit()
+        log_structured("info", "event_partition_archived", {
+            "partition": name,
+            "rows": writer.rows,
+            "path": writer.path
+        })
+        return writer.rows
+
+    async def run_once(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Uma execução completa: partições futuras, detach e arquivamento.
+
+        Usa advisory lock do Postgres para que só um worker rode por vez. O
+        lock é de sessão, então lock, trabalho e unlock usam a mesma conexão
+        (a sessão fica presa a ela e os commits não a devolvem ao pool).
+
+        Args:
+            today: Data de referência (UTC)
+
+        Returns:
+            Resumo da execução
+        """
+        from sqlalchemy.ext.asyncio import AsyncSession
+        from app.infra.db import get_async_engine
+
+        today = today or datetime.now(timezone.utc).date()
+        summary: Dict[str, Any] = {"created": [], "archived": {}}
+        async with get_async_engine().connect() as conn:
+            locked = await conn.scalar(
+                text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": RETENTION_LOCK_ID}
+            )
+            await conn.commit()
+            if not locked:
+                return {"skipped": "locked"}
+            try:
+                async with AsyncSession(bind=conn, expire_on_commit=False) as db:
+                    summary["created"] = await self.ensure_partitions(db, today)
+                    await db.commit()
+
+                    attached = await self.list_partitions(db)
+                    for name, month in expired_partitions(attached, today, self.retention_months):
+                        await db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+                        await db.commit()
+                        log_structured("info", "event_partition_detached", {"partition": name})
+                        summary["archived"][name] = await self.archive_partition(db, name, month)
+
+                    # Destacadas em execuções anteriores que falharam no arquivamento
+                    for name in await self._detached_leftovers(db, attached):
+                        summary["archived"][name] = await self.archive_partition(db, name, partition_month(name))
+            finally:
+                # Desfazer transação abortada antes de liberar, senão o unlock falha
+                await conn.rollback()
+                await conn.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": RETENTION_LOCK_ID})
+                await conn.commit()
+        return summary
+
+    async def _detached_leftovers(self, db, attached: List[str]) -> List[str]:
+        result = await db.execute(text(
+            "SELECT relname FROM pg_class WHERE relkind = 'r' AND relname LIKE :prefix"
+        ), {"prefix": f"{PARTITION_PREFIX}%"})
+        return [
+            name for (name,) in result.all()
+            if name not in attached and partition_month(name) is not None
+        ]
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                summary = await self.run_once()
+                log_structured("info", "event_retention_run", summary)
+            except Exception as e:
+                logger.error(f"Erro na retenção de eventos: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        """Inicia a execução periódica (chamado no startup da aplicação)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            log_structured("info", "event_retention_started", {
+                "retention_months": self.retention_months,
+                "archive_dir": self.archive_dir
+            })
+
+    async def stop(self) -> None:
+        """Cancela a execução periódica."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+# Instância global
+_event_retention_job: Optional[EventRetentionJob] = None
+
+def get_event_retention_job() -> EventRetentionJob:
+    """Obtém instância singleton do job de retenção."""
+    global _event_retention_job
+    if _event_retention_job is None:
+        _event_retention_job = EventRetentionJob()
+    return _event_retention_job
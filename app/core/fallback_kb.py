@@ -11,6 +11,9 @@ from typing import Optional, List, Dict, Any
 from difflib import SequenceMatcher
 
 from app.data.schemas import Env
+from app.core.decision_mode import is_deterministic_only, llm_slot
+from app.core.degradation import kb_llm_enabled
+from app.core.llm_call import call_llm
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +55,10 @@ async def query_knowledge_base(env: Env) -> Optional[str]:
             logger.warning("OpenAI API key não configurada, usando resposta simples")
             return kb_context.hits[0]["texto"]
         
+        # Determinístico ou sob carga (skip_kb_llm): o trecho da KB é a resposta
+        if is_deterministic_only() or not kb_llm_enabled():
+            return kb_context.hits[0]["texto"]
+        
         client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         
         # Montar contexto da KB
@@ -81,12 +88,13 @@ Responda de forma:
 
 Resposta:"""
 
-        response = await client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=300,
-            temperature=0.3
-        )
+        async with llm_slot():
+            response = await call_llm("kb", client.chat.completions.create,
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=300,
+                temperature=0.3
+            )
         
         resposta = response.choices[0].message.content.strip()
         logger.info(f"Resposta gerada pela LLM usando KB: {resposta[:100]}...")
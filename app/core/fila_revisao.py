@@ -6,12 +6,13 @@ Nunca publica automaticamente no catálogo.
 """
 import logging
 from typing import Optional, List, Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 from app.data.models import FilaRevisao as FilaRevisaoDB
 from app.data.schemas import FilaRevisaoItem, Snapshot
-from app.infra.db import get_db
+from app.data.unit_of_work import unit_of_work
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +20,7 @@ logger = logging.getLogger(__name__)
 class FilaRevisaoService:
     """Serviço para gerenciar fila de revisão humana."""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Optional[AsyncSession] = None):
         self.db = db
     
     async def adicionar_item(
@@ -58,9 +59,10 @@ class FilaRevisaoService:
             aprovado=False
         )
         
-        self.db.add(item_db)
-        self.db.commit()
-        self.db.refresh(item_db)
+        async with unit_of_work(self.db) as uow:
+            uow.add(item_db)
+            await uow.db.flush()
+            await uow.save()
         
         logger.info(f"Item adicionado à fila de revisão: {item_db.id} (lead: {lead_id})")
         return item_db.id
@@ -80,14 +82,15 @@ class FilaRevisaoService:
         Returns:
             Lista de itens pendentes
         """
-        itens_db = (
-            self.db.query(FilaRevisaoDB)
-            .filter(FilaRevisaoDB.aprovado == False)
-            .order_by(FilaRevisaoDB.criado_em.desc())
-            .limit(limite)
-            .offset(offset)
-            .all()
-        )
+        async with unit_of_work(self.db) as uow:
+            result = await uow.db.execute(
+                select(FilaRevisaoDB)
+                .where(FilaRevisaoDB.aprovado == False)
+                .order_by(FilaRevisaoDB.criado_em.desc())
+                .limit(limite)
+                .offset(offset)
+            )
+            itens_db = result.scalars().all()
         
         return [self._converter_para_schema(item) for item in itens_db]
     
@@ -101,9 +104,8 @@ class FilaRevisaoService:
         Returns:
             Item ou None se não encontrado
         """
-        item_db = self.db.query(FilaRevisaoDB).filter(
-            FilaRevisaoDB.id == item_id
-        ).first()
+        async with unit_of_work(self.db) as uow:
+            item_db = await uow.get(FilaRevisaoDB, item_id)
         
         if not item_db:
             return None
@@ -125,20 +127,19 @@ class FilaRevisaoService:
         Returns:
             True se aprovado com sucesso
         """
-        item_db = self.db.query(FilaRevisaoDB).filter(
-            FilaRevisaoDB.id == item_id
-        ).first()
-        
-        if not item_db:
-            logger.warning(f"Item {item_id} não encontrado para aprovação")
-            return False
-        
-        # Atualizar resposta se editada
-        if resposta_editada:
-            item_db.resposta = resposta_editada
-        
-        item_db.aprovado = True
-        self.db.commit()
+        async with unit_of_work(self.db) as uow:
+            item_db = await uow.get(FilaRevisaoDB, item_id)
+            
+            if not item_db:
+                logger.warning(f"Item {item_id} não encontrado para aprovação")
+                return False
+            
+            # Atualizar resposta se editada
+            if resposta_editada:
+                item_db.resposta = resposta_editada
+            
+            item_db.aprovado = True
+            await uow.save()
         
         logger.info(f"Item {item_id} aprovado" + 
                    (" (editado)" if resposta_editada else ""))
@@ -154,16 +155,15 @@ class FilaRevisaoService:
         Returns:
             True se removido com sucesso
         """
-        item_db = self.db.query(FilaRevisaoDB).filter(
-            FilaRevisaoDB.id == item_id
-        ).first()
-        
-        if not item_db:
-            logger.warning(f"Item {item_id} não encontrado para rejeição")
-            return False
-        
-        self.db.delete(item_db)
-        self.db.commit()
+        async with unit_of_work(self.db) as uow:
+            item_db = await uow.get(FilaRevisaoDB, item_id)
+            
+            if not item_db:
+                logger.warning(f"Item {item_id} não encontrado para rejeição")
+                return False
+            
+            await uow.delete(item_db, item_id)
+            await uow.save()
         
         logger.info(f"Item {item_id} rejeitado e removido")
         return True
@@ -175,15 +175,16 @@ class FilaRevisaoService:
         Returns:
             Dicionário com estatísticas
         """
-        total_pendentes = self.db.query(FilaRevisaoDB).filter(
-            FilaRevisaoDB.aprovado == False
-        ).count()
-        
-        total_aprovados = self.db.query(FilaRevisaoDB).filter(
-            FilaRevisaoDB.aprovado == True
-        ).count()
-        
-        total_geral = self.db.query(FilaRevisaoDB).count()
+        # Uma única consulta com contagens condicionais
+        async with unit_of_work(self.db) as uow:
+            result = await uow.db.execute(
+                select(
+                    func.count().filter(FilaRevisaoDB.aprovado == False),
+                    func.count().filter(FilaRevisaoDB.aprovado == True),
+                    func.count()
+                ).select_from(FilaRevisaoDB)
+            )
+            total_pendentes, total_aprovados, total_geral = result.one()
         
         return {
             "pendentes": total_pendentes,
@@ -214,6 +215,6 @@ class FilaRevisaoService:
         )
 
 
-def get_fila_revisao_service(db: Session = next(get_db())) -> FilaRevisaoService:
+def get_fila_revisao_service(db: Optional[AsyncSession] = None) -> FilaRevisaoService:
     """Factory para criar instância do serviço."""
     return FilaRevisaoService(db)
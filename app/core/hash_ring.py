@@ -0,0 +1,89 @@
+"""
+Hash Ring - Hashing consistente de leads para workers
+
+Cada worker ocupa `vnodes` pontos no anel; um lead vai para o primeiro
+ponto após o hash da sua chave. Quando um worker entra ou sai, só os leads
+dos trechos afetados (~1/N) mudam de dono.
+"""
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_VNODES = 128
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Anel de hashing consistente com nós virtuais."""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = DEFAULT_VNODES):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        self._nodes: set = set()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        """Nós atuais, ordenados."""
+        return sorted(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def add(self, node: str) -> None:
+        """Adiciona um nó (idempotente)."""
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for replica in range(self.vnodes):
+            point = _hash(f"{node}#{replica}")
+            if point in self._owners:
+                continue
+            self._owners[point] = node
+            bisect.insort(self._points, point)
+
+    def remove(self, node: str) -> None:
+        """Remove um nó (idempotente)."""
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        self._points = [p for p in self._points if self._owners[p] != node]
+        self._owners = {p: self._owners[p] for p in self._points}
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Nó dono de uma chave.
+
+        Args:
+            key: Chave do lead
+
+        Returns:
+            Nó ou None se o anel estiver vazio
+        """
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[self._points[index]]
+
+    def preference(self, key: str) -> List[str]:
+        """
+        Nós em ordem de preferência para a chave (dono, depois sucessores).
+
+        Usado para failover quando o dono não responde.
+        """
+        if not self._points:
+            return []
+        start = bisect.bisect(self._points, _hash(key))
+        ordered: List[str] = []
+        for offset in range(len(self._points)):
+            node = self._owners[self._points[(start + offset) % len(self._points)]]
+            if node not in ordered:
+                ordered.append(node)
+                if len(ordered) == len(self._nodes):
+                    break
+        return ordered
@@ -0,0 +1,186 @@
+"""
+Idempotency Store - Idempotência de apply_plan em duas camadas
+
+Redis é o caminho rápido: um SET NX com TTL marca a chave como em
+andamento e, ao terminar, guarda a resposta com TTL. Duplicatas
+concorrentes ou repetidas são resolvidas com uma única ida ao Redis.
+
+Postgres (idempotency_key) só é usado quando o chamador pede replay
+durável (ex: reenvios após dias ou após perda do Redis); o purge
+periódico remove registros mais antigos que a retenção.
+"""
+import json
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from app.settings import settings
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY = "mb:idem:{key}"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+
+
+def in_progress_response(key: str) -> Dict[str, Any]:
+    """Resposta para duplicata de um plano ainda em execução."""
+    return {
+        "applied": False,
+        "idempotency_key": key,
+        "status": "in_progress"
+    }
+
+
+class IdempotencyStore:
+    """Marcadores em andamento e respostas cacheadas por chave."""
+
+    def __init__(self, redis=None):
+        if redis is None:
+            from app.redis_adapter import get_redis
+            redis = get_redis()
+        self.redis = redis
+        self.in_flight_ttl = settings.IDEMPOTENCY_IN_FLIGHT_TTL_SECONDS
+        self.response_ttl = settings.IDEMPOTENCY_TTL_SECONDS
+
+    def _key(self, key: str) -> str:
+        return IDEMPOTENCY_KEY.format(key=key)
+
+    async def begin(self, key: str, db=None, durable: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Reserva a chave para execução.
+
+        Args:
+            key: Chave de idempotência
+            db: AsyncSession (só usada com durable=True)
+            durable: Consultar também o registro durável no Postgres
+
+        Returns:
+            None se a execução pode seguir; senão a resposta a devolver
+            (resposta cacheada ou status "in_progress")
+        """
+        redis_key = self._key(key)
+        marker = {"state": IN_FLIGHT, "at": datetime.now(timezone.utc).isoformat()}
+        reserved = self.redis.set(redis_key, marker, ex=self.in_flight_ttl, nx=True)
+        if not reserved and self.redis.last_error is None:
+            raw = self.redis.get(redis_key)
+            if raw is not None:
+                entry = json.loads(raw)
+                if entry.get("state") == DONE:
+                    log_structured("info", "idempotency_hit", {"key": key, "tier": "redis"})
+                    return entry.get("response")
+                log_structured("info", "idempotency_in_progress", {"key": key})
+                return in_progress_response(key)
+            # Expirou entre o SET NX e o GET (ou GET falhou): segue
+
+        # Chave reservada ou Redis sem resposta: o registro durável decide
+        if durable and db is not None:
+            stored = await self._get_durable(key, db)
+            if stored is not None:
+                self.redis.set(redis_key, {"state": DONE, "response": stored}, ex=self.response_ttl)
+                return stored
+        return None
+
+    async def complete(self, key: str, response: Dict[str, Any], db=None, durable: bool = False) -> None:
+        """
+        Guarda a resposta final da chave.
+
+        Args:
+            key: Chave de idempotência
+            response: Resposta do apply_plan
+            db: AsyncSession (só usada com durable=True)
+            durable: Gravar também no Postgres (no commit do turno)
+        """
+        self.redis.set(self._key(key), {"state": DONE, "response": response}, ex=self.response_ttl)
+        if durable and db is not None:
+            from app.data.repo import IdempotencyRepository
+            await IdempotencyRepository(db).store_response(key, response)
+
+    def release(self, key: str) -> None:
+        """Libera a chave sem resposta (permite nova tentativa)."""
+        self.redis.delete(self._key(key))
+
+    async def _get_durable(self, key: str, db) -> Optional[Dict[str, Any]]:
+        from app.data.repo import IdempotencyRepository
+        response = await IdempotencyRepository(db).get_response(key)
+        if response is not None:
+            log_structured("info", "idempotency_hit", {"key": key, "tier": "postgres"})
+        return response
+
+
+class IdempotencyPurger:
+    """Remove, em lotes, registros duráveis mais antigos que a retenção."""
+
+    def __init__(self):
+        self.interval = settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS
+        self.batch_size = settings.IDEMPOTENCY_PURGE_BATCH_SIZE
+        self.retention = timedelta(days=settings.IDEMPOTENCY_DURABLE_RETENTION_DAYS)
+        self._task: Optional[asyncio.Task] = None
+
+    async def purge_once(self) -> int:
+        """
+        Apaga registros expirados até esvaziar, um lote por transação.
+
+        Returns:
+            Total de registros removidos
+        """
+        from app.data.repo import IdempotencyRepository
+        from app.infra.db import async_session_scope
+
+        before = datetime.now(timezone.utc) - self.retention
+        total = 0
+        while True:
+            async with async_session_scope() as db:
+                deleted = await IdempotencyRepository(db).purge_expired(before, self.batch_size)
+            total += deleted
+            if deleted < self.batch_size:
+                break
+            await asyncio.sleep(0)
+        if total:
+            log_structured("info", "idempotency_purged", {"deleted": total})
+        return total
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.purge_once()
+            except Exception as e:
+                logger.error(f"Erro no purge de idempotência: {e}")
+
+    async def start(self) -> None:
+        """Inicia o purge periódico (chamado no startup da aplicação)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Cancela o purge periódico."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+# Instâncias globais
+_idempotency_store: Optional[IdempotencyStore] = None
+_idempotency_purger: Optional[IdempotencyPurger] = None
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Obtém instância singleton do store de idempotência."""
+    global _idempotency_store
+    if _idempotency_store is None:
+        _idempotency_store = IdempotencyStore()
+    return _idempotency_store
+
+
+def get_idempotency_purger() -> IdempotencyPurger:
+    """Obtém instância singleton do purge de idempotência."""
+    global _idempotency_purger
+    if _idempotency_purger is None:
+        _idempotency_purger = IdempotencyPurger()
+    return _idempotency_purger
@@ -10,6 +10,9 @@ from typing import Dict, Any, List, Optional, Tuple
 import asyncio
 
 from app.data.schemas import Env
+from app.core.decision_mode import is_deterministic_only, llm_slot
+from app.core.degradation import intake_samples
+from app.core.llm_call import call_llm
 
 logger = logging.getLogger(__name__)
 
@@ -108,7 +111,7 @@ async def run_intake_always_llm(env: Env) -> Env:
     enriched_env = _apply_llm_signals_to_env(env, llm_result)
     
     # Log estruturado para observabilidade
-    logger.info(f"{{'event':'intake_llm', 'intents':{len(llm_result.get('intents', []))}, 'polarity':'{llm_result.get('polarity', 'unknown')}', 'targets':{len(llm_result.get('targets', {}))}, 'facts_count':{len(llm_result.get('facts', []))}, 'propose_automations_count':{len(llm_result.get('propose_automations', []))}, 'used_samples':{INTAKE_LLM_CONFIG['samples']}, 'agreement_score':{llm_result.get('agreement_score', 'N/A')}, 'error':{llm_result.get('error', None)}}}")
+    logger.info(f"{{'event':'intake_llm', 'intents':{len(llm_result.get('intents', []))}, 'polarity':'{llm_result.get('polarity', 'unknown')}', 'targets':{len(llm_result.get('targets', {}))}, 'facts_count':{len(llm_result.get('facts', []))}, 'propose_automations_count':{len(llm_result.get('propose_automations', []))}, 'used_samples':{llm_result.get('used_samples', INTAKE_LLM_CONFIG['samples'])}, 'agreement_score':{llm_result.get('agreement_score', 'N/A')}, 'error':{llm_result.get('error', None)}}}")
     
     logger.info(f"Intake sempre-LLM concluído: polarity={llm_result.get('polarity')}, intents={llm_result.get('intents')}")
     return enriched_env
@@ -196,22 +199,32 @@ async def _analyze_message_with_llm(message: str, env: Env, use_rag: bool) -> Di
             logger.warning("OpenAI API key não configurada - retornando resultado vazio")
             return _get_empty_llm_result()
         
+        if is_deterministic_only():
+            logger.info("Modo determinístico: LLM de intake ignorado")
+            return _get_empty_llm_result()
+        
         client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         
-        # Preparar contexto
-        context = _build_intake_context(message, env, use_rag)
+        # Preparar contexto (com as confirmações pendentes, para o gate reaproveitar)
+        pending_targets = await _get_pending_targets(env)
+        context = _build_intake_context(message, env, use_rag, pending_targets)
         
-        # Executar análise com self-consistency se habilitado
-        if INTAKE_LLM_CONFIG["self_consistency"]:
+        # Executar análise com self-consistency se habilitado (uma amostra sob carga)
+        samples = intake_samples(INTAKE_LLM_CONFIG["samples"])
+        if INTAKE_LLM_CONFIG["self_consistency"] and samples > 1:
             results = []
-            for i in range(INTAKE_LLM_CONFIG["samples"]):
-                result = await _call_intake_llm(client, context, i)
+            for i in range(samples):
+                async with llm_slot():
+                    result = await _call_intake_llm(client, context, i)
                 results.append(result)
             
             # Majority vote para campos críticos
             final_result = _merge_llm_results(results)
         else:
-            final_result = await _call_intake_llm(client, context, 0)
+            async with llm_slot():
+                final_result = await _call_intake_llm(client, context, 0)
+        final_result["used_samples"] = samples if INTAKE_LLM_CONFIG["self_consistency"] else 1
+        final_result["pending_targets"] = [p["target"] for p in pending_targets]
         
         return final_result
         
@@ -220,7 +233,32 @@ async def _analyze_message_with_llm(message: str, env: Env, use_rag: bool) -> Di
         return _get_empty_llm_result()
 
 
-def _build_intake_context(message: str, env: Env, use_rag: bool) -> str:
+async def _get_pending_targets(env: Env) -> List[Dict[str, Any]]:
+    """
+    Confirmações pendentes do lead (mesma regra do gate).
+    
+    Args:
+        env: Ambiente atual
+        
+    Returns:
+        Lista de pendências (vazia sem lead ou em erro)
+    """
+    if not env.lead or not env.lead.id:
+        return []
+    try:
+        from app.core.confirmation_gate import get_confirmation_gate
+        return await get_confirmation_gate().get_pending_confirmations(env)
+    except Exception as e:
+        logger.warning(f"Não foi possível obter confirmações pendentes: {e}")
+        return []
+
+
+def _build_intake_context(
+    message: str,
+    env: Env,
+    use_rag: bool,
+    pending_targets: Optional[List[Dict[str, Any]]] = None
+) -> str:
     """
     Constrói contexto para análise LLM.
     
@@ -228,6 +266,7 @@ def _build_intake_context(message: str, env: Env, use_rag: bool) -> str:
         message: Mensagem atual
         env: Ambiente
         use_rag: Se deve incluir contexto RAG
+        pending_targets: Confirmações pendentes (target + pergunta)
         
     Returns:
         Contexto formatado
@@ -252,6 +291,11 @@ def _build_intake_context(message: str, env: Env, use_rag: bool) -> str:
         for msg in recent_messages:
             context_parts.append(f"- {msg.sender}: {msg.text}")
     
+    if pending_targets:
+        context_parts.append("Confirmações pendentes (preencha TARGETS para cada uma):")
+        for pending in pending_targets:
+            context_parts.append(f"- {pending['target']}: \"{pending.get('prompt_text') or 'pergunta sem texto'}\"")
+    
     # TODO: Adicionar contexto RAG se use_rag=True
     
     return "\n".join(context_parts)
@@ -270,7 +314,7 @@ async def _call_intake_llm(client, context: str, sample_id: int) -> Dict[str, An
         Resultado da análise
     """
     try:
-        response = await client.chat.completions.create(
+        response = await call_llm("intake", client.chat.completions.create,
             model="gpt-4o-mini",
             temperature=0.1 if sample_id == 0 else 0.3,  # Primeira amostra mais determinística
             messages=[
@@ -282,11 +326,12 @@ Analise a mensagem do usuário e extraia informações estruturadas:
 
 1. INTENTS: Intenções principais (ex: "quero testar", "preciso de ajuda", "criar conta")
 2. POLARITY: Polaridade da resposta (yes/no/other/sarcastic)
-3. TARGETS: Confirmações para targets específicos (ex: {"confirm_can_deposit": "yes"})
+3. TARGETS: Confirmações para targets específicos (ex: {"confirm_can_deposit": "yes"}); responda sempre para as confirmações pendentes listadas no contexto
 4. FACTS: Fatos extraídos da mensagem (ex: [{"path": "agreements.can_deposit", "value": true, "confidence": 0.9}])
 5. PROPOSE_AUTOMATIONS: Automações sugeridas (ex: ["ask_deposit_for_test", "signup_link"])
 6. NEEDS_CLARIFYING: Se precisa de esclarecimento
 7. SLOTS_PATCH: Campos opcionais para atualizar
+8. CONFIDENCE: Sua confiança (0 a 1) na POLARITY e nos TARGETS; responda sempre, mesmo sem confirmações pendentes
 
 Contexto: Sistema ManyBlack V2 para robô de trading."""
                 },
@@ -350,6 +395,12 @@ Contexto: Sistema ManyBlack V2 para robô de trading."""
                                     "type": "boolean",
                                     "description": "Se precisa de esclarecimento"
                                 },
+                                "confidence": {
+                                    "type": "number",
+                                    "minimum": 0,
+                                    "maximum": 1,
+                                    "description": "Confiança na polaridade e nos targets (0-1)"
+                                },
                                 "slots_patch": {
                                     "type": "object",
                                     "additionalProperties": {
@@ -362,7 +413,7 @@ Contexto: Sistema ManyBlack V2 para robô de trading."""
                                     "description": "Campos opcionais para atualizar"
                                 }
                             },
-                            "required": ["intents", "polarity", "targets", "facts", "propose_automations", "needs_clarifying"],
+                            "required": ["intents", "polarity", "targets", "facts", "propose_automations", "needs_clarifying", "confidence"],
                             "additionalProperties": False
                         }
                     }
@@ -462,6 +513,12 @@ def _merge_llm_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
         polarity_agreement = sum(1 for r in results if r.get("polarity") == final_polarity) / len(results)
         agreement_score = round(polarity_agreement, 2)
     
+    # Confiança: média das amostras, descontada pela discordância
+    confidences = [r["confidence"] for r in results if isinstance(r.get("confidence"), (int, float))]
+    confidence = None
+    if confidences:
+        confidence = round(sum(confidences) / len(confidences) * (agreement_score or 1.0), 2)
+    
     return {
         "intents": list(all_intents),
         "polarity": final_polarity,
@@ -470,6 +527,7 @@ def _merge_llm_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
         "propose_automations": list(all_automations),
         "needs_clarifying": any(r.get("needs_clarifying", False) for r in results),
         "slots_patch": results[0].get("slots_patch", {}),  # Usar primeiro
+        "confidence": confidence,
         "agreement_score": agreement_score,
         "error": None
     }
@@ -497,7 +555,9 @@ def _apply_llm_signals_to_env(env: Env, llm_result: Dict[str, Any]) -> Env:
             "propose_automations": llm_result.get("propose_automations", []),
             "needs_clarifying": llm_result.get("needs_clarifying", False),
             "slots_patch": llm_result.get("slots_patch", {}),
-            "used_samples": INTAKE_LLM_CONFIG['samples'],
+            "used_samples": llm_result.get("used_samples", INTAKE_LLM_CONFIG['samples']),
+            "confidence": llm_result.get("confidence"),
+            "pending_targets": llm_result.get("pending_targets", []),
             "agreement_score": llm_result.get("agreement_score"),
             "error": llm_result.get("error")
         })
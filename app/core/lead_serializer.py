@@ -0,0 +1,368 @@
+"""
+Lead Serializer - Execução serial de turnos por lead entre workers
+
+Turnos do mesmo lead rodam estritamente em ordem; leads diferentes rodam em
+paralelo. Duas camadas:
+
+- fila local por lead (asyncio.Lock, FIFO) para turnos do mesmo processo
+- lease no Redis (SET NX + TTL, renovado em background) para os demais
+  workers, com fencing token monotônico por lead
+
+Se outro worker detém o lease, o turno espera até o prazo e então é
+rejeitado (LeadSerializationTimeout); se o Redis não responde, o turno segue
+na hora só com a ordem local.
+
+O fencing token do turno atual fica em contextvar e é conferido antes das
+gravações do turno (ensure_lead_turn_current): com o lease perdido ou um
+token mais novo emitido para outro dono, o turno é abortado com LeadTurnLost.
+"""
+import time
+import uuid
+import random
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from app.settings import settings
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+LEASE_KEY = "mb:lease:{key}"
+FENCE_KEY = "mb:lease:{key}:fence"
+FENCE_TTL_SECONDS = 7 * 86400
+WAIT_SAMPLES = 1024
+
+_held_leases: ContextVar[Tuple["LeadTurn", ...]] = ContextVar("held_leases", default=())
+
+
+def telegram_lead_key(chat_id: str) -> str:
+    """Chave de serialização de um lead do Telegram (chat_id)."""
+    return f"telegram:{chat_id}"
+
+
+async def lead_key_for_id(lead_id: int) -> Optional[str]:
+    """
+    Chave de serialização de um lead a partir do ID interno.
+
+    Resolve o chat do lead para cair na mesma chave do webhook e do
+    roteamento do dispatcher (telegram_lead_key).
+
+    Args:
+        lead_id: ID do lead
+
+    Returns:
+        Chave do lead ou None se o lead não existe
+    """
+    from app.data.models import Lead
+    from app.data.unit_of_work import unit_of_work
+
+    async with unit_of_work() as uow:
+        lead = await uow.get(Lead, lead_id)
+    if lead is None or not lead.platform_user_id:
+        return None
+    return telegram_lead_key(lead.platform_user_id)
+
+
+def current_lead_turn() -> Optional["LeadTurn"]:
+    """Turno serializado mais interno da task atual (None fora de um)."""
+    held = _held_leases.get()
+    return held[-1] if held else None
+
+
+def current_fencing_token() -> Optional[int]:
+    """Fencing token do turno atual (None fora de um turno serializado)."""
+    turn = current_lead_turn()
+    return turn.fencing_token if turn else None
+
+
+def ensure_lead_turn_current() -> None:
+    """
+    Confere se o turno atual ainda é o dono do lead (sem turno, não faz nada).
+
+    Raises:
+        LeadTurnLost: Lease perdido ou token mais novo emitido para outro dono
+    """
+    turn = current_lead_turn()
+    if turn is not None:
+        turn.ensure_current()
+
+
+class LeadSerializationTimeout(Exception):
+    """Não foi possível obter a vez do lead dentro do prazo."""
+
+
+class LeadTurnLost(Exception):
+    """O turno perdeu a vez do lead; suas gravações devem ser descartadas."""
+
+
+class _LocalSlot:
+    """Fila local de um lead: lock FIFO + contagem de interessados."""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class LeadTurn:
+    """Vez de um lead: fila local + lease distribuído."""
+
+    def __init__(self, key: str, redis=None):
+        self.key = key
+        self.owner = uuid.uuid4().hex
+        self.fencing_token: Optional[int] = None
+        self.lease_acquired = False
+        self.redis_unavailable = False
+        self.lost = False
+        self.waited_ms = 0.0
+        self._redis = redis
+        self._renew_task: Optional[asyncio.Task] = None
+
+    def ensure_current(self) -> None:
+        """
+        Rejeita gravações de um dono antigo.
+
+        Sem resposta do Redis o token não é conferido (os demais workers
+        também seguem sem lease nesse caso).
+
+        Raises:
+            LeadTurnLost: Lease perdido ou token mais novo já emitido
+        """
+        if not self.lost and self.fencing_token is not None and self._redis is not None:
+            latest = self._redis.get(FENCE_KEY.format(key=self.key))
+            if latest is not None and int(latest) > self.fencing_token:
+                self.lost = True
+        if self.lost:
+            log_structured("error", "lead_turn_fenced", {
+                "key": self.key,
+                "fencing_token": self.fencing_token
+            })
+            raise LeadTurnLost(self.key)
+
+
+class SerializerMetrics:
+    """Contadores de contenção e espera da serialização por lead."""
+
+    def __init__(self):
+        self.acquired = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.lease_lost = 0
+        self.unavailable = 0
+        self.waiting = 0
+        self.active = 0
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    def observe_wait(self, waited_ms: float, contended: bool) -> None:
+        self.acquired += 1
+        if contended:
+            self.contended += 1
+        self._waits.append(waited_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Métricas atuais (espera em ms sobre as últimas aquisições)."""
+        waits = sorted(self._waits)
+
+        def _pct(p: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 2)
+
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "timeouts": self.timeouts,
+            "lease_lost": self.lease_lost,
+            "unavailable": self.unavailable,
+            "waiting": self.waiting,
+            "active": self.active,
+            "wait_ms_p50": _pct(0.50),
+            "wait_ms_p95": _pct(0.95),
+            "wait_ms_max": round(waits[-1], 2) if waits else 0.0,
+        }
+
+
+class LeadSerializer:
+    """Executor serial por lead."""
+
+    def __init__(self, redis=None):
+        if redis is None:
+            from app.redis_adapter import get_redis
+            redis = get_redis()
+        self.redis = redis
+        self.lease_ttl = max(1, settings.LEAD_LEASE_TTL_MS // 1000)
+        self.wait_timeout = settings.LEAD_LEASE_WAIT_TIMEOUT_MS / 1000
+        self.metrics = SerializerMetrics()
+        self._slots: Dict[str, _LocalSlot] = {}
+
+    @asynccontextmanager
+    async def serialize(
+        self,
+        key: str,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[LeadTurn]:
+        """
+        Executa o bloco na vez do lead.
+
+        Reentrante: se a task já está na vez desse lead, segue direto.
+
+        Args:
+            key: Chave do lead (ver telegram_lead_key/lead_key_for_id)
+            timeout: Espera máxima em segundos (padrão: settings)
+
+        Raises:
+            LeadSerializationTimeout: Prazo esgotado (fila local ou lease
+                mantido por outro worker)
+        """
+        for held in _held_leases.get():
+            if held.key == key:
+                yield held
+                return
+
+        turn = await self.acquire(key, timeout)
+        if turn is None:
+            raise LeadSerializationTimeout(key)
+        token = _held_leases.set(_held_leases.get() + (turn,))
+        try:
+            yield turn
+        finally:
+            _held_leases.reset(token)
+            await self.release(turn)
+
+    async def acquire(
+        self,
+        key: str,
+        timeout: Optional[float] = None
+    ) -> Optional[LeadTurn]:
+        """
+        Aguarda a vez do lead (fila local e depois lease distribuído).
+
+        Sem resposta do Redis segue na hora só com a ordem local.
+
+        Args:
+            key: Chave do lead
+            timeout: Espera máxima em segundos (padrão: settings)
+
+        Returns:
+            LeadTurn ou None se o prazo esgotou
+        """
+        timeout = self.wait_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        turn = LeadTurn(key, self.redis)
+
+        slot = self._slots.setdefault(key, _LocalSlot())
+        slot.users += 1
+        contended = slot.users > 1
+        self.metrics.waiting += 1
+        try:
+            await asyncio.wait_for(slot.lock.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self._leave_slot(key, slot)
+            self.metrics.timeouts += 1
+            return None
+        except BaseException:
+            self._leave_slot(key, slot)
+            raise
+        finally:
+            self.metrics.waiting -= 1
+
+        try:
+            remote_contended = await self._acquire_lease(turn, deadline)
+        except BaseException:
+            slot.lock.release()
+            self._leave_slot(key, slot)
+            raise
+        if not turn.lease_acquired and not turn.redis_unavailable:
+            self.metrics.timeouts += 1
+            log_structured("warning", "lead_lease_timeout", {"key": key})
+            slot.lock.release()
+            self._leave_slot(key, slot)
+            return None
+
+        turn.waited_ms = (time.monotonic() - started) * 1000
+        self.metrics.observe_wait(turn.waited_ms, contended or remote_contended)
+        self.metrics.active += 1
+        if contended or remote_contended:
+            log_structured("info", "lead_turn_contended", {
+                "key": key,
+                "waited_ms": round(turn.waited_ms, 1),
+                "fencing_token": turn.fencing_token
+            })
+        return turn
+
+    async def release(self, turn: LeadTurn) -> None:
+        """Libera o lease e passa a vez ao próximo da fila local."""
+        if turn._renew_task is not None:
+            turn._renew_task.cancel()
+            turn._renew_task = None
+        if turn.lease_acquired and not turn.lost:
+            self.redis.delete_if_equal(LEASE_KEY.format(key=turn.key), turn.owner)
+        self.metrics.active -= 1
+        slot = self._slots.get(turn.key)
+        if slot is not None:
+            slot.lock.release()
+            self._leave_slot(turn.key, slot)
+
+    def _leave_slot(self, key: str, slot: _LocalSlot) -> None:
+        slot.users -= 1
+        if slot.users == 0 and self._slots.get(key) is slot:
+            del self._slots[key]
+
+    async def _acquire_lease(self, turn: LeadTurn, deadline: float) -> bool:
+        lease_key = LEASE_KEY.format(key=turn.key)
+        delay = 0.01
+        contended = False
+        while True:
+            if self.redis.set(lease_key, turn.owner, ex=self.lease_ttl, nx=True):
+                # Token emitido só depois do lease: cresce na ordem de posse
+                token = self.redis.incr(FENCE_KEY.format(key=turn.key), ex=FENCE_TTL_SECONDS)
+                turn.fencing_token = token if self.redis.last_error is None else None
+                turn.lease_acquired = True
+                turn._renew_task = asyncio.create_task(self._renew(turn))
+                return contended
+            if self.redis.last_error is not None:
+                # Redis fora: seguir já, só com a ordem local
+                turn.redis_unavailable = True
+                self.metrics.unavailable += 1
+                log_structured("warning", "lead_lease_unavailable", {
+                    "key": turn.key,
+                    "error": str(self.redis.last_error)
+                })
+                return contended
+            contended = True
+            if time.monotonic() + delay > deadline:
+                return contended
+            await asyncio.sleep(delay * (0.5 + random.random()))
+            delay = min(delay * 2, 0.2)
+
+    async def _renew(self, turn: LeadTurn) -> None:
+        lease_key = LEASE_KEY.format(key=turn.key)
+        interval = max(self.lease_ttl / 3, 0.1)
+        while True:
+            await asyncio.sleep(interval)
+            if not self.redis.expire_if_equal(lease_key, turn.owner, self.lease_ttl):
+                if self.redis.last_error is not None:
+                    # Falha transitória: o dono só muda se o lease expirar
+                    continue
+                turn.lost = True
+                self.metrics.lease_lost += 1
+                log_structured("error", "lead_lease_lost", {
+                    "key": turn.key,
+                    "fencing_token": turn.fencing_token
+                })
+                return
+
+
+# Instância global
+_lead_serializer: Optional[LeadSerializer] = None
+
+def get_lead_serializer() -> LeadSerializer:
+    """Obtém instância singleton do serializador por lead."""
+    global _lead_serializer
+    if _lead_serializer is None:
+        _lead_serializer = LeadSerializer()
+    return _lead_serializer
@@ -0,0 +1,207 @@
+"""
+LLM Call - Caminho comum das chamadas LLM do pipeline
+
+Todos os pontos que chamam o provedor passam por call_llm: breaker por
+modelo + endpoint (falha rápida enquanto aberto) e teto de tempo por
+chamada. Quem chama trata CircuitOpenError como qualquer erro de LLM e
+segue pelo caminho determinístico.
+
+Hedging (só nos pontos em LLM_HEDGE_SITES): se a chamada não voltou até o
+percentil LLM_HEDGE_PERCENTILE da latência recente do modelo, dispara uma
+cópia; a primeira resposta vence e a outra é cancelada. Cada ponto tem um
+orçamento de cópias (LLM_HEDGE_BUDGET_RATIO por chamada).
+"""
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from app.settings import settings
+from app.core.circuit_breaker import CircuitOpenError, get_circuit_breaker
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["call_llm", "CircuitOpenError", "get_llm_hedger"]
+
+LATENCY_SAMPLES = 256
+
+
+class _SiteBudget:
+    """Orçamento de cópias de um ponto de chamada (token bucket)."""
+
+    def __init__(self, burst: float):
+        self.tokens = burst
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+
+class LLMHedger:
+    """Latência recente por modelo e orçamento de hedging por ponto."""
+
+    def __init__(self):
+        self.sites = {site.strip() for site in settings.LLM_HEDGE_SITES.split(",") if site.strip()}
+        self.percentile = settings.LLM_HEDGE_PERCENTILE
+        self.min_samples = settings.LLM_HEDGE_MIN_SAMPLES
+        self.min_delay = settings.LLM_HEDGE_MIN_DELAY_MS / 1000
+        self.budget_ratio = settings.LLM_HEDGE_BUDGET_RATIO
+        self.budget_burst = settings.LLM_HEDGE_BUDGET_BURST
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._budgets: Dict[str, _SiteBudget] = {}
+
+    def enabled_for(self, site: str) -> bool:
+        return site in self.sites
+
+    def observe(self, model: str, latency: float) -> None:
+        """Registra a latência (s) de uma requisição bem-sucedida."""
+        self._latencies.setdefault(model, deque(maxlen=LATENCY_SAMPLES)).append(latency)
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """
+        Espera antes da cópia para o modelo.
+
+        Returns:
+            Segundos, ou None sem amostras suficientes
+        """
+        samples = self._latencies.get(model)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        value = ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+        return max(value, self.min_delay)
+
+    def _budget(self, site: str) -> _SiteBudget:
+        budget = self._budgets.get(site)
+        if budget is None:
+            budget = self._budgets[site] = _SiteBudget(self.budget_burst)
+        return budget
+
+    def on_call(self, site: str) -> None:
+        budget = self._budget(site)
+        budget.calls += 1
+        budget.tokens = min(self.budget_burst, budget.tokens + self.budget_ratio)
+
+    def try_spend(self, site: str) -> bool:
+        """Consome uma cópia do orçamento do ponto, se houver."""
+        budget = self._budget(site)
+        if budget.tokens < 1:
+            budget.denied += 1
+            return False
+        budget.tokens -= 1
+        budget.hedged += 1
+        return True
+
+    def on_hedge_win(self, site: str) -> None:
+        self._budget(site).hedge_wins += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado atual para /metrics/runtime."""
+        delays = {model: self.hedge_delay(model) for model in sorted(self._latencies)}
+        return {
+            "sites": sorted(self.sites),
+            "delay_ms": {model: round(delay * 1000, 1) for model, delay in delays.items() if delay is not None},
+            "budgets": {
+                site: {
+                    "calls": budget.calls,
+                    "hedged": budget.hedged,
+                    "hedge_wins": budget.hedge_wins,
+                    "denied": budget.denied,
+                }
+                for site, budget in sorted(self._budgets.items())
+            },
+        }
+
+
+# Instância global
+_llm_hedger: Optional[LLMHedger] = None
+
+def get_llm_hedger() -> LLMHedger:
+    """Obtém instância singleton do hedger de LLM."""
+    global _llm_hedger
+    if _llm_hedger is None:
+        _llm_hedger = LLMHedger()
+    return _llm_hedger
+
+
+async def call_llm(
+    site: str,
+    create: Callable[..., Awaitable[Any]],
+    endpoint: str = "chat.completions",
+    **kwargs: Any
+) -> Any:
+    """
+    Executa uma chamada LLM protegida.
+
+    Args:
+        site: Ponto do pipeline (ex: "intake", "gate"); decide o hedging
+        create: Função do cliente (ex: client.chat.completions.create)
+        endpoint: Endpoint do provedor (compõe a chave do breaker)
+        **kwargs: Argumentos da chamada (precisa de model=)
+
+    Returns:
+        Resposta do provedor
+
+    Raises:
+        CircuitOpenError: Breaker do modelo aberto (nenhuma chamada feita)
+        asyncio.TimeoutError: Chamada passou de LLM_CALL_TIMEOUT_SECONDS
+    """
+    model = kwargs.get("model", "unknown")
+    breaker = get_circuit_breaker(model, endpoint)
+    hedger = get_llm_hedger()
+    hedger.on_call(site)
+    try:
+        async with breaker.guard():
+            return await asyncio.wait_for(
+                _hedged_request(site, model, lambda: create(**kwargs), hedger),
+                settings.LLM_CALL_TIMEOUT_SECONDS
+            )
+    except CircuitOpenError:
+        logger.info(f"LLM {breaker.name} indisponível (breaker aberto): {site} segue sem LLM")
+        raise
+
+
+async def _timed(model: str, request: Awaitable[Any], hedger: LLMHedger) -> Any:
+    started = time.monotonic()
+    result = await request
+    hedger.observe(model, time.monotonic() - started)
+    return result
+
+
+async def _hedged_request(
+    site: str,
+    model: str,
+    factory: Callable[[], Awaitable[Any]],
+    hedger: LLMHedger
+) -> Any:
+    delay = hedger.hedge_delay(model) if hedger.enabled_for(site) else None
+    if delay is None:
+        return await _timed(model, factory(), hedger)
+
+    primary = asyncio.ensure_future(_timed(model, factory(), hedger))
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done or not hedger.try_spend(site):
+            return await primary
+
+        backup = asyncio.ensure_future(_timed(model, factory(), hedger))
+        tasks.add(backup)
+        logger.debug(f"Hedge LLM {model} em {site} após {delay * 1000:.0f}ms")
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        hedger.on_hedge_win(site)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # Perdedor (ou tudo, se o chamador desistiu) é cancelado
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -4,19 +4,27 @@ Orchestrator - Orquestrador central de decisões
 Recebe snapshot enriquecido e decide entre DÚVIDA ou PROCEDIMENTO.
 NÃO chama APIs externas, decide apenas pelos fatos do Lead Snapshot.
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Query, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, Optional
+import json
 import logging
 import uuid
 
 from app.data.schemas import Env, Plan, Action
-from app.core.selector import select_automation
-from app.core.procedures import run_procedure
+from app.core.selector import select_automation, load_catalog
+from app.core.procedures import run_procedure, load_procedures
+from app.core.catalog_store import get_catalog_store
 from app.core.fallback_kb import query_knowledge_base
 from app.core.resposta_curta import get_resposta_curta_service
 from app.core.contexto_lead import get_contexto_lead_service
 from app.core.comparador_semantico import get_comparador_semantico
 from app.core.fila_revisao import get_fila_revisao_service
+from app.core.decision_mode import get_contexto_cache, is_no_persist
+from app.core.decision_batch import (
+    run_decision_batch, iter_json_list, iter_jsonl,
+    DEFAULT_CONCURRENCY, DEFAULT_LLM_CONCURRENCY, MAX_CONCURRENCY
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -36,6 +44,51 @@ async def decide_endpoint(env: Env) -> Plan:
     return await decide_and_plan(env)
 
 
+@router.post("/decide/batch")
+async def decide_batch_endpoint(
+    request: Request,
+    deterministic_only: bool = Query(False, description="Não chamar LLMs"),
+    concurrency: int = Query(DEFAULT_CONCURRENCY, ge=1, le=MAX_CONCURRENCY),
+    llm_concurrency: int = Query(DEFAULT_LLM_CONCURRENCY, ge=1, le=MAX_CONCURRENCY)
+) -> StreamingResponse:
+    """
+    Avalia vários Envs em uma chamada, devolvendo Plans em NDJSON conforme ficam prontos.
+    
+    Aceita `{"envs": [...]}` (ou uma lista JSON) ou um corpo JSONL
+    (`application/x-ndjson`) com um Env por linha.
+    
+    Returns:
+        Linhas `{"index", "plan"}` ou `{"index", "error"}`
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        # O corpo é lido antes da resposta: StreamingResponse também consome
+        # o canal de receive (detecção de desconexão) enquanto transmite
+        items = iter_jsonl(await request.body())
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Corpo JSON inválido")
+        envs = body.get("envs") if isinstance(body, dict) else body
+        if not isinstance(envs, list):
+            raise HTTPException(status_code=400, detail="Esperado lista de envs")
+        if isinstance(body, dict):
+            deterministic_only = bool(body.get("deterministic_only", deterministic_only))
+        items = iter_json_list(envs)
+    
+    async def _stream():
+        async for result in run_decision_batch(
+            items,
+            deterministic_only=deterministic_only,
+            concurrency=concurrency,
+            llm_concurrency=llm_concurrency
+        ):
+            yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+    
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+
 async def decide_and_plan(env: Env) -> Plan:
     """
     Decisão principal: analisa ambiente e gera plano de resposta.
@@ -54,7 +107,14 @@ async def decide_and_plan(env: Env) -> Plan:
     contexto_service = get_contexto_lead_service()
     contexto_lead = None
     if env.lead.id:
-        contexto_lead = await contexto_service.obter_contexto(env.lead.id)
+        # Em lotes, o contexto de cada lead é consultado uma única vez
+        contexto_cache = get_contexto_cache()
+        if contexto_cache is not None and env.lead.id in contexto_cache:
+            contexto_lead = contexto_cache[env.lead.id]
+        else:
+            contexto_lead = await contexto_service.obter_contexto(env.lead.id)
+            if contexto_cache is not None:
+                contexto_cache[env.lead.id] = contexto_lead
     
     # Verificar se é resposta curta para confirmação pendente
     resposta_curta_service = get_resposta_curta_service()
@@ -170,7 +230,9 @@ async def handle_procedure_flow(env: Env, contexto_lead=None) -> Dict[str, Any]:
     
     if procedure_id:
         logger.info(f"Executando procedimento: {procedure_id}")
-        procedure_result = await run_procedure(procedure_id, env)
+        progress = contexto_lead.progresso_procedimento if contexto_lead else None
+        procedure_result = await run_procedure(procedure_id, env, progress)
+        await save_procedure_progress(env, procedure_result.get("progress"), progress)
         
         # BUGFIX: Se procedimento falhou (não encontrado), fazer fallback para DÚVIDA
         if (procedure_result.get("decision_id") == "proc_error" or 
@@ -185,6 +247,54 @@ async def handle_procedure_flow(env: Env, contexto_lead=None) -> Dict[str, Any]:
         return await handle_doubt_flow(env, contexto_lead)
 
 
+async def save_procedure_progress(
+    env: Env,
+    progress: Optional[Dict[str, Any]],
+    previous: Optional[Dict[str, Any]]
+) -> None:
+    """
+    Persiste o progresso do procedimento no contexto do lead, só se mudou.
+    
+    Args:
+        env: Ambiente atual
+        progress: Progresso calculado neste turno
+        previous: Progresso salvo anteriormente
+    """
+    if not progress or progress == previous or not env.lead.id:
+        return
+    # Lote/what-if: só o plano, sem gravar progresso
+    if is_no_persist():
+        return
+    
+    try:
+        contexto_service = get_contexto_lead_service()
+        await contexto_service.atualizar_contexto(
+            env.lead.id,
+            procedimento_ativo=progress["procedure_id"],
+            etapa_ativa=progress["current_step"],
+            progresso_procedimento=progress
+        )
+        
+        # Resumo de atividade (filtros de procedimento do Studio). No turno,
+        # o upsert (com lock da linha) vai para a saída, junto do commit final
+        from app.data.repo import ActivityRepository
+        from app.data.unit_of_work import current_unit_of_work
+        lead_id = env.lead.id
+        
+        async def set_procedure() -> None:
+            await ActivityRepository().set_procedure(
+                lead_id, progress["procedure_id"], progress["current_step"]
+            )
+        
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.defer(set_procedure)
+        else:
+            await set_procedure()
+    except Exception as e:
+        logger.warning(f"Erro ao salvar progresso do procedimento: {e}")
+
+
 def determine_active_procedure(env: Env) -> str:
     """
     Determina qual procedimento deve ser executado.
@@ -292,8 +402,6 @@ async def handle_fallback_flow(env: Env, contexto_lead=None) -> Dict[str, Any]:
         Plano de ação de fallback
     """
     from app.infra.logging import log_structured
-    from app.core.selector import load_catalog
-    from app.core.procedures import load_procedures
     
     # Get current message for context
     current_message = ""
@@ -436,7 +544,7 @@ async def handle_confirmacao_curta(env: Env, contexto_lead, posicao: str, decisi
     
     # Limpar estado aguardando
     contexto_service = get_contexto_lead_service()
-    if env.lead.id:
+    if env.lead.id and not is_no_persist():
         await contexto_service.limpar_aguardando(env.lead.id)
     
     return Plan(
@@ -520,7 +628,7 @@ async def is_proposal_valid(automation_id: str, env: Env) -> bool:
 
 async def load_automation_from_catalog(automation_id: str) -> Optional[Dict[str, Any]]:
     """
-    FASE 4: Carrega configuração de automação do catálogo YAML.
+    FASE 4: Carrega configuração de automação da store do catálogo.
     
     Args:
         automation_id: ID da automação
@@ -528,29 +636,7 @@ async def load_automation_from_catalog(automation_id: str) -> Optional[Dict[str,
     Returns:
         Configuração da automação ou None
     """
-    try:
-        import yaml
-        import os
-        
-        catalog_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 
-            "policies", "catalog.yml"
-        )
-        
-        if os.path.exists(catalog_path):
-            with open(catalog_path, 'r', encoding='utf-8') as f:
-                catalog_list = yaml.safe_load(f) or []
-                
-            # Buscar automação por ID
-            for automation in catalog_list:
-                if automation.get("id") == automation_id:
-                    return automation
-                    
-        return None
-        
-    except Exception as e:
-        logger.error(f"Erro ao carregar automação do catálogo: {e}")
-        return None
+    return get_catalog_store().get_automation(automation_id)
 
 
 def convert_automation_config_to_action(automation_config: Dict[str, Any]) -> Dict[str, Any]:
@@ -0,0 +1,137 @@
+"""
+Policy Bundle - Políticas pré-compiladas em binário
+
+Depois de validar os YAMLs, a store grava um bundle pickle com o conteúdo
+parseado, as regras de elegibilidade compiladas e os índices de
+palavras-chave. Na inicialização os workers carregam o bundle em
+milissegundos e só voltam a parsear YAML quando algum arquivo de origem
+mudou desde a compilação.
+"""
+import os
+import time
+import pickle
+import pathlib
+import logging
+from typing import Dict, Any, Optional, Iterable
+
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FILE = "policy_bundle.pkl"
+
+# Incrementar quando o formato do conteúdo compilado mudar
+BUNDLE_FORMAT = 1
+
+REQUIRED_KEYS = ("automations", "confirm_targets", "procedures", "compiled_rules", "keywords")
+
+
+def source_stamps(policies_dir: pathlib.Path, filenames: Iterable[str]) -> Dict[str, Any]:
+    """
+    Carimbos (mtime_ns, tamanho) dos YAMLs de origem.
+
+    Args:
+        policies_dir: Diretório das políticas
+        filenames: Arquivos de origem
+
+    Returns:
+        Dict arquivo -> carimbo (None se ausente)
+    """
+    stamps = {}
+    for name in filenames:
+        try:
+            st = os.stat(policies_dir / name)
+            stamps[name] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamps[name] = None
+    return stamps
+
+
+def load_bundle(policies_dir: pathlib.Path, filenames: Iterable[str]) -> Optional[Dict[str, Any]]:
+    """
+    Carrega o bundle se existir, for válido e estiver em dia com os YAMLs.
+
+    Args:
+        policies_dir: Diretório das políticas
+        filenames: Arquivos de origem usados para checar se está desatualizado
+
+    Returns:
+        Conteúdo do bundle ou None (ausente, inválido ou desatualizado)
+    """
+    path = policies_dir / BUNDLE_FILE
+    if not path.exists():
+        return None
+
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            bundle = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Bundle de políticas ilegível, voltando ao YAML: {e}")
+        return None
+
+    if not isinstance(bundle, dict) or bundle.get("format") != BUNDLE_FORMAT:
+        return None
+    if any(key not in bundle for key in REQUIRED_KEYS):
+        return None
+    if bundle.get("sources") != source_stamps(policies_dir, filenames):
+        log_structured("info", "policy_bundle_stale", {"path": str(path)})
+        return None
+
+    log_structured("info", "policy_bundle_loaded", {
+        "path": str(path),
+        "load_ms": round((time.perf_counter() - start) * 1000, 2)
+    })
+    return bundle
+
+
+def write_bundle(
+    policies_dir: pathlib.Path,
+    filenames: Iterable[str],
+    snapshot
+) -> bool:
+    """
+    Grava o bundle compilado de forma atômica (arquivo temporário + rename).
+
+    Args:
+        policies_dir: Diretório das políticas
+        filenames: Arquivos de origem cujos carimbos vão no bundle
+        snapshot: CatalogSnapshot já validado e compilado
+
+    Returns:
+        True se gravou
+    """
+    if not policies_dir.exists():
+        return False
+
+    bundle = {
+        "format": BUNDLE_FORMAT,
+        "sources": source_stamps(policies_dir, filenames),
+        "compiled_at": time.time(),
+        "automations": snapshot.automations,
+        "confirm_targets": snapshot.confirm_targets,
+        "procedures": snapshot.procedures,
+        "compiled_rules": snapshot.compiled_rules,
+        "keywords": snapshot.keywords,
+    }
+
+    path = policies_dir / BUNDLE_FILE
+    tmp_path = path.with_suffix(f".tmp{os.getpid()}")
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"Erro ao gravar bundle de políticas: {e}")
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        return False
+
+    log_structured("info", "policy_bundle_written", {
+        "path": str(path),
+        "automations": len(snapshot.automations),
+        "procedures": len(snapshot.procedures)
+    })
+    return True
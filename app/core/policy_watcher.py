@@ -0,0 +1,300 @@
+"""
+Policy Watcher - Invalidação de políticas entre workers
+
+Mantém um carimbo de versão por componente (catálogo, KB, prompt RAG) e
+recarrega atomicamente o componente quando ele muda:
+
+- Localmente: uma task em background compara mtime/tamanho dos arquivos
+  (nenhuma checagem de disco acontece no caminho das requisições).
+- Entre workers: quem salvou publica no canal Redis POLICY_CHANNEL e os
+  demais processos recarregam ao receber a mensagem.
+"""
+import os
+import json
+import uuid
+import asyncio
+import pathlib
+import logging
+from typing import Dict, Optional, Tuple, List, Callable
+
+from app.settings import settings
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+COMPONENT_CATALOG = "catalog"
+COMPONENT_KB = "kb"
+COMPONENT_PROMPT = "prompt"
+COMPONENTS = (COMPONENT_CATALOG, COMPONENT_KB, COMPONENT_PROMPT)
+
+# Canal Redis de notificação de mudanças
+POLICY_CHANNEL = "mb:policies:changed"
+
+FileStamp = Optional[Tuple[int, int]]
+
+
+def _default_paths() -> Dict[str, List[pathlib.Path]]:
+    """Arquivos observados por componente."""
+    from app.core import catalog_store, rag_service, rag_prompt_manager
+
+    policies_dir = catalog_store.POLICIES_DIR
+    return {
+        COMPONENT_CATALOG: [
+            policies_dir / catalog_store.CATALOG_FILE,
+            policies_dir / catalog_store.CONFIRM_TARGETS_FILE,
+            policies_dir / catalog_store.PROCEDURES_FILE,
+        ],
+        COMPONENT_KB: [rag_service.KB_FILE],
+        COMPONENT_PROMPT: [pathlib.Path(rag_prompt_manager.CUSTOM_PROMPT_PATH)],
+    }
+
+
+def _reload_catalog() -> None:
+    from app.core.catalog_store import get_catalog_store
+    get_catalog_store().reload()
+
+
+def _reload_kb() -> None:
+    from app.core.rag_service import recarregar_kb
+    from app.core.fallback_kb import reload_knowledge_base
+    recarregar_kb()
+    reload_knowledge_base()
+
+
+def _reload_prompt() -> None:
+    from app.core.rag_prompt_manager import invalidate_prompt_cache
+    invalidate_prompt_cache()
+
+
+DEFAULT_RELOADERS: Dict[str, Callable[[], None]] = {
+    COMPONENT_CATALOG: _reload_catalog,
+    COMPONENT_KB: _reload_kb,
+    COMPONENT_PROMPT: _reload_prompt,
+}
+
+
+def _stamp(path: pathlib.Path) -> FileStamp:
+    """Carimbo barato do arquivo: (mtime_ns, tamanho) ou None se ausente."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class PolicyWatcher:
+    """Observa arquivos de políticas e propaga recargas entre processos."""
+
+    def __init__(
+        self,
+        paths: Optional[Dict[str, List[pathlib.Path]]] = None,
+        reloaders: Optional[Dict[str, Callable[[], None]]] = None,
+        interval_ms: Optional[int] = None
+    ):
+        self.paths = paths if paths is not None else _default_paths()
+        self.reloaders = reloaders if reloaders is not None else DEFAULT_RELOADERS
+        self.interval = (interval_ms or settings.POLICY_WATCH_INTERVAL_MS) / 1000.0
+        self.origin = uuid.uuid4().hex
+        self.versions: Dict[str, int] = {c: 0 for c in self.paths}
+        self._stamps: Dict[str, Tuple[FileStamp, ...]] = {
+            c: self._component_stamps(c) for c in self.paths
+        }
+        self._tasks: List[asyncio.Task] = []
+        self._redis = None
+
+    def _component_stamps(self, component: str) -> Tuple[FileStamp, ...]:
+        return tuple(_stamp(p) for p in self.paths.get(component, []))
+
+    def reload_component(self, component: str, source: str) -> int:
+        """
+        Recarrega um componente e incrementa sua versão.
+
+        Args:
+            component: catalog | kb | prompt
+            source: Origem da recarga (file, pubsub, local)
+
+        Returns:
+            Nova versão do componente
+        """
+        reloader = self.reloaders.get(component)
+        if reloader is None:
+            logger.warning(f"Componente de política desconhecido: {component}")
+            return self.versions.get(component, 0)
+
+        try:
+            reloader()
+        except Exception as e:
+            log_structured("error", "policy_reload_error", {
+                "component": component,
+                "source": source,
+                "error": str(e)
+            })
+            return self.versions.get(component, 0)
+
+        return self._mark_reloaded(component, source)
+
+    def _mark_reloaded(self, component: str, source: str) -> int:
+        """Atualiza carimbos (evita recarga dupla no próximo ciclo) e versão."""
+        self._stamps[component] = self._component_stamps(component)
+        self.versions[component] = self.versions.get(component, 0) + 1
+
+        log_structured("info", "policy_reloaded", {
+            "component": component,
+            "source": source,
+            "version": self.versions[component]
+        })
+        return self.versions[component]
+
+    def check_once(self) -> List[str]:
+        """
+        Compara carimbos dos arquivos e recarrega o que mudou.
+
+        Returns:
+            Lista de componentes recarregados
+        """
+        changed = []
+        for component in self.paths:
+            stamps = self._component_stamps(component)
+            if stamps != self._stamps.get(component):
+                self.reload_component(component, source="file")
+                changed.append(component)
+        return changed
+
+    async def notify(self, component: str, reload: bool = True) -> int:
+        """
+        Recarrega localmente e avisa os demais workers via Redis.
+
+        Args:
+            component: Componente alterado
+            reload: False quando o chamador já trocou o estado em memória
+
+        Returns:
+            Nova versão local do componente
+        """
+        if reload:
+            version = self.reload_component(component, source="local")
+        else:
+            version = self._mark_reloaded(component, source="local")
+        await self._publish(component)
+        return version
+
+    async def _publish(self, component: str) -> None:
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.publish(POLICY_CHANNEL, json.dumps({
+                "component": component,
+                "origin": self.origin
+            }))
+        except Exception as e:
+            log_structured("warning", "policy_publish_error", {
+                "component": component,
+                "error": str(e)
+            })
+
+    def handle_message(self, raw: str) -> Optional[str]:
+        """
+        Processa mensagem do canal; ignora as publicadas por este processo.
+
+        Returns:
+            Componente recarregado ou None
+        """
+        try:
+            message = json.loads(raw)
+        except (TypeError, ValueError):
+            return None
+
+        component = message.get("component")
+        if message.get("origin") == self.origin or component not in self.reloaders:
+            return None
+
+        self.reload_component(component, source="pubsub")
+        return component
+
+    def _get_redis(self):
+        if not settings.REDIS_URL:
+            return None
+        if self._redis is None:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        return self._redis
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.check_once()
+            except Exception as e:
+                logger.error(f"Erro no watcher de políticas: {e}")
+
+    async def _pubsub_loop(self) -> None:
+        client = self._get_redis()
+        if client is None:
+            return
+        while True:
+            try:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(POLICY_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.handle_message(message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log_structured("warning", "policy_pubsub_error", {"error": str(e)})
+                await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        """Inicia as tasks de observação (chamado no startup da aplicação)."""
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._poll_loop()))
+        if settings.REDIS_URL:
+            self._tasks.append(asyncio.create_task(self._pubsub_loop()))
+        log_structured("info", "policy_watcher_started", {
+            "interval_ms": int(self.interval * 1000),
+            "pubsub": bool(settings.REDIS_URL)
+        })
+
+    async def stop(self) -> None:
+        """Cancela as tasks e fecha a conexão Redis."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks = []
+        if self._redis is not None:
+            try:
+                await self._redis.close()
+            except Exception:
+                pass
+            self._redis = None
+
+
+# Instância global do watcher
+_policy_watcher: Optional[PolicyWatcher] = None
+
+def get_policy_watcher() -> PolicyWatcher:
+    """Obtém instância singleton do watcher de políticas."""
+    global _policy_watcher
+    if _policy_watcher is None:
+        _policy_watcher = PolicyWatcher()
+    return _policy_watcher
+
+
+async def notify_policy_change(component: str, reload: bool = True) -> int:
+    """
+    Atalho para rotas de escrita: recarrega e propaga a mudança.
+
+    Args:
+        component: catalog | kb | prompt
+        reload: False quando o estado em memória já foi trocado pelo chamador
+
+    Returns:
+        Nova versão local do componente
+    """
+    return await get_policy_watcher().notify(component, reload=reload)
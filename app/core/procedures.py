@@ -3,31 +3,48 @@ Procedures - Executor de procedimentos (funil de passos)
 
 Executa funil flexível de procedimentos por passos sem "verificação ativa".
 Para no primeiro passo não satisfeito e dispara 1 automação.
+
+O progresso de cada lead (passo atual + valores dos fatos de que os passos
+já avaliados dependem) fica em ContextoLead.progresso_procedimento. Um turno
+só reavalia condições quando algum desses fatos mudou, a partir do primeiro
+passo afetado.
 """
-import yaml
-import pathlib
+import json
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 from app.data.schemas import Env
-from app.core.selector import evaluate_eligibility_rule, convert_automation_to_action, load_catalog
+from app.core.selector import evaluate_eligibility_rule, convert_automation_to_action
+from app.core.catalog_store import get_catalog_store
+from app.core.eligibility import (
+    compile_eligibility_rule, evaluate_compiled_rule, rule_dependencies, read_fact
+)
 
 logger = logging.getLogger(__name__)
 
-# Cache dos procedimentos carregados
-_PROCEDURES_CACHE: Optional[List[Dict[str, Any]]] = None
+# Nome de etapa gravado em ContextoLead.etapa_ativa quando o funil termina
+ETAPA_CONCLUIDA = "Concluído"
+
+# Passos compilados por (versão do catálogo, procedimento)
+_COMPILED_CACHE: Dict[Tuple[int, str], Dict[str, Any]] = {}
 
 
-async def run_procedure(proc_id: str, env: Env) -> Dict[str, Any]:
+async def run_procedure(
+    proc_id: str,
+    env: Env,
+    progress: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
     """
     Executa procedimento específico contra o snapshot do lead.
     
     Args:
         proc_id: ID do procedimento a ser executado
         env: Ambiente com snapshot do lead
+        progress: Progresso salvo do lead (ContextoLead.progresso_procedimento)
         
     Returns:
-        Plano com ações a serem executadas
+        Plano com ações a serem executadas e progresso atualizado
     """
     logger.info(f"Executando procedimento: {proc_id}")
     
@@ -36,30 +53,19 @@ async def run_procedure(proc_id: str, env: Env) -> Dict[str, Any]:
         logger.error(f"Procedimento não encontrado: {proc_id}")
         return {"decision_id": "proc_error", "actions": []}
     
-    snapshot = env.snapshot
     actions = []
-    
-    # Avaliar cada passo em ordem
-    for i, step in enumerate(proc.get("steps", [])):
-        step_name = step.get("name", f"Step {i+1}")
-        condition = step.get("condition", "")
-        
-        logger.info(f"Avaliando passo: {step_name}")
-        
-        # Verificar se o passo está satisfeito
-        if is_step_satisfied(condition, snapshot):
-            logger.info(f"Passo satisfeito: {step_name}")
-            continue
-        
-        # Passo não satisfeito - executar ação e parar
-        logger.info(f"Passo não satisfeito: {step_name} - executando ação")
+    progress = advance_procedure(proc_id, env.snapshot, progress)
+    step_index = progress["step_index"]
+    steps = proc.get("steps", [])
+    
+    # Passo não satisfeito - executar ação e parar
+    if step_index < len(steps):
+        step = steps[step_index]
+        logger.info(f"Passo não satisfeito: {progress['current_step']} - executando ação")
         
         step_action = await execute_step_action(step, env)
         if step_action:
             actions.append(step_action)
-        
-        # Parar no primeiro passo não satisfeito
-        break
     
     # Se todos os passos foram satisfeitos, executar ação final
     if not actions and proc.get("steps"):
@@ -82,57 +88,164 @@ async def run_procedure(proc_id: str, env: Env) -> Dict[str, Any]:
     
     return {
         "decision_id": f"proc_{proc_id}_{len(actions)}",
-        "actions": actions
+        "actions": actions,
+        "progress": progress
     }
 
 
-def find_procedure(proc_id: str) -> Optional[Dict[str, Any]]:
+def compile_procedure(proc_id: str) -> Optional[Dict[str, Any]]:
     """
-    Busca procedimento por ID.
+    Compila os passos do procedimento (regra + fatos dependentes por passo).
     
     Args:
         proc_id: ID do procedimento
         
     Returns:
-        Definição do procedimento ou None
+        {"signature", "steps": [{name, compiled, deps}]} ou None
     """
-    procedures = load_procedures()
+    store = get_catalog_store()
+    cache_key = (store.version, proc_id)
+    cached = _COMPILED_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    proc = store.get_procedure(proc_id)
+    if not proc:
+        return None
     
-    for proc in procedures:
-        if proc.get("id") == proc_id:
-            return proc
+    steps = []
+    for i, step in enumerate(proc.get("steps", [])):
+        compiled = compile_eligibility_rule(step.get("condition", "") or "")
+        steps.append({
+            "name": step.get("name", f"Step {i+1}"),
+            "compiled": compiled,
+            "deps": rule_dependencies(compiled)
+        })
+    
+    # Assinatura estável entre processos: muda só se os passos mudarem
+    raw = json.dumps(proc.get("steps", []), sort_keys=True, default=str)
+    compiled_proc = {
+        "signature": hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16],
+        "steps": steps
+    }
     
-    return None
+    # Descartar entradas de versões antigas do catálogo
+    for key in [k for k in _COMPILED_CACHE if k[0] != store.version]:
+        del _COMPILED_CACHE[key]
+    _COMPILED_CACHE[cache_key] = compiled_proc
+    return compiled_proc
 
 
-def load_procedures() -> List[Dict[str, Any]]:
+def advance_procedure(
+    proc_id: str,
+    snapshot,
+    progress: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
     """
-    Carrega procedimentos do arquivo YAML.
+    Atualiza o progresso do lead reavaliando só o necessário.
+    
+    Se nenhum fato observado mudou, o progresso salvo é devolvido sem avaliar
+    nenhuma condição. Caso contrário a avaliação recomeça no primeiro passo
+    cuja dependência mudou (nunca depois do passo atual).
     
+    Args:
+        proc_id: ID do procedimento
+        snapshot: Snapshot do lead
+        progress: Progresso salvo (None = avaliar desde o início)
+        
     Returns:
-        Lista de procedimentos
+        Novo progresso ou None se o procedimento não existe
     """
-    global _PROCEDURES_CACHE
+    compiled_proc = compile_procedure(proc_id)
+    if compiled_proc is None:
+        return None
     
-    if _PROCEDURES_CACHE is not None:
-        return _PROCEDURES_CACHE
+    steps = compiled_proc["steps"]
+    start = 0
     
-    procedures_path = pathlib.Path("policies") / "procedures.yml"
+    if (progress and progress.get("procedure_id") == proc_id and
+            progress.get("signature") == compiled_proc["signature"]):
+        current = min(int(progress.get("step_index", 0)), len(steps))
+        facts = progress.get("facts") or {}
+        changed = {path for path, value in facts.items() if read_fact(snapshot, path) != value}
+        
+        if not changed:
+            return progress
+        
+        start = current
+        for i in range(current):
+            if changed.intersection(steps[i]["deps"]):
+                start = i
+                break
+        logger.info(f"Procedimento {proc_id}: fatos alterados {sorted(changed)}, reavaliando do passo {start}")
+    
+    # Avançar até o primeiro passo não satisfeito
+    index = start
+    while index < len(steps) and evaluate_compiled_rule(steps[index]["compiled"], snapshot):
+        index += 1
+    
+    # Fatos observados: passos satisfeitos + passo atual
+    facts = {}
+    for step in steps[:index + 1]:
+        for path in step["deps"]:
+            facts[path] = read_fact(snapshot, path)
     
-    if not procedures_path.exists():
-        logger.error(f"Arquivo de procedimentos não encontrado: {procedures_path}")
-        return []
+    return {
+        "procedure_id": proc_id,
+        "signature": compiled_proc["signature"],
+        "step_index": index,
+        "total_steps": len(steps),
+        "current_step": steps[index]["name"] if index < len(steps) else ETAPA_CONCLUIDA,
+        "facts": facts
+    }
+
+
+def summarize_progress(progress: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Resumo do progresso salvo, sem reavaliar nada (O(1) por lead).
     
-    try:
-        with open(procedures_path, "r", encoding="utf-8") as f:
-            _PROCEDURES_CACHE = yaml.safe_load(f) or []
+    Args:
+        progress: ContextoLead.progresso_procedimento
         
-        logger.info(f"Procedimentos carregados: {len(_PROCEDURES_CACHE)}")
-        return _PROCEDURES_CACHE
+    Returns:
+        Resumo para o Studio ou None se não há progresso
+    """
+    if not progress or not progress.get("procedure_id"):
+        return None
+    
+    total_steps = progress.get("total_steps", 0)
+    completed_steps = min(progress.get("step_index", 0), total_steps)
+    return {
+        "procedure_id": progress["procedure_id"],
+        "current_step": progress.get("current_step"),
+        "completed_steps": completed_steps,
+        "total_steps": total_steps,
+        "progress": completed_steps / total_steps if total_steps > 0 else 0.0,
+        "is_complete": completed_steps == total_steps
+    }
+
+
+def find_procedure(proc_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Busca procedimento por ID.
+    
+    Args:
+        proc_id: ID do procedimento
         
-    except Exception as e:
-        logger.error(f"Erro ao carregar procedimentos: {str(e)}")
-        return []
+    Returns:
+        Definição do procedimento ou None
+    """
+    return get_catalog_store().get_procedure(proc_id)
+
+
+def load_procedures() -> List[Dict[str, Any]]:
+    """
+    Retorna procedimentos da store em memória.
+    
+    Returns:
+        Lista de procedimentos
+    """
+    return get_catalog_store().procedures
 
 
 def is_step_satisfied(condition: str, snapshot) -> bool:
@@ -215,29 +328,27 @@ def find_automation_by_id(automation_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Automação do catálogo ou None
     """
-    catalog = load_catalog()
-    
-    for automation in catalog:
-        if automation.get("id") == automation_id:
-            return automation
-    
-    return None
+    return get_catalog_store().get_automation(automation_id)
 
 
 def reload_procedures():
     """Força recarga dos procedimentos (útil para desenvolvimento)."""
-    global _PROCEDURES_CACHE
-    _PROCEDURES_CACHE = None
-    logger.info("Cache dos procedimentos limpo - será recarregado na próxima consulta")
+    get_catalog_store().reload()
+    logger.info("Procedimentos recarregados do disco")
 
 
-def get_procedure_status(proc_id: str, snapshot) -> Dict[str, Any]:
+def get_procedure_status(
+    proc_id: str,
+    snapshot,
+    progress: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
     """
     Obtém status de progresso de um procedimento.
     
     Args:
         proc_id: ID do procedimento
         snapshot: Snapshot do lead
+        progress: Progresso salvo do lead (evita reavaliar passos)
         
     Returns:
         Status do procedimento com progresso dos passos
@@ -247,25 +358,17 @@ def get_procedure_status(proc_id: str, snapshot) -> Dict[str, Any]:
     if not proc:
         return {"error": "Procedimento não encontrado"}
     
-    steps_status = []
-    completed_steps = 0
+    progress = advance_procedure(proc_id, snapshot, progress)
+    completed_steps = progress["step_index"]
     
-    for i, step in enumerate(proc.get("steps", [])):
-        step_name = step.get("name", f"Step {i+1}")
-        condition = step.get("condition", "")
-        satisfied = is_step_satisfied(condition, snapshot)
-        
+    # Passos satisfeitos + primeiro não satisfeito
+    steps_status = []
+    for i, step in enumerate(proc.get("steps", [])[:completed_steps + 1]):
         steps_status.append({
-            "name": step_name,
-            "condition": condition,
-            "satisfied": satisfied
+            "name": step.get("name", f"Step {i+1}"),
+            "condition": step.get("condition", ""),
+            "satisfied": i < completed_steps
         })
-        
-        if satisfied:
-            completed_steps += 1
-        else:
-            # Parar no primeiro não satisfeito
-            break
     
     total_steps = len(proc.get("steps", []))
     progress = completed_steps / total_steps if total_steps > 0 else 0.0
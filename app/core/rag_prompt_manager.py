@@ -4,9 +4,17 @@ Permite usar prompt personalizado se existir, senão usa o padrão.
 """
 import logging
 import os
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Arquivo do prompt personalizado
+CUSTOM_PROMPT_PATH = "/app/policies/rag_prompt_custom.txt"
+
+# Cache do prompt personalizado ("" = sem prompt personalizado)
+# Invalidado pelo watcher de políticas quando o arquivo muda
+_CUSTOM_PROMPT_CACHE: Optional[str] = None
+
 # Template padrão para RAG (formato especificado pelo usuário)
 DEFAULT_TEMPLATE = """[OBJETIVO]
 Responder a mensagem atual do lead analisando TODOS os contextos disponíveis da FAQ.
@@ -33,23 +41,38 @@ Pergunta: Ele usa sinais? Se sim, opera todo dia?
 Contextos: 1) "Não depende de sinais, opera sozinho" 2) "Para OTC usa sinais só sábado e domingo"
 Resposta correta: Não depende de sinais em geral, mas para OTC usa sinais só nos fins de semana."""
 
-def get_current_rag_prompt():
+
+def _load_custom_prompt() -> str:
     """
-    Retorna o template de prompt RAG atual.
-    Usa personalizado se existir, senão usa o padrão.
+    Lê o prompt personalizado do disco uma vez e mantém em cache.
     """
-    custom_prompt_path = "/app/policies/rag_prompt_custom.txt"
-    
+    global _CUSTOM_PROMPT_CACHE
+
+    if _CUSTOM_PROMPT_CACHE is not None:
+        return _CUSTOM_PROMPT_CACHE
+
+    custom_template = ""
     try:
-        if os.path.exists(custom_prompt_path):
-            with open(custom_prompt_path, 'r', encoding='utf-8') as f:
+        if os.path.exists(CUSTOM_PROMPT_PATH):
+            with open(CUSTOM_PROMPT_PATH, 'r', encoding='utf-8') as f:
                 custom_template = f.read().strip()
-                if custom_template:  # Só usa se não estiver vazio
-                    logger.debug("Usando prompt RAG personalizado")
-                    return custom_template
     except Exception as e:
         logger.warning(f"Erro ao carregar prompt personalizado: {e}")
-    
+        return ""
+
+    _CUSTOM_PROMPT_CACHE = custom_template
+    return custom_template
+
+def get_current_rag_prompt():
+    """
+    Retorna o template de prompt RAG atual.
+    Usa personalizado se existir, senão usa o padrão.
+    """
+    custom_template = _load_custom_prompt()
+    if custom_template:  # Só usa se não estiver vazio
+        logger.debug("Usando prompt RAG personalizado")
+        return custom_template
+
     logger.debug("Usando prompt RAG padrão")
     return DEFAULT_TEMPLATE.strip()
 
@@ -57,15 +80,14 @@ def save_custom_rag_prompt(template: str):
     """
     Salva um template de prompt personalizado.
     """
-    custom_prompt_path = "/app/policies/rag_prompt_custom.txt"
-    
     try:
         # Criar diretório se não existir
-        os.makedirs(os.path.dirname(custom_prompt_path), exist_ok=True)
-        
-        with open(custom_prompt_path, 'w', encoding='utf-8') as f:
+        os.makedirs(os.path.dirname(CUSTOM_PROMPT_PATH), exist_ok=True)
+
+        with open(CUSTOM_PROMPT_PATH, 'w', encoding='utf-8') as f:
             f.write(template)
-            
+
+        invalidate_prompt_cache()
         logger.info(f"Prompt RAG personalizado salvo: {len(template)} caracteres")
         return True
     except Exception as e:
@@ -76,11 +98,9 @@ def is_using_custom_prompt():
     """
     Retorna True se está usando prompt personalizado, False se padrão.
     """
-    custom_prompt_path = "/app/policies/rag_prompt_custom.txt"
-    try:
-        if os.path.exists(custom_prompt_path):
-            with open(custom_prompt_path, 'r', encoding='utf-8') as f:
-                return bool(f.read().strip())
-    except:
-        pass
-    return False
+    return bool(_load_custom_prompt())
+
+def invalidate_prompt_cache():
+    """Descarta o prompt em cache; a próxima leitura volta ao disco."""
+    global _CUSTOM_PROMPT_CACHE
+    _CUSTOM_PROMPT_CACHE = None
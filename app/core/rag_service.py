@@ -33,7 +33,9 @@ class RagService:
     """Serviço de RAG com cache por tópico."""
     
     def __init__(self):
-        self._carregar_kb()
+        # KB é carregada uma vez por processo; recargas vêm do watcher de políticas
+        if _KB_CACHE is None:
+            self._carregar_kb()
     
     async def buscar_contexto_kb(
         self, 
@@ -241,7 +243,9 @@ class RagService:
         
         try:
             conteudo = KB_FILE.read_text(encoding="utf-8")
-            _KB_CACHE = self._parsear_md(conteudo)
+            # Parsear antes de publicar para que leitores nunca vejam KB parcial
+            secoes = self._parsear_md(conteudo)
+            _KB_CACHE = secoes
             logger.info(f"KB carregada: {len(_KB_CACHE)} seções")
         except Exception as e:
             logger.error(f"Erro ao carregar KB: {e}")
@@ -312,6 +316,19 @@ class RagService:
         logger.info("Cache RAG limpo")
 
 
+def recarregar_kb() -> int:
+    """
+    Relê a KB do disco, troca o índice em memória e descarta o cache RAG.
+
+    Returns:
+        Número de seções carregadas
+    """
+    service = RagService()
+    service._carregar_kb()
+    service.limpar_cache()
+    return len(_KB_CACHE or [])
+
+
 def get_rag_service() -> RagService:
     """Factory para criar instância do serviço RAG."""
     return RagService()
@@ -1,10 +1,10 @@
 """
-Serviço para entender respostas curtas ('sim/não') via regex e LLM fallback.
+Serviço para entender respostas curtas ('sim/não') via classificador e LLM fallback.
 
-Interpreta confirmações por texto usando padrões regex e LLM como fallback
-quando a mensagem é ambígua.
+Interpreta confirmações por texto usando o classificador determinístico
+(app.core.confirmation_classifier) e LLM como fallback quando a mensagem
+é ambígua.
 """
-import re
 import json
 import logging
 import asyncio
@@ -13,12 +13,15 @@ from openai import AsyncOpenAI
 
 from app.data.schemas import ContextoLead, Snapshot, Message, ConfirmacaoCurta
 from app.settings import settings
+from app.core.decision_mode import is_deterministic_only, llm_slot
+from app.core.degradation import gate_llm_enabled
+from app.core.llm_call import call_llm
+from app.core.confirmation_classifier import classify_confirmation, get_confirmation_metrics
 
 logger = logging.getLogger(__name__)
 
-# Patterns regex para detecção de confirmações
-PADRAO_AFIRMACAO = re.compile(r'^\s*(sim|s|ok|claro|consigo|bora|vamos|aceito|concordo|pode|perfeito)\s*$', re.IGNORECASE)
-PADRAO_NEGACAO = re.compile(r'^\s*(não|nao|n|agora não|ainda não|nunca|jamais|negativo)\s*$', re.IGNORECASE)
+# Polaridade do classificador → posição da resposta curta
+POSICAO_POR_POLARIDADE = {"yes": "afirmacao", "no": "negacao"}
 
 # Timeout para LLM (1.5s)
 LLM_TIMEOUT = 1.5
@@ -48,6 +51,7 @@ class RespostaCurtaService:
     
     def __init__(self):
         self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
+        self.metrics = get_confirmation_metrics()
     
     async def interpretar_resposta(
         self,
@@ -76,40 +80,65 @@ class RespostaCurtaService:
         if aguardando.get("tipo") != "confirmacao":
             return None
         
-        # Primeiro, tentar regex
+        # Primeiro, o classificador determinístico
         posicao_regex = self._detectar_por_regex(mensagem)
         if posicao_regex:
-            logger.info(f"Resposta curta detectada por regex: {posicao_regex}")
+            logger.info(f"Resposta curta detectada pelo classificador: {posicao_regex}")
+            self.metrics.record("classifier")
             return posicao_regex
         
-        # Se não deu match por regex e mensagem é curta/ambígua, usar LLM
+        # Abaixo do limiar e mensagem curta/ambígua: sinais do intake, senão LLM
         if self._eh_mensagem_curta_ambigua(mensagem):
+            posicao_intake = self._posicao_por_sinais_intake(aguardando, snapshot)
+            if posicao_intake:
+                logger.info(f"Resposta curta resolvida pelos sinais do intake: {posicao_intake}")
+                self.metrics.record("intake")
+                return posicao_intake
+            
             logger.info("Mensagem curta ambígua, tentando LLM fallback")
             posicao_llm = await self._interpretar_com_llm(
                 mensagem, aguardando, snapshot, messages_window
             )
+            self.metrics.record("llm" if posicao_llm else "unresolved")
             return posicao_llm
         
         return None
     
     def _detectar_por_regex(self, mensagem: str) -> Optional[str]:
         """
-        Detecta confirmação usando padrões regex.
+        Detecta confirmação com o classificador determinístico.
         
         Args:
             mensagem: Texto da mensagem
             
         Returns:
-            'afirmacao', 'negacao' ou None
+            'afirmacao', 'negacao' ou None (abaixo do limiar ou adiamento)
         """
-        mensagem_limpa = mensagem.strip()
-        
-        if PADRAO_AFIRMACAO.match(mensagem_limpa):
-            return "afirmacao"
-        elif PADRAO_NEGACAO.match(mensagem_limpa):
-            return "negacao"
+        classification = classify_confirmation(mensagem)
+        if classification.confidence < settings.CONFIRM_CLASSIFIER_THRESHOLD:
+            return None
+        return POSICAO_POR_POLARIDADE.get(classification.polarity)
+    
+    def _posicao_por_sinais_intake(self, aguardando: Dict[str, Any], snapshot: Snapshot) -> Optional[str]:
+        """
+        Reaproveita a classificação do intake para o target aguardado.
         
-        return None
+        Args:
+            aguardando: Estado de aguardando confirmação
+            snapshot: Snapshot com llm_signals do intake
+            
+        Returns:
+            'afirmacao', 'negacao' ou None se ausente/baixa confiança
+        """
+        signals = getattr(snapshot, "llm_signals", None) or {}
+        confidence = signals.get("confidence")
+        if signals.get("error") or not isinstance(confidence, (int, float)):
+            return None
+        if confidence < settings.CONFIRM_AGENT_THRESHOLD:
+            return None
+        target = aguardando.get("target") or aguardando.get("fato")
+        polarity = (signals.get("targets") or {}).get(target)
+        return POSICAO_POR_POLARIDADE.get(polarity)
     
     def _eh_mensagem_curta_ambigua(self, mensagem: str) -> bool:
         """
@@ -147,6 +176,10 @@ class RespostaCurtaService:
             logger.warning("Cliente OpenAI não configurado")
             return None
         
+        if is_deterministic_only() or not gate_llm_enabled():
+            logger.info("Modo determinístico: LLM de resposta curta ignorado")
+            return None
+        
         try:
             # Preparar contexto para o LLM
             pergunta_pendente = aguardando.get("origem", "pergunta não especificada")
@@ -171,15 +204,17 @@ class RespostaCurtaService:
             )
             
             # Chamar LLM com timeout
-            response = await asyncio.wait_for(
-                self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=100,
-                    temperature=0.1
-                ),
-                timeout=LLM_TIMEOUT
-            )
+            self.metrics.record_llm_call()
+            async with llm_slot():
+                response = await asyncio.wait_for(
+                    call_llm("resposta_curta", self.client.chat.completions.create,
+                        model="gpt-3.5-turbo",
+                        messages=[{"role": "user", "content": prompt}],
+                        max_tokens=100,
+                        temperature=0.1
+                    ),
+                    timeout=LLM_TIMEOUT
+                )
             
             content = response.choices[0].message.content.strip()
             logger.info(f"Resposta LLM: {content}")
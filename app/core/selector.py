@@ -4,18 +4,15 @@ Selector - Escolhedor de automações
 Escolhe automação por regras em PT-BR (compiladas para predicados).
 Avalia elegibilidade do catálogo contra o snapshot do lead.
 """
-import yaml
-import pathlib
 import logging
 from typing import Dict, Any, Optional, List
 
 from app.data.schemas import Env
+from app.core.catalog_store import get_catalog_store
+from app.core.eligibility import compile_eligibility_rule, evaluate_compiled_rule, extract_keywords
 
 logger = logging.getLogger(__name__)
 
-# Cache do catálogo carregado
-_CATALOG_CACHE: Optional[List[Dict[str, Any]]] = None
-
 
 async def select_automation(env: Env) -> Optional[Dict[str, Any]]:
     """
@@ -48,6 +45,10 @@ async def select_automation(env: Env) -> Optional[Dict[str, Any]]:
             eligible_automations.append(automation)
             logger.info(f"Automação elegível: {automation.get('id', 'unknown')}")
     
+    # Cooldown/limite diário de todas as candidatas em um único round trip
+    if eligible_automations and env.lead.id:
+        eligible_automations = filter_by_cooldown(env.lead.id, eligible_automations)
+    
     if not eligible_automations:
         logger.info("Nenhuma automação elegível encontrada")
         return None
@@ -66,34 +67,37 @@ async def select_automation(env: Env) -> Optional[Dict[str, Any]]:
     return convert_automation_to_action(selected)
 
 
-def load_catalog() -> List[Dict[str, Any]]:
+def filter_by_cooldown(lead_id: int, automations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
-    Carrega catálogo de automações do arquivo YAML.
+    Remove automações em cooldown ou no limite diário para o lead.
     
+    Args:
+        lead_id: ID do lead
+        automations: Automações elegíveis
+        
     Returns:
-        Lista de automações do catálogo
+        Automações que ainda podem ser enviadas
     """
-    global _CATALOG_CACHE
-    
-    if _CATALOG_CACHE is not None:
-        return _CATALOG_CACHE
-    
-    catalog_path = pathlib.Path("policies") / "catalog.yml"
-    
-    if not catalog_path.exists():
-        logger.error(f"Arquivo de catálogo não encontrado: {catalog_path}")
-        return []
-    
     try:
-        with open(catalog_path, "r", encoding="utf-8") as f:
-            _CATALOG_CACHE = yaml.safe_load(f) or []
-        
-        logger.info(f"Catálogo carregado com {len(_CATALOG_CACHE)} automações")
-        return _CATALOG_CACHE
-        
+        from app.core.cooldown import get_cooldown_service
+        allowed = get_cooldown_service().check_many(
+            lead_id, [a.get("id") for a in automations if a.get("id")]
+        )
     except Exception as e:
-        logger.error(f"Erro ao carregar catálogo: {str(e)}")
-        return []
+        logger.warning(f"Error checking cooldowns: {e}")
+        return automations
+    
+    return [a for a in automations if allowed.get(a.get("id"), True)]
+
+
+def load_catalog() -> List[Dict[str, Any]]:
+    """
+    Retorna catálogo de automações da store em memória.
+    
+    Returns:
+        Lista de automações do catálogo
+    """
+    return get_catalog_store().automations
 
 
 def is_automation_eligible(automation: Dict[str, Any], snapshot, text: str) -> bool:
@@ -108,25 +112,30 @@ def is_automation_eligible(automation: Dict[str, Any], snapshot, text: str) -> b
     Returns:
         True se elegível, False caso contrário
     """
-    # Verificar tópico/contexto
-    topic = automation.get("topic", "")
-    use_when = automation.get("use_when", "").lower()
+    # Regras e palavras-chave já compiladas no snapshot do catálogo
+    catalog = get_catalog_store().snapshot
+    automation_id = automation.get("id")
+    keywords = catalog.keywords.get(automation_id)
+    compiled = catalog.compiled_rules.get(automation_id)
+    
+    # Automação fora do catálogo (ex: montada em teste): compilar na hora
+    if keywords is None or catalog.automations_by_id.get(automation_id) is not automation:
+        keywords = extract_keywords(automation)
+        compiled = compile_eligibility_rule(automation.get("eligibility", "") or "")
     
     # Verificar se o contexto da mensagem bate com o tópico
-    if topic and topic.lower() not in text:
+    topic, use_when_words = keywords
+    if topic and topic not in text:
         # Se não tem o tópico no texto, verificar use_when
-        if not any(word in text for word in use_when.split()):
+        if not any(word in text for word in use_when_words):
             return False
     
-    # Compilar e avaliar regra de elegibilidade
-    eligibility = automation.get("eligibility", "")
-    return evaluate_eligibility_rule(eligibility, snapshot)
+    return evaluate_compiled_rule(compiled, snapshot)
 
 
 def evaluate_eligibility_rule(rule: str, snapshot) -> bool:
     """
     Avalia regra de elegibilidade em PT-BR contra o snapshot.
-    TODO: Implementar compilador completo PT-BR → predicado.
     
     Args:
         rule: Regra em português
@@ -135,62 +144,7 @@ def evaluate_eligibility_rule(rule: str, snapshot) -> bool:
     Returns:
         True se a regra é satisfeita
     """
-    if not rule:
-        return True  # Sem regra = sempre elegível
-    
-    rule_lower = rule.lower()
-    
-    # Compilador heurístico básico
-    # TODO: Expandir para DSL completa
-    
-    # Regras de depósito
-    if "não concordou em depositar" in rule_lower:
-        can_deposit = snapshot.agreements.get("can_deposit", False)
-        if can_deposit:
-            return False
-    
-    if "concordou em depositar" in rule_lower and "não concordou" not in rule_lower:
-        can_deposit = snapshot.agreements.get("can_deposit", False)
-        if not can_deposit:
-            return False
-    
-    if "não depositou" in rule_lower:
-        deposit_status = snapshot.deposit.get("status", "nenhum")
-        if deposit_status in ["confirmado", "pendente"]:
-            return False
-    
-    if "já depositou" in rule_lower:
-        deposit_status = snapshot.deposit.get("status", "nenhum") 
-        if deposit_status not in ["confirmado", "pendente"]:
-            return False
-    
-    if "depósito confirmado" in rule_lower:
-        deposit_status = snapshot.deposit.get("status", "nenhum")
-        if deposit_status != "confirmado":
-            return False
-    
-    # Regras de conta
-    if "tem conta" in rule_lower and "não tem conta" not in rule_lower:
-        accounts = snapshot.accounts
-        has_account = any(status not in ["desconhecido", "unknown"] for status in accounts.values())
-        if not has_account:
-            return False
-    
-    if "não tem conta" in rule_lower:
-        accounts = snapshot.accounts
-        has_account = any(status not in ["desconhecido", "unknown"] for status in accounts.values())
-        if has_account:
-            return False
-    
-    # Regras de flags
-    if "explicado" in rule_lower:
-        explained = snapshot.flags.get("explained", False)
-        if "não foi explicado" in rule_lower and explained:
-            return False
-        if "foi explicado" in rule_lower and not explained:
-            return False
-    
-    return True
+    return evaluate_compiled_rule(compile_eligibility_rule(rule or ""), snapshot)
 
 
 def convert_automation_to_action(automation: Dict[str, Any]) -> Dict[str, Any]:
@@ -245,7 +199,7 @@ async def is_automation_applicable(automation: Dict[str, Any], env: Env) -> bool
 
 async def check_cooldown(automation_id: str, lead_id: int) -> bool:
     """
-    FASE 4: Verifica se automação não está em cooldown.
+    FASE 4: Verifica se automação não está em cooldown nem no limite diário.
     
     Args:
         automation_id: ID da automação
@@ -255,34 +209,8 @@ async def check_cooldown(automation_id: str, lead_id: int) -> bool:
         True se pode executar (não em cooldown)
     """
     try:
-        # Implementação simples - para produção seria melhor usar Redis
-        from app.core.contexto_lead import get_contexto_lead_service
-        
-        contexto_service = get_contexto_lead_service()
-        contexto = await contexto_service.obter_contexto(lead_id)
-        
-        if not contexto:
-            return True  # Sem contexto = pode executar
-        
-        # Verificar se última automação foi a mesma há pouco tempo
-        if (contexto.ultima_automacao_enviada == automation_id and 
-            contexto.atualizado_em):
-            import time
-            from datetime import datetime
-            
-            # Cooldown básico de 5 minutos para a mesma automação
-            cooldown_seconds = 300
-            if isinstance(contexto.atualizado_em, str):
-                last_update = datetime.fromisoformat(contexto.atualizado_em.replace('Z', '+00:00'))
-            else:
-                last_update = contexto.atualizado_em
-            
-            time_diff = (datetime.utcnow() - last_update.replace(tzinfo=None)).total_seconds()
-            if time_diff < cooldown_seconds:
-                logger.info(f"Automation {automation_id} in cooldown for lead {lead_id} (remaining: {cooldown_seconds - time_diff:.0f}s)")
-                return False
-        
-        return True
+        from app.core.cooldown import get_cooldown_service
+        return get_cooldown_service().check(lead_id, automation_id)
         
     except Exception as e:
         logger.warning(f"Error checking cooldown for {automation_id}: {e}")
@@ -291,6 +219,5 @@ async def check_cooldown(automation_id: str, lead_id: int) -> bool:
 
 def reload_catalog():
     """Força recarga do catálogo (útil para desenvolvimento)."""
-    global _CATALOG_CACHE
-    _CATALOG_CACHE = None
-    logger.info("Cache do catálogo limpo - será recarregado na próxima consulta")
+    get_catalog_store().reload()
+    logger.info("Catálogo recarregado do disco")
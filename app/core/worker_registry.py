@@ -0,0 +1,78 @@
+"""
+Worker Registry - Membros vivos do pool de workers
+
+Cada worker (com WORKER_URL definido) publica um heartbeat no sorted set
+mb:workers (score = timestamp). O dispatcher lê os membros com heartbeat
+recente e rebalanceia o anel quando alguém entra ou sai.
+"""
+import time
+import asyncio
+import logging
+from typing import List, Optional
+
+from app.settings import settings
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+WORKERS_KEY = "mb:workers"
+
+
+class WorkerRegistry:
+    """Heartbeat deste worker e leitura dos workers vivos."""
+
+    def __init__(self, redis=None, worker_url: Optional[str] = None):
+        if redis is None:
+            from app.redis_adapter import get_redis
+            redis = get_redis()
+        self.redis = redis
+        self.worker_url = worker_url if worker_url is not None else settings.WORKER_URL
+        self.interval = settings.WORKER_HEARTBEAT_MS / 1000
+        self.ttl = settings.WORKER_TTL_MS / 1000
+        self._task: Optional[asyncio.Task] = None
+
+    def heartbeat(self) -> None:
+        """Publica (ou renova) a presença deste worker."""
+        self.redis.zadd(WORKERS_KEY, {self.worker_url: time.time()})
+
+    def live_workers(self) -> List[str]:
+        """URLs dos workers com heartbeat dentro do TTL."""
+        return sorted(self.redis.zrangebyscore(WORKERS_KEY, time.time() - self.ttl, "+inf"))
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"Erro no heartbeat do worker: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        """Inicia o heartbeat (chamado no startup do worker)."""
+        if self._task is None and self.worker_url:
+            self._task = asyncio.create_task(self._loop())
+            log_structured("info", "worker_registered", {"worker_url": self.worker_url})
+
+    async def stop(self) -> None:
+        """Para o heartbeat e sai do pool imediatamente."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+            # Score 0 = fora da janela de vivos: o dispatcher rebalanceia já
+            self.redis.zadd(WORKERS_KEY, {self.worker_url: 0})
+            log_structured("info", "worker_left", {"worker_url": self.worker_url})
+
+
+# Instância global
+_worker_registry: Optional[WorkerRegistry] = None
+
+def get_worker_registry() -> WorkerRegistry:
+    """Obtém instância singleton do registro de workers."""
+    global _worker_registry
+    if _worker_registry is None:
+        _worker_registry = WorkerRegistry()
+    return _worker_registry
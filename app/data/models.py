@@ -1,5 +1,6 @@
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column
-from sqlalchemy import Integer, String, JSON, DateTime, func
+from sqlalchemy import Integer, String, JSON, Date, DateTime, Index, func, text
+from sqlalchemy.dialects.postgresql import JSONB
 
 
 Base = declarative_base()
@@ -14,6 +15,11 @@ class Lead(Base):
     name: Mapped[str] = mapped_column(String, nullable=True)
     lang: Mapped[str] = mapped_column(String, default="pt-BR")
     created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    
+    # Paginação por cursor do Studio: ORDER BY created_at, id
+    __table_args__ = (
+        Index("ix_lead_created_at_id", "created_at", "id"),
+    )
 
 
 class LeadProfile(Base):
@@ -21,10 +27,26 @@ class LeadProfile(Base):
     __tablename__ = "lead_profile"
     
     lead_id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    accounts: Mapped[dict] = mapped_column(JSON)        # {quotex, nyrion}
-    deposit: Mapped[dict] = mapped_column(JSON)         # {status}
-    agreements: Mapped[dict] = mapped_column(JSON)      # {can_deposit, ...}
-    flags: Mapped[dict] = mapped_column(JSON)           # {explained, ...}
+    accounts: Mapped[dict] = mapped_column(JSONB)       # {quotex, nyrion}
+    deposit: Mapped[dict] = mapped_column(JSONB)        # {status}
+    agreements: Mapped[dict] = mapped_column(JSONB)     # {can_deposit, ...}
+    flags: Mapped[dict] = mapped_column(JSONB)          # {explained, tags, ...}
+    
+    # Filtros do Studio (/api/leads): GIN para containment (@>) e
+    # expressão para os campos de alta cardinalidade
+    __table_args__ = (
+        Index("ix_lead_profile_accounts_gin", "accounts", postgresql_using="gin",
+              postgresql_ops={"accounts": "jsonb_path_ops"}),
+        Index("ix_lead_profile_deposit_gin", "deposit", postgresql_using="gin",
+              postgresql_ops={"deposit": "jsonb_path_ops"}),
+        Index("ix_lead_profile_agreements_gin", "agreements", postgresql_using="gin",
+              postgresql_ops={"agreements": "jsonb_path_ops"}),
+        Index("ix_lead_profile_flags_gin", "flags", postgresql_using="gin",
+              postgresql_ops={"flags": "jsonb_path_ops"}),
+        Index("ix_lead_profile_deposit_status", text("(deposit ->> 'status')")),
+        Index("ix_lead_profile_accounts_quotex", text("(accounts ->> 'quotex')")),
+        Index("ix_lead_profile_accounts_nyrion", text("(accounts ->> 'nyrion')")),
+    )
 
 
 class AutomationRun(Base):
@@ -51,14 +73,39 @@ class ProcedureRun(Base):
 
 
 class JourneyEvent(Base):
-    """Eventos da jornada do lead (ledger de ações)."""
+    """
+    Eventos da jornada do lead (ledger de ações).
+    
+    Particionada por mês em created_at (journey_event_pYYYYMM); partições
+    antigas são arquivadas por app.core.event_retention.
+    """
     __tablename__ = "journey_event"
     
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    lead_id: Mapped[int] = mapped_column(Integer, index=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    lead_id: Mapped[int] = mapped_column(Integer)
     type: Mapped[str] = mapped_column(String)
     payload: Mapped[dict] = mapped_column(JSON)
-    created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[str] = mapped_column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_journey_event_lead_id_created_at", "lead_id", text("created_at DESC")),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class LeadActivity(Base):
+    """Resumo de atividade por lead, mantido a cada evento gravado."""
+    __tablename__ = "lead_activity"
+    
+    lead_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    last_activity_at: Mapped[str] = mapped_column(DateTime(timezone=True), index=True)
+    last_event_type: Mapped[str] = mapped_column(String, nullable=True)
+    events_day: Mapped[str] = mapped_column(Date)                # dia (UTC) de events_today
+    events_today: Mapped[int] = mapped_column(Integer, default=0)
+    messages_in: Mapped[int] = mapped_column(Integer, default=0)
+    messages_out: Mapped[int] = mapped_column(Integer, default=0)
+    procedure_active: Mapped[str] = mapped_column(String, nullable=True, index=True)
+    procedure_step: Mapped[str] = mapped_column(String, nullable=True)
 
 
 class LeadTouchpoint(Base):
@@ -78,7 +125,7 @@ class IdempotencyKey(Base):
     
     key: Mapped[str] = mapped_column(String, primary_key=True)
     response: Mapped[dict] = mapped_column(JSON)
-    created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
 
 
 class ContextoLead(Base):
@@ -88,6 +135,7 @@ class ContextoLead(Base):
     lead_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     procedimento_ativo: Mapped[str] = mapped_column(String, nullable=True)
     etapa_ativa: Mapped[str] = mapped_column(String, nullable=True)
+    progresso_procedimento: Mapped[dict] = mapped_column(JSON, nullable=True)  # {procedure_id, signature, step_index, total_steps, current_step, facts}
     aguardando: Mapped[dict] = mapped_column(JSON, nullable=True)  # {tipo, fato, origem, ttl}
     ultima_automacao_enviada: Mapped[str] = mapped_column(String, nullable=True)
     ultimo_topico_kb: Mapped[str] = mapped_column(String, nullable=True)
@@ -0,0 +1,201 @@
+"""
+Paginação por cursor (keyset) e contagens baratas para listagens.
+
+O cursor guarda o último (campo de ordenação, id) da página; a próxima
+página é um range scan a partir dele, então o custo não cresce com a
+profundidade. O total pode vir exato (com cache no Redis e recálculo em
+background) ou estimado pelo planner do Postgres (EXPLAIN).
+"""
+import json
+import asyncio
+import base64
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Optional, Set, Tuple
+
+from sqlalchemy import and_, or_, select, func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.settings import settings
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+COUNT_CACHE_KEY = "mb:count:{name}:{digest}"
+
+_pending_counts: Set[str] = set()
+_count_tasks: Set[asyncio.Task] = set()
+
+
+class InvalidCursor(ValueError):
+    """Cursor malformado ou gerado para outra ordenação."""
+
+
+def encode_cursor(sort_by: str, sort_dir: str, value: Any, row_id: int) -> str:
+    """
+    Gera o token opaco da próxima página.
+
+    Args:
+        sort_by: Campo de ordenação
+        sort_dir: "asc" ou "desc"
+        value: Valor do campo no último item da página
+        row_id: ID do último item da página
+
+    Returns:
+        Token base64 url-safe
+    """
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    raw = json.dumps({"s": sort_by, "d": sort_dir, "v": value, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort_by: str, sort_dir: str) -> Tuple[Any, int]:
+    """
+    Lê um token de cursor.
+
+    Args:
+        token: Token recebido do cliente
+        sort_by: Ordenação da requisição atual
+        sort_dir: Direção da requisição atual
+
+    Returns:
+        (valor do campo, id)
+
+    Raises:
+        InvalidCursor: Token inválido ou de outra ordenação
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, row_id = data["v"], int(data["id"])
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Cursor inválido: {e}")
+    if data.get("s") != sort_by or data.get("d") != sort_dir:
+        raise InvalidCursor("Cursor gerado para outra ordenação")
+    return value, row_id
+
+
+def keyset_filter(sort_column, id_column, sort_dir: str, value: Any, row_id: int):
+    """
+    Condição "depois do cursor" para ordenação por (campo, id).
+
+    Args:
+        sort_column: Coluna de ordenação
+        id_column: Coluna de desempate (única)
+        sort_dir: "asc" ou "desc"
+        value: Valor do campo no cursor
+        row_id: ID no cursor
+
+    Returns:
+        Expressão para query.where
+    """
+    if sort_dir == "desc":
+        return or_(sort_column < value, and_(sort_column == value, id_column < row_id))
+    return or_(sort_column > value, and_(sort_column == value, id_column > row_id))
+
+
+class explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) de uma query, com os mesmos parâmetros."""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def estimate_count(db, query) -> Optional[int]:
+    """
+    Total estimado pelo planner (sem varrer a tabela).
+
+    Args:
+        db: AsyncSession
+        query: Select já filtrado (sem ordenação/paginação)
+
+    Returns:
+        Linhas estimadas ou None se o EXPLAIN falhar
+    """
+    try:
+        plan = (await db.execute(explain(query))).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.warning(f"Falha ao estimar contagem: {e}")
+        return None
+
+
+def count_cache_key(name: str, query) -> str:
+    """Chave de cache da contagem: SQL compilado + parâmetros."""
+    compiled = query.compile(dialect=postgresql.dialect())
+    params = sorted((k, repr(v)) for k, v in compiled.params.items())
+    digest = hashlib.sha1(f"{compiled}|{params}".encode()).hexdigest()
+    return COUNT_CACHE_KEY.format(name=name, digest=digest)
+
+
+async def _count(db, query) -> int:
+    return await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+
+async def _refresh_count(key: str, query) -> None:
+    from app.infra.db import async_session_scope
+    from app.redis_adapter import get_redis
+
+    try:
+        async with async_session_scope() as session:
+            total = await _count(session, query)
+        get_redis().set(key, total, ex=settings.LIST_COUNT_CACHE_TTL_SECONDS)
+        log_structured("info", "list_count_refreshed", {"key": key, "total": total})
+    except Exception as e:
+        logger.warning(f"Falha ao recalcular contagem {key}: {e}")
+    finally:
+        _pending_counts.discard(key)
+
+
+def schedule_count_refresh(key: str, query) -> None:
+    """Recalcula a contagem exata em background (uma vez por chave)."""
+    if key in _pending_counts:
+        return
+    _pending_counts.add(key)
+    task = asyncio.create_task(_refresh_count(key, query))
+    _count_tasks.add(task)
+    task.add_done_callback(_count_tasks.discard)
+
+
+async def cached_exact_count(db, name: str, query, wait: bool = True) -> Optional[int]:
+    """
+    Contagem exata com cache no Redis.
+
+    Args:
+        db: AsyncSession
+        name: Nome da listagem (prefixo da chave)
+        query: Select já filtrado
+        wait: Em cache miss, contar agora (True) ou só agendar em
+            background e devolver None (False)
+
+    Returns:
+        Total ou None se ainda não calculado
+    """
+    from app.redis_adapter import get_redis
+
+    key = count_cache_key(name, query)
+    redis = get_redis()
+    cached = redis.get(key)
+    if cached is not None:
+        return int(cached)
+    if not wait:
+        schedule_count_refresh(key, query)
+        return None
+    total = await _count(db, query)
+    redis.set(key, total, ex=settings.LIST_COUNT_CACHE_TTL_SECONDS)
+    return total
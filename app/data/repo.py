@@ -1,41 +1,65 @@
 """
 Repository helpers para persistência.
 Implementará operações CRUD e queries específicas conforme necessário.
+
+Os repositórios usam AsyncSession (asyncpg) para não bloquear o event loop
+no caminho do turno. Quando a sessão é a do turno atual, as gravações ficam
+para o commit único do fim do apply_plan (ver app.data.unit_of_work).
 """
+from datetime import datetime, timezone
 from typing import Optional, Dict, Any
-from sqlalchemy.orm import Session
-from app.data.models import Lead, LeadProfile, JourneyEvent, IdempotencyKey
+from sqlalchemy import select, delete, case, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.data.models import Lead, LeadProfile, JourneyEvent, IdempotencyKey, LeadActivity
+from app.data.unit_of_work import unit_of_work
+
+
+def merge_facts(current: Optional[Dict[str, Any]], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Mescla recursivamente fatos novos sobre um dict JSON existente."""
+    merged = dict(current or {})
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_facts(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
 
 
 class LeadRepository:
     """Repository para operações relacionadas ao Lead."""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    def get_by_platform_user_id(self, platform_user_id: str) -> Optional[Lead]:
+    async def get_by_platform_user_id(self, platform_user_id: str) -> Optional[Lead]:
         """Busca lead por platform_user_id."""
-        return self.db.query(Lead).filter(Lead.platform_user_id == platform_user_id).first()
+        result = await self.db.execute(
+            select(Lead).where(Lead.platform_user_id == platform_user_id).limit(1)
+        )
+        return result.scalars().first()
     
-    def get_by_id(self, lead_id: int) -> Optional[Lead]:
+    async def get_by_id(self, lead_id: int) -> Optional[Lead]:
         """Busca lead por ID."""
-        return self.db.query(Lead).filter(Lead.id == lead_id).first()
+        async with unit_of_work(self.db) as uow:
+            return await uow.get(Lead, lead_id)
     
-    def create_lead(self, platform_user_id: str, name: Optional[str] = None, lang: str = "pt-BR") -> Lead:
+    async def create_lead(self, platform_user_id: str, name: Optional[str] = None, lang: str = "pt-BR") -> Lead:
         """Cria um novo lead."""
         lead = Lead(platform_user_id=platform_user_id, name=name, lang=lang)
-        self.db.add(lead)
-        self.db.commit()
-        self.db.refresh(lead)
+        async with unit_of_work(self.db) as uow:
+            uow.add(lead)
+            await uow.db.flush()
+            await uow.save()
         return lead
     
-    def get_profile(self, lead_id: int) -> Optional[LeadProfile]:
+    async def get_profile(self, lead_id: int) -> Optional[LeadProfile]:
         """Busca perfil do lead."""
-        return self.db.query(LeadProfile).filter(LeadProfile.lead_id == lead_id).first()
+        async with unit_of_work(self.db) as uow:
+            return await uow.get(LeadProfile, lead_id)
     
-    def update_profile(self, lead_id: int, **kwargs) -> None:
-        """Atualiza perfil do lead."""
-        profile = self.get_profile(lead_id)
+    async def _get_or_create_profile(self, uow, lead_id: int) -> LeadProfile:
+        profile = await uow.get(LeadProfile, lead_id)
         if not profile:
             # Criar perfil se não existir
             profile = LeadProfile(
@@ -45,42 +69,200 @@ class LeadRepository:
                 agreements={},
                 flags={}
             )
-            self.db.add(profile)
-        
-        # Atualizar campos fornecidos
-        for field, value in kwargs.items():
-            if hasattr(profile, field):
-                setattr(profile, field, value)
-        
-        self.db.commit()
+            uow.add(profile, lead_id)
+        return profile
+    
+    async def update_profile(self, lead_id: int, **kwargs) -> None:
+        """Atualiza perfil do lead."""
+        async with unit_of_work(self.db) as uow:
+            profile = await self._get_or_create_profile(uow, lead_id)
+            
+            # Atualizar campos fornecidos
+            for field, value in kwargs.items():
+                if hasattr(profile, field):
+                    setattr(profile, field, value)
+            
+            await uow.save()
+    
+    async def update_profile_facts(self, lead_id: int, facts: Dict[str, Any]) -> None:
+        """
+        Mescla fatos aninhados (ex: {"agreements": {"can_deposit": True}})
+        nas colunas JSON do perfil, preservando as chaves não informadas.
+        """
+        async with unit_of_work(self.db) as uow:
+            profile = await self._get_or_create_profile(uow, lead_id)
+            
+            for field, value in facts.items():
+                if not hasattr(profile, field):
+                    continue
+                if isinstance(value, dict):
+                    setattr(profile, field, merge_facts(getattr(profile, field), value))
+                else:
+                    setattr(profile, field, value)
+            
+            await uow.save()
 
 
 class IdempotencyRepository:
     """Repository para chaves de idempotência."""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    def get_response(self, key: str) -> Optional[Dict[str, Any]]:
+    async def get_response(self, key: str) -> Optional[Dict[str, Any]]:
         """Busca resposta cacheada por chave de idempotência."""
-        record = self.db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
-        return record.response if record else None
-    
-    def store_response(self, key: str, response: Dict[str, Any]) -> None:
-        """Armazena resposta para chave de idempotência."""
-        record = IdempotencyKey(key=key, response=response)
-        self.db.add(record)
-        self.db.commit()
+        # Savepoint: uma falha aqui não aborta a transação do turno
+        async with self.db.begin_nested():
+            result = await self.db.execute(
+                select(IdempotencyKey.response).where(IdempotencyKey.key == key).limit(1)
+            )
+        return result.scalars().first()
+    
+    async def store_response(self, key: str, response: Dict[str, Any]) -> None:
+        """Armazena resposta para chave de idempotência (primeira gravação vence)."""
+        stmt = insert(IdempotencyKey).values(key=key, response=response).on_conflict_do_nothing(
+            index_elements=[IdempotencyKey.__table__.c.key]
+        )
+        async with unit_of_work(self.db) as uow:
+            # Savepoint: uma falha aqui não descarta as escritas do turno
+            async with uow.db.begin_nested():
+                await uow.db.execute(stmt)
+            await uow.save()
+    
+    async def purge_expired(self, before: datetime, limit: int) -> int:
+        """
+        Remove um lote de chaves criadas antes de `before`.
+        
+        Args:
+            before: Limite de criação
+            limit: Tamanho máximo do lote
+            
+        Returns:
+            Quantidade removida
+        """
+        batch = (
+            select(IdempotencyKey.key)
+            .where(IdempotencyKey.created_at < before)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        async with unit_of_work(self.db) as uow:
+            result = await uow.db.execute(delete(IdempotencyKey).where(IdempotencyKey.key.in_(batch)))
+            await uow.save()
+        return result.rowcount or 0
 
 
 class EventRepository:
     """Repository para eventos da jornada."""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    def log_event(self, lead_id: int, event_type: str, payload: Dict[str, Any]) -> None:
+    async def log_event(self, lead_id: int, event_type: str, payload: Dict[str, Any]) -> None:
         """Registra evento na jornada do lead."""
         event = JourneyEvent(lead_id=lead_id, type=event_type, payload=payload)
-        self.db.add(event)
-        self.db.commit()
+        async with unit_of_work(self.db) as uow:
+            uow.add(event)
+            await ActivityRepository(uow.db).record_event(lead_id, event_type, payload)
+            await uow.save()
+
+
+def message_direction(event_type: str, payload: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Classifica o evento como mensagem recebida ("in"), enviada ("out") ou nenhuma."""
+    if event_type == "message_received":
+        return "in"
+    if event_type == "message_sent":
+        return "out"
+    if event_type == "pipeline_executed" and (payload or {}).get("response_sent"):
+        return "out"
+    return None
+
+
+class ActivityRepository:
+    """
+    Repository para o resumo lead_activity.
+    
+    Cada atualização é um único upsert atômico (sem leitura prévia), então
+    pode rodar no mesmo commit do evento que a originou.
+    """
+    
+    def __init__(self, db: Optional[AsyncSession] = None):
+        self.db = db
+    
+    async def record_event(
+        self,
+        lead_id: int,
+        event_type: str,
+        payload: Optional[Dict[str, Any]] = None,
+        at: Optional[datetime] = None
+    ) -> None:
+        """
+        Contabiliza um evento no resumo do lead.
+        
+        Args:
+            lead_id: ID do lead
+            event_type: Tipo do JourneyEvent
+            payload: Payload do evento
+            at: Momento do evento (padrão: agora, UTC)
+        """
+        at = at or datetime.now(timezone.utc)
+        direction = message_direction(event_type, payload)
+        values = {
+            "lead_id": lead_id,
+            "last_activity_at": at,
+            "last_event_type": event_type,
+            "events_day": at.date(),
+            "events_today": 1,
+            "messages_in": 1 if direction == "in" else 0,
+            "messages_out": 1 if direction == "out" else 0,
+        }
+        stmt = insert(LeadActivity).values(**values)
+        table = LeadActivity.__table__
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.lead_id],
+            set_={
+                "last_activity_at": func.greatest(table.c.last_activity_at, stmt.excluded.last_activity_at),
+                "last_event_type": stmt.excluded.last_event_type,
+                "events_today": case(
+                    (table.c.events_day == stmt.excluded.events_day, table.c.events_today + 1),
+                    else_=1
+                ),
+                "events_day": stmt.excluded.events_day,
+                "messages_in": table.c.messages_in + stmt.excluded.messages_in,
+                "messages_out": table.c.messages_out + stmt.excluded.messages_out,
+            }
+        )
+        async with unit_of_work(self.db) as uow:
+            await uow.db.execute(stmt)
+            await uow.save()
+    
+    async def set_procedure(self, lead_id: int, procedure_active: Optional[str], procedure_step: Optional[str]) -> None:
+        """
+        Atualiza procedimento/etapa ativos no resumo.
+        
+        Args:
+            lead_id: ID do lead
+            procedure_active: ID do procedimento (None = nenhum)
+            procedure_step: Etapa atual
+        """
+        now = datetime.now(timezone.utc)
+        stmt = insert(LeadActivity).values(
+            lead_id=lead_id,
+            last_activity_at=now,
+            events_day=now.date(),
+            events_today=0,
+            messages_in=0,
+            messages_out=0,
+            procedure_active=procedure_active,
+            procedure_step=procedure_step
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[LeadActivity.__table__.c.lead_id],
+            set_={
+                "procedure_active": stmt.excluded.procedure_active,
+                "procedure_step": stmt.excluded.procedure_step,
+            }
+        )
+        async with unit_of_work(self.db) as uow:
+            await uow.db.execute(stmt)
+            await uow.save()
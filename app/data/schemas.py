@@ -66,6 +66,7 @@ class ContextoLead(BaseModel):
     lead_id: int
     procedimento_ativo: Optional[str] = None
     etapa_ativa: Optional[str] = None
+    progresso_procedimento: Optional[Dict[str, Any]] = None  # {procedure_id, step_index, facts, ...}
     aguardando: Optional[Dict[str, Any]] = None
     ultima_automacao_enviada: Optional[str] = None
     ultimo_topico_kb: Optional[str] = None
@@ -0,0 +1,247 @@
+"""
+Unit of Work por turno.
+
+Um turno (mensagem recebida -> decisão -> apply_plan) usa uma única
+AsyncSession e carrega lead/perfil/contexto uma vez em um identity map do
+turno. A sessão só segura conexão enquanto há trabalho no banco: o
+carregamento do lead faz commit logo em seguida, leituras no meio do
+pipeline são encerradas antes de cada chamada LLM (release) e as alterações
+da decisão vão em uma transação no fim do apply_plan. As entidades do
+identity map seguem válidas entre as transações (expire_on_commit=False).
+
+Serviços e repositórios descobrem o turno atual via contextvar; fora de um
+turno, cada operação usa um unit of work curto que faz commit ao terminar
+(comportamento anterior).
+
+Trabalho de bookkeeping adiado pelo apply_plan (hook de expects_reply,
+timeline, telemetria) roda na saída do turno, depois do envio da resposta,
+ainda na mesma sessão e antes do commit final.
+
+O commit de um turno confere antes o fencing token do lead: se outro
+worker já recebeu a vez, as alterações do turno são descartadas.
+"""
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.lead_serializer import ensure_lead_turn_current
+from app.data.models import Lead, LeadProfile, ContextoLead
+from app.infra.db import get_async_sessionmaker, async_session_scope
+from app.infra.logging import log_structured
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+_current_uow: ContextVar[Optional["UnitOfWork"]] = ContextVar("unit_of_work", default=None)
+
+
+class UnitOfWork:
+    """Sessão + identity map de um turno (ou de uma operação avulsa)."""
+
+    def __init__(self, db: AsyncSession, turn: bool = False):
+        self.db = db
+        self.turn = turn
+        self._identity: Dict[Tuple[Type, Any], Any] = {}
+        self._deferred: List[Callable[[], Awaitable[Any]]] = []
+        self._wrote = False
+        self._release_lock = asyncio.Lock()
+
+    async def get(self, model: Type, pk: Any) -> Optional[Any]:
+        """
+        Busca entidade por chave primária, no máximo uma vez por turno.
+
+        Ausências também ficam no mapa, então um contexto inexistente não é
+        reconsultado a cada ponto do pipeline.
+        """
+        key = (model, pk)
+        cached = self._identity.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        entity = await self.db.get(model, pk)
+        self._identity[key] = entity
+        return entity
+
+    def add(self, entity: Any, pk: Any = None) -> None:
+        """Registra entidade nova na sessão (e no identity map, se tiver pk)."""
+        self.db.add(entity)
+        if pk is not None:
+            self._identity[(type(entity), pk)] = entity
+
+    async def delete(self, entity: Any, pk: Any = None) -> None:
+        """Remove entidade e marca a ausência no identity map."""
+        await self.db.delete(entity)
+        if pk is not None:
+            self._identity[(type(entity), pk)] = None
+
+    async def preload_lead(self, lead_id: int) -> None:
+        """
+        Carrega lead, perfil e contexto em uma única consulta.
+
+        Args:
+            lead_id: ID do lead do turno
+        """
+        if (ContextoLead, lead_id) in self._identity:
+            return
+        result = await self.db.execute(
+            select(Lead, LeadProfile, ContextoLead)
+            .outerjoin(LeadProfile, LeadProfile.lead_id == Lead.id)
+            .outerjoin(ContextoLead, ContextoLead.lead_id == Lead.id)
+            .where(Lead.id == lead_id)
+        )
+        row = result.first()
+        lead, profile, contexto = row if row else (None, None, None)
+        self._identity[(Lead, lead_id)] = lead
+        self._identity[(LeadProfile, lead_id)] = profile
+        self._identity[(ContextoLead, lead_id)] = contexto
+
+    async def save(self) -> None:
+        """
+        Persiste as alterações de uma operação.
+
+        Em um turno não faz nada (o commit é único, no fim do apply_plan);
+        em uma operação avulsa faz commit imediato.
+        """
+        if not self.turn:
+            await self.db.commit()
+        else:
+            self._wrote = True
+
+    @property
+    def pending(self) -> bool:
+        """True se o turno tem alterações ainda sem commit (enviadas ou não ao banco)."""
+        return self._wrote or bool(self.db.new or self.db.dirty or self.db.deleted)
+
+    async def release(self) -> None:
+        """
+        Encerra a transação de leitura do turno e devolve a conexão ao pool.
+
+        Chamado antes de esperas longas (LLM). Se o turno já enviou gravações
+        ao banco ou tem alterações pendentes, não faz nada: elas só podem sair
+        no commit do turno.
+        """
+        if not self.turn:
+            return
+        async with self._release_lock:
+            if self.pending or not self.db.in_transaction():
+                return
+            await self.db.commit()
+
+    async def commit(self) -> None:
+        """
+        Grava todas as alterações pendentes em uma transação.
+
+        Raises:
+            LeadTurnLost: Em um turno cujo lease do lead foi perdido
+        """
+        if self.turn:
+            ensure_lead_turn_current()
+        await self.db.commit()
+        self._wrote = False
+
+    async def rollback(self) -> None:
+        """Descarta alterações pendentes, o identity map e o trabalho adiado."""
+        await self.db.rollback()
+        self._wrote = False
+        self._identity.clear()
+        self._deferred.clear()
+
+    def defer(self, work: Callable[[], Awaitable[Any]]) -> None:
+        """Agenda trabalho para a saída do turno (depois da resposta enviada)."""
+        self._deferred.append(work)
+
+    async def run_deferred(self) -> None:
+        """
+        Executa o trabalho adiado, um por vez (a sessão não é concorrente).
+
+        Falhas são registradas e não interrompem os demais itens.
+        """
+        if not self._deferred:
+            return
+        deferred, self._deferred = self._deferred, []
+        start = time.perf_counter()
+        for work in deferred:
+            try:
+                await work()
+            except Exception as e:
+                logger.warning(f"Erro no trabalho adiado do turno: {str(e)}")
+        log_structured("info", "turn_deferred_done", {
+            "count": len(deferred),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2)
+        })
+
+
+def current_unit_of_work() -> Optional[UnitOfWork]:
+    """Unit of work do turno atual (None fora de um turno)."""
+    return _current_uow.get()
+
+
+@asynccontextmanager
+async def turn_unit_of_work(db: Optional[AsyncSession] = None) -> AsyncIterator[UnitOfWork]:
+    """
+    Abre o unit of work de um turno e o torna visível para o pipeline.
+
+    Alterações ainda pendentes na saída são gravadas; em erro, descartadas.
+    Se já houver um turno ativo, ele é reutilizado.
+
+    Args:
+        db: Sessão do chamador (opcional); sem ela, uma nova é aberta
+    """
+    current = _current_uow.get()
+    if current is not None and (db is None or db is current.db):
+        yield current
+        return
+
+    owns_session = db is None
+    if owns_session:
+        db = get_async_sessionmaker()()
+    uow = UnitOfWork(db, turn=True)
+    token = _current_uow.set(uow)
+    try:
+        yield uow
+        await uow.run_deferred()
+        if uow.pending:
+            await uow.commit()
+    except BaseException:
+        await uow.rollback()
+        raise
+    finally:
+        _current_uow.reset(token)
+        if owns_session:
+            await db.close()
+
+
+@asynccontextmanager
+async def unit_of_work(db: Optional[AsyncSession] = None) -> AsyncIterator[UnitOfWork]:
+    """
+    Unit of work para uma operação de serviço/repositório.
+
+    Dentro de um turno (com a mesma sessão ou sem sessão explícita) devolve
+    o unit of work do turno. Fora dele usa a sessão recebida ou abre uma
+    curta, que devolve a conexão ao pool ao sair.
+
+    Args:
+        db: Sessão do chamador (opcional)
+    """
+    current = _current_uow.get()
+    if current is not None and (db is None or db is current.db):
+        yield current
+        return
+
+    async with async_session_scope(db) as session:
+        yield UnitOfWork(session)
+
+
+async def rollback_session(db: AsyncSession) -> None:
+    """Rollback que também limpa o identity map se a sessão for a do turno."""
+    current = _current_uow.get()
+    if current is not None and current.db is db:
+        await current.rollback()
+    else:
+        await db.rollback()
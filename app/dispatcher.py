@@ -0,0 +1,191 @@
+"""
+ManyBlack V2 - Dispatcher multi-processo
+
+Front leve que recebe todo o tráfego e repassa cada requisição para um
+worker uvicorn (app.main). Turnos de um lead sempre vão para o mesmo
+worker por hashing consistente da chave do lead, mantendo os caches locais
+daquele lead quentes; o restante é distribuído em round-robin.
+
+Workers se anunciam no Redis (app.core.worker_registry); o anel é
+refeito quando alguém entra ou sai. Sem Redis, usa DISPATCHER_WORKERS.
+"""
+import json
+import asyncio
+import logging
+import itertools
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.settings import settings
+from app.infra.logging import configure_logging, log_structured
+from app.channels.adapter import telegram_chat_id
+from app.core.hash_ring import HashRing
+from app.core.lead_serializer import telegram_lead_key
+
+logger = logging.getLogger(__name__)
+
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host", "content-length"
+}
+TELEGRAM_WEBHOOK_PATH = "/channels/telegram/webhook"
+
+
+def lead_routing_key(path: str, body: bytes) -> Optional[str]:
+    """
+    Chave do lead para roteamento (None = qualquer worker).
+
+    Args:
+        path: Caminho da requisição
+        body: Corpo bruto
+
+    Returns:
+        Mesma chave usada pelo serializador de turnos, ou None
+    """
+    if path != TELEGRAM_WEBHOOK_PATH or not body:
+        return None
+    try:
+        chat_id = telegram_chat_id(json.loads(body))
+    except (ValueError, KeyError, TypeError):
+        return None
+    return telegram_lead_key(chat_id) if chat_id else None
+
+
+class Dispatcher:
+    """Anel de workers + encaminhamento HTTP."""
+
+    def __init__(self, registry=None, static_workers: Optional[List[str]] = None):
+        self.registry = registry
+        self.static_workers = static_workers or []
+        self.ring = HashRing(vnodes=settings.DISPATCHER_VNODES)
+        self._round_robin = itertools.count()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def refresh(self) -> bool:
+        """
+        Atualiza o anel com os workers vivos.
+
+        Returns:
+            True se houve rebalanceamento
+        """
+        live = self.registry.live_workers() if self.registry is not None else []
+        members = set(live or self.static_workers)
+        current = set(self.ring.nodes)
+        if members == current:
+            return False
+        for node in current - members:
+            self.ring.remove(node)
+        for node in members - current:
+            self.ring.add(node)
+        log_structured("info", "dispatcher_rebalanced", {
+            "joined": sorted(members - current),
+            "left": sorted(current - members),
+            "workers": len(members)
+        })
+        return True
+
+    def candidates(self, key: Optional[str]) -> List[str]:
+        """Workers em ordem de tentativa para a chave."""
+        nodes = self.ring.nodes
+        if not nodes:
+            return []
+        if key is not None:
+            return self.ring.preference(key)
+        start = next(self._round_robin) % len(nodes)
+        return nodes[start:] + nodes[:start]
+
+    async def forward(self, request: Request):
+        """Repassa a requisição ao worker do lead (com failover)."""
+        body = await request.body()
+        key = lead_routing_key(request.url.path, body)
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+
+        for worker in self.candidates(key):
+            upstream = self._client.build_request(
+                request.method,
+                f"{worker}{request.url.path}",
+                params=request.query_params,
+                headers=headers,
+                content=body
+            )
+            try:
+                response = await self._client.send(upstream, stream=True)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # Worker caiu sem sair do registro: tira do anel até o próximo refresh
+                logger.warning(f"Worker {worker} indisponível: {e}")
+                self.ring.remove(worker)
+                continue
+            return StreamingResponse(
+                response.aiter_raw(),
+                status_code=response.status_code,
+                headers={k: v for k, v in response.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS},
+                background=_close_later(response)
+            )
+        return JSONResponse({"detail": "Nenhum worker disponível"}, status_code=503)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Erro ao atualizar workers: {e}")
+            await asyncio.sleep(settings.WORKER_HEARTBEAT_MS / 1000)
+
+    async def start(self) -> None:
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(settings.DISPATCHER_TIMEOUT_SECONDS, connect=1.0))
+        self.refresh()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+
+
+def _close_later(response: httpx.Response):
+    from starlette.background import BackgroundTask
+    return BackgroundTask(response.aclose)
+
+
+def _build_dispatcher() -> Dispatcher:
+    from app.core.worker_registry import WorkerRegistry
+    static = [url.strip() for url in settings.DISPATCHER_WORKERS.split(",") if url.strip()]
+    return Dispatcher(WorkerRegistry(worker_url=""), static)
+
+
+dispatcher = _build_dispatcher()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Gerencia lifespan do dispatcher."""
+    configure_logging()
+    await dispatcher.start()
+    yield
+    await dispatcher.stop()
+
+
+app = FastAPI(title="ManyBlack V2 Dispatcher", lifespan=lifespan)
+
+
+@app.get("/dispatcher/health")
+async def dispatcher_health():
+    """Workers atuais do anel."""
+    return {"status": "healthy", "workers": dispatcher.ring.nodes}
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"])
+async def proxy(request: Request, path: str):
+    """Encaminha qualquer outra requisição para um worker."""
+    return await dispatcher.forward(request)
@@ -1,10 +1,15 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from app.settings import settings
 
 
 # Construir URL de conexão com PostgreSQL
 url = f"postgresql+psycopg2://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+async_url = f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
 
 # Engine do SQLAlchemy
 engine = create_engine(url, pool_pre_ping=True, echo=False, future=True)
@@ -20,3 +25,68 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Engine assíncrono (asyncpg) usado no caminho do turno. Criado sob demanda
+# para que importar este módulo não exija o driver nem abra conexões.
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Obtém o engine assíncrono com pool dimensionado pelas settings."""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            async_url,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+            echo=False
+        )
+    return _async_engine
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    """Obtém a factory de AsyncSession."""
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        _async_sessionmaker = async_sessionmaker(
+            bind=get_async_engine(),
+            autoflush=False,
+            expire_on_commit=False
+        )
+    return _async_sessionmaker
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Dependency para obter sessão assíncrona do banco de dados."""
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+@asynccontextmanager
+async def async_session_scope(db: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Usa a sessão recebida ou abre uma curta, devolvendo a conexão ao pool no fim.
+
+    Args:
+        db: Sessão do chamador (opcional). Quando informada, o chamador
+            controla o ciclo de vida dela.
+    """
+    if db is not None:
+        yield db
+        return
+    async with get_async_sessionmaker()() as session:
+        yield session
+
+
+async def dispose_async_engine() -> None:
+    """Fecha as conexões do pool assíncrono (shutdown da aplicação)."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_sessionmaker = None
@@ -25,8 +25,45 @@ async def lifespan(app: FastAPI):
     """Gerencia lifespan da aplicação."""
     # Startup
     configure_logging()
+    # Compilar/carregar o bundle de políticas antes do primeiro turno
+    from app.core.catalog_store import get_catalog_store
+    get_catalog_store().reload()
+    watcher = None
+    if settings.POLICY_WATCH_ENABLED:
+        from app.core.policy_watcher import get_policy_watcher
+        watcher = get_policy_watcher()
+        await watcher.start()
+    flusher = None
+    if settings.CONTEXT_CACHE_ENABLED:
+        from app.core.context_cache import get_context_flusher
+        flusher = get_context_flusher()
+        await flusher.start()
+    retention = None
+    if settings.EVENT_RETENTION_ENABLED:
+        from app.core.event_retention import get_event_retention_job
+        retention = get_event_retention_job()
+        await retention.start()
+    from app.core.idempotency import get_idempotency_purger
+    purger = get_idempotency_purger()
+    await purger.start()
+    registry = None
+    if settings.WORKER_URL:
+        from app.core.worker_registry import get_worker_registry
+        registry = get_worker_registry()
+        await registry.start()
     yield
-    # Shutdown (se necessário)
+    # Shutdown
+    if registry is not None:
+        await registry.stop()
+    await purger.stop()
+    if retention is not None:
+        await retention.stop()
+    if watcher is not None:
+        await watcher.stop()
+    if flusher is not None:
+        await flusher.stop()
+    from app.infra.db import dispose_async_engine
+    await dispose_async_engine()
 
 
 app = FastAPI(
@@ -76,6 +113,25 @@ async def info():
     }
 
 
+@app.get("/metrics/runtime")
+async def runtime_metrics():
+    """Métricas de execução do worker (serialização, degradação, LLM e confirmações)."""
+    from app.core.lead_serializer import get_lead_serializer
+    from app.core.degradation import get_degradation_controller
+    from app.core.circuit_breaker import circuit_breakers_snapshot
+    from app.core.llm_call import get_llm_hedger
+    from app.core.confirmation_classifier import get_confirmation_metrics
+    from app.core.confirmation_plans import get_confirmation_plan_cache
+    return {
+        "lead_serializer": get_lead_serializer().metrics.snapshot(),
+        "degradation": get_degradation_controller().snapshot(),
+        "llm_breakers": circuit_breakers_snapshot(),
+        "llm_hedging": get_llm_hedger().snapshot(),
+        "confirmation": get_confirmation_metrics().snapshot(),
+        "confirmation_plans": get_confirmation_plan_cache().snapshot()
+    }
+
+
 # Incluir routers
 app.include_router(tg_router, prefix="/channels/telegram", tags=["channels:telegram"])
 app.include_router(wa_router, prefix="/channels/whatsapp", tags=["channels:whatsapp"])
@@ -5,20 +5,30 @@ Usado quando Redis não está disponível em DEV/TEST
 import json
 import time
 import logging
-from typing import Any, Optional, Dict
+from typing import Any, Optional, Dict, List
 from abc import ABC, abstractmethod
 
 logger = logging.getLogger(__name__)
 
 class RedisAdapter(ABC):
-    """Interface para adapter Redis"""
+    """
+    Interface para adapter Redis
+    
+    Os métodos não propagam erros de conexão: devolvem um valor neutro
+    (False, None, {}, []). Para distinguir "não existe" de "Redis
+    indisponível", `last_error` guarda a exceção da última chamada (None se
+    ela funcionou); vale logo após a chamada, antes de qualquer await.
+    """
+    
+    last_error: Optional[Exception] = None
     
     @abstractmethod
     def ping(self) -> bool:
         pass
     
     @abstractmethod
-    def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+    def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> bool:
+        """SET com TTL opcional; com nx=True só grava se a chave não existir."""
         pass
     
     @abstractmethod
@@ -32,6 +42,72 @@ class RedisAdapter(ABC):
     @abstractmethod
     def exists(self, key: str) -> bool:
         pass
+    
+    @abstractmethod
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """Lê várias chaves em um único round trip."""
+        pass
+    
+    @abstractmethod
+    def incr(self, key: str, ex: Optional[int] = None) -> int:
+        """Incrementa contador e (re)define expiração."""
+        pass
+    
+    @abstractmethod
+    def hgetall(self, key: str) -> Dict[str, str]:
+        """Lê todos os campos de um hash."""
+        pass
+    
+    @abstractmethod
+    def hset(self, key: str, mapping: Dict[str, Any], ex: Optional[int] = None) -> bool:
+        """Grava campos de um hash atomicamente e (re)define expiração."""
+        pass
+    
+    @abstractmethod
+    def sadd(self, key: str, *members: str) -> int:
+        """Adiciona membros a um set."""
+        pass
+    
+    @abstractmethod
+    def spop(self, key: str, count: int) -> List[str]:
+        """Remove e retorna até `count` membros de um set."""
+        pass
+    
+    @abstractmethod
+    def zadd(self, key: str, mapping: Dict[str, float], max_len: Optional[int] = None,
+             ex: Optional[int] = None) -> bool:
+        """Adiciona membros a um sorted set, mantendo só os `max_len` de maior score."""
+        pass
+    
+    @abstractmethod
+    def zrangebyscore(self, key: str, min_score: Any = "-inf", max_score: Any = "+inf") -> List[str]:
+        """Membros com score no intervalo, em ordem crescente."""
+        pass
+    
+    @abstractmethod
+    def expire_if_equal(self, key: str, value: str, ex: int) -> bool:
+        """Renova o TTL só se a chave ainda tiver o valor (compare-and-expire)."""
+        pass
+    
+    @abstractmethod
+    def delete_if_equal(self, key: str, value: str) -> bool:
+        """Remove a chave só se ainda tiver o valor (compare-and-delete)."""
+        pass
+
+_EXPIRE_IF_EQUAL = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_DELETE_IF_EQUAL = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 
 class RedisClient(RedisAdapter):
     """Adapter Redis real"""
@@ -41,41 +117,170 @@ class RedisClient(RedisAdapter):
         self.client = redis.from_url(redis_url)
     
     def ping(self) -> bool:
+        self.last_error = None
         try:
             return self.client.ping()
-        except Exception:
+        except Exception as e:
+            self.last_error = e
             return False
     
-    def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+    def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> bool:
+        self.last_error = None
         try:
             if isinstance(value, (dict, list)):
                 value = json.dumps(value)
-            return self.client.set(key, value, ex=ex)
+            return bool(self.client.set(key, value, ex=ex, nx=nx))
         except Exception as e:
+            self.last_error = e
             logger.error(f"Redis SET error: {e}")
             return False
     
     def get(self, key: str) -> Optional[str]:
+        self.last_error = None
         try:
             result = self.client.get(key)
             return result.decode('utf-8') if result else None
         except Exception as e:
+            self.last_error = e
             logger.error(f"Redis GET error: {e}")
             return None
     
     def delete(self, key: str) -> int:
+        self.last_error = None
         try:
             return self.client.delete(key)
         except Exception as e:
+            self.last_error = e
             logger.error(f"Redis DELETE error: {e}")
             return 0
     
     def exists(self, key: str) -> bool:
+        self.last_error = None
         try:
             return bool(self.client.exists(key))
         except Exception as e:
+            self.last_error = e
             logger.error(f"Redis EXISTS error: {e}")
             return False
+    
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        self.last_error = None
+        if not keys:
+            return []
+        try:
+            results = self.client.mget(keys)
+            return [r.decode('utf-8') if r else None for r in results]
+        except Exception as e:
+            self.last_error = e
+            logger.error(f"Redis MGET error: {e}")
+            return [None] * len(keys)
+    
+    def incr(self, key: str, ex: Optional[int] = None) -> int:
+        self.last_error = None
+        try:
+            pipe = self.client.pipeline()
+            pipe.incr(key)
+            if ex:
+                pipe.expire(key, ex)
+            return int(pipe.execute()[0])
+        except Exception as e:
+            self.last_error = e
+            logger.error(f"Redis INCR error: {e}")
+            return 0
+    
+    def hgetall(self, key: str) -> Dict[str, str]:
+        self.last_error = None
+        try:
+            return {
+                k.decode('utf-8'): v.decode('utf-8')
+                for k, v in self.client.hgetall(key).items()
+            }
+        except Exception as e:
+            self.last_error = e
+            logger.error(f"Redis HGETALL error: {e}")
+            return {}
+    
+    def hset(self, key: str, mapping: Dict[str, Any], ex: Optional[int] = None) -> bool:
+        self.last_error = None
+        if not mapping:
+            return True
+        try:
+            pipe = self.client.pipeline()
+            pipe.hset(key, mapping=mapping)
+            if ex:
+                pipe.expire(key, ex)
+            pipe.execute()
+            return True
+        except Exception as e:
+            self.last_error = e
+            logger.error(f"Redis HSET error: {e}")
+            return False
+    
+    def sadd(self, key: str, *members: str) -> int:
+        self.last_error = None
+        if not members:
+            return 0
+        try:
+            return self.client.sadd(key, *members)
+        except Exception as e:
+            self.last_error = e
+            logger.error(f"Redis SADD error: {e}")
+            return 0
+    
+    def spop(self, key: str, count: int) -> List[str]:
+        self.last_error = None
+        try:
+            return [m.decode('utf-8') for m in (self.client.spop(key, count) or [])]
+        except Exception as e:
+            self.last_error = e
+            logger.error(f"Redis SPOP error: {e}")
+            return []
+    
+    def zadd(self, key: str, mapping: Dict[str, float], max_len: Optional[int] = None,
+             ex: Optional[int] = None) -> bool:
+        self.last_error = None
+        if not mapping:
+            return True
+        try:
+            pipe = self.client.pipeline()
+            pipe.zadd(key, mapping)
+            if max_len:
+                pipe.zremrangebyrank(key, 0, -(max_len + 1))
+            if ex:
+                pipe.expire(key, ex)
+            pipe.execute()
+            return True
+        except Exception as e:
+            self.last_error = e
+            logger.error(f"Redis ZADD error: {e}")
+            return False
+    
+    def zrangebyscore(self, key: str, min_score: Any = "-inf", max_score: Any = "+inf") -> List[str]:
+        self.last_error = None
+        try:
+            return [m.decode('utf-8') for m in self.client.zrangebyscore(key, min_score, max_score)]
+        except Exception as e:
+            self.last_error = e
+            logger.error(f"Redis ZRANGEBYSCORE error: {e}")
+            return []
+    
+    def expire_if_equal(self, key: str, value: str, ex: int) -> bool:
+        self.last_error = None
+        try:
+            return bool(self.client.eval(_EXPIRE_IF_EQUAL, 1, key, value, ex))
+        except Exception as e:
+            self.last_error = e
+            logger.error(f"Redis EXPIRE_IF_EQUAL error: {e}")
+            return False
+    
+    def delete_if_equal(self, key: str, value: str) -> bool:
+        self.last_error = None
+        try:
+            return bool(self.client.eval(_DELETE_IF_EQUAL, 1, key, value))
+        except Exception as e:
+            self.last_error = e
+            logger.error(f"Redis DELETE_IF_EQUAL error: {e}")
+            return False
 
 class InMemoryRedis(RedisAdapter):
     """Adapter Redis in-memory para DEV/TEST"""
@@ -87,10 +292,12 @@ class InMemoryRedis(RedisAdapter):
     def ping(self) -> bool:
         return True
     
-    def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+    def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> bool:
         try:
             if isinstance(value, (dict, list)):
                 value = json.dumps(value)
+            if nx and self._live_value(key) is not None:
+                return False
             
             entry = {
                 "value": value,
@@ -145,6 +352,92 @@ class InMemoryRedis(RedisAdapter):
         except Exception as e:
             logger.error(f"InMemory EXISTS error: {e}")
             return False
+    
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        return [self.get(key) for key in keys]
+    
+    def incr(self, key: str, ex: Optional[int] = None) -> int:
+        try:
+            value = int(self.get(key) or 0) + 1
+            self.set(key, str(value), ex=ex)
+            return value
+        except Exception as e:
+            logger.error(f"InMemory INCR error: {e}")
+            return 0
+    
+    def _live_value(self, key: str) -> Any:
+        if not self.exists(key):
+            return None
+        return self._data[key]["value"]
+    
+    def hgetall(self, key: str) -> Dict[str, str]:
+        value = self._live_value(key)
+        return dict(value) if isinstance(value, dict) else {}
+    
+    def hset(self, key: str, mapping: Dict[str, Any], ex: Optional[int] = None) -> bool:
+        value = self._live_value(key)
+        if not isinstance(value, dict):
+            value = {}
+        value.update({k: str(v) for k, v in mapping.items()})
+        expires = self._data[key]["expires"] if key in self._data else None
+        self._data[key] = {
+            "value": value,
+            "expires": time.time() + ex if ex else expires
+        }
+        return True
+    
+    def sadd(self, key: str, *members: str) -> int:
+        value = self._live_value(key)
+        if not isinstance(value, set):
+            value = set()
+            self._data[key] = {"value": value, "expires": None}
+        before = len(value)
+        value.update(str(m) for m in members)
+        return len(value) - before
+    
+    def spop(self, key: str, count: int) -> List[str]:
+        value = self._live_value(key)
+        if not isinstance(value, set):
+            return []
+        return [value.pop() for _ in range(min(count, len(value)))]
+    
+    def zadd(self, key: str, mapping: Dict[str, float], max_len: Optional[int] = None,
+             ex: Optional[int] = None) -> bool:
+        value = self._live_value(key)
+        if not isinstance(value, dict):
+            value = {}
+        value.update({str(m): float(score) for m, score in mapping.items()})
+        if max_len and len(value) > max_len:
+            keep = sorted(value.items(), key=lambda item: (item[1], item[0]))[-max_len:]
+            value = dict(keep)
+        expires = self._data[key]["expires"] if key in self._data else None
+        self._data[key] = {
+            "value": value,
+            "expires": time.time() + ex if ex else expires
+        }
+        return True
+    
+    def zrangebyscore(self, key: str, min_score: Any = "-inf", max_score: Any = "+inf") -> List[str]:
+        value = self._live_value(key)
+        if not isinstance(value, dict):
+            return []
+        low, high = float(min_score), float(max_score)
+        return [
+            member for member, score in sorted(value.items(), key=lambda item: (item[1], item[0]))
+            if low <= score <= high
+        ]
+    
+    def expire_if_equal(self, key: str, value: str, ex: int) -> bool:
+        if self._live_value(key) != value:
+            return False
+        self._data[key]["expires"] = time.time() + ex
+        return True
+    
+    def delete_if_equal(self, key: str, value: str) -> bool:
+        if self._live_value(key) != value:
+            return False
+        del self._data[key]
+        return True
 
 def get_redis_adapter() -> RedisAdapter:
     """Factory para obter adapter Redis"""
@@ -12,6 +12,11 @@ class Settings(BaseSettings):
     DB_NAME: str = "manyblack_v2"
     DB_USER: str = "mbuser"
     DB_PASSWORD: str = "change-me"
+    # Pool do engine assíncrono (asyncpg)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 5
+    DB_POOL_RECYCLE: int = 1800
     REDIS_URL: str | None = None
     TELEGRAM_BOT_TOKEN: str = ""
     TELEGRAM_WEBHOOK_SECRET: str = ""
@@ -28,8 +33,11 @@ class Settings(BaseSettings):
     CONFIRM_AGENT_TIMEOUT_MS: int = 1000
     CONFIRM_AGENT_THRESHOLD: float = 0.80
     CONFIRM_AGENT_MAX_HISTORY: int = 10
+    # Classificador determinístico: LLM só abaixo do limiar
+    CONFIRM_CLASSIFIER_THRESHOLD: float = 0.85
+    CONFIRM_CLASSIFIER_FALLBACK_MIN: float = 0.60
     
-    # Flag para Gate determinístico (testes)
+    # Flag para Gate determinístico (testes): também resolve adiamentos ("depois") sem LLM
     GATE_YESNO_DETERMINISTICO: bool = False
     
     # Configurações do Gate retroativo
@@ -38,6 +46,75 @@ class Settings(BaseSettings):
     # Configurações do Orquestrador com sinais LLM
     ORCH_ACCEPT_LLM_PROPOSAL: bool = True
     
+    # Watcher de políticas (catálogo, KB, prompt) entre workers
+    POLICY_WATCH_ENABLED: bool = True
+    POLICY_WATCH_INTERVAL_MS: int = 500
+    
+    # Cache de ContextoLead no Redis com persistência write-behind
+    CONTEXT_CACHE_ENABLED: bool = True
+    CONTEXT_CACHE_TTL_SECONDS: int = 86400
+    CONTEXT_FLUSH_INTERVAL_MS: int = 1000
+    CONTEXT_FLUSH_BATCH_SIZE: int = 200
+    TIMELINE_SNAPSHOT_INTERVAL_MS: int = 60000
+    
+    # Listagens do Studio: cache da contagem exata
+    LIST_COUNT_CACHE_TTL_SECONDS: int = 60
+    
+    # journey_event: partições mensais, retenção e arquivo frio (JSONL gzip)
+    EVENT_RETENTION_ENABLED: bool = True
+    EVENT_RETENTION_MONTHS: int = 6
+    EVENT_PARTITION_MONTHS_AHEAD: int = 2
+    EVENT_RETENTION_INTERVAL_SECONDS: int = 21600
+    EVENT_ARCHIVE_DIR: str = "data/archive"
+    
+    # Idempotência do apply_plan: Redis (SET NX + TTL) e Postgres só para replay durável
+    IDEMPOTENCY_IN_FLIGHT_TTL_SECONDS: int = 60
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_DURABLE_RETENTION_DAYS: int = 7
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: int = 3600
+    IDEMPOTENCY_PURGE_BATCH_SIZE: int = 1000
+    
+    # Serialização de turnos por lead (fila local + lease no Redis)
+    LEAD_LEASE_TTL_MS: int = 15000
+    LEAD_LEASE_WAIT_TIMEOUT_MS: int = 30000
+    
+    # Modo multi-processo: workers anunciados no Redis e dispatcher por hash do lead
+    WORKER_URL: str = ""               # URL interna deste worker (vazio = fora do pool)
+    WORKER_HEARTBEAT_MS: int = 1000
+    WORKER_TTL_MS: int = 5000
+    DISPATCHER_WORKERS: str = ""       # fallback estático sem Redis: "http://127.0.0.1:8001,..."
+    DISPATCHER_VNODES: int = 128
+    DISPATCHER_TIMEOUT_SECONDS: int = 60
+    
+    # Degradação sob carga: limiares por modo (single_intake_sample, det_only_gate,
+    # skip_kb_llm, catalog_kb_only); vazio desliga o sinal
+    DEGRADATION_ENABLED: bool = True
+    DEGRADATION_IN_FLIGHT_THRESHOLDS: str = "24,32,48,64"
+    DEGRADATION_QUEUE_THRESHOLDS: str = "8,16,32,64"
+    DEGRADATION_LLM_P95_MS_THRESHOLDS: str = "4000,6000,9000,12000"
+    DEGRADATION_LLM_WINDOW_SECONDS: int = 60
+    DEGRADATION_RECOVERY_SECONDS: int = 30
+    DEGRADATION_EVAL_INTERVAL_MS: int = 1000
+    DEGRADATION_FORCED_MODE: str = ""  # força um modo (ex: "det_only_gate"); vazio = automático
+    
+    # Circuit breaker por modelo + endpoint LLM (taxa de erro ou de chamadas lentas)
+    LLM_CALL_TIMEOUT_SECONDS: float = 20.0
+    LLM_BREAKER_WINDOW_SECONDS: int = 30
+    LLM_BREAKER_MIN_CALLS: int = 10
+    LLM_BREAKER_ERROR_RATE: float = 0.5
+    LLM_BREAKER_SLOW_CALL_MS: int = 8000
+    LLM_BREAKER_SLOW_RATE: float = 0.8
+    LLM_BREAKER_OPEN_SECONDS: int = 15
+    LLM_BREAKER_HALF_OPEN_PROBES: int = 1
+    
+    # Hedging de LLM: cópia da chamada após o percentil da latência recente do modelo
+    LLM_HEDGE_SITES: str = "intake,gate"  # pontos latência-críticos; geração fica de fora
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_MIN_DELAY_MS: int = 200
+    LLM_HEDGE_BUDGET_RATIO: float = 0.1   # cópias por chamada do ponto
+    LLM_HEDGE_BUDGET_BURST: float = 5.0
+    
     model_config = {"env_file": ".env", "extra": "ignore"}
 
 
@@ -4,31 +4,44 @@ Apply Plan - Aplicador de planos
 Aplica planos de ação gerados pelo orchestrador.
 Inclui adaptação por canal, envio de mensagens e rastreamento de eventos.
 Suporte a idempotência via X-Idempotency-Key.
+
+As ações rodam em sequência, na ordem do plano (o envio real é feito pelo
+canal depois do apply_plan). O bookkeeping pós-envio (hook de
+expects_reply, cooldown, timeline e telemetria) é adiado para depois da
+resposta.
 """
 from fastapi import APIRouter, Header, HTTPException, Depends
-from typing import Dict, Any, List, Optional
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+import time
 import logging
 import json
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.data.schemas import Plan, Action
-from app.data.repo import IdempotencyRepository, EventRepository
-from app.infra.db import get_db
+from app.data.repo import EventRepository
+from app.infra.db import get_async_db
 from app.channels.adapter import to_telegram, to_whatsapp
 from app.metrics.tracking import track_action_execution
 from app.infra.logging import log_structured
-from app.core.config_melhorias import normalizar_action_type, IDEMPOTENCY_HEADER
+from app.core.config_melhorias import normalizar_action_type, IDEMPOTENCY_HEADER, IDEMPOTENCY_DURABLE_HEADER
 from app.core.automation_hook import get_automation_hook
+from app.core.cooldown import get_cooldown_service
+from app.core.idempotency import get_idempotency_store
+from app.core.lead_serializer import LeadTurnLost, current_fencing_token, ensure_lead_turn_current
+from app.data.unit_of_work import current_unit_of_work
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+Deferred = List[Callable[[], Awaitable[Any]]]
+
 
 @router.post("/apply_plan")
 async def apply_plan_endpoint(
     plan: Dict[str, Any], 
     x_idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
-    db: Session = Depends(get_db)
+    x_idempotency_durable: Optional[str] = Header(None, alias=IDEMPOTENCY_DURABLE_HEADER),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Endpoint público para aplicar plano de ações.
@@ -36,30 +49,43 @@ async def apply_plan_endpoint(
     Args:
         plan: Plano de ações a ser executado
         x_idempotency_key: Chave de idempotência opcional
+        x_idempotency_durable: "true" para replay durável (Postgres)
         db: Sessão do banco de dados
         
     Returns:
         Resultado da aplicação do plano
     """
-    return await apply_plan(plan, x_idempotency_key, db)
+    durable = (x_idempotency_durable or "").lower() in ("1", "true", "yes")
+    return await apply_plan(plan, x_idempotency_key, db, durable_idempotency=durable)
 
 
 async def apply_plan(
     plan: Dict[str, Any], 
     idempotency_key: Optional[str] = None,
-    db: Optional[Session] = None
+    db: Optional[AsyncSession] = None,
+    durable_idempotency: bool = False
 ) -> Dict[str, Any]:
     """
     Aplica plano de ações com suporte a idempotência.
     
+    Dentro de um turno (unit of work ativo), usa a sessão do turno e grava
+    todas as alterações do turno em uma única transação ao final.
+    
     Args:
         plan: Plano de ações
         idempotency_key: Chave de idempotência
         db: Sessão do banco (opcional)
+        durable_idempotency: Guardar/consultar a resposta também no Postgres
         
     Returns:
         Resultado da aplicação
     """
+    uow = current_unit_of_work()
+    if db is None and uow is not None:
+        db = uow.db
+    if uow is not None and uow.db is not db:
+        uow = None
+    
     decision_id = plan.get("decision_id", "unknown")
     actions = plan.get("actions", [])
     metadata = plan.get("metadata", {})
@@ -67,23 +93,24 @@ async def apply_plan(
     log_structured("info", "apply_plan_start", {
         "decision_id": decision_id,
         "actions_count": len(actions),
-        "has_idempotency": bool(idempotency_key)
+        "has_idempotency": bool(idempotency_key),
+        "fencing_token": current_fencing_token()
     })
     
-    # Verificar idempotência se chave fornecida
-    if idempotency_key and db:
-        cached_response = await check_idempotency(idempotency_key, db)
+    # Turno de um dono antigo (lease perdido): abortar antes de qualquer efeito
+    ensure_lead_turn_current()
+    
+    # Verificar idempotência se chave fornecida (SET NX no Redis)
+    if idempotency_key:
+        cached_response = await check_idempotency(idempotency_key, db, durable_idempotency)
         if cached_response:
             logger.info(f"Resposta idempotente encontrada para {idempotency_key}")
             return cached_response
     
     try:
         # Executar ações do plano
-        execution_results = []
-        
-        for i, action in enumerate(actions):
-            action_result = await execute_action(action, i, decision_id, db, metadata)
-            execution_results.append(action_result)
+        deferred: Deferred = []
+        execution_results = await execute_actions(actions, decision_id, db, metadata, deferred)
         
         # Montar resposta final
         result = {
@@ -94,17 +121,44 @@ async def apply_plan(
             "status": "success"
         }
         
-        # Salvar resposta para idempotência
-        if idempotency_key and db:
-            await store_idempotency_response(idempotency_key, result, db)
+        # Salvar resposta para idempotência (só se o turno ainda é o dono)
+        ensure_lead_turn_current()
+        if idempotency_key:
+            await store_idempotency_response(idempotency_key, result, db, durable_idempotency)
+        
+        # Commit único do turno
+        if uow is not None:
+            await uow.commit()
         
         log_structured("info", "apply_plan_success", {
             "decision_id": decision_id,
-            "actions_executed": len(execution_results)
+            "actions_executed": len(execution_results),
+            "deferred": len(deferred)
         })
         
+        # Bookkeeping: no turno roda depois do envio da resposta (saída do
+        # unit of work); fora de um turno roda aqui, em sequência
+        if uow is not None:
+            for work in deferred:
+                uow.defer(work)
+        else:
+            for work in deferred:
+                try:
+                    await work()
+                except Exception as e:
+                    logger.warning(f"Erro no bookkeeping do plano: {str(e)}")
+        
         return result
         
+    except LeadTurnLost:
+        # Outro dono já tem a vez do lead: nada deste turno é gravado, e a
+        # chave é liberada para a reentrega não receber "em andamento"
+        if uow is not None:
+            await uow.rollback()
+        if idempotency_key:
+            get_idempotency_store().release(idempotency_key)
+        raise
+        
     except Exception as e:
         error_msg = str(e)
         log_structured("error", "apply_plan_error", {
@@ -119,19 +173,56 @@ async def apply_plan(
             "status": "error"
         }
         
+        # Descartar alterações parciais do turno
+        if uow is not None:
+            await uow.rollback()
+        
         # Ainda salvar erro para idempotência
-        if idempotency_key and db:
-            await store_idempotency_response(idempotency_key, error_result, db)
+        if idempotency_key:
+            await store_idempotency_response(idempotency_key, error_result, db, durable_idempotency)
+        
+        if uow is not None:
+            await uow.commit()
         
         return error_result
 
 
+async def execute_actions(
+    actions: List[Dict[str, Any]],
+    decision_id: str,
+    db: Optional[AsyncSession] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    deferred: Optional[Deferred] = None
+) -> List[Dict[str, Any]]:
+    """
+    Executa as ações do plano em sequência, na ordem do plano.
+    
+    As ações de estado usam a sessão do turno e as de envio só preparam o
+    payload (o canal envia depois), então não há o que paralelizar.
+    
+    Args:
+        actions: Ações do plano
+        decision_id: ID da decisão
+        db: Sessão do banco
+        metadata: Metadata do plano
+        deferred: Lista que recebe o bookkeeping adiado (None = executar inline)
+        
+    Returns:
+        Resultados na ordem original do plano
+    """
+    results = []
+    for i, action in enumerate(actions):
+        results.append(await execute_action(action, i, decision_id, db, metadata, deferred))
+    return results
+
+
 async def execute_action(
     action: Dict[str, Any], 
     action_index: int, 
     decision_id: str,
-    db: Optional[Session] = None,
-    metadata: Optional[Dict[str, Any]] = None
+    db: Optional[AsyncSession] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    deferred: Optional[Deferred] = None
 ) -> Dict[str, Any]:
     """
     Executa uma ação individual do plano.
@@ -141,13 +232,16 @@ async def execute_action(
         action_index: Índice da ação no plano
         decision_id: ID da decisão
         db: Sessão do banco
+        metadata: Metadata do plano
+        deferred: Lista que recebe o bookkeeping adiado (None = executar inline)
         
     Returns:
-        Resultado da execução da ação
+        Resultado da execução da ação (com duration_ms)
     """
     action_type_raw = action.get("type", "unknown")
     action_type = normalizar_action_type(action_type_raw)
     action_id = f"{decision_id}_action_{action_index}"
+    started = time.perf_counter()
     
     log_structured("info", "action_execution_start", {
         "action_id": action_id,
@@ -170,72 +264,110 @@ async def execute_action(
         else:
             result = await execute_generic_action(action, action_id)
         
-        # Rastrear execução da ação
-        if db:
-            await track_action_execution(action_id, action_type, result, db)
-        
-        # Hook para expects_reply (se for send_message com sucesso)
-        if action_type == "send_message" and result.get("message_sent"):
-            try:
-                automation_hook = get_automation_hook()
-                automation_id = action.get("automation_id")
-                # Extrair lead_id do metadata do plan
-                lead_id = (metadata or {}).get("lead_id")
-                # Extrair provider_message_id se disponível
-                provider_message_id = (metadata or {}).get("provider_message_id")
-                # Extrair texto da mensagem
-                prompt_text = action.get("text", "")
-                
-                logger.info(f"🔧 [ApplyPlan] Calling automation hook: automation_id={automation_id}, lead_id={lead_id}, success={result.get('message_sent')}")
-                if automation_id and lead_id:
-                    await automation_hook.on_automation_sent(
-                        automation_id=automation_id, 
-                        lead_id=lead_id, 
-                        success=True,
-                        provider_message_id=provider_message_id,
-                        prompt_text=prompt_text
-                    )
-                    
-                    # FASE 3 - Registrar no timeline leve para retroativo (independente do Hook)
-                    await register_expects_reply_timeline(
-                        automation_id=automation_id,
-                        lead_id=lead_id,
-                        provider_message_id=provider_message_id,
-                        prompt_text=prompt_text
-                    )
-                else:
-                    logger.warning(f"🔧 [ApplyPlan] Missing automation_id ({automation_id}) or lead_id ({lead_id}) for hook")
-            except Exception as hook_error:
-                logger.warning(f"Automation hook error: {str(hook_error)}")
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        
+        # Rastreamento e hook de expects_reply não atrasam a resposta
+        async def bookkeeping() -> None:
+            await _after_action_bookkeeping(action, action_id, action_type, result, db, metadata)
+        
+        if deferred is None:
+            await bookkeeping()
+        else:
+            deferred.append(bookkeeping)
         
         log_structured("info", "action_execution_success", {
             "action_id": action_id,
-            "action_type": action_type
+            "action_type": action_type,
+            "duration_ms": duration_ms
         })
         
         return {
             "action_id": action_id,
             "action_type": action_type,
             "status": "success",
-            "result": result
+            "result": result,
+            "duration_ms": duration_ms
         }
         
     except Exception as e:
         error_msg = str(e)
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
         log_structured("error", "action_execution_error", {
             "action_id": action_id,
             "action_type": action_type,
-            "error": error_msg
+            "error": error_msg,
+            "duration_ms": duration_ms
         })
         
         return {
             "action_id": action_id,
             "action_type": action_type,
             "status": "error",
-            "error": error_msg
+            "error": error_msg,
+            "duration_ms": duration_ms
         }
 
 
+async def _after_action_bookkeeping(
+    action: Dict[str, Any],
+    action_id: str,
+    action_type: str,
+    result: Dict[str, Any],
+    db: Optional[AsyncSession] = None,
+    metadata: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Telemetria da ação e, após envio com sucesso, hook de expects_reply.
+    
+    Args:
+        action: Definição da ação
+        action_id: ID da ação
+        action_type: Tipo normalizado
+        result: Resultado da execução
+        db: Sessão do banco
+        metadata: Metadata do plano
+    """
+    # Rastrear execução da ação
+    if db:
+        await track_action_execution(action_id, action_type, result, db)
+    
+    # Hook para expects_reply (se for send_message com sucesso)
+    if action_type == "send_message" and result.get("message_sent"):
+        try:
+            automation_hook = get_automation_hook()
+            automation_id = action.get("automation_id")
+            # Extrair lead_id do metadata do plan
+            lead_id = (metadata or {}).get("lead_id")
+            # Extrair provider_message_id se disponível
+            provider_message_id = (metadata or {}).get("provider_message_id")
+            # Extrair texto da mensagem
+            prompt_text = action.get("text", "")
+            
+            logger.info(f"🔧 [ApplyPlan] Calling automation hook: automation_id={automation_id}, lead_id={lead_id}, success={result.get('message_sent')}")
+            if automation_id and lead_id:
+                get_cooldown_service().record_sent(lead_id, automation_id)
+                
+                await automation_hook.on_automation_sent(
+                    automation_id=automation_id, 
+                    lead_id=lead_id, 
+                    success=True,
+                    provider_message_id=provider_message_id,
+                    prompt_text=prompt_text
+                )
+                
+                # FASE 3 - Registrar no timeline leve para retroativo (independente do Hook)
+                await register_expects_reply_timeline(
+                    automation_id=automation_id,
+                    lead_id=lead_id,
+                    provider_message_id=provider_message_id,
+                    prompt_text=prompt_text
+                )
+            else:
+                logger.warning(f"🔧 [ApplyPlan] Missing automation_id ({automation_id}) or lead_id ({lead_id}) for hook")
+        except Exception as hook_error:
+            logger.warning(f"Automation hook error: {str(hook_error)}")
+
+
 async def execute_send_message(action: Dict[str, Any], action_id: str) -> Dict[str, Any]:
     """
     Executa ação de envio de mensagem com blindagem contra nulos.
@@ -301,7 +433,7 @@ async def execute_send_media(action: Dict[str, Any], action_id: str) -> Dict[str
 async def execute_set_facts(
     action: Dict[str, Any], 
     action_id: str, 
-    db: Optional[Session] = None,
+    db: Optional[AsyncSession] = None,
     metadata: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
@@ -354,7 +486,7 @@ async def execute_set_facts(
                 profile_updates[key] = value
         
         # Atualizar perfil
-        repo.update_profile_facts(lead_id, profile_updates)
+        await repo.update_profile_facts(lead_id, profile_updates)
         
         logger.info(f"📝 [SetFacts] Updated facts for lead {lead_id}: {set_facts}")
         
@@ -379,7 +511,7 @@ async def execute_set_facts(
 async def execute_track_event(
     action: Dict[str, Any], 
     action_id: str,
-    db: Optional[Session] = None
+    db: Optional[AsyncSession] = None
 ) -> Dict[str, Any]:
     """
     Executa ação de rastreamento de evento.
@@ -470,38 +602,49 @@ async def execute_generic_action(action: Dict[str, Any], action_id: str) -> Dict
     }
 
 
-async def check_idempotency(key: str, db: Session) -> Optional[Dict[str, Any]]:
+async def check_idempotency(
+    key: str,
+    db: Optional[AsyncSession] = None,
+    durable: bool = False
+) -> Optional[Dict[str, Any]]:
     """
-    Verifica se já existe resposta para chave de idempotência.
+    Reserva a chave de idempotência ou devolve a resposta já conhecida.
     
     Args:
         key: Chave de idempotência
-        db: Sessão do banco
+        db: Sessão do banco (usada só com durable)
+        durable: Consultar também o Postgres
         
     Returns:
-        Resposta cacheada ou None
+        Resposta cacheada, status "in_progress" ou None (pode executar)
     """
     try:
-        idempotency_repo = IdempotencyRepository(db)
-        return idempotency_repo.get_response(key)
+        return await get_idempotency_store().begin(key, db, durable)
     except Exception as e:
+        # A consulta durável roda em savepoint: a transação do turno segue válida
         logger.warning(f"Erro ao verificar idempotência: {str(e)}")
         return None
 
 
-async def store_idempotency_response(key: str, response: Dict[str, Any], db: Session):
+async def store_idempotency_response(
+    key: str,
+    response: Dict[str, Any],
+    db: Optional[AsyncSession] = None,
+    durable: bool = False
+):
     """
     Armazena resposta para chave de idempotência.
     
     Args:
         key: Chave de idempotência
         response: Resposta a ser armazenada
-        db: Sessão do banco
+        db: Sessão do banco (usada só com durable)
+        durable: Gravar também no Postgres
     """
     try:
-        idempotency_repo = IdempotencyRepository(db)
-        idempotency_repo.store_response(key, response)
+        await get_idempotency_store().complete(key, response, db, durable)
     except Exception as e:
+        # A gravação durável roda em savepoint: as escritas do turno seguem válidas
         logger.warning(f"Erro ao armazenar idempotência: {str(e)}")
 
 
@@ -610,23 +753,11 @@ async def register_expects_reply_timeline(
         prompt_text: Texto da mensagem enviada
     """
     try:
-        import yaml
         import time
+        from app.core.catalog_store import get_catalog_store
         
-        # Carregar catálogo para verificar expects_reply
-        try:
-            with open("policies/catalog.yml", "r", encoding="utf-8") as f:
-                catalog = yaml.safe_load(f)
-        except Exception as e:
-            logger.warning(f"Erro ao carregar catálogo para timeline: {e}")
-            return
-        
-        # Buscar automação no catálogo
-        automation = None
-        for item in catalog:
-            if item.get("id") == automation_id:
-                automation = item
-                break
+        # Buscar automação na store do catálogo para verificar expects_reply
+        automation = get_catalog_store().get_automation(automation_id)
         
         if not automation:
             return  # Automação não encontrada no catálogo
@@ -640,8 +771,7 @@ async def register_expects_reply_timeline(
         if not target:
             return  # Target não definido
         
-        # Registrar no timeline de expects_reply 
-        # Usando Redis ou contexto_lead (implementação simples via contexto_lead)
+        # Registrar no timeline de expects_reply (sorted set por lead no cache de contexto)
         from app.core.contexto_lead import get_contexto_lead_service
         
         contexto_service = get_contexto_lead_service()
@@ -655,7 +785,7 @@ async def register_expects_reply_timeline(
             "created_at": int(time.time())
         }
         
-        # Salvar no timeline (vamos usar um campo separado no contexto_lead)
+        # Salvar no timeline
         await contexto_service.adicionar_timeline_expects_reply(lead_id, timeline_entry)
         
         logger.info(f"📋 [Timeline] Registered expects_reply: lead_id={lead_id}, target={target}, automation_id={automation_id}")
@@ -679,27 +809,10 @@ async def get_retroactive_expects_reply(lead_id: int, window_minutes: int = 10)
         import time
         from app.core.contexto_lead import get_contexto_lead_service
         
+        # Consulta por janela (ZRANGEBYSCORE no timeline do lead)
         contexto_service = get_contexto_lead_service()
-        timeline = await contexto_service.obter_timeline_expects_reply(lead_id)
-        
-        if not timeline:
-            return None
-        
-        # Filtrar por janela de tempo
-        now = int(time.time())
-        window_seconds = window_minutes * 60
-        
-        recent_entries = []
-        for entry in timeline:
-            created_at = entry.get("created_at", 0)
-            if now - created_at <= window_seconds:
-                recent_entries.append(entry)
-        
-        if not recent_entries:
-            return None
-        
-        # Retornar a mais recente (maior timestamp)
-        return max(recent_entries, key=lambda x: x.get("created_at", 0))
+        desde = int(time.time()) - window_minutes * 60
+        return await contexto_service.obter_expects_reply_recente(lead_id, desde)
         
     except Exception as e:
         logger.warning(f"Erro ao buscar timeline retroativo: {e}")
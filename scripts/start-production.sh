@@ -1,5 +1,10 @@
 #!/bin/bash
 # Script de inicialização para produção
+#
+# WEB_WORKERS=1 (padrão): um único uvicorn na porta 8000.
+# WEB_WORKERS=N (>1): N workers uvicorn em 8001..800N e o dispatcher na
+# porta 8000, que envia os turnos de cada lead sempre ao mesmo worker
+# (hashing consistente) e rebalanceia quando um worker entra ou sai.
 
 set -e
 
@@ -16,9 +21,38 @@ echo "✅ PostgreSQL disponível"
 echo "🔄 Executando migrações..."
 alembic upgrade head
 
-# Servir arquivos estáticos e API
-echo "🌐 Iniciando servidor..."
-uvicorn app.main:app \
+WEB_WORKERS="${WEB_WORKERS:-1}"
+WORKER_BASE_PORT="${WORKER_BASE_PORT:-8001}"
+
+if [ "$WEB_WORKERS" -le 1 ]; then
+    # Servir arquivos estáticos e API
+    echo "🌐 Iniciando servidor..."
+    exec uvicorn app.main:app \
+        --host 0.0.0.0 \
+        --port 8000 \
+        --access-log \
+        --log-level info
+fi
+
+echo "🌐 Iniciando $WEB_WORKERS workers..."
+WORKER_PIDS=()
+WORKER_URLS=()
+for i in $(seq 0 $((WEB_WORKERS - 1))); do
+    PORT=$((WORKER_BASE_PORT + i))
+    WORKER_URLS+=("http://127.0.0.1:$PORT")
+    WORKER_URL="http://127.0.0.1:$PORT" uvicorn app.main:app \
+        --host 127.0.0.1 \
+        --port "$PORT" \
+        --no-access-log \
+        --log-level info &
+    WORKER_PIDS+=($!)
+done
+
+# Encerrar os workers junto com o dispatcher
+trap 'kill -TERM "${WORKER_PIDS[@]}" 2>/dev/null; wait' EXIT INT TERM
+
+echo "🧭 Iniciando dispatcher na porta 8000..."
+DISPATCHER_WORKERS="$(IFS=,; echo "${WORKER_URLS[*]}")" uvicorn app.dispatcher:app \
     --host 0.0.0.0 \
     --port 8000 \
     --access-log \
@@ -172,10 +172,13 @@ export interface LeadDetail extends LeadListItem {
 
 export interface LeadsListResponse {
   items: LeadListItem[];
-  total: number;
+  total: number;  // null com count=none ou cursor sem total em cache
+  total_estimated?: boolean;
   page: number;
   page_size: number;
   total_pages: number;
+  has_more?: boolean;
+  next_cursor?: string | null;
 }
 
 export interface LeadsFilters {
@@ -207,6 +210,8 @@ export interface LeadsFilters {
   page_size?: number;
   sort_by?: string;
   sort_dir?: 'asc' | 'desc';
+  cursor?: string;
+  count?: 'exact' | 'estimate' | 'none';
 }
 
 // Tipos para autocomplete
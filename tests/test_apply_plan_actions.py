@@ -0,0 +1,100 @@
+"""
+Testes para a execução de ações e o bookkeeping adiado do apply_plan.
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.data.unit_of_work import UnitOfWork
+from app.tools import apply_plan as apply_plan_module
+from app.tools.apply_plan import execute_action, execute_actions
+
+
+class TestExecuteActions:
+    """Testes para execute_actions."""
+
+    @pytest.mark.asyncio
+    async def test_actions_run_in_plan_order(self, monkeypatch):
+        """Testa execução sequencial na ordem do plano, com duração por ação."""
+        events = []
+
+        async def slow_send(action, action_id):
+            events.append(f"send_start:{action['text']}")
+            await asyncio.sleep(0.01)
+            events.append(f"send_end:{action['text']}")
+            return {"message_sent": False}
+
+        async def set_facts(action, action_id, db, metadata):
+            events.append("facts")
+            return {"facts_updated": 1}
+
+        monkeypatch.setattr(apply_plan_module, "execute_send_message", slow_send)
+        monkeypatch.setattr(apply_plan_module, "execute_set_facts", set_facts)
+
+        actions = [
+            {"type": "send_message", "text": "a"},
+            {"type": "set_facts", "set_facts": {"flags.x": True}},
+            {"type": "send_message", "text": "b"},
+        ]
+        results = await execute_actions(actions, "d1", deferred=[])
+
+        assert events == ["send_start:a", "send_end:a", "facts", "send_start:b", "send_end:b"]
+        assert [r["action_id"] for r in results] == ["d1_action_0", "d1_action_1", "d1_action_2"]
+        assert all("duration_ms" in r for r in results)
+
+    @pytest.mark.asyncio
+    async def test_hook_is_deferred(self):
+        """Testa que o hook de expects_reply só roda quando o trabalho adiado executa."""
+        hook = MagicMock()
+        hook.on_automation_sent = AsyncMock()
+        deferred = []
+        action = {"type": "send_message", "text": "?", "automation_id": "ask_deposit"}
+
+        with patch.object(apply_plan_module, "get_automation_hook", return_value=hook), \
+             patch.object(apply_plan_module, "register_expects_reply_timeline", AsyncMock()) as timeline:
+            result = await execute_action(action, 0, "d1", metadata={"lead_id": 7}, deferred=deferred)
+            assert result["status"] == "success"
+            hook.on_automation_sent.assert_not_called()
+
+            for work in deferred:
+                await work()
+
+        hook.on_automation_sent.assert_awaited_once()
+        timeline.assert_awaited_once()
+
+
+class TestUnitOfWorkDeferred:
+    """Testes para o trabalho adiado do unit of work."""
+
+    @pytest.mark.asyncio
+    async def test_runs_in_order_and_survives_errors(self):
+        """Testa execução sequencial, falha isolada e esvaziamento da fila."""
+        uow = UnitOfWork(MagicMock(), turn=True)
+        calls = []
+
+        async def failing():
+            calls.append("failing")
+            raise RuntimeError("boom")
+
+        async def ok():
+            calls.append("ok")
+
+        uow.defer(failing)
+        uow.defer(ok)
+        await uow.run_deferred()
+        await uow.run_deferred()
+
+        assert calls == ["failing", "ok"]
+
+    @pytest.mark.asyncio
+    async def test_rollback_discards_deferred(self):
+        """Testa que rollback descarta o bookkeeping pendente."""
+        db = MagicMock()
+        db.rollback = AsyncMock()
+        uow = UnitOfWork(db, turn=True)
+        work = AsyncMock()
+        uow.defer(work)
+        await uow.rollback()
+        await uow.run_deferred()
+        work.assert_not_called()
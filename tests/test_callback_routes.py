@@ -0,0 +1,87 @@
+"""
+Testes para a tabela de roteamento dos botões de callback.
+"""
+from app.core.callback_routes import build_callback_routes, callback_route_actions
+from app.core.catalog_store import CatalogStore
+
+
+def automation(automation_id, buttons):
+    return {
+        "id": automation_id,
+        "output": {"type": "message", "text": f"texto {automation_id}", "buttons": buttons}
+    }
+
+
+CATALOG = [
+    automation("ask_deposit", [
+        {
+            "id": "btn_yes_deposit", "label": "Sim", "kind": "callback",
+            "set_facts": {"agreements.can_deposit": True},
+            "track": {"event": "click_yes_deposit"},
+            "next_automation": "deposit_help"
+        },
+        {"id": "btn_help", "label": "Ajuda", "kind": "url", "url": "https://x", "track": {"event": "help"}},
+        {"label": "Sem id", "kind": "callback", "set_facts": {"flags.x": True}},
+        {"id": "btn_noop", "label": "Nada", "kind": "callback"},
+    ]),
+    automation("deposit_help", [
+        {"id": "btn_done", "label": "Feito", "set_facts": {"deposit.status": "pendente"}},
+        {"id": "btn_broken", "label": "Quebrado", "next_automation": "nao_existe"},
+    ]),
+]
+
+
+class TestBuildCallbackRoutes:
+    """Testes para build_callback_routes."""
+
+    def test_routes_only_explicit_callback_buttons(self):
+        """Testa que só botões callback com id e efeito entram na tabela."""
+        routes = build_callback_routes(CATALOG)
+        assert set(routes) == {"btn_yes_deposit", "btn_done"}
+        route = routes["btn_yes_deposit"]
+        assert route["automation_id"] == "ask_deposit"
+        assert route["next_automation"] == "deposit_help"
+        assert route["set_facts"] == {"agreements.can_deposit": True}
+
+    def test_missing_next_automation_is_dropped(self):
+        """Testa botão apontando para automação inexistente."""
+        catalog = [automation("a", [{"id": "b", "label": "B", "next_automation": "x", "track": {"event": "e"}}])]
+        assert build_callback_routes(catalog)["b"]["next_automation"] is None
+
+    def test_conflicting_ids_fall_back_to_pipeline(self):
+        """Testa id repetido: igual é mantido, diferente sai da tabela."""
+        same = {"id": "btn_ok", "label": "Ok", "set_facts": {"flags.ok": True}}
+        other = {"id": "btn_ok", "label": "Ok", "set_facts": {"flags.ok": False}}
+        assert "btn_ok" in build_callback_routes([automation("a", [same]), automation("b", [dict(same)])])
+        assert "btn_ok" not in build_callback_routes([automation("a", [same]), automation("b", [other])])
+
+
+class TestCallbackRouteActions:
+    """Testes para callback_route_actions."""
+
+    def test_actions_in_order(self):
+        """Testa set_facts, track e envio da próxima automação."""
+        route = build_callback_routes(CATALOG)["btn_yes_deposit"]
+        actions = callback_route_actions(route, CATALOG[1])
+        assert [a["type"] for a in actions] == ["set_facts", "track_event", "message"]
+        assert actions[2]["automation_id"] == "deposit_help"
+
+    def test_facts_only(self):
+        """Testa botão só com set_facts (sem mensagem)."""
+        route = build_callback_routes(CATALOG)["btn_done"]
+        assert callback_route_actions(route) == [
+            {"type": "set_facts", "set_facts": {"deposit.status": "pendente"}}
+        ]
+
+
+class TestCatalogStoreRoutes:
+    """Testes para a tabela no snapshot da store."""
+
+    def test_table_rebuilt_on_replace(self, tmp_path):
+        """Testa que a tabela acompanha cada troca de snapshot."""
+        store = CatalogStore(policies_dir=tmp_path)
+        store.replace(automations=CATALOG)
+        assert store.get_callback_route("btn_done")["automation_id"] == "deposit_help"
+
+        store.replace(automations=[])
+        assert store.get_callback_route("btn_done") is None
@@ -0,0 +1,143 @@
+"""
+Testes para a store em memória das políticas (catálogo, targets, procedimentos).
+"""
+import pytest
+
+from app.core.catalog_store import CatalogStore
+
+
+@pytest.fixture
+def policies_dir(tmp_path):
+    """Diretório de políticas temporário com YAMLs mínimos."""
+    (tmp_path / "catalog.yml").write_text(
+        "- id: ask_deposit_for_test\n"
+        "  expects_reply:\n"
+        "    target: confirm_can_deposit\n"
+        "- id: signup_link\n",
+        encoding="utf-8"
+    )
+    (tmp_path / "confirm_targets.yml").write_text(
+        "confirm_can_deposit:\n"
+        "  max_age_minutes: 30\n",
+        encoding="utf-8"
+    )
+    (tmp_path / "procedures.yml").write_text(
+        "- id: liberar_teste\n"
+        "  steps: []\n",
+        encoding="utf-8"
+    )
+    return tmp_path
+
+
+class TestCatalogStore:
+    """Testes para CatalogStore."""
+
+    def test_indexes_by_id(self, policies_dir):
+        """Testa carregamento e indexação por ID."""
+        store = CatalogStore(policies_dir)
+
+        assert store.get_automation("signup_link")["id"] == "signup_link"
+        assert store.get_automation("inexistente") is None
+        assert store.get_confirm_target("confirm_can_deposit")["max_age_minutes"] == 30
+        assert store.get_procedure("liberar_teste") is not None
+        assert len(store.automations) == 2
+
+    def test_loads_once(self, policies_dir):
+        """Testa que o disco não é relido a cada consulta."""
+        store = CatalogStore(policies_dir)
+        version = store.version
+
+        (policies_dir / "catalog.yml").write_text("[]", encoding="utf-8")
+
+        assert store.get_automation("signup_link") is not None
+        assert store.version == version
+
+    def test_replace_swaps_snapshot(self, policies_dir):
+        """Testa troca atômica com conteúdo já parseado."""
+        store = CatalogStore(policies_dir)
+        old_snapshot = store.snapshot
+
+        store.replace(automations=[{"id": "nova"}])
+
+        assert store.version == old_snapshot.version + 1
+        assert store.get_automation("nova") is not None
+        assert store.get_automation("signup_link") is None
+        # Targets e procedimentos preservados
+        assert store.get_confirm_target("confirm_can_deposit") is not None
+        assert store.get_procedure("liberar_teste") is not None
+        # Snapshot antigo não é alterado
+        assert old_snapshot.automations_by_id.get("signup_link") is not None
+
+    def test_concurrent_partial_replaces_keep_both(self, policies_dir):
+        """Testa que replaces parciais simultâneos não perdem atualização."""
+        import threading
+
+        store = CatalogStore(policies_dir)
+        store.snapshot
+        barrier = threading.Barrier(2)
+
+        def replace(**kwargs):
+            barrier.wait()
+            store.replace(**kwargs)
+
+        threads = [
+            threading.Thread(target=replace, kwargs={"automations": [{"id": "nova"}]}),
+            threading.Thread(target=replace, kwargs={"procedures": [{"id": "novo_proc", "steps": []}]}),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert store.get_automation("nova") is not None
+        assert store.get_procedure("novo_proc") is not None
+
+    def test_invalid_content_is_normalized(self, tmp_path):
+        """Testa arquivos ausentes ou com formato inesperado."""
+        (tmp_path / "catalog.yml").write_text("chave: valor", encoding="utf-8")
+        store = CatalogStore(tmp_path)
+
+        assert store.automations == []
+        assert store.confirm_targets == {}
+        assert store.procedures == []
+
+
+class TestPolicyBundle:
+    """Testes para o bundle compilado das políticas."""
+
+    def test_reload_writes_and_uses_bundle(self, policies_dir, monkeypatch):
+        """Testa que a segunda carga vem do bundle, sem parsear YAML."""
+        CatalogStore(policies_dir).reload()
+        assert (policies_dir / "policy_bundle.pkl").exists()
+
+        def _fail(*args, **kwargs):
+            raise AssertionError("YAML não deveria ser parseado")
+
+        monkeypatch.setattr(CatalogStore, "_read_yaml", _fail)
+        store = CatalogStore(policies_dir)
+
+        assert store.get_automation("signup_link") is not None
+        assert store.snapshot.compiled_rules["signup_link"] == ()
+        assert store.snapshot.keywords["signup_link"] == ("", ())
+
+    def test_stale_bundle_falls_back_to_yaml(self, policies_dir):
+        """Testa que o bundle é ignorado quando um YAML muda."""
+        CatalogStore(policies_dir).reload()
+
+        (policies_dir / "catalog.yml").write_text(
+            "- id: nova\n"
+            "  eligibility: não tem conta\n",
+            encoding="utf-8"
+        )
+        store = CatalogStore(policies_dir)
+
+        assert store.get_automation("nova") is not None
+        assert store.snapshot.compiled_rules["nova"] == ("no_account",)
+
+    def test_corrupt_bundle_is_ignored(self, policies_dir):
+        """Testa fallback para YAML com bundle ilegível."""
+        (policies_dir / "policy_bundle.pkl").write_bytes(b"lixo")
+
+        store = CatalogStore(policies_dir)
+
+        assert store.get_automation("signup_link") is not None
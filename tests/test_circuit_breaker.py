@@ -0,0 +1,164 @@
+"""
+Testes para o circuit breaker das chamadas LLM.
+"""
+import asyncio
+
+import pytest
+
+from app.core import circuit_breaker as cb
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from app.core.llm_call import call_llm
+
+
+class FakeClock:
+    """Relógio manual."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    """Breaker com limiares pequenos."""
+    b = CircuitBreaker("test-model:chat.completions", clock=clock)
+    b.window = 30
+    b.min_calls = 4
+    b.error_rate = 0.5
+    b.slow_call_ms = 1000
+    b.slow_rate = 0.75
+    b.open_seconds = 10
+    b.half_open_probes = 1
+    return b
+
+
+class TestCircuitBreaker:
+    """Testes para CircuitBreaker."""
+
+    def test_trips_on_error_rate(self, breaker):
+        """Testa abertura pela taxa de erro após o mínimo de chamadas."""
+        for success in (True, False, True):
+            assert breaker.allow()
+            breaker.record(success, 10)
+        assert breaker.state == CLOSED
+
+        breaker.record(False, 10)
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        assert breaker.rejected == 1
+
+    def test_trips_on_slow_calls(self, breaker):
+        """Testa abertura por chamadas lentas mesmo sem erro."""
+        for _ in range(4):
+            breaker.record(True, 5000)
+        assert breaker.state == OPEN
+
+    def test_old_outcomes_leave_window(self, breaker, clock):
+        """Testa que erros fora da janela não contam."""
+        breaker.record(False, 10)
+        breaker.record(False, 10)
+        clock.now += 31
+        breaker.record(True, 10)
+        breaker.record(True, 10)
+        assert breaker.state == CLOSED
+
+    def test_half_open_probe_closes(self, breaker, clock):
+        """Testa prova do meio-aberto que fecha o breaker."""
+        for _ in range(4):
+            breaker.record(False, 10)
+        clock.now += 10
+
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow()  # só uma prova por vez
+
+        breaker.record(True, 10, probe=True)
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    def test_half_open_probe_failure_reopens(self, breaker, clock):
+        """Testa prova que falha e reabre o breaker."""
+        for _ in range(4):
+            breaker.record(False, 10)
+        clock.now += 10
+        assert breaker.allow()
+        breaker.record(False, 10, probe=True)
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    @pytest.mark.asyncio
+    async def test_guard_records_and_rejects(self, breaker):
+        """Testa guard registrando exceções e recusando quando aberto."""
+        for _ in range(4):
+            with pytest.raises(RuntimeError):
+                async with breaker.guard():
+                    raise RuntimeError("provider down")
+        assert breaker.state == OPEN
+
+        ran = False
+        with pytest.raises(CircuitOpenError):
+            async with breaker.guard():
+                ran = True
+        assert not ran
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_is_released(self, breaker, clock):
+        """Testa que uma prova cancelada não prende o meio-aberto."""
+        for _ in range(4):
+            breaker.record(False, 10)
+        clock.now += 10
+
+        async def probe():
+            async with breaker.guard():
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(probe())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow()
+
+
+class TestCallLlm:
+    """Testes para call_llm."""
+
+    @pytest.fixture(autouse=True)
+    def isolated_breakers(self, monkeypatch):
+        monkeypatch.setattr(cb, "_circuit_breakers", {})
+
+    @pytest.mark.asyncio
+    async def test_shared_breaker_fails_fast(self):
+        """Testa breaker compartilhado entre pontos de chamada do mesmo modelo."""
+        calls = []
+
+        async def failing(**kwargs):
+            calls.append(kwargs)
+            raise RuntimeError("503")
+
+        breaker = cb.get_circuit_breaker("gpt-test")
+        breaker.min_calls = 2
+        for site in ("intake", "gate"):
+            with pytest.raises(RuntimeError):
+                await call_llm(site, failing, model="gpt-test", messages=[])
+        assert breaker.state == OPEN
+
+        with pytest.raises(CircuitOpenError):
+            await call_llm("kb", failing, model="gpt-test", messages=[])
+        assert len(calls) == 2
+
+        # Outro modelo tem breaker próprio
+        async def ok(**kwargs):
+            return "ok"
+        assert await call_llm("comparador", ok, model="gpt-other") == "ok"
+        assert set(cb.circuit_breakers_snapshot()) == {
+            "gpt-test:chat.completions", "gpt-other:chat.completions"
+        }
@@ -0,0 +1,138 @@
+"""
+Testes para o classificador determinístico de confirmações.
+"""
+import pytest
+
+from app.core.confirmation_classifier import (
+    ConfirmationMetrics, classify_confirmation, normalize
+)
+from app.core.confirmation_gate import ConfirmationGate
+from app.settings import settings
+
+PENDING = [{"target": "confirm_can_deposit", "source": "context"}]
+
+
+class TestNormalize:
+    """Testes para normalize."""
+
+    def test_accents_emoji_and_repeats(self):
+        """Testa acentos, emojis, pontuação e letras repetidas."""
+        assert normalize("Siiiim!!! 👍🏻") == "sim emoji_yes"
+        assert normalize("Não, agora NÃO.") == "nao agora nao"
+
+
+class TestClassifyConfirmation:
+    """Testes para classify_confirmation."""
+
+    @pytest.mark.parametrize("message", [
+        "sim", "s", "ss", "ok", "👍", "✅", "claro", "bora", "blz", "beleza", "eu tbm",
+        "pode sim", "com certeza", "siiim", "consigo sim", "já fiz"
+    ])
+    def test_confident_yes(self, message):
+        """Testa afirmações (inclui gírias e emojis) acima do limiar."""
+        result = classify_confirmation(message)
+        assert result.polarity == "yes"
+        assert result.confidence >= settings.CONFIRM_CLASSIFIER_THRESHOLD
+
+    @pytest.mark.parametrize("message", [
+        "não", "nao", "n", "agora não", "ainda não", "não consigo", "nem pensar",
+        "claro que não", "👎", "não posso não"
+    ])
+    def test_confident_no(self, message):
+        """Testa negações, inclusive negação de verbos de sim."""
+        result = classify_confirmation(message)
+        assert result.polarity == "no"
+        assert result.confidence >= settings.CONFIRM_CLASSIFIER_THRESHOLD
+
+    def test_negator_flips_yes_term(self):
+        """Testa negador seguido de termo de sim fora das frases prontas."""
+        result = classify_confirmation("nunca aceito")
+        assert result.polarity == "no"
+
+    @pytest.mark.parametrize("message", ["depois", "talvez", "sei lá", "não sei", "n sei"])
+    def test_postponement(self, message):
+        """Testa adiamentos e incerteza."""
+        assert classify_confirmation(message).polarity == "other"
+
+    @pytest.mark.parametrize("message", [
+        "Consigo fazer o depósito sim, mas preciso de ajuda",
+        "sim, mas depois",
+        "posso?",
+        "não, consigo sim",
+        "consigo depositar na semana que vem se o banco liberar",
+    ])
+    def test_ambiguous_stays_below_threshold(self, message):
+        """Testa que conflito, contraste, pergunta e texto longo vão para o LLM."""
+        assert classify_confirmation(message).confidence < settings.CONFIRM_CLASSIFIER_THRESHOLD
+
+    @pytest.mark.parametrize("message", [
+        "não, pode sim",
+        "nao, claro",
+        "não! bora",
+        "nunca, quero sim",
+    ])
+    def test_negator_does_not_cross_punctuation(self, message):
+        """Testa que o negador não se junta ao termo de sim depois de vírgula/exclamação."""
+        result = classify_confirmation(message)
+        assert len(result.matched) == 2
+        assert "conflict" in result.reason
+        assert result.confidence < settings.CONFIRM_CLASSIFIER_THRESHOLD
+
+    @pytest.mark.parametrize("message,polarity", [
+        ("já fiz no app", "yes"),
+        ("depositei no pix", "yes"),
+        ("to no trabalho", None),
+        ("ta caro", None),
+    ])
+    def test_short_words_inside_phrases(self, message, polarity):
+        """Testa "no" (em+o) e "ta" dentro de frases: não contam como não/sim."""
+        assert classify_confirmation(message).polarity == polarity
+
+    def test_short_words_alone(self):
+        """Testa "no" e "ta" como mensagem inteira."""
+        assert classify_confirmation("no").polarity == "no"
+        assert classify_confirmation("ta").polarity == "yes"
+
+    def test_no_match(self):
+        """Testa mensagem sem termos do léxico."""
+        result = classify_confirmation("qual o link da corretora?")
+        assert result.polarity is None
+        assert result.confidence == 0.0
+
+
+class TestConfirmationMetrics:
+    """Testes para ConfirmationMetrics."""
+
+    def test_without_model_ratio(self):
+        """Testa fração resolvida sem chamada de modelo."""
+        metrics = ConfirmationMetrics()
+        assert metrics.snapshot()["without_model_ratio"] is None
+        for path in ("classifier", "classifier", "fallback", "llm", "unresolved"):
+            metrics.record(path)
+        assert metrics.snapshot()["without_model_ratio"] == 0.75
+
+
+class TestGateTiers:
+    """Testes para a ordem classificador → LLM no gate."""
+
+    def test_short_circuit_without_flag(self, monkeypatch):
+        """Testa sim/não resolvidos sem LLM mesmo em llm_first."""
+        monkeypatch.setattr(settings, "GATE_YESNO_DETERMINISTICO", False)
+        gate = ConfirmationGate()
+
+        result = gate._deterministic_short_response("bora", PENDING)
+        assert result.source == "deterministic_short"
+        assert result.polarity == "yes"
+
+        # Adiamento sem a flag e mensagem ambígua seguem para o LLM
+        assert gate._deterministic_short_response("depois", PENDING) is None
+        assert gate._deterministic_short_response("sim, mas depois", PENDING) is None
+
+    @pytest.mark.asyncio
+    async def test_fallback_uses_lower_threshold(self):
+        """Testa fallback determinístico com o mesmo classificador."""
+        gate = ConfirmationGate()
+        result = await gate._try_deterministic_confirmation("sim consigo depositar amanhã", PENDING)
+        assert result.handled
+        assert result.polarity == "yes"
+        assert result.source == "fallback"
@@ -0,0 +1,110 @@
+"""
+Testes para os planos de confirmação pré-calculados.
+"""
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core import confirmation_plans
+from app.core.automation_hook import AutomationHook
+from app.core.catalog_store import get_catalog_store
+from app.core.confirmation_gate import ConfirmationGate, ConfirmationResult
+from app.core.confirmation_plans import ConfirmationPlanCache, build_confirmation_actions
+
+TARGET_CONFIG = {
+    "max_age_minutes": 30,
+    "on_yes": {"facts": {"agreements.can_deposit": True}},
+    "on_no": {"facts": {"agreements.can_deposit": False}, "automation": "deposit_help"},
+}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """Cache isolado por teste."""
+    c = ConfirmationPlanCache()
+    monkeypatch.setattr(confirmation_plans, "_confirmation_plan_cache", c)
+    return c
+
+
+def precompute(cache, **overrides):
+    args = dict(
+        lead_id=7, target="confirm_can_deposit", automation_id="ask_deposit",
+        target_config=TARGET_CONFIG, expires_at=time.time() + 60, catalog_version=1
+    )
+    args.update(overrides)
+    return cache.precompute(**args)
+
+
+class TestConfirmationPlanCache:
+    """Testes para ConfirmationPlanCache."""
+
+    def test_both_polarities_precomputed(self, cache):
+        """Testa planos de sim e não montados no envio."""
+        entry = precompute(cache)
+        assert [a.type for a in entry.plans["yes"].actions] == ["set_facts", "send_message", "clear_waiting"]
+        assert entry.plans["no"].actions[0].set_facts == {"agreements.can_deposit": False}
+
+    @pytest.mark.parametrize("lookup", [
+        {"target": "confirm_wants_test"},
+        {"automation_id": "other_automation"},
+        {"catalog_version": 2},
+        {"polarity": "other"},
+    ])
+    def test_stale_or_foreign_entry_misses(self, cache, lookup):
+        """Testa que outra pendência, catálogo trocado ou polaridade sem plano não usam o cache."""
+        precompute(cache)
+        args = dict(lead_id=7, target="confirm_can_deposit", polarity="yes",
+                    automation_id="ask_deposit", catalog_version=1)
+        args.update(lookup)
+        assert cache.get_plan(**args) is None
+        assert cache.snapshot()["misses"] == 1
+
+    def test_expired_entry_misses(self, cache):
+        """Testa pendência expirada."""
+        precompute(cache, expires_at=time.time() - 1)
+        assert cache.get_plan(7, "confirm_can_deposit", "yes", "ask_deposit", 1) is None
+
+    def test_lru_bound(self):
+        """Testa limite de leads em memória."""
+        c = ConfirmationPlanCache(max_leads=2)
+        for lead_id in (1, 2, 3):
+            precompute(c, lead_id=lead_id)
+        assert c.snapshot()["leads"] == 2
+        assert c.get_plan(1, "confirm_can_deposit", "yes", "ask_deposit", 1) is None
+
+
+class TestHookAndGate:
+    """Testes para o plano montado no hook e aplicado pelo gate."""
+
+    @pytest.mark.asyncio
+    async def test_gate_applies_precomputed_plan(self, cache):
+        """Testa que o gate usa o plano pronto sem recarregar o target."""
+        hook = AutomationHook()
+        hook.contexto_service = AsyncMock()
+        automation = {"id": "ask_deposit", "expects_reply": {"target": "confirm_can_deposit"}, "output": {"text": "?"}}
+        store = get_catalog_store()
+        with patch.object(hook, "_get_automation_config", AsyncMock(return_value=automation)), \
+             patch.object(store.snapshot, "confirm_targets", {"confirm_can_deposit": TARGET_CONFIG}):
+            await hook.on_automation_sent("ask_deposit", 7, prompt_text="?")
+        assert cache.snapshot()["stored"] == 1
+
+        gate = ConfirmationGate()
+        result = ConfirmationResult(handled=True, target="confirm_can_deposit", polarity="no")
+        pending = [{"target": "confirm_can_deposit", "automation_id": "ask_deposit"}]
+        with patch.object(gate, "_get_target_config", AsyncMock()) as get_config:
+            actions = await gate._create_confirmation_actions(result, 7, pending)
+
+        get_config.assert_not_called()
+        assert [a.type for a in actions] == ["set_facts", "send_message", "clear_waiting"]
+        assert cache.snapshot()["hits"] == 1
+        assert cache.snapshot()["leads"] == 0
+
+    @pytest.mark.asyncio
+    async def test_gate_builds_on_miss(self, cache):
+        """Testa que sem plano pronto o gate monta as ações na hora."""
+        gate = ConfirmationGate()
+        result = ConfirmationResult(handled=True, target="confirm_can_deposit", polarity="yes")
+        with patch.object(gate, "_get_target_config", AsyncMock(return_value=TARGET_CONFIG)):
+            actions = await gate._create_confirmation_actions(result, 7, [{"target": "confirm_can_deposit"}])
+        assert [a.type for a in actions] == [a.type for a in build_confirmation_actions(TARGET_CONFIG, "yes")]
@@ -0,0 +1,332 @@
+"""
+Testes para o cache de ContextoLead com write-behind.
+"""
+import time
+import pytest
+
+from app.core.context_cache import ContextCache, ContextFlusher, DIRTY_KEY
+from app.core.contexto_lead import ContextoLeadService
+from app.data.models import ContextoLead
+from app.data.unit_of_work import turn_unit_of_work
+from app.redis_adapter import InMemoryRedis
+
+
+class FakeSession:
+    """Sessão mínima que conta leituras por chave primária."""
+
+    def __init__(self, rows=None):
+        self.rows = rows or {}
+        self.gets = 0
+        self.new = []
+        self.dirty = []
+        self.deleted = []
+
+    async def get(self, model, pk):
+        self.gets += 1
+        return self.rows.get((model, pk))
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    def add(self, entity):
+        self.new.append(entity)
+
+
+class FlakyRedis(InMemoryRedis):
+    """InMemoryRedis cujos métodos em `failing` falham como o RedisClient (valor neutro + last_error)."""
+
+    NEUTRAL = {
+        "get": None, "set": False, "delete": 0, "exists": False, "hgetall": {}, "hset": False,
+        "sadd": 0, "spop": [], "zadd": False, "zrangebyscore": [],
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.failing = set()
+
+    def __getattribute__(self, name):
+        attr = super().__getattribute__(name)
+        neutral = type(self).NEUTRAL
+        if name not in neutral:
+            return attr
+
+        def call(*args, **kwargs):
+            if name in self.failing:
+                self.last_error = ConnectionError("redis fora")
+                return neutral[name]
+            self.last_error = None
+            return attr(*args, **kwargs)
+        return call
+
+
+@pytest.fixture
+def cache():
+    return ContextCache(InMemoryRedis(), ttl_seconds=3600)
+
+
+class TestContextCache:
+    """Testes para ContextCache e integração com ContextoLeadService."""
+
+    @pytest.mark.asyncio
+    async def test_read_through_loads_once(self, cache):
+        """Testa que o banco só é lido na primeira vez."""
+        session = FakeSession({
+            (ContextoLead, 1): ContextoLead(lead_id=1, ultimo_topico_kb="saque")
+        })
+        service = ContextoLeadService(session, cache=cache)
+
+        first = await service.obter_contexto(1)
+        second = await service.obter_contexto(1)
+
+        assert first.ultimo_topico_kb == second.ultimo_topico_kb == "saque"
+        assert session.gets == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_context_is_cached(self, cache):
+        """Testa cache negativo para lead sem contexto."""
+        session = FakeSession()
+        service = ContextoLeadService(session, cache=cache)
+
+        assert await service.obter_contexto(2) is None
+        assert await service.obter_contexto(2) is None
+        assert session.gets == 1
+
+    @pytest.mark.asyncio
+    async def test_writes_stay_in_cache_and_mark_dirty(self, cache):
+        """Testa escrita sem tocar o banco e marcação para write-behind."""
+        session = FakeSession()
+        service = ContextoLeadService(session, cache=cache)
+
+        async with turn_unit_of_work(session):
+            await service.atualizar_contexto(3, ultima_automacao_enviada="ask_deposit")
+            await service.adicionar_timeline_expects_reply(3, {"target": "confirm_can_deposit"})
+
+        contexto = await service.obter_contexto(3)
+        assert contexto.ultima_automacao_enviada == "ask_deposit"
+        assert await service.obter_timeline_expects_reply(3) == [{"target": "confirm_can_deposit"}]
+        assert session.new == []
+        assert cache.pop_dirty(10) == [3]
+
+    @pytest.mark.asyncio
+    async def test_aguardando_expires_by_ttl(self, cache, monkeypatch):
+        """Testa expiração nativa do estado 'aguardando'."""
+        service = ContextoLeadService(FakeSession(), cache=cache)
+        await service.definir_aguardando_confirmacao(4, "confirm_can_deposit", "ask_deposit", ttl_segundos=60)
+
+        contexto = await service.obter_contexto(4)
+        assert contexto.aguardando["fato"] == "confirm_can_deposit"
+
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 120)
+        assert (await service.obter_contexto(4)).aguardando is None
+
+    @pytest.mark.asyncio
+    async def test_limpar_aguardando(self, cache):
+        """Testa limpeza explícita do 'aguardando'."""
+        service = ContextoLeadService(FakeSession(), cache=cache)
+        await service.definir_aguardando_confirmacao(5, "confirm_can_deposit", "ask_deposit")
+
+        await service.limpar_aguardando(5)
+
+        assert (await service.obter_contexto(5)).aguardando is None
+
+    @pytest.mark.asyncio
+    async def test_flush_batches_dirty_leads(self, cache, monkeypatch):
+        """Testa persistência em lote dos leads sujos."""
+        service = ContextoLeadService(FakeSession(), cache=cache)
+        await service.atualizar_contexto(6, etapa_ativa="Depositar")
+        await service.atualizar_contexto(7, procedimento_ativo="liberar_teste")
+
+        batches = []
+        flusher = ContextFlusher(cache)
+
+        async def _upsert(rows, columns):
+            batches.append(rows)
+
+        monkeypatch.setattr(flusher, "_upsert", _upsert)
+
+        assert await flusher.flush_once() == 2
+        assert len(batches) == 1
+        rows = {row["lead_id"]: row for row in batches[0]}
+        assert rows[6]["etapa_ativa"] == "Depositar"
+        assert rows[7]["procedimento_ativo"] == "liberar_teste"
+        assert await flusher.flush_once() == 0
+
+    @pytest.mark.asyncio
+    async def test_flush_failure_requeues(self, cache, monkeypatch):
+        """Testa que falha no banco devolve os leads ao set de pendentes."""
+        await ContextoLeadService(FakeSession(), cache=cache).atualizar_contexto(8, etapa_ativa="x")
+        flusher = ContextFlusher(cache)
+
+        async def _upsert(rows, columns):
+            raise RuntimeError("db fora")
+
+        monkeypatch.setattr(flusher, "_upsert", _upsert)
+
+        assert await flusher.flush_once() == 0
+        assert cache.redis.spop(DIRTY_KEY, 10) == ["8"]
+
+    @pytest.mark.asyncio
+    async def test_flush_isolates_failing_row(self, cache, monkeypatch):
+        """Testa que uma linha ruim volta ao set sem segurar o lote nem recriar hash."""
+        service = ContextoLeadService(FakeSession(), cache=cache)
+        await service.atualizar_contexto(13, etapa_ativa="ok")
+        await service.atualizar_contexto(14, etapa_ativa="ruim")
+        flusher = ContextFlusher(cache)
+        written = []
+
+        async def _upsert(rows, columns):
+            if any(row["lead_id"] == 14 for row in rows):
+                raise RuntimeError("linha ruim")
+            written.extend(row["lead_id"] for row in rows)
+
+        monkeypatch.setattr(flusher, "_upsert", _upsert)
+
+        assert await flusher.flush_once() == 1
+        assert written == [13]
+        assert cache.redis.spop(DIRTY_KEY, 10) == ["14"]
+
+        cache.invalidate(14)
+        cache.mark_dirty(14)
+        assert await flusher.flush_once() == 0
+        assert not cache.is_loaded(14)
+
+    @pytest.mark.asyncio
+    async def test_flush_unread_hash_requeues(self, monkeypatch):
+        """Testa que um HGETALL com erro devolve o lead ao set em vez de perder a alteração."""
+        cache = ContextCache(FlakyRedis(), ttl_seconds=3600)
+        await ContextoLeadService(FakeSession(), cache=cache).atualizar_contexto(9, etapa_ativa="Depositar")
+        flusher = ContextFlusher(cache)
+        batches = []
+
+        async def _upsert(rows, columns):
+            batches.append(rows)
+
+        monkeypatch.setattr(flusher, "_upsert", _upsert)
+
+        cache.redis.failing = {"hgetall"}
+        assert await flusher.flush_once() == 0
+        cache.redis.failing = set()
+        assert await flusher.flush_once() == 1
+        assert batches[0][0]["etapa_ativa"] == "Depositar"
+
+    @pytest.mark.asyncio
+    async def test_read_error_is_not_a_miss(self):
+        """Testa que erro do Redis lê do banco sem sobrescrever o cache."""
+        cache = ContextCache(FlakyRedis(), ttl_seconds=3600)
+        await ContextoLeadService(FakeSession(), cache=cache).atualizar_contexto(10, etapa_ativa="nova")
+        session = FakeSession({
+            (ContextoLead, 10): ContextoLead(lead_id=10, etapa_ativa="antiga")
+        })
+        service = ContextoLeadService(session, cache=cache)
+
+        cache.redis.failing = {"hgetall"}
+        assert (await service.obter_contexto(10)).etapa_ativa == "antiga"
+        cache.redis.failing = set()
+        assert (await service.obter_contexto(10)).etapa_ativa == "nova"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("failing", [{"hset"}, {"sadd"}, {"exists"}])
+    async def test_write_error_falls_back_to_database(self, failing):
+        """Testa que escrita sem resposta do Redis (ou sem cache carregado) vai para o contexto_lead."""
+        cache = ContextCache(FlakyRedis(), ttl_seconds=3600)
+        service = ContextoLeadService(FakeSession(), cache=cache)
+        await service.atualizar_contexto(11, etapa_ativa="antiga")
+
+        session = FakeSession()
+        cache.redis.failing = failing
+        async with turn_unit_of_work(session):
+            await ContextoLeadService(session, cache=cache).atualizar_contexto(11, etapa_ativa="nova")
+        cache.redis.failing = set()
+
+        assert [c.etapa_ativa for c in session.new] == ["nova"]
+        assert not cache.is_loaded(11)
+
+    @pytest.mark.asyncio
+    async def test_timeline_and_clear_fall_back_to_database(self):
+        """Testa timeline e limpeza de 'aguardando' com o Redis falhando."""
+        cache = ContextCache(FlakyRedis(), ttl_seconds=3600)
+        contexto = ContextoLead(lead_id=12, aguardando={"fato": "x", "ttl": int(time.time()) + 60})
+        session = FakeSession({(ContextoLead, 12): contexto})
+        service = ContextoLeadService(session, cache=cache)
+
+        cache.redis.failing = {"zadd", "delete"}
+        async with turn_unit_of_work(session):
+            await service.adicionar_timeline_expects_reply(12, {"target": "t", "created_at": 1})
+            await service.limpar_aguardando(12)
+
+        assert contexto.timeline_expects_reply == [{"target": "t", "created_at": 1}]
+        assert contexto.aguardando is None
+
+    @pytest.mark.asyncio
+    async def test_timeline_sorted_set_window(self, cache):
+        """Testa ZADD com corte e consulta por janela de tempo."""
+        service = ContextoLeadService(FakeSession(), cache=cache)
+        now = int(time.time())
+        for i in range(12):
+            await service.adicionar_timeline_expects_reply(
+                9, {"target": f"t{i}", "created_at": now - 1200 + i * 100}
+            )
+
+        timeline = await service.obter_timeline_expects_reply(9)
+        assert len(timeline) == 10
+        assert timeline[0]["target"] == "t2"
+
+        recente = await service.obter_expects_reply_recente(9, now - 600)
+        assert recente["target"] == "t11"
+        assert await service.obter_expects_reply_recente(9, now + 1) is None
+
+    @pytest.mark.asyncio
+    async def test_timeline_snapshot_separate_from_context_flush(self, cache, monkeypatch):
+        """Testa que o timeline só vai ao Postgres na fotografia periódica."""
+        service = ContextoLeadService(FakeSession(), cache=cache)
+        await service.adicionar_timeline_expects_reply(10, {"target": "a", "created_at": 1})
+
+        calls = []
+        flusher = ContextFlusher(cache)
+
+        async def _upsert(rows, columns):
+            calls.append((rows, columns))
+
+        monkeypatch.setattr(flusher, "_upsert", _upsert)
+
+        assert await flusher.flush_once() == 0
+        assert await flusher.snapshot_timelines_once() == 1
+        rows, columns = calls[0]
+        assert columns == ("timeline_expects_reply",)
+        assert rows[0]["timeline_expects_reply"] == [{"target": "a", "created_at": 1}]
+
+    @pytest.mark.asyncio
+    async def test_timeline_read_error_skips_snapshot(self, monkeypatch):
+        """Testa que ZRANGEBYSCORE com erro não grava timeline vazio e devolve o lead ao set."""
+        cache = ContextCache(FlakyRedis(), ttl_seconds=3600)
+        service = ContextoLeadService(FakeSession(), cache=cache)
+        await service.adicionar_timeline_expects_reply(15, {"target": "a", "created_at": 1})
+        flusher = ContextFlusher(cache)
+        batches = []
+
+        async def _upsert(rows, columns):
+            batches.append(rows)
+
+        monkeypatch.setattr(flusher, "_upsert", _upsert)
+
+        cache.redis.failing = {"zrangebyscore"}
+        assert await flusher.snapshot_timelines_once() == 0
+        assert batches == []
+        cache.redis.failing = set()
+        assert await flusher.snapshot_timelines_once() == 1
+        assert batches[0][0]["timeline_expects_reply"] == [{"target": "a", "created_at": 1}]
+
+    @pytest.mark.asyncio
+    async def test_timeline_read_error_falls_back_to_database(self):
+        """Testa que a leitura do timeline com o Redis falhando vem do contexto_lead."""
+        cache = ContextCache(FlakyRedis(), ttl_seconds=3600)
+        contexto = ContextoLead(lead_id=16, timeline_expects_reply=[{"target": "db", "created_at": 5}])
+        service = ContextoLeadService(FakeSession({(ContextoLead, 16): contexto}), cache=cache)
+
+        cache.redis.failing = {"zrangebyscore"}
+        assert await service.obter_timeline_expects_reply(16) == [{"target": "db", "created_at": 5}]
+        assert (await service.obter_expects_reply_recente(16, 1))["target"] == "db"
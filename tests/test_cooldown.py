@@ -0,0 +1,82 @@
+"""
+Testes para cooldown e limite diário de automações.
+"""
+import pytest
+
+from app.core import catalog_store
+from app.core.catalog_store import CatalogStore
+from app.core.cooldown import CooldownService, parse_duration, DEFAULT_COOLDOWN_SECONDS
+from app.redis_adapter import InMemoryRedis
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """Serviço com catálogo isolado e Redis in-memory."""
+    (tmp_path / "catalog.yml").write_text(
+        "- id: ask_deposit\n"
+        "  cooldown: 24h\n"
+        "- id: signup_link\n"
+        "  cooldown: 0\n"
+        "  max_per_day: 2\n"
+        "- id: sem_config\n",
+        encoding="utf-8"
+    )
+    monkeypatch.setattr(catalog_store, "_catalog_store", CatalogStore(tmp_path))
+    return CooldownService(InMemoryRedis())
+
+
+class TestCooldown:
+    """Testes para CooldownService."""
+
+    def test_parse_duration(self):
+        """Testa formatos de duração do catálogo."""
+        assert parse_duration("24h") == 86400
+        assert parse_duration("30m") == 1800
+        assert parse_duration("2d") == 172800
+        assert parse_duration(90) == 90
+        assert parse_duration("90") == 90
+        assert parse_duration("sempre") is None
+        assert parse_duration(None) is None
+
+    def test_cooldown_blocks_after_send(self, service):
+        """Testa janela de cooldown por (lead, automação)."""
+        assert service.check(1, "ask_deposit") is True
+
+        service.record_sent(1, "ask_deposit")
+
+        assert service.check(1, "ask_deposit") is False
+        assert service.check(2, "ask_deposit") is True
+
+    def test_default_cooldown_ttl(self, service):
+        """Testa cooldown padrão para automação sem configuração."""
+        service.record_sent(1, "sem_config")
+
+        entry = service.redis._data["mb:cd:1:sem_config"]
+        assert entry["expires"] is not None
+        assert service.check(1, "sem_config") is False
+        assert DEFAULT_COOLDOWN_SECONDS == 300
+
+    def test_max_per_day(self, service):
+        """Testa limite diário sem cooldown."""
+        service.record_sent(1, "signup_link")
+        assert service.check(1, "signup_link") is True
+
+        service.record_sent(1, "signup_link")
+        assert service.check(1, "signup_link") is False
+
+    def test_check_many_single_round_trip(self, service, monkeypatch):
+        """Testa verificação em lote com um único MGET."""
+        calls = []
+        original = service.redis.mget
+
+        def _mget(keys):
+            calls.append(keys)
+            return original(keys)
+
+        monkeypatch.setattr(service.redis, "mget", _mget)
+        service.record_sent(1, "ask_deposit")
+
+        result = service.check_many(1, ["ask_deposit", "signup_link", "sem_config"])
+
+        assert result == {"ask_deposit": False, "signup_link": True, "sem_config": True}
+        assert len(calls) == 1
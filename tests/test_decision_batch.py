@@ -0,0 +1,87 @@
+"""
+Testes para a avaliação de decisões em lote.
+"""
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core import orchestrator
+from app.core.decision_batch import run_decision_batch, iter_json_list, iter_jsonl
+from app.core.decision_mode import decision_mode, is_deterministic_only, is_no_persist
+from app.data.schemas import Env, Plan
+
+
+def _env(text):
+    return {
+        "lead": {"id": None, "nome": "Teste"},
+        "snapshot": {},
+        "messages_window": [{"id": "m1", "text": text}]
+    }
+
+
+class TestDecisionBatch:
+    """Testes para run_decision_batch."""
+
+    @pytest.mark.asyncio
+    async def test_streams_plans_with_shared_mode(self, monkeypatch):
+        """Testa que cada decisão roda no modo do lote."""
+        seen = []
+
+        async def _decide(env):
+            seen.append((is_deterministic_only(), is_no_persist()))
+            return Plan(decision_id=env.messages_window[-1].text, actions=[])
+
+        monkeypatch.setattr("app.core.orchestrator.decide_and_plan", _decide)
+
+        results = [
+            r async for r in run_decision_batch(
+                iter_json_list([_env("a"), _env("b"), _env("c")]),
+                deterministic_only=True,
+                concurrency=2
+            )
+        ]
+
+        assert sorted(r["index"] for r in results) == [0, 1, 2]
+        assert {r["plan"]["decision_id"] for r in results} == {"a", "b", "c"}
+        assert seen == [(True, True)] * 3
+        assert is_deterministic_only() is False
+        assert is_no_persist() is False
+
+    @pytest.mark.asyncio
+    async def test_jsonl_invalid_line_is_isolated(self, monkeypatch):
+        """Testa que uma linha inválida não derruba o lote."""
+        async def _decide(env):
+            return Plan(decision_id="ok", actions=[])
+
+        monkeypatch.setattr("app.core.orchestrator.decide_and_plan", _decide)
+
+        body = (json.dumps(_env("a")) + "\n{quebrado\n" + json.dumps(_env("b"))).encode()
+        items = iter_jsonl(body)
+
+        results = {r["index"]: r async for r in run_decision_batch(items)}
+
+        assert "plan" in results[0]
+        assert "error" in results[1]
+        assert "plan" in results[2]
+
+
+class TestNoPersist:
+    """Testes para decisões sem gravação de estado."""
+
+    @pytest.mark.asyncio
+    async def test_procedure_progress_not_saved(self):
+        """Testa que o progresso do procedimento não é gravado no modo no_persist."""
+        env = Env(**{**_env("a"), "lead": {"id": 7, "nome": "Teste"}})
+        progress = {"procedure_id": "liberar_teste", "current_step": "Depositar"}
+        service = AsyncMock()
+
+        with patch.object(orchestrator, "get_contexto_lead_service", return_value=service), \
+             patch("app.data.repo.ActivityRepository") as activity:
+            with decision_mode(no_persist=True):
+                await orchestrator.save_procedure_progress(env, progress, None)
+            service.atualizar_contexto.assert_not_called()
+            activity.assert_not_called()
+
+            await orchestrator.save_procedure_progress(env, progress, None)
+            service.atualizar_contexto.assert_awaited_once()
@@ -0,0 +1,197 @@
+"""
+Testes para o controlador de degradação sob carga.
+"""
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core import degradation
+from app.core.degradation import (
+    DegradationController, DEGRADATION_MODES, level_for, parse_thresholds
+)
+from app.core.decision_mode import decision_mode, is_deterministic_only
+from app.core.lead_serializer import LeadSerializer
+from app.redis_adapter import InMemoryRedis
+
+
+class FakeClock:
+    """Relógio manual."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def controller(clock):
+    """Controlador com limiares pequenos e sem intervalo entre avaliações."""
+    ctrl = DegradationController(serializer=LeadSerializer(InMemoryRedis()), clock=clock)
+    ctrl.enabled = True
+    ctrl.forced_mode = ""
+    ctrl.in_flight_thresholds = [2, 4, 6, 8]
+    ctrl.queue_thresholds = [1, 2, 3, 4]
+    ctrl.llm_p95_thresholds = [1000, 2000, 3000, 4000]
+    ctrl.eval_interval = 0
+    ctrl.recovery_seconds = 10
+    ctrl.latency_window = 60
+    return ctrl
+
+
+class TestThresholds:
+    """Testes para parse_thresholds/level_for."""
+
+    def test_parse_and_level(self):
+        """Testa o modo exigido por cada valor."""
+        thresholds = parse_thresholds("2, 4,6,8")
+        assert thresholds == [2, 4, 6, 8]
+        assert level_for(0, thresholds) == 0
+        assert level_for(4, thresholds) == 2
+        assert level_for(100, thresholds) == 4
+        assert level_for(100, parse_thresholds("")) == 0
+
+
+class TestDegradationController:
+    """Testes para DegradationController."""
+
+    def test_normal_without_pressure(self, controller):
+        """Testa modo normal sem carga."""
+        assert controller.mode == "normal"
+
+    @pytest.mark.asyncio
+    async def test_in_flight_escalates(self, controller):
+        """Testa subida direta para o modo exigido pelos turnos em andamento."""
+        async with controller.track_turn(), controller.track_turn(), controller.track_turn(), \
+                controller.track_turn():
+            assert controller.mode == "det_only_gate"
+        assert controller.in_flight == 0
+
+    def test_queue_depth_from_serializer(self, controller):
+        """Testa leitura da fila de turnos aguardando a vez do lead."""
+        controller.serializer.metrics.waiting = 3
+        assert controller.mode == "skip_kb_llm"
+
+    def test_llm_p95_needs_samples_and_window(self, controller, clock):
+        """Testa p95 de LLM na janela recente com amostras mínimas."""
+        for _ in range(4):
+            controller.record_llm_latency(5000)
+        assert controller.llm_p95_ms() is None
+
+        controller.record_llm_latency(5000)
+        assert controller.mode == "catalog_kb_only"
+
+        clock.now += 61
+        assert controller.llm_p95_ms() is None
+
+    def test_recovers_one_step_after_calm_window(self, controller, clock):
+        """Testa recuperação gradual quando a pressão cai."""
+        controller.serializer.metrics.waiting = 4
+        assert controller.mode == "catalog_kb_only"
+
+        controller.serializer.metrics.waiting = 0
+        assert controller.mode == "catalog_kb_only"
+        clock.now += 5
+        assert controller.mode == "catalog_kb_only"
+        clock.now += 5
+        assert controller.mode == "skip_kb_llm"
+        clock.now += 10
+        assert controller.mode == "det_only_gate"
+
+    def test_pressure_during_recovery_resets_window(self, controller, clock):
+        """Testa que nova pressão interrompe a recuperação."""
+        controller.serializer.metrics.waiting = 2
+        assert controller.mode == "det_only_gate"
+
+        controller.serializer.metrics.waiting = 0
+        controller.evaluate()
+        clock.now += 8
+        controller.serializer.metrics.waiting = 2
+        controller.evaluate()
+        controller.serializer.metrics.waiting = 0
+        clock.now += 8
+        assert controller.mode == "det_only_gate"
+
+    def test_forced_and_disabled(self, controller):
+        """Testa modo forçado e controlador desligado."""
+        controller.serializer.metrics.waiting = 4
+        controller.forced_mode = "single_intake_sample"
+        assert controller.mode == "single_intake_sample"
+
+        controller.forced_mode = ""
+        controller.enabled = False
+        assert controller.mode == "normal"
+
+    def test_snapshot(self, controller):
+        """Testa estado exposto em /metrics/runtime."""
+        controller.serializer.metrics.waiting = 1
+        snapshot = controller.snapshot()
+        assert snapshot["mode"] == "single_intake_sample"
+        assert snapshot["pressure"]["queue_depth"] == 1
+        assert snapshot["transitions"] == 1
+
+
+class TestModeHelpers:
+    """Testes para os cortes aplicados por modo."""
+
+    @pytest.fixture
+    def forced(self, controller, monkeypatch):
+        monkeypatch.setattr(degradation, "_degradation_controller", controller)
+
+        def _force(mode):
+            controller.forced_mode = mode
+        return _force
+
+    def test_cuts_are_cumulative(self, forced):
+        """Testa que cada modo inclui os cortes dos anteriores."""
+        expected = {
+            "normal": (2, "llm_first", True, False),
+            "single_intake_sample": (1, "llm_first", True, False),
+            "det_only_gate": (1, "det_only", True, False),
+            "skip_kb_llm": (1, "det_only", False, False),
+            "catalog_kb_only": (1, "det_only", False, True),
+        }
+        for mode in DEGRADATION_MODES:
+            forced(mode)
+            assert (
+                degradation.intake_samples(2),
+                degradation.confirm_agent_mode("llm_first"),
+                degradation.kb_llm_enabled(),
+                degradation.catalog_kb_only(),
+            ) == expected[mode]
+
+    def test_catalog_kb_only_makes_decisions_deterministic(self, forced):
+        """Testa que catalog_kb_only liga o caminho determinístico."""
+        forced("normal")
+        assert not is_deterministic_only()
+        with decision_mode(deterministic_only=True):
+            assert is_deterministic_only()
+
+        forced("catalog_kb_only")
+        assert is_deterministic_only()
+
+    @pytest.mark.asyncio
+    async def test_skip_kb_llm_answers_with_excerpt(self, forced, monkeypatch):
+        """Testa que skip_kb_llm responde dúvidas com o trecho da KB, sem LLM."""
+        from types import SimpleNamespace
+        from app.core import fallback_kb, rag_service
+        from app.data.schemas import Env
+        from app.settings import settings
+
+        hits = [{"texto": "O saque cai em até 24h.", "fonte": "kb.md"}]
+        service = SimpleNamespace(buscar_contexto_kb=AsyncMock(return_value=SimpleNamespace(hits=hits)))
+        llm = AsyncMock()
+        monkeypatch.setattr(rag_service, "get_rag_service", lambda: service)
+        monkeypatch.setattr(fallback_kb, "call_llm", llm)
+        monkeypatch.setattr(settings, "OPENAI_API_KEY", "sk-test")
+        env = Env(**{"lead": {"id": 1}, "snapshot": {}, "messages_window": [{"id": "m1", "text": "quando cai o saque?"}]})
+
+        forced("skip_kb_llm")
+        assert not is_deterministic_only()
+        assert await fallback_kb.query_knowledge_base(env) == "O saque cai em até 24h."
+        llm.assert_not_called()
@@ -0,0 +1,137 @@
+"""
+Testes para partições e arquivamento de journey_event.
+"""
+import gzip
+import json
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app.core.event_retention import (
+    ArchiveWriter, EventRetentionJob, add_months, expired_partitions,
+    partition_month, partition_name
+)
+
+
+class TestPartitionHelpers:
+    """Testes para nomes e datas de partições."""
+
+    def test_partition_name_round_trip(self):
+        """Testa nome da partição e leitura do mês."""
+        name = partition_name(date(2025, 3, 1))
+
+        assert name == "journey_event_p202503"
+        assert partition_month(name) == date(2025, 3, 1)
+        assert partition_month("journey_event_default") is None
+
+    def test_add_months_crosses_year(self):
+        """Testa soma de meses com virada de ano."""
+        assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+        assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+    def test_expired_partitions(self):
+        """Testa seleção de meses inteiros fora da retenção."""
+        names = [
+            "journey_event_p202503", "journey_event_p202501",
+            "journey_event_p202504", "journey_event_default"
+        ]
+
+        expired = expired_partitions(names, date(2025, 9, 15), retention_months=5)
+
+        assert expired == [
+            ("journey_event_p202501", date(2025, 1, 1)),
+            ("journey_event_p202503", date(2025, 3, 1)),
+        ]
+
+
+class TestArchiveWriter:
+    """Testes para o arquivo frio JSONL gzip."""
+
+    def test_writes_gzip_jsonl_atomically(self, tmp_path):
+        """Testa escrita em .tmp e troca para o nome final no close."""
+        job = EventRetentionJob(archive_dir=str(tmp_path))
+        path = job.archive_path(date(2025, 1, 1))
+        writer = ArchiveWriter(path)
+        created = datetime(2025, 1, 2, tzinfo=timezone.utc)
+
+        writer.write([{"id": 1, "lead_id": 7, "type": "message_received",
+                       "payload": {"text": "olá"}, "created_at": created}])
+        assert not (tmp_path / "journey_event" / "2025-01.jsonl.gz").exists()
+        writer.close()
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        assert rows == [{"id": 1, "lead_id": 7, "type": "message_received",
+                         "payload": {"text": "olá"}, "created_at": created.isoformat()}]
+        assert writer.rows == 1
+
+    def test_abort_removes_partial_file(self, tmp_path):
+        """Testa que falha no meio não deixa arquivo parcial."""
+        writer = ArchiveWriter(str(tmp_path / "journey_event" / "2025-02.jsonl.gz"))
+        writer.write([{"id": 1}])
+        writer.abort()
+
+        assert list((tmp_path / "journey_event").iterdir()) == []
+
+
+class TestRunOnceLock:
+    """Testes para a liberação do advisory lock."""
+
+    @pytest.mark.asyncio
+    async def test_lock_work_and_unlock_on_one_connection(self, monkeypatch):
+        """Testa lock, trabalho e unlock na mesma conexão, com rollback antes do unlock."""
+        from contextlib import asynccontextmanager
+        from app.infra import db as db_module
+
+        calls = []
+        seen = []
+
+        class FakeConnection:
+            async def scalar(self, stmt, params=None):
+                calls.append(str(stmt))
+                return True
+
+            async def execute(self, stmt, params=None):
+                calls.append(str(stmt))
+
+            async def commit(self):
+                calls.append("commit")
+
+            async def rollback(self):
+                calls.append("rollback")
+
+        conn = FakeConnection()
+
+        class FakeEngine:
+            @asynccontextmanager
+            async def connect(self):
+                yield conn
+
+        async def failing_partitions(db, today):
+            seen.append(db.bind)
+            raise RuntimeError("statement failed")
+
+        class FakeSession:
+            def __init__(self, bind, **kwargs):
+                self.bind = bind
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                calls.append("session_close")
+
+        import sqlalchemy.ext.asyncio as sa_asyncio
+        monkeypatch.setattr(sa_asyncio, "AsyncSession", FakeSession)
+        monkeypatch.setattr(db_module, "get_async_engine", lambda: FakeEngine())
+        job = EventRetentionJob()
+        monkeypatch.setattr(job, "ensure_partitions", failing_partitions)
+
+        with pytest.raises(RuntimeError):
+            await job.run_once(date(2025, 9, 15))
+
+        assert seen == [conn]
+        assert "pg_try_advisory_lock" in calls[0]
+        unlock = next(i for i, call in enumerate(calls) if "pg_advisory_unlock" in call)
+        assert calls[unlock - 1] == "rollback"
+        assert calls[-1] == "commit"
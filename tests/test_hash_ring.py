@@ -0,0 +1,87 @@
+"""
+Testes para o hashing consistente e o roteamento do dispatcher.
+"""
+import json
+
+from app.core.hash_ring import HashRing
+from app.dispatcher import Dispatcher, lead_routing_key
+from app.redis_adapter import InMemoryRedis
+from app.core.worker_registry import WorkerRegistry
+
+
+WORKERS = ["http://w1", "http://w2", "http://w3"]
+KEYS = [f"telegram:{i}" for i in range(2000)]
+
+
+class TestHashRing:
+    """Testes para HashRing."""
+
+    def test_stable_assignment_and_balance(self):
+        """Testa dono fixo por chave e distribuição razoável."""
+        ring = HashRing(WORKERS)
+        owners = [ring.get(key) for key in KEYS]
+
+        assert owners == [HashRing(WORKERS).get(key) for key in KEYS]
+        for worker in WORKERS:
+            assert owners.count(worker) > len(KEYS) / len(WORKERS) * 0.7
+
+    def test_join_moves_only_a_fraction(self):
+        """Testa que um worker novo só leva ~1/N das chaves."""
+        ring = HashRing(WORKERS)
+        before = {key: ring.get(key) for key in KEYS}
+
+        ring.add("http://w4")
+        moved = [key for key in KEYS if ring.get(key) != before[key]]
+
+        assert all(ring.get(key) == "http://w4" for key in moved)
+        assert len(moved) < len(KEYS) * 0.4
+
+    def test_leave_reassigns_only_its_keys(self):
+        """Testa que a saída só move as chaves do worker que saiu."""
+        ring = HashRing(WORKERS)
+        before = {key: ring.get(key) for key in KEYS}
+
+        ring.remove("http://w2")
+
+        for key in KEYS:
+            if before[key] != "http://w2":
+                assert ring.get(key) == before[key]
+            else:
+                assert ring.get(key) in ("http://w1", "http://w3")
+
+    def test_preference_starts_with_owner(self):
+        """Testa ordem de failover."""
+        ring = HashRing(WORKERS)
+
+        preference = ring.preference("telegram:42")
+
+        assert preference[0] == ring.get("telegram:42")
+        assert sorted(preference) == WORKERS
+
+
+class TestDispatcherRouting:
+    """Testes para chave de roteamento e rebalanceamento."""
+
+    def test_routing_key_from_telegram_update(self):
+        """Testa chave do lead a partir do update (mensagem e callback)."""
+        message = json.dumps({"message": {"chat": {"id": 123}, "text": "oi"}}).encode()
+        callback = json.dumps({"callback_query": {"message": {"chat": {"id": 123}}, "data": "sim"}}).encode()
+
+        assert lead_routing_key("/channels/telegram/webhook", message) == "telegram:123"
+        assert lead_routing_key("/channels/telegram/webhook", callback) == "telegram:123"
+        assert lead_routing_key("/api/leads", message) is None
+
+    def test_refresh_rebalances_on_join_and_leave(self):
+        """Testa anel refeito a partir dos heartbeats."""
+        redis = InMemoryRedis()
+        dispatcher = Dispatcher(WorkerRegistry(redis, worker_url=""))
+
+        WorkerRegistry(redis, worker_url="http://w1").heartbeat()
+        WorkerRegistry(redis, worker_url="http://w2").heartbeat()
+        assert dispatcher.refresh() is True
+        assert dispatcher.ring.nodes == ["http://w1", "http://w2"]
+        assert dispatcher.refresh() is False
+
+        redis.zadd("mb:workers", {"http://w2": 0})
+        assert dispatcher.refresh() is True
+        assert dispatcher.ring.nodes == ["http://w1"]
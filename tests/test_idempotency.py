@@ -0,0 +1,68 @@
+"""
+Testes para o store de idempotência em Redis.
+"""
+import pytest
+
+from app.core.idempotency import IdempotencyStore
+from app.redis_adapter import InMemoryRedis, RedisClient
+
+
+@pytest.fixture
+def store():
+    """Store com Redis in-memory."""
+    return IdempotencyStore(InMemoryRedis())
+
+
+class TestIdempotencyStore:
+    """Testes para IdempotencyStore."""
+
+    def test_set_nx(self):
+        """Testa SET NX do adapter in-memory."""
+        redis = InMemoryRedis()
+
+        assert redis.set("k", "a", ex=10, nx=True) is True
+        assert redis.set("k", "b", ex=10, nx=True) is False
+        assert redis.get("k") == "a"
+
+    @pytest.mark.asyncio
+    async def test_first_call_proceeds_duplicate_in_progress(self, store):
+        """Testa marcador em andamento para duplicata concorrente."""
+        assert await store.begin("plan-1") is None
+
+        duplicate = await store.begin("plan-1")
+
+        assert duplicate["status"] == "in_progress"
+        assert duplicate["applied"] is False
+
+    @pytest.mark.asyncio
+    async def test_completed_response_is_replayed(self, store):
+        """Testa replay da resposta guardada no Redis."""
+        await store.begin("plan-2")
+        response = {"applied": True, "status": "success"}
+
+        await store.complete("plan-2", response)
+
+        assert await store.begin("plan-2") == response
+        assert store.redis._data["mb:idem:plan-2"]["expires"] is not None
+
+    @pytest.mark.asyncio
+    async def test_release_allows_retry(self, store):
+        """Testa liberação da chave sem resposta."""
+        await store.begin("plan-3")
+        store.release("plan-3")
+
+        assert await store.begin("plan-3") is None
+
+    @pytest.mark.asyncio
+    async def test_redis_down_consults_durable(self, monkeypatch):
+        """Testa que sem resposta do Redis o registro durável ainda decide."""
+        store = IdempotencyStore(RedisClient("redis://127.0.0.1:1/0"))
+        response = {"applied": True, "status": "success"}
+
+        async def get_durable(key, db):
+            return response
+
+        monkeypatch.setattr(store, "_get_durable", get_durable)
+
+        assert await store.begin("plan-4", db=object(), durable=True) == response
+        assert store.redis.last_error is not None
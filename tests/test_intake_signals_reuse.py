@@ -0,0 +1,116 @@
+"""
+Testes para o reaproveitamento dos sinais do intake no gate e na resposta curta.
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import intake_agent
+from app.core.confirmation_gate import ConfirmationGate
+from app.core.intake_agent import _build_intake_context, _merge_llm_results
+from app.core.resposta_curta import RespostaCurtaService
+from app.data.schemas import Env, Lead, Message, Snapshot
+from app.settings import settings
+
+PENDING = [{
+    "target": "confirm_can_deposit",
+    "source": "context",
+    "prompt_text": "Você consegue fazer um pequeno depósito?"
+}]
+
+
+def make_env(signals=None, text="acho que rola"):
+    return Env(
+        lead=Lead(id=7),
+        snapshot=Snapshot(llm_signals=signals or {}),
+        messages_window=[Message(id="1", text=text)]
+    )
+
+
+class TestGateIntakeSignals:
+    """Testes para ConfirmationGate._intake_signal_result."""
+
+    def test_covered_target_is_reused(self):
+        """Testa confirmação resolvida pelo intake sem nova chamada."""
+        env = make_env({"targets": {"confirm_can_deposit": "yes"}, "confidence": 0.9})
+        result = ConfirmationGate()._intake_signal_result(env, PENDING)
+        assert result.handled
+        assert result.polarity == "yes"
+        assert result.source == "intake"
+
+    @pytest.mark.parametrize("signals", [
+        {},
+        {"targets": {"confirm_can_deposit": "yes"}},
+        {"targets": {"confirm_can_deposit": "yes"}, "confidence": 0.5},
+        {"targets": {"confirm_can_deposit": "n/a"}, "confidence": 0.95},
+        {"targets": {"confirm_created_account": "yes"}, "confidence": 0.95},
+        {"targets": {"confirm_can_deposit": "yes"}, "confidence": 0.95, "error": "timeout"},
+    ])
+    def test_missing_or_low_confidence_falls_through(self, signals):
+        """Testa que só sinais confiantes e que cobrem a pendência são usados."""
+        assert ConfirmationGate()._intake_signal_result(make_env(signals), PENDING) is None
+
+
+class TestRespostaCurtaIntakeSignals:
+    """Testes para RespostaCurtaService._posicao_por_sinais_intake."""
+
+    def test_reuses_target_polarity(self):
+        """Testa afirmação/negação vindas do intake para o target aguardado."""
+        service = RespostaCurtaService()
+        aguardando = {"tipo": "confirmacao", "target": "confirm_can_deposit"}
+        snapshot = Snapshot(llm_signals={"targets": {"confirm_can_deposit": "no"}, "confidence": 0.9})
+        assert service._posicao_por_sinais_intake(aguardando, snapshot) == "negacao"
+
+        snapshot.llm_signals["confidence"] = 0.4
+        assert service._posicao_por_sinais_intake(aguardando, snapshot) is None
+
+
+class TestIntakePrompt:
+    """Testes para as pendências no prompt do intake."""
+
+    def test_context_lists_pending_targets(self):
+        """Testa que as confirmações pendentes vão no contexto do intake."""
+        context = _build_intake_context("acho que rola", make_env(), False, PENDING)
+        assert "confirm_can_deposit" in context
+        assert "pequeno depósito" in context
+
+    def test_merge_confidence_discounts_disagreement(self):
+        """Testa confiança mesclada das amostras."""
+        merged = _merge_llm_results([
+            {"polarity": "yes", "targets": {"confirm_can_deposit": "yes"}, "confidence": 0.9},
+            {"polarity": "no", "targets": {"confirm_can_deposit": "no"}, "confidence": 0.7},
+        ])
+        assert merged["confidence"] == 0.4
+
+    @pytest.mark.asyncio
+    async def test_single_sample_carries_confidence(self, monkeypatch):
+        """Testa que com uma amostra a confiança pedida ao modelo chega ao gate."""
+        calls = []
+
+        async def fake_call_llm(site, create, **kwargs):
+            calls.append(kwargs)
+            arguments = {
+                "intents": [], "polarity": "yes", "targets": {"confirm_can_deposit": "yes"},
+                "facts": [], "propose_automations": [], "needs_clarifying": False, "confidence": 0.92
+            }
+            message = SimpleNamespace(function_call=SimpleNamespace(arguments=json.dumps(arguments)))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+        async def pending(env):
+            return PENDING
+
+        monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+        monkeypatch.setattr(intake_agent, "call_llm", fake_call_llm)
+        monkeypatch.setattr(intake_agent, "intake_samples", lambda configured: 1)
+        monkeypatch.setattr(intake_agent, "_get_pending_targets", pending)
+
+        env = make_env()
+        result = await intake_agent._analyze_message_with_llm("acho que rola", env, False)
+        intake_agent._apply_llm_signals_to_env(env, result)
+
+        schema = calls[0]["functions"][0]["parameters"]
+        assert "confidence" in schema["required"]
+        assert "CONFIDENCE" in calls[0]["messages"][0]["content"]
+        assert env.snapshot.llm_signals["confidence"] == 0.92
+        assert ConfirmationGate()._intake_signal_result(env, PENDING).polarity == "yes"
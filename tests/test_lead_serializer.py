@@ -0,0 +1,258 @@
+"""
+Testes para a serialização de turnos por lead.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.lead_serializer import (
+    LeadSerializer, LeadSerializationTimeout, LeadTurnLost, current_fencing_token,
+    ensure_lead_turn_current, lead_key_for_id, telegram_lead_key
+)
+from app.core import lead_serializer as lead_serializer_module
+from app.core.confirmation_gate import ConfirmationGate
+from app.core.idempotency import IdempotencyStore
+from app.channels import telegram as telegram_module
+from app.data.models import Lead
+from app.data.schemas import Action, Plan
+from app.data.unit_of_work import turn_unit_of_work
+from app.redis_adapter import InMemoryRedis, RedisClient
+from app.tools import apply_plan as apply_plan_module
+from app.tools.apply_plan import apply_plan
+
+
+@pytest.fixture
+def serializer():
+    """Serializador com Redis in-memory."""
+    return LeadSerializer(InMemoryRedis())
+
+
+class FakeSession:
+    """Sessão do turno com uma alteração pendente."""
+
+    def __init__(self):
+        self.new = [object()]
+        self.dirty = []
+        self.deleted = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def get(self, model, pk):
+        return Lead(id=pk, platform_user_id="77") if model is Lead else None
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeRequest:
+    """Request com o update do Telegram."""
+
+    async def json(self):
+        return {"update_id": 1, "message": {"chat": {"id": 77}, "from": {"id": 77}, "text": "oi"}}
+
+
+@pytest.fixture
+def telegram_turn(serializer, monkeypatch):
+    """Webhook do Telegram com pipeline falso; devolve (sessão, mensagens enviadas, ganchos)."""
+    session = FakeSession()
+    sent = []
+    hooks = {"apply_plan": lambda: None, "send": lambda: None}
+
+    async def passthrough(env):
+        return env
+
+    async def load_lead(uow, update, chat_id, message_text):
+        return None
+
+    async def decide_and_plan(env):
+        return Plan(decision_id="d1", actions=[Action(type="send_message", text="resposta")])
+
+    async def apply_plan(plan):
+        hooks["apply_plan"]()
+        return {"applied": False}
+
+    async def send(chat_id, text):
+        sent.append(text)
+        hooks["send"]()
+        return True
+
+    gate = SimpleNamespace(process_message=lambda env: asyncio.sleep(0, SimpleNamespace(handled=False)))
+    monkeypatch.setattr(telegram_module, "get_lead_serializer", lambda: serializer)
+    monkeypatch.setattr(telegram_module, "turn_unit_of_work", lambda: turn_unit_of_work(session))
+    monkeypatch.setattr(telegram_module, "_load_lead", load_lead)
+    monkeypatch.setattr(telegram_module, "build_snapshot", passthrough)
+    monkeypatch.setattr(telegram_module, "run_intake", passthrough)
+    monkeypatch.setattr(telegram_module, "get_confirmation_gate", lambda: gate)
+    monkeypatch.setattr(telegram_module, "decide_and_plan", decide_and_plan)
+    monkeypatch.setattr(telegram_module, "apply_plan", apply_plan)
+    monkeypatch.setattr(telegram_module, "send_telegram_message", send)
+    monkeypatch.setattr(telegram_module.settings, "TELEGRAM_WEBHOOK_SECRET", "s")
+    return session, sent, hooks
+
+
+class TestLeadSerializer:
+    """Testes para LeadSerializer."""
+
+    @pytest.mark.asyncio
+    async def test_same_lead_runs_in_order(self, serializer):
+        """Testa execução estritamente em ordem para o mesmo lead."""
+        order = []
+
+        async def turn(name, delay):
+            async with serializer.serialize("telegram:1"):
+                order.append(f"{name}:start")
+                await asyncio.sleep(delay)
+                order.append(f"{name}:end")
+
+        await asyncio.gather(turn("a", 0.02), turn("b", 0), turn("c", 0))
+
+        assert order == ["a:start", "a:end", "b:start", "b:end", "c:start", "c:end"]
+        assert serializer.metrics.contended == 2
+        assert serializer._slots == {}
+
+    @pytest.mark.asyncio
+    async def test_different_leads_run_in_parallel(self, serializer):
+        """Testa que leads diferentes não se bloqueiam."""
+        running = []
+
+        async def turn(key):
+            async with serializer.serialize(key):
+                running.append(key)
+                await asyncio.sleep(0.01)
+                return len(running)
+
+        results = await asyncio.gather(turn("telegram:1"), turn("telegram:2"))
+
+        assert max(results) == 2
+
+    @pytest.mark.asyncio
+    async def test_fencing_token_increases_and_reentrant(self, serializer):
+        """Testa fencing token monotônico e reentrância na mesma task."""
+        async with serializer.serialize("lead:5") as first:
+            async with serializer.serialize("lead:5") as nested:
+                assert nested is first
+            assert current_fencing_token() == first.fencing_token
+        async with serializer.serialize("lead:5") as second:
+            assert second.fencing_token > first.fencing_token
+        assert current_fencing_token() is None
+
+    @pytest.mark.asyncio
+    async def test_remote_lease_blocks_until_timeout(self, serializer):
+        """Testa lease mantido por outro worker."""
+        serializer.redis.set("mb:lease:lead:9", "outro-worker", ex=30, nx=True)
+
+        with pytest.raises(LeadSerializationTimeout):
+            async with serializer.serialize("lead:9", timeout=0.05):
+                pass
+
+        assert serializer.metrics.timeouts == 1
+        assert serializer._slots == {}
+
+    @pytest.mark.asyncio
+    async def test_release_keeps_foreign_lease(self, serializer):
+        """Testa que o release não apaga lease de outro dono."""
+        async with serializer.serialize("lead:3"):
+            serializer.redis.set("mb:lease:lead:3", "novo-dono", ex=30)
+
+        assert serializer.redis.get("mb:lease:lead:3") == "novo-dono"
+
+    @pytest.mark.asyncio
+    async def test_redis_down_proceeds_immediately(self):
+        """Testa que sem Redis o turno segue na hora, só com a ordem local."""
+        serializer = LeadSerializer(RedisClient("redis://127.0.0.1:1/0"))
+
+        async with serializer.serialize("lead:4", timeout=5) as turn:
+            assert turn.redis_unavailable is True
+            assert turn.fencing_token is None
+            ensure_lead_turn_current()
+
+        assert turn.waited_ms < 1000
+        assert serializer.metrics.unavailable == 1
+        assert serializer.metrics.timeouts == 0
+
+    @pytest.mark.asyncio
+    async def test_newer_token_fences_old_owner(self, serializer):
+        """Testa que um token mais novo rejeita as gravações do dono antigo."""
+        async with serializer.serialize("lead:6") as turn:
+            ensure_lead_turn_current()
+            serializer.redis.incr("mb:lease:lead:6:fence")
+
+            with pytest.raises(LeadTurnLost):
+                ensure_lead_turn_current()
+            assert turn.lost is True
+
+    @pytest.mark.asyncio
+    async def test_lost_turn_aborts_apply_plan(self, serializer):
+        """Testa que o apply_plan não executa ações de um turno perdido."""
+        plan = {"decision_id": "d1", "actions": [{"type": "send_message", "text": "oi"}]}
+        async with serializer.serialize("lead:8") as turn:
+            turn.lost = True
+            with pytest.raises(LeadTurnLost):
+                await apply_plan(plan)
+
+    @pytest.mark.asyncio
+    async def test_fenced_turn_releases_idempotency_key(self, serializer, monkeypatch):
+        """Testa que o turno cercado no meio do apply_plan libera a chave de idempotência."""
+        store = IdempotencyStore(InMemoryRedis())
+        monkeypatch.setattr(apply_plan_module, "get_idempotency_store", lambda: store)
+
+        async def fenced_actions(actions, decision_id, db=None, metadata=None, deferred=None):
+            serializer.redis.incr("mb:lease:lead:11:fence")
+            return []
+
+        monkeypatch.setattr(apply_plan_module, "execute_actions", fenced_actions)
+
+        async with serializer.serialize("lead:11"):
+            with pytest.raises(LeadTurnLost):
+                await apply_plan({"decision_id": "d1", "actions": []}, idempotency_key="turn-11")
+
+        assert await store.begin("turn-11") is None
+
+    @pytest.mark.asyncio
+    async def test_fence_advanced_after_apply_plan_blocks_reply(self, serializer, telegram_turn):
+        """Testa que o turno cercado depois do apply_plan não envia a resposta (503, reentrega)."""
+        session, sent, hooks = telegram_turn
+        hooks["apply_plan"] = lambda: serializer.redis.incr("mb:lease:telegram:77:fence")
+
+        with pytest.raises(HTTPException) as exc:
+            await telegram_module.webhook(FakeRequest(), "s")
+
+        assert exc.value.status_code == 503
+        assert sent == []
+        assert session.commits == 0
+
+    @pytest.mark.asyncio
+    async def test_fence_advanced_after_reply_returns_ok(self, serializer, telegram_turn):
+        """Testa que o turno cercado depois da resposta enviada descarta as gravações e responde 200."""
+        session, sent, hooks = telegram_turn
+        hooks["send"] = lambda: serializer.redis.incr("mb:lease:telegram:77:fence")
+
+        result = await telegram_module.webhook(FakeRequest(), "s")
+
+        assert sent == ["resposta"]
+        assert result["ok"] is True
+        assert result["result"]["persisted"] is False
+        assert session.commits == 0
+        assert session.rollbacks == 1
+
+    @pytest.mark.asyncio
+    async def test_gate_lock_uses_webhook_key(self, serializer, monkeypatch):
+        """Testa que o gate fora de um turno disputa o mesmo lease do webhook."""
+        monkeypatch.setattr(lead_serializer_module, "get_lead_serializer", lambda: serializer)
+        serializer.wait_timeout = 0.05
+        gate = ConfirmationGate()
+
+        async with turn_unit_of_work(FakeSession()):
+            assert await lead_key_for_id(5) == telegram_lead_key("77")
+
+            serializer.redis.set("mb:lease:telegram:77", "webhook-worker", ex=30, nx=True)
+            assert await gate._acquire_lead_lock(5) is False
+
+            serializer.redis.delete("mb:lease:telegram:77")
+            assert await gate._acquire_lead_lock(5) is True
+            await gate._release_lead_lock(5)
@@ -0,0 +1,90 @@
+"""
+Testes para filtros e paginação da listagem de leads.
+"""
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.api.leads import _account_filter, _inactive_cutoff
+from app.data.models import Lead, LeadProfile
+from app.data.pagination import (
+    InvalidCursor, encode_cursor, decode_cursor, keyset_filter, count_cache_key
+)
+
+
+def _sql(condition) -> str:
+    query = select(LeadProfile.lead_id).where(condition)
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+class TestAccountFilter:
+    """Testes para _account_filter."""
+
+    def test_exact_value_uses_containment(self):
+        """Testa valor exato como @> (índice GIN)."""
+        assert "lead_profile.accounts @>" in _sql(_account_filter("quotex", "verificada"))
+
+    def test_com_conta_matches_expression_index(self):
+        """Testa chave literal, igual à expressão do índice."""
+        sql = _sql(_account_filter("nyrion", "com_conta"))
+
+        assert "(lead_profile.accounts ->> 'nyrion') IS NOT NULL" in sql
+        assert "NOT IN" in sql
+
+    def test_sem_conta(self):
+        """Testa ausência de conta como NULL ou valores vazios."""
+        sql = _sql(_account_filter("quotex", "sem_conta"))
+
+        assert "(lead_profile.accounts ->> 'quotex') IS NULL OR" in sql
+
+
+class TestKeysetPagination:
+    """Testes para cursor e condição keyset."""
+
+    def test_cursor_round_trip(self):
+        """Testa codificação do cursor com datetime."""
+        created = datetime(2025, 9, 1, 12, 30, tzinfo=timezone.utc)
+        token = encode_cursor("created_at", "desc", created, 42)
+
+        assert decode_cursor(token, "created_at", "desc") == (created, 42)
+
+    def test_cursor_rejects_other_sort(self):
+        """Testa cursor de outra ordenação ou corrompido."""
+        token = encode_cursor("id", "asc", 10, 10)
+
+        with pytest.raises(InvalidCursor):
+            decode_cursor(token, "id", "desc")
+        with pytest.raises(InvalidCursor):
+            decode_cursor("nao-e-cursor", "id", "asc")
+
+    def test_keyset_filter_desc(self):
+        """Testa condição (campo, id) para ordem decrescente."""
+        sql = str(
+            select(Lead.id)
+            .where(keyset_filter(Lead.created_at, Lead.id, "desc", datetime(2025, 1, 1), 7))
+            .compile(dialect=postgresql.dialect())
+        )
+
+        assert "lead.created_at < " in sql
+        assert "lead.id < " in sql
+
+    def test_count_cache_key_depends_on_params(self):
+        """Testa chave de cache distinta por valor de filtro."""
+        base = select(Lead)
+
+        assert count_cache_key("leads", base.where(Lead.lang == "pt-BR")) != \
+            count_cache_key("leads", base.where(Lead.lang == "en"))
+        assert count_cache_key("leads", base.where(Lead.lang == "en")) == \
+            count_cache_key("leads", base.where(Lead.lang == "en"))
+
+    def test_inactive_cutoff_keeps_cache_key_stable(self):
+        """Testa que o corte de inatividade não muda a chave dentro do mesmo minuto."""
+        base = select(Lead)
+        first = _inactive_cutoff(24, datetime(2025, 9, 15, 12, 30, 5, 123456))
+        second = _inactive_cutoff(24, datetime(2025, 9, 15, 12, 30, 48, 987654))
+
+        assert first == datetime(2025, 9, 14, 12, 30)
+        assert count_cache_key("leads", base.where(Lead.created_at < first)) == \
+            count_cache_key("leads", base.where(Lead.created_at < second))
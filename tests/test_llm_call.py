@@ -0,0 +1,110 @@
+"""
+Testes para o hedging do caminho comum de chamadas LLM.
+"""
+import asyncio
+
+import pytest
+
+from app.core import circuit_breaker as cb
+from app.core import llm_call
+from app.core.llm_call import LLMHedger, call_llm
+
+
+@pytest.fixture
+def hedger(monkeypatch):
+    """Hedger isolado, com 'gate' habilitado e latência de 10ms aprendida."""
+    h = LLMHedger()
+    h.sites = {"gate"}
+    h.percentile = 0.9
+    h.min_samples = 5
+    h.min_delay = 0.01
+    h.budget_ratio = 0.5
+    h.budget_burst = 1.0
+    for _ in range(10):
+        h.observe("gpt-test", 0.01)
+    monkeypatch.setattr(llm_call, "_llm_hedger", h)
+    monkeypatch.setattr(cb, "_circuit_breakers", {})
+    return h
+
+
+def slow_then_fast(delays):
+    """Fábrica que responde cada requisição após o próximo atraso da lista."""
+    state = {"started": [], "cancelled": []}
+
+    async def create(**kwargs):
+        index = len(state["started"])
+        state["started"].append(index)
+        try:
+            await asyncio.sleep(delays[index])
+        except asyncio.CancelledError:
+            state["cancelled"].append(index)
+            raise
+        return f"response-{index}"
+
+    return create, state
+
+
+class TestLLMHedger:
+    """Testes para LLMHedger."""
+
+    def test_delay_needs_samples(self):
+        """Testa que sem amostras suficientes não há hedging."""
+        h = LLMHedger()
+        h.min_samples = 3
+        h.observe("m", 1.0)
+        assert h.hedge_delay("m") is None
+
+    def test_budget_caps_extra_requests(self, hedger):
+        """Testa orçamento de cópias por ponto de chamada."""
+        hedger.on_call("gate")
+        assert hedger.try_spend("gate")
+        assert not hedger.try_spend("gate")
+        hedger.on_call("gate")
+        hedger.on_call("gate")
+        assert hedger.try_spend("gate")
+        assert hedger.snapshot()["budgets"]["gate"]["denied"] == 1
+
+
+class TestHedgedCall:
+    """Testes para call_llm com hedging."""
+
+    @pytest.mark.asyncio
+    async def test_backup_wins_and_primary_is_cancelled(self, hedger):
+        """Testa cópia disparada após o percentil e cancelamento do perdedor."""
+        create, state = slow_then_fast([1.0, 0.0])
+
+        result = await call_llm("gate", create, model="gpt-test")
+
+        assert result == "response-1"
+        await asyncio.sleep(0)
+        assert state["cancelled"] == [0]
+        assert hedger.snapshot()["budgets"]["gate"]["hedge_wins"] == 1
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_is_not_hedged(self, hedger):
+        """Testa que respostas rápidas não disparam cópia."""
+        create, state = slow_then_fast([0.0])
+        assert await call_llm("gate", create, model="gpt-test") == "response-0"
+        assert state["started"] == [0]
+
+    @pytest.mark.asyncio
+    async def test_site_without_hedging(self, hedger):
+        """Testa ponto fora de LLM_HEDGE_SITES (geração) sem cópia."""
+        create, state = slow_then_fast([0.05])
+        assert await call_llm("comparador", create, model="gpt-test") == "response-0"
+        assert state["started"] == [0]
+
+    @pytest.mark.asyncio
+    async def test_failed_copy_waits_for_other(self, hedger):
+        """Testa que a falha de uma requisição não derruba a outra."""
+        calls = []
+
+        async def create(**kwargs):
+            calls.append(len(calls))
+            if len(calls) == 1:
+                await asyncio.sleep(0.05)
+                return "primary"
+            raise RuntimeError("503")
+
+        assert await call_llm("gate", create, model="gpt-test") == "primary"
+        assert len(calls) == 2
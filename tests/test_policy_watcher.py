@@ -0,0 +1,77 @@
+"""
+Testes para o watcher de políticas (invalidação entre workers).
+"""
+import json
+import os
+
+import pytest
+
+from app.core.policy_watcher import PolicyWatcher, COMPONENT_CATALOG, COMPONENT_KB
+
+
+@pytest.fixture
+def watched(tmp_path):
+    """Arquivos temporários observados e contadores de recarga."""
+    catalog = tmp_path / "catalog.yml"
+    kb = tmp_path / "kb.md"
+    catalog.write_text("[]", encoding="utf-8")
+    kb.write_text("# KB\n", encoding="utf-8")
+
+    calls = {COMPONENT_CATALOG: 0, COMPONENT_KB: 0}
+
+    def reloader(component):
+        def _reload():
+            calls[component] += 1
+        return _reload
+
+    watcher = PolicyWatcher(
+        paths={COMPONENT_CATALOG: [catalog], COMPONENT_KB: [kb]},
+        reloaders={c: reloader(c) for c in calls},
+        interval_ms=100
+    )
+    return watcher, catalog, kb, calls
+
+
+class TestPolicyWatcher:
+    """Testes para PolicyWatcher."""
+
+    def test_check_once_reloads_only_changed(self, watched):
+        """Testa que só o componente alterado é recarregado."""
+        watcher, catalog, kb, calls = watched
+
+        assert watcher.check_once() == []
+
+        catalog.write_text("- id: nova\n", encoding="utf-8")
+        os.utime(catalog, ns=(1, 1))
+
+        assert watcher.check_once() == [COMPONENT_CATALOG]
+        assert calls == {COMPONENT_CATALOG: 1, COMPONENT_KB: 0}
+        assert watcher.versions[COMPONENT_CATALOG] == 1
+
+        # Sem novas mudanças, sem nova recarga
+        assert watcher.check_once() == []
+
+    @pytest.mark.asyncio
+    async def test_notify_without_reload_skips_file_cycle(self, watched, monkeypatch):
+        """Testa que notificação local não gera recarga dupla pelo polling."""
+        watcher, catalog, kb, calls = watched
+        monkeypatch.setattr("app.core.policy_watcher.settings.REDIS_URL", None)
+
+        kb.write_text("# KB\nNova pergunta?\nResposta\n", encoding="utf-8")
+        version = await watcher.notify(COMPONENT_KB, reload=False)
+
+        assert version == 1
+        assert calls[COMPONENT_KB] == 0
+        assert watcher.check_once() == []
+
+    def test_handle_message_ignores_own_origin(self, watched):
+        """Testa mensagens do canal Redis."""
+        watcher, catalog, kb, calls = watched
+
+        own = json.dumps({"component": COMPONENT_KB, "origin": watcher.origin})
+        other = json.dumps({"component": COMPONENT_KB, "origin": "outro-worker"})
+
+        assert watcher.handle_message(own) is None
+        assert watcher.handle_message("invalido") is None
+        assert watcher.handle_message(other) == COMPONENT_KB
+        assert calls[COMPONENT_KB] == 1
@@ -0,0 +1,105 @@
+"""
+Testes para o progresso incremental de procedimentos.
+"""
+import pytest
+
+from app.core import catalog_store, eligibility
+from app.core.catalog_store import CatalogStore
+from app.core.procedures import advance_procedure, summarize_progress, ETAPA_CONCLUIDA
+from app.data.schemas import Snapshot
+
+
+PROCEDURES_YML = (
+    "- id: liberar_teste\n"
+    "  steps:\n"
+    "    - name: Criar conta\n"
+    "      condition: tem conta\n"
+    "    - name: Concordar em depositar\n"
+    "      condition: concordou em depositar\n"
+    "    - name: Depositar\n"
+    "      condition: depósito confirmado\n"
+)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Store isolada com um procedimento de três passos."""
+    (tmp_path / "procedures.yml").write_text(PROCEDURES_YML, encoding="utf-8")
+    store = CatalogStore(tmp_path)
+    monkeypatch.setattr(catalog_store, "_catalog_store", store)
+    return store
+
+
+def _snapshot(account="desconhecido", can_deposit=False, deposit="nenhum"):
+    return Snapshot(
+        accounts={"quotex": account},
+        agreements={"can_deposit": can_deposit},
+        deposit={"status": deposit}
+    )
+
+
+class TestProcedureProgress:
+    """Testes para advance_procedure."""
+
+    def test_stops_at_first_unsatisfied_step(self, store):
+        """Testa avaliação inicial e fatos observados."""
+        progress = advance_procedure("liberar_teste", _snapshot(account="ativo"))
+
+        assert progress["step_index"] == 1
+        assert progress["current_step"] == "Concordar em depositar"
+        assert set(progress["facts"]) == {"accounts", "agreements.can_deposit"}
+
+    def test_unchanged_facts_skip_evaluation(self, store, monkeypatch):
+        """Testa que nada é reavaliado quando os fatos não mudaram."""
+        snapshot = _snapshot(account="ativo")
+        progress = advance_procedure("liberar_teste", snapshot)
+
+        def _fail(*args, **kwargs):
+            raise AssertionError("Condição não deveria ser reavaliada")
+
+        monkeypatch.setattr("app.core.procedures.evaluate_compiled_rule", _fail)
+
+        assert advance_procedure("liberar_teste", snapshot, progress) is progress
+
+    def test_resumes_from_current_step(self, store, monkeypatch):
+        """Testa que passos anteriores não são reavaliados."""
+        progress = advance_procedure("liberar_teste", _snapshot(account="ativo"))
+
+        evaluated = []
+        original = eligibility.evaluate_compiled_rule
+
+        def _spy(compiled, snapshot):
+            evaluated.append(compiled)
+            return original(compiled, snapshot)
+
+        monkeypatch.setattr("app.core.procedures.evaluate_compiled_rule", _spy)
+        progress = advance_procedure(
+            "liberar_teste", _snapshot(account="ativo", can_deposit=True), progress
+        )
+
+        assert progress["step_index"] == 2
+        assert ("has_account",) not in evaluated
+
+    def test_regression_reevaluates_earlier_step(self, store):
+        """Testa volta de passo quando um fato de passo anterior muda."""
+        progress = advance_procedure(
+            "liberar_teste", _snapshot(account="ativo", can_deposit=True)
+        )
+        assert progress["step_index"] == 2
+
+        progress = advance_procedure("liberar_teste", _snapshot(can_deposit=True), progress)
+
+        assert progress["step_index"] == 0
+
+    def test_summary_is_read_from_saved_progress(self, store):
+        """Testa resumo O(1) para o Studio."""
+        progress = advance_procedure(
+            "liberar_teste",
+            _snapshot(account="ativo", can_deposit=True, deposit="confirmado")
+        )
+        summary = summarize_progress(progress)
+
+        assert summary["is_complete"] is True
+        assert summary["current_step"] == ETAPA_CONCLUIDA
+        assert summary["progress"] == 1.0
+        assert summarize_progress(None) is None
@@ -0,0 +1,74 @@
+"""
+Testes para helpers da camada de persistência assíncrona.
+"""
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.data.repo import merge_facts, message_direction, ActivityRepository
+from app.infra.db import async_session_scope
+
+
+class TestRepoHelpers:
+    """Testes para merge de fatos e escopo de sessão."""
+
+    def test_merge_facts_preserves_existing_keys(self):
+        """Testa merge recursivo de fatos no JSON do perfil."""
+        current = {"can_deposit": False, "wants_test": True}
+
+        merged = merge_facts(current, {"can_deposit": True})
+
+        assert merged == {"can_deposit": True, "wants_test": True}
+        assert current["can_deposit"] is False
+
+    def test_merge_facts_nested(self):
+        """Testa merge de dicts aninhados e substituição de escalares."""
+        merged = merge_facts({"a": {"b": 1, "c": 2}, "d": 1}, {"a": {"b": 3}, "d": {"e": 1}})
+
+        assert merged == {"a": {"b": 3, "c": 2}, "d": {"e": 1}}
+
+    @pytest.mark.asyncio
+    async def test_session_scope_reuses_caller_session(self):
+        """Testa que a sessão do chamador é usada sem abrir outra."""
+        session = object()
+
+        async with async_session_scope(session) as db:
+            assert db is session
+
+
+class _RecordingSession:
+    """Sessão falsa que guarda os statements executados."""
+
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+    async def commit(self):
+        self.commits += 1
+
+
+class TestActivityRepository:
+    """Testes para o resumo lead_activity."""
+
+    def test_message_direction(self):
+        """Testa classificação de eventos como mensagens."""
+        assert message_direction("message_received", {}) == "in"
+        assert message_direction("pipeline_executed", {"response_sent": True}) == "out"
+        assert message_direction("pipeline_executed", {"response_sent": False}) is None
+        assert message_direction("automation_sent", None) is None
+
+    @pytest.mark.asyncio
+    async def test_record_event_is_single_upsert(self):
+        """Testa que o evento vira um único INSERT ... ON CONFLICT."""
+        session = _RecordingSession()
+
+        await ActivityRepository(session).record_event(7, "message_received", {"text": "oi"})
+
+        assert len(session.statements) == 1
+        sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (lead_id) DO UPDATE" in sql
+        assert "greatest(lead_activity.last_activity_at" in sql
+        assert "lead_activity.messages_in + excluded.messages_in" in sql
+        assert session.commits == 1
@@ -0,0 +1,127 @@
+"""
+Testes para o unit of work por turno.
+"""
+import pytest
+
+from app.core.decision_mode import llm_slot
+from app.core.contexto_lead import ContextoLeadService
+from app.data.models import ContextoLead
+from app.data.unit_of_work import UnitOfWork, turn_unit_of_work, current_unit_of_work
+from app.settings import settings
+
+
+@pytest.fixture(autouse=True)
+def sem_cache_de_contexto(monkeypatch):
+    """Exercita o caminho direto no banco do ContextoLeadService."""
+    monkeypatch.setattr(settings, "CONTEXT_CACHE_ENABLED", False)
+
+
+class FakeSession:
+    """Sessão mínima que conta consultas e commits."""
+
+    def __init__(self, rows=None):
+        self.rows = rows or {}
+        self.gets = 0
+        self.commits = 0
+        self.new = []
+        self.dirty = []
+        self.deleted = []
+        self.open = False
+
+    async def get(self, model, pk):
+        self.gets += 1
+        self.open = True
+        return self.rows.get((model, pk))
+
+    def in_transaction(self):
+        return self.open
+
+    def add(self, entity):
+        self.new.append(entity)
+
+    async def commit(self):
+        self.commits += 1
+        self.new = []
+        self.open = False
+
+    async def rollback(self):
+        self.new = []
+        self.open = False
+
+
+class TestUnitOfWork:
+    """Testes para UnitOfWork e integração com ContextoLeadService."""
+
+    @pytest.mark.asyncio
+    async def test_identity_map_loads_once(self):
+        """Testa que o contexto (inclusive ausente) é buscado uma vez por turno."""
+        session = FakeSession()
+        uow = UnitOfWork(session, turn=True)
+
+        assert await uow.get(ContextoLead, 1) is None
+        assert await uow.get(ContextoLead, 1) is None
+        assert session.gets == 1
+
+    @pytest.mark.asyncio
+    async def test_turn_defers_commit_to_end(self):
+        """Testa que gravações do serviço ficam para um commit único."""
+        session = FakeSession()
+        service = ContextoLeadService()
+
+        async with turn_unit_of_work(session) as uow:
+            assert current_unit_of_work() is uow
+
+            await service.atualizar_contexto(1, ultima_automacao_enviada="ask_deposit")
+            await service.definir_aguardando_confirmacao(1, "confirm_can_deposit", "ask_deposit")
+            contexto = await service.obter_contexto(1)
+
+            assert session.commits == 0
+            assert contexto.ultima_automacao_enviada == "ask_deposit"
+            assert contexto.aguardando["fato"] == "confirm_can_deposit"
+
+        assert session.commits == 1
+        assert session.gets == 1
+        assert current_unit_of_work() is None
+
+    @pytest.mark.asyncio
+    async def test_services_share_turn_without_global_session(self):
+        """Testa que instâncias sem sessão usam o turno atual."""
+        contexto_db = ContextoLead(lead_id=7, ultimo_topico_kb="saque")
+        session = FakeSession({(ContextoLead, 7): contexto_db})
+
+        async with turn_unit_of_work(session):
+            first = await ContextoLeadService().obter_contexto(7)
+            second = await ContextoLeadService().obter_contexto(7)
+
+        assert first.ultimo_topico_kb == second.ultimo_topico_kb == "saque"
+        assert session.gets == 1
+        assert session.commits == 0
+
+    @pytest.mark.asyncio
+    async def test_llm_slot_releases_read_transaction(self):
+        """Testa que a conexão de leitura do turno é devolvida antes da chamada LLM."""
+        contexto_db = ContextoLead(lead_id=8, ultimo_topico_kb="saque")
+        session = FakeSession({(ContextoLead, 8): contexto_db})
+
+        async with turn_unit_of_work(session) as uow:
+            await ContextoLeadService().obter_contexto(8)
+            assert session.in_transaction()
+
+            async with llm_slot():
+                assert not session.in_transaction()
+
+            assert (await uow.get(ContextoLead, 8)) is contexto_db
+        assert session.gets == 1
+
+    @pytest.mark.asyncio
+    async def test_release_keeps_pending_writes(self):
+        """Testa que release não antecipa gravações do turno, que saem no commit final."""
+        session = FakeSession()
+
+        async with turn_unit_of_work(session) as uow:
+            await uow.get(ContextoLead, 9)
+            await uow.save()
+            await uow.release()
+            assert session.commits == 0
+
+        assert session.commits == 1